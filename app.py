@@ -19,6 +19,8 @@ load_dotenv()
 # Import configurations
 from config.settings import Config
 from src.core.database import init_db
+from src.core.observability import init_metrics
+from src.core.rate_limiter import init_rate_limiter
 from src.api.routes import register_blueprints
 
 # Configure logging
@@ -49,6 +51,12 @@ def create_app(config_class=Config):
     # Initialize database
     init_db(app)
     
+    # Prometheus request metrics and /metrics
+    init_metrics(app)
+    
+    # Per-client rate limits (API_RATE_LIMIT)
+    init_rate_limiter(app)
+    
     # Register API blueprints
     register_blueprints(app)
     
@@ -91,8 +99,18 @@ def create_app(config_class=Config):
     return app
 
 
-# Create application instance
-app = create_app()
+def __getattr__(name):
+    """
+    The default application instance, created on first access
+
+    ``gunicorn app:app`` and ``flask run`` look it up by name; importing
+    create_app alone (tests, Celery tasks, CLIs) no longer builds one.
+    """
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
@@ -101,6 +119,7 @@ if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     
     logger.info(f"Starting ADFLOWAI server on port {port}")
+    app = create_app()
     app.run(
         host='0.0.0.0',
         port=port,
@@ -26,9 +26,34 @@ class Config:
     SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', 10))
     SQLALCHEMY_POOL_TIMEOUT = int(os.getenv('DATABASE_POOL_TIMEOUT', 30))
     
+    # File-backed SQLite (single-node deployments): WAL, pragmas and a pooled, single-writer engine
+    SQLITE_WAL = os.getenv('SQLITE_WAL', 'True').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough under WAL; FULL to fsync every commit
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))  # page cache per connection
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # bytes of the file read through mmap; 0 disables
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # wait for the write lock before 'database is locked'
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 8))
+    
+    # Read replicas (comma-separated URLs; dashboard, analytics, reports and admin stats read from them)
+    DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+    DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))  # seconds; laggier replicas fall back to the primary
+    DB_REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 2))  # seconds between lag probes
+    DB_REPLICA_PROBE_TIMEOUT = float(os.getenv('DB_REPLICA_PROBE_TIMEOUT', 1))  # seconds a lag probe may take
+    
+    # Database Instrumentation (per-request query stats; headers in debug)
+    DB_INSTRUMENTATION_ENABLED = os.getenv('DB_INSTRUMENTATION_ENABLED', 'True').lower() == 'true'
+    DB_QUERY_HEADERS = os.getenv('DB_QUERY_HEADERS', 'False').lower() == 'true'  # X-DB-* headers outside debug too
+    DB_SLOW_QUERY_COUNT = int(os.getenv('DB_SLOW_QUERY_COUNT', 5))  # slowest statements kept per request
+    DB_N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', 10))  # repeats of one statement before warning
+    
+    # Prometheus (/metrics; set PROMETHEUS_MULTIPROC_DIR under multi-process servers)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    CELERY_METRICS_PORT = int(os.getenv('CELERY_METRICS_PORT', 0))  # 0 = workers don't serve /metrics
+    
     # Redis Configuration
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     REDIS_CACHE_TTL = int(os.getenv('REDIS_CACHE_TTL', 3600))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.5))  # seconds; rate limiter and bandit calls sit on request paths
     
     # JWT Configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-change-in-production')
@@ -39,14 +64,35 @@ class Config:
         seconds=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES', 2592000))
     )
     
+    # Password Hashing
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))  # changing it rehashes on next login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 1))  # concurrent bcrypt calls per process
+    PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 0))  # waiting calls before 503
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))  # seconds
+    
+    # Identity Cache (user records and campaign owners; per process)
+    IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 30))  # seconds another process may lag a change
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', 10000))
+    
+    # API Keys (X-API-Key header; stored as HMAC-SHA256 digests)
+    API_KEY_HMAC_SECRET = os.getenv('API_KEY_HMAC_SECRET', '')  # defaults to SECRET_KEY; changing it voids all keys
+    API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', 60))  # seconds another process may honour a revoked key
+    API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', 10000))
+    API_KEY_LAST_USED_FLUSH = float(os.getenv('API_KEY_LAST_USED_FLUSH', 60))  # seconds between last_used writes
+    
     # CORS Settings
     CORS_ORIGINS = os.getenv(
         'CORS_ORIGINS',
         'http://localhost:3000,http://localhost:5000'
     ).split(',')
     
-    # API Rate Limiting
-    API_RATE_LIMIT = int(os.getenv('API_RATE_LIMIT', 100))
+    # API Rate Limiting (token bucket per API key / user / address)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    API_RATE_LIMIT = int(os.getenv('API_RATE_LIMIT', 100))  # requests per RATE_LIMIT_PERIOD
+    API_RATE_LIMIT_EXPENSIVE = int(os.getenv('API_RATE_LIMIT_EXPENSIVE', 10))  # per bucket: optimize, reports, metrics
+    RATE_LIMIT_PERIOD = float(os.getenv('RATE_LIMIT_PERIOD', 60))  # seconds to refill an empty bucket
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory (per process), redis (shared by all workers)
+    RATE_LIMIT_REDIS_PREFIX = os.getenv('RATE_LIMIT_REDIS_PREFIX', 'ratelimit')
     
     # Platform API Keys - Google Ads
     GOOGLE_ADS_DEVELOPER_TOKEN = os.getenv('GOOGLE_ADS_DEVELOPER_TOKEN', '')
@@ -69,8 +115,15 @@ class Config:
     ML_PREDICTION_CONFIDENCE_THRESHOLD = float(
         os.getenv('ML_PREDICTION_CONFIDENCE_THRESHOLD', 0.75)
     )
+    ML_TRAINING_CHUNK_SIZE = int(os.getenv('ML_TRAINING_CHUNK_SIZE', 250000))  # rows in memory per chunk
+    ML_TRAINING_ESTIMATORS = int(os.getenv('ML_TRAINING_ESTIMATORS', 100))
+    ML_TRAINING_MAX_ESTIMATORS = int(os.getenv('ML_TRAINING_MAX_ESTIMATORS', 300))  # cap across warm starts
+    ML_TRAINING_JOBS = int(os.getenv('ML_TRAINING_JOBS', -1))
+    ML_TRAINING_WARM_START = os.getenv('ML_TRAINING_WARM_START', 'True').lower() == 'true'
     AUTO_PAUSE_THRESHOLD = float(os.getenv('AUTO_PAUSE_THRESHOLD', 0.3))
     AUTO_REALLOCATE = os.getenv('AUTO_REALLOCATE', 'True').lower() == 'true'
+    BANDIT_STATE_BACKEND = os.getenv('BANDIT_STATE_BACKEND', 'memory')  # memory, redis (shared by all workers)
+    BANDIT_REDIS_PREFIX = os.getenv('BANDIT_REDIS_PREFIX', 'bandit')
     
     # Campaign Optimization Settings
     OPTIMIZATION_CHECK_INTERVAL = int(os.getenv('OPTIMIZATION_CHECK_INTERVAL', 3600))
@@ -79,6 +132,25 @@ class Config:
     MIN_PERFORMANCE_SCORE = float(os.getenv('MIN_PERFORMANCE_SCORE', 0.4))
     HIGH_PERFORMANCE_THRESHOLD = float(os.getenv('HIGH_PERFORMANCE_THRESHOLD', 0.8))
     
+    # Real-Time Streaming (SSE / long-poll)
+    REALTIME_LOCAL_MONITOR = os.getenv('REALTIME_LOCAL_MONITOR', 'True').lower() == 'true'
+    REALTIME_POLL_TIMEOUT = int(os.getenv('REALTIME_POLL_TIMEOUT', 25))
+    REALTIME_HEARTBEAT_INTERVAL = int(os.getenv('REALTIME_HEARTBEAT_INTERVAL', 15))
+    REALTIME_MAX_STREAMS = int(os.getenv('REALTIME_MAX_STREAMS', 1))  # open SSE streams per process; each holds a worker thread
+    REALTIME_METRICS_SOURCE = os.getenv('REALTIME_METRICS_SOURCE', 'simulated')  # simulated, history, redis, replay
+    REALTIME_METRICS_STREAM = os.getenv('REALTIME_METRICS_STREAM', 'metrics:stream')
+    REALTIME_TRACE_PATH = os.getenv('REALTIME_TRACE_PATH', '')
+    REALTIME_REPLAY_SPEED = float(os.getenv('REALTIME_REPLAY_SPEED', 1.0))
+    REALTIME_WINDOW_SIZE = int(os.getenv('REALTIME_WINDOW_SIZE', 3600))  # samples kept in memory per campaign
+    REALTIME_MONITOR_IDLE_TTL = int(os.getenv('REALTIME_MONITOR_IDLE_TTL', 120))  # stop campaigns nobody asked for
+    
+    # Real-Time Gateway (python -m src.core.realtime_gateway)
+    REALTIME_GATEWAY_PORT = int(os.getenv('REALTIME_GATEWAY_PORT', 8765))
+    REALTIME_SHARD_INDEX = int(os.getenv('REALTIME_SHARD_INDEX', 0))
+    REALTIME_SHARD_COUNT = int(os.getenv('REALTIME_SHARD_COUNT', 1))
+    REALTIME_CLIENT_QUEUE_SIZE = int(os.getenv('REALTIME_CLIENT_QUEUE_SIZE', 256))
+    REALTIME_WATCH_LEASE = int(os.getenv('REALTIME_WATCH_LEASE', 90))
+    
     # Celery Configuration
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -116,6 +188,10 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    BCRYPT_ROUNDS = 4
+    PASSWORD_HASH_QUEUE_DEPTH = 4
+    API_KEY_LAST_USED_FLUSH = 0  # no background writer against the shared in-memory DB
+    RATE_LIMIT_ENABLED = False
 
 
 # Configuration dictionary
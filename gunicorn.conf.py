@@ -0,0 +1,32 @@
+"""
+ADFLOWAI - Gunicorn configuration
+Read automatically by gunicorn from the working directory; command-line flags still win.
+
+Sets up Prometheus multiprocess mode so /metrics aggregates every worker, and
+gives each forked worker its own database connections.
+"""
+
+import os
+import shutil
+import tempfile
+
+# Must be set before the app (and prometheus_client) is imported, which
+# with --preload happens right after this file is read
+multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'adflowai-prometheus')
+)
+# Samples from a previous run would be summed into this one
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    """With --preload the app, and its connection pools, were created in the master"""
+    from src.core.database import db
+    db.dispose_after_fork()
+
+
+def child_exit(server, worker):
+    """Drop the exited worker's live gauges (its counters and histograms are kept)"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
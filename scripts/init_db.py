@@ -10,7 +10,9 @@ import os
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.models.campaign import Base
+from sqlalchemy import inspect, text
+
+from src.models.campaign import APIKey, Base
 from src.core.database import db
 from config.settings import Config
 from src.auth.auth_manager import AuthManager
@@ -30,6 +32,8 @@ def init_database(seed_data=False):
     try:
         logger.info("Initializing database...")
         
+        upgrade_api_keys_table()
+        
         # Create all tables
         db.create_tables()
         logger.info("✓ Database tables created")
@@ -46,6 +50,34 @@ def init_database(seed_data=False):
         raise
 
 
+def upgrade_api_keys_table(engine=None):
+    """
+    Recreate an api_keys table from before keys were HMAC-hashed
+    
+    The old table stored the raw key in a ``key`` column and has no
+    ``prefix`` / ``key_hash``. Old keys can't be carried over (they lack the
+    adf_<prefix>_ format keys are looked up by), so the table is dropped and
+    recreated and its keys have to be reissued.
+    
+    Returns:
+        True if the table was recreated
+    """
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    if not inspector.has_table(APIKey.__tablename__):
+        return False
+    columns = {column['name'] for column in inspector.get_columns(APIKey.__tablename__)}
+    if {'prefix', 'key_hash'} <= columns:
+        return False
+    
+    with engine.begin() as conn:
+        legacy = conn.execute(text(f"SELECT COUNT(*) FROM {APIKey.__tablename__}")).scalar()
+        APIKey.__table__.drop(conn)
+        APIKey.__table__.create(conn)
+    logger.warning(f"✓ api_keys upgraded to hashed keys; {legacy} old key(s) removed and must be reissued")
+    return True
+
+
 def seed_test_data():
     """Create test user and sample campaigns"""
     from src.core.campaign_manager import CampaignManager
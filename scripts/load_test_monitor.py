@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+ADFLOWAI - Real-Time Monitor Load Test
+Replays a recorded (or synthetic) metrics trace through RealTimeMonitor as fast as possible
+
+Usage:
+    python scripts/load_test_monitor.py --campaigns 5000 --seconds 60
+    python scripts/load_test_monitor.py --trace recorded.jsonl --speed 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.metrics_sources import TraceReplaySource, record_trace
+from src.core.realtime_monitor import RealTimeMonitor
+
+
+def synthesize_trace(path: str, campaigns: int, seconds: int, seed: int = 42):
+    """Write a synthetic per-second trace for `campaigns` campaigns"""
+    rng = random.Random(seed)
+
+    def records():
+        for t in range(seconds):
+            for campaign_id in range(1, campaigns + 1):
+                yield {
+                    't': t,
+                    'campaign_id': campaign_id,
+                    'metrics': {
+                        'impressions_rate': rng.uniform(10, 100),
+                        'clicks_rate': rng.uniform(0.1, 5),
+                        'spend_rate': rng.uniform(0.5, 20),
+                        'ctr': rng.uniform(0.005, 0.05),
+                        'cpc': rng.uniform(0.5, 6.0),
+                        'performance_score': rng.uniform(0.2, 0.9),
+                    },
+                }
+
+    record_trace(path, records())
+
+
+async def run(trace_path: str, speed: float, campaigns: int):
+    source = TraceReplaySource(trace_path, speed=speed)
+    monitor = RealTimeMonitor(metrics_source=source, tick_interval=0)
+    monitor.active_campaigns.update(range(1, campaigns + 1))
+
+    ticks = updates = 0
+    started = time.perf_counter()
+    while not source.exhausted:
+        updates += await monitor.tick()
+        ticks += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"Ticks:              {ticks}")
+    print(f"Campaign updates:   {updates}")
+    print(f"Alert transitions:  {len(monitor.alert_manager.stream)}")
+    print(f"Elapsed:            {elapsed:.2f}s")
+    print(f"Throughput:         {updates / elapsed:,.0f} updates/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace', help='Recorded JSON-lines trace (synthesised if omitted)')
+    parser.add_argument('--campaigns', type=int, default=1000)
+    parser.add_argument('--seconds', type=int, default=30)
+    parser.add_argument('--speed', type=float, default=1.0, help='Trace seconds replayed per tick')
+    args = parser.parse_args()
+
+    trace_path = args.trace
+    if not trace_path:
+        trace_path = os.path.join(tempfile.mkdtemp(), 'trace.jsonl')
+        print(f"Synthesising {args.campaigns} campaigns x {args.seconds}s -> {trace_path}")
+        synthesize_trace(trace_path, args.campaigns, args.seconds)
+
+    asyncio.run(run(trace_path, args.speed, args.campaigns))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from sqlalchemy import func
 
 from src.models.campaign import User, Campaign, CampaignStatus, OptimizationLog
 from src.core.database import get_db_session
+from src.core.identity_cache import invalidate_user
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +54,7 @@ class AdminManager:
             if k in data:
                 setattr(user, k, data[k])
         self.db.commit()
+        invalidate_user(user_id)
         self.db.refresh(user)
         return user
 
@@ -62,6 +64,7 @@ class AdminManager:
             raise ValueError(f"User {user_id} not found")
         self.db.delete(user)
         self.db.commit()
+        invalidate_user(user_id)
         return True
 
     def toggle_active(self, user_id: int) -> User:
@@ -70,6 +73,7 @@ class AdminManager:
             raise ValueError(f"User {user_id} not found")
         user.is_active = not user.is_active
         self.db.commit()
+        invalidate_user(user_id)
         self.db.refresh(user)
         return user
 
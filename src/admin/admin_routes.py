@@ -8,7 +8,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 import logging
 
 from src.admin.admin_manager import AdminManager
-from src.core.database import get_db_session
+from src.core.database import get_db_session, get_read_session
 
 logger = logging.getLogger(__name__)
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/v1/admin')
@@ -67,19 +67,24 @@ def _mgr():
     return AdminManager(db_session=get_db_session())
 
 
+def _read_mgr():
+    """Manager for read-only views; may read from a replica"""
+    return AdminManager(db_session=get_read_session())
+
+
 # ── System Stats ──────────────────────────────────────────────────────────────
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
 def system_stats():
-    return jsonify({'success': True, 'stats': _mgr().get_system_stats()}), 200
+    return jsonify({'success': True, 'stats': _read_mgr().get_system_stats()}), 200
 
 
 @admin_bp.route('/activity', methods=['GET'])
 @admin_required
 def recent_activity():
     limit = min(int(request.args.get('limit', 20)), 100)
-    return jsonify({'success': True, 'activity': _mgr().get_recent_activity(limit)}), 200
+    return jsonify({'success': True, 'activity': _read_mgr().get_recent_activity(limit)}), 200
 
 
 # ── User Management ───────────────────────────────────────────────────────────
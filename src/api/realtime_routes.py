@@ -0,0 +1,218 @@
+"""
+ADFLOWAI - Real-Time API Routes
+Server-Sent Events and long-poll endpoints backed by the RealTimeMonitor stream
+"""
+
+import json
+import logging
+import threading
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from src.auth.api_keys import api_key_or_jwt_required, current_identity
+from src.core.database import get_db_session, release_request_session
+from src.core.metrics_sources import METRIC_KEYS
+from src.core.realtime_monitor import get_monitor
+from src.models.campaign import Campaign
+
+logger = logging.getLogger(__name__)
+
+realtime_bp = Blueprint('realtime', __name__, url_prefix='/api/v1/realtime')
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+def _requested_campaigns():
+    """
+    Parse and authorise the ?campaigns=1,2,3 query parameter
+
+    Returns:
+        Tuple of (campaign_ids, error_response)
+    """
+    raw = request.args.get('campaigns', '')
+    try:
+        campaign_ids = sorted({int(c) for c in raw.split(',') if c.strip()})
+    except ValueError:
+        return None, (jsonify({'error': 'campaigns must be a comma-separated list of IDs'}), 400)
+    if not campaign_ids:
+        return None, (jsonify({'error': 'Missing required parameter: campaigns'}), 400)
+    return _authorise_campaigns(campaign_ids)
+
+
+def _authorise_campaigns(campaign_ids):
+    """
+    Check the current user owns every campaign and make sure they're monitored
+
+    Returns:
+        Tuple of (campaign_ids, error_response)
+    """
+    user_id = current_identity()
+    rows = get_db_session().query(Campaign.id, Campaign.user_id)\
+        .filter(Campaign.id.in_(campaign_ids))\
+        .all()
+    owners = {row.id: row.user_id for row in rows}
+
+    missing = [c for c in campaign_ids if c not in owners]
+    if missing:
+        return None, (jsonify({'error': 'Campaign not found', 'campaign_ids': missing}), 404)
+    if any(owner != user_id for owner in owners.values()):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+
+    if current_app.config.get('REALTIME_LOCAL_MONITOR', True):
+        get_monitor().ensure_monitoring(campaign_ids)
+    return campaign_ids, None
+
+
+def _open_stream_slot(limit: int):
+    """Take one of this process's SSE slots; returns its release callback, or None if all are taken"""
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= limit:
+            return None
+        _open_streams += 1
+    released = threading.Event()
+
+    def release():
+        global _open_streams
+        if not released.is_set():
+            released.set()
+            with _streams_lock:
+                _open_streams -= 1
+    return release
+
+
+def _sse_event(event) -> str:
+    return (
+        f"id: {get_monitor().updates.cursor(event['sequence'])}\n"
+        f"event: {event['event']}\n"
+        f"data: {json.dumps({'campaign_id': event['campaign_id'], **event['data']})}\n\n"
+    )
+
+
+@realtime_bp.route('/stream', methods=['GET'])
+@api_key_or_jwt_required()
+def stream():
+    """
+    Server-Sent Events stream of live updates
+
+    Query Parameters:
+    - campaigns: Comma-separated campaign IDs (required)
+
+    Emits ``update`` events with metric snapshots and ``alert`` events with alert
+    transitions. Reconnecting clients send ``Last-Event-ID`` and resume from there;
+    an ID from another worker or from before a restart gets the latest snapshot.
+
+    Each open stream holds a worker thread for its whole lifetime, so under
+    gunicorn's sync/gthread workers a process serves at most
+    REALTIME_MAX_STREAMS of them and answers 503 beyond that. Dashboards
+    should prefer the real-time gateway (``/ws``) or ``/poll``.
+    """
+    campaign_ids, error = _requested_campaigns()
+    if error:
+        return error
+    release_slot = _open_stream_slot(current_app.config.get('REALTIME_MAX_STREAMS', 1))
+    if release_slot is None:
+        response = jsonify({'error': 'Too many open streams; use /api/v1/realtime/poll or the real-time gateway'})
+        response.headers['Retry-After'] = str(current_app.config.get('REALTIME_HEARTBEAT_INTERVAL', 15))
+        return response, 503
+    # The stream never queries again; don't pin a connection for its lifetime
+    release_request_session()
+
+    updates = get_monitor().updates
+    sequence = updates.parse_cursor(request.headers.get('Last-Event-ID'))
+    heartbeat = current_app.config.get('REALTIME_HEARTBEAT_INTERVAL', 15)
+    keep_monitored = current_app.config.get('REALTIME_LOCAL_MONITOR', True)
+
+    def generate(sequence):
+        yield "retry: 3000\n\n"
+        while True:
+            if keep_monitored:
+                # Renew the campaigns' lease while this client is connected
+                get_monitor().ensure_monitoring(campaign_ids)
+            sequence, events = updates.wait(sequence, campaign_ids, timeout=heartbeat)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                yield _sse_event(event)
+
+    response = Response(
+        stream_with_context(generate(sequence)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, including on client disconnect
+    response.call_on_close(release_slot)
+    return response
+
+
+@realtime_bp.route('/poll', methods=['GET'])
+@api_key_or_jwt_required()
+def poll():
+    """
+    Conditional long-poll for live updates
+
+    Query Parameters:
+    - campaigns: Comma-separated campaign IDs (required)
+    - since: Cursor (``sequence`` / ``X-Sequence``) of the last response seen;
+      omitted or from another worker = latest snapshot
+    - timeout: Seconds to wait for new data (capped by REALTIME_POLL_TIMEOUT)
+
+    Returns 200 with the new events as soon as a newer sequence exists,
+    or 204 if nothing new arrived before the timeout.
+    """
+    campaign_ids, error = _requested_campaigns()
+    if error:
+        return error
+
+    max_timeout = current_app.config.get('REALTIME_POLL_TIMEOUT', 25)
+    try:
+        timeout = min(float(request.args.get('timeout', max_timeout)), max_timeout)
+    except ValueError:
+        return jsonify({'error': 'timeout must be numeric'}), 400
+    release_request_session()
+
+    updates = get_monitor().updates
+    since = updates.parse_cursor(request.args.get('since'))
+    sequence, events = updates.wait(since, campaign_ids, timeout=max(0.0, timeout))
+    if not events:
+        return Response(status=204, headers={'X-Sequence': updates.cursor(sequence)})
+
+    return jsonify({
+        'success': True,
+        'sequence': updates.cursor(sequence),
+        'events': events
+    }), 200
+
+
+@realtime_bp.route('/campaigns/<int:campaign_id>/sparkline', methods=['GET'])
+@api_key_or_jwt_required()
+def sparkline(campaign_id):
+    """
+    Recent values of one metric from the monitor's in-memory window
+
+    Query Parameters:
+    - metric: One of the live metric keys (default ctr)
+    - seconds: Window length (default 3600, max REALTIME_WINDOW_SIZE)
+    - points: Number of buckets (default 60, max 600)
+    """
+    metric = request.args.get('metric', 'ctr')
+    if metric not in METRIC_KEYS:
+        return jsonify({'error': f"metric must be one of: {', '.join(METRIC_KEYS)}"}), 400
+    try:
+        seconds = int(request.args.get('seconds', 3600))
+        points = int(request.args.get('points', 60))
+    except ValueError:
+        return jsonify({'error': 'seconds and points must be integers'}), 400
+    if seconds <= 0 or not 0 < points <= 600:
+        return jsonify({'error': 'seconds must be positive and points between 1 and 600'}), 400
+    seconds = min(seconds, current_app.config.get('REALTIME_WINDOW_SIZE', 3600))
+
+    _, error = _authorise_campaigns([campaign_id])
+    if error:
+        return error
+
+    return jsonify({
+        'success': True,
+        'sparkline': get_monitor().get_sparkline(campaign_id, metric, seconds, points)
+    }), 200
@@ -4,15 +4,16 @@ RESTful API endpoints for campaign management
 """
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 import logging
 
 from src.core.campaign_manager import CampaignManager
-from src.core.database import get_db_session
+from src.core.database import get_db_session, get_read_session
+from src.auth.api_keys import api_key_or_jwt_required, current_identity
 from src.auth.auth_routes import auth_bp
 from src.admin.admin_routes import admin_bp
 from src.reports.report_routes import reports_bp
+from src.api.realtime_routes import realtime_bp
 
 logger = logging.getLogger(__name__)
 
@@ -20,11 +21,28 @@ logger = logging.getLogger(__name__)
 api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 
 
+def _owned_campaign(manager: CampaignManager, campaign_id: int, user_id: int):
+    """
+    Load a campaign once and check the user owns it
+    
+    Returns:
+        Tuple of (campaign, error_response); hand the campaign to the manager
+        so it isn't loaded again
+    """
+    campaign = manager.get_campaign(campaign_id)
+    if not campaign:
+        return None, (jsonify({'error': 'Campaign not found'}), 404)
+    if campaign.user_id != user_id:
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return campaign, None
+
+
 def register_blueprints(app):
     """Register all API blueprints"""
     app.register_blueprint(auth_bp)    # Authentication
     app.register_blueprint(admin_bp)   # Admin panel
     app.register_blueprint(reports_bp) # Reports/exports
+    app.register_blueprint(realtime_bp) # Live updates (SSE / long-poll)
     app.register_blueprint(api_v1)     # Main API
     logger.info("API blueprints registered")
 
@@ -34,7 +52,7 @@ def register_blueprints(app):
 # ============================================================================
 
 @api_v1.route('/campaigns', methods=['POST'])
-@jwt_required()
+@api_key_or_jwt_required()
 def create_campaign():
     """
     Create a new campaign
@@ -56,7 +74,7 @@ def create_campaign():
     }
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         data = request.get_json(silent=True) or {}
         
         # Validate required fields
@@ -120,7 +138,7 @@ def create_campaign():
 
 
 @api_v1.route('/campaigns', methods=['GET'])
-@jwt_required()
+@api_key_or_jwt_required()
 def get_campaigns():
     """
     Get all campaigns for the authenticated user
@@ -129,7 +147,7 @@ def get_campaigns():
     - status: Filter by status (active, paused, stopped, completed)
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         status = request.args.get('status')
         
         manager = CampaignManager()
@@ -147,20 +165,16 @@ def get_campaigns():
 
 
 @api_v1.route('/campaigns/<int:campaign_id>', methods=['GET'])
-@jwt_required()
+@api_key_or_jwt_required()
 def get_campaign(campaign_id):
     """Get a specific campaign by ID"""
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         
         manager = CampaignManager()
-        campaign = manager.get_campaign(campaign_id)
-        
-        if not campaign:
-            return jsonify({'error': 'Campaign not found'}), 404
-        
-        if campaign.user_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
+        campaign, denied = _owned_campaign(manager, campaign_id, user_id)
+        if denied:
+            return denied
         
         return jsonify({
             'success': True,
@@ -173,22 +187,18 @@ def get_campaign(campaign_id):
 
 
 @api_v1.route('/campaigns/<int:campaign_id>', methods=['DELETE'])
-@jwt_required()
+@api_key_or_jwt_required()
 def delete_campaign(campaign_id):
     """Delete a campaign"""
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         
         manager = CampaignManager()
-        campaign = manager.get_campaign(campaign_id)
-        
-        if not campaign:
-            return jsonify({'error': 'Campaign not found'}), 404
-        
-        if campaign.user_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
+        campaign, denied = _owned_campaign(manager, campaign_id, user_id)
+        if denied:
+            return denied
         
-        manager.delete_campaign(campaign_id)
+        manager.delete_campaign(campaign_id, campaign=campaign)
         
         return jsonify({
             'success': True,
@@ -201,7 +211,7 @@ def delete_campaign(campaign_id):
 
 
 @api_v1.route('/campaigns/<int:campaign_id>/metrics', methods=['POST'])
-@jwt_required()
+@api_key_or_jwt_required()
 def update_campaign_metrics(campaign_id):
     """
     Update campaign metrics
@@ -219,19 +229,15 @@ def update_campaign_metrics(campaign_id):
     }
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         data = request.get_json()
         
         manager = CampaignManager()
-        campaign = manager.get_campaign(campaign_id)
+        campaign, denied = _owned_campaign(manager, campaign_id, user_id)
+        if denied:
+            return denied
         
-        if not campaign:
-            return jsonify({'error': 'Campaign not found'}), 404
-        
-        if campaign.user_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
-        
-        manager.update_campaign_metrics(campaign_id, metrics=data)
+        manager.update_campaign_metrics(campaign_id, metrics=data, campaign=campaign)
         
         return jsonify({
             'success': True,
@@ -244,7 +250,7 @@ def update_campaign_metrics(campaign_id):
 
 
 @api_v1.route('/campaigns/<int:campaign_id>/optimize', methods=['POST'])
-@jwt_required()
+@api_key_or_jwt_required()
 def optimize_campaign(campaign_id):
     """
     Run AI optimization on a campaign
@@ -252,18 +258,14 @@ def optimize_campaign(campaign_id):
     Returns optimization actions taken
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         
         manager = CampaignManager()
-        campaign = manager.get_campaign(campaign_id)
-        
-        if not campaign:
-            return jsonify({'error': 'Campaign not found'}), 404
-        
-        if campaign.user_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
+        campaign, denied = _owned_campaign(manager, campaign_id, user_id)
+        if denied:
+            return denied
         
-        actions = manager.optimize_campaign(campaign_id)
+        actions = manager.optimize_campaign(campaign_id, campaign=campaign)
         
         return jsonify({
             'success': True,
@@ -277,22 +279,18 @@ def optimize_campaign(campaign_id):
 
 
 @api_v1.route('/campaigns/<int:campaign_id>/analytics', methods=['GET'])
-@jwt_required()
+@api_key_or_jwt_required()
 def get_campaign_analytics(campaign_id):
     """Get comprehensive analytics for a campaign"""
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         
-        manager = CampaignManager()
-        campaign = manager.get_campaign(campaign_id)
-        
-        if not campaign:
-            return jsonify({'error': 'Campaign not found'}), 404
+        manager = CampaignManager(db_session=get_read_session())
+        campaign, denied = _owned_campaign(manager, campaign_id, user_id)
+        if denied:
+            return denied
         
-        if campaign.user_id != user_id:
-            return jsonify({'error': 'Unauthorized'}), 403
-        
-        analytics = manager.get_campaign_analytics(campaign_id)
+        analytics = manager.get_campaign_analytics(campaign_id, campaign=campaign)
         
         return jsonify({
             'success': True,
@@ -309,7 +307,7 @@ def get_campaign_analytics(campaign_id):
 # ============================================================================
 
 @api_v1.route('/dashboard', methods=['GET'])
-@jwt_required()
+@api_key_or_jwt_required()
 def get_dashboard():
     """
     Get dashboard overview
@@ -317,9 +315,9 @@ def get_dashboard():
     Returns summary statistics across all campaigns
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = current_identity()
         
-        manager = CampaignManager()
+        manager = CampaignManager(db_session=get_read_session())
         campaigns = manager.get_user_campaigns(user_id)
         
         # Calculate aggregate statistics
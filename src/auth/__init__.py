@@ -2,7 +2,17 @@
 ADFLOWAI Authentication Module
 """
 
+from src.auth.api_keys import (
+    APIKeyAuthenticator, APIKeyError, APIKeyManager, api_key_or_jwt_required, current_identity,
+    get_api_key_authenticator
+)
 from src.auth.auth_manager import AuthManager, AuthenticationError
 from src.auth.auth_routes import auth_bp
+from src.auth.password_hasher import PasswordHasher, PasswordHasherBusy, get_password_hasher
 
-__all__ = ['AuthManager', 'AuthenticationError', 'auth_bp']
+__all__ = [
+    'AuthManager', 'AuthenticationError', 'auth_bp',
+    'PasswordHasher', 'PasswordHasherBusy', 'get_password_hasher',
+    'APIKeyAuthenticator', 'APIKeyError', 'APIKeyManager', 'api_key_or_jwt_required',
+    'current_identity', 'get_api_key_authenticator'
+]
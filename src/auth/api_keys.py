@@ -0,0 +1,312 @@
+"""
+ADFLOWAI - API Key Authentication
+HMAC-hashed, prefix-indexed API keys for machine clients, with an in-process
+LRU of verified keys and batched last_used writes
+"""
+
+import atexit
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+from flask import has_request_context, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import bindparam, update
+
+from src.core.app_singleton import AppSingleton
+from src.core.identity_cache import get_user_record
+from src.models.campaign import APIKey
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = 'X-API-Key'
+KEY_PREFIX = 'adf_'
+_REQUEST_KEY = 'adflowai.api_key'
+_REQUEST_IDENTITY = 'adflowai.api_key_identity'     # key accepted by api_key_or_jwt_required
+
+
+class APIKeyError(Exception):
+    """Raised when an API key can't be created or revoked"""
+    pass
+
+
+@dataclass(frozen=True)
+class APIKeyRecord:
+    """What a verified key resolves to"""
+    id: int
+    user_id: int
+    expires_at: Optional[datetime]
+
+
+class APIKeyAuthenticator:
+    """
+    Verifies ``X-API-Key`` values without bcrypt
+
+    Keys look like ``adf_<prefix>_<secret>``. Only HMAC-SHA256(key) under a
+    server secret is stored, next to the unique-indexed prefix, so a miss
+    costs one indexed lookup plus a constant-time compare, and a hit costs
+    one HMAC and a dict lookup. Verified keys stay in an LRU for ``cache_ttl``
+    seconds; revocation in this process drops the entry immediately, other
+    processes honour a revoked key for at most ``cache_ttl``.
+
+    ``last_used`` is recorded in memory and written in one batch every
+    ``flush_interval`` seconds by a background thread (or only on explicit
+    ``flush()`` when the interval is 0).
+    """
+
+    def __init__(self, secret: str, cache_ttl: float = 60.0, cache_size: int = 10000,
+                 flush_interval: float = 60.0):
+        if not secret:
+            raise ValueError("API key HMAC secret must not be empty")
+        self._secret = secret.encode('utf-8')
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    @classmethod
+    def from_config(cls, config) -> 'APIKeyAuthenticator':
+        return cls(
+            secret=config['API_KEY_HMAC_SECRET'] or config['SECRET_KEY'],
+            cache_ttl=config['API_KEY_CACHE_TTL'],
+            cache_size=config['API_KEY_CACHE_SIZE'],
+            flush_interval=config['API_KEY_LAST_USED_FLUSH']
+        )
+
+    # ── Keys ─────────────────────────────────────────────────────────────────
+
+    def generate(self) -> Tuple[str, str, str]:
+        """New random key; returns (raw_key, prefix, key_hash)"""
+        prefix = secrets.token_hex(6)
+        raw_key = f"{KEY_PREFIX}{prefix}_{secrets.token_urlsafe(32)}"
+        return raw_key, prefix, self.hash_key(raw_key)
+
+    def hash_key(self, raw_key: str) -> str:
+        return hmac.new(self._secret, raw_key.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def parse_prefix(raw_key: str) -> Optional[str]:
+        if not raw_key.startswith(KEY_PREFIX):
+            return None
+        prefix, sep, secret = raw_key[len(KEY_PREFIX):].partition('_')
+        return prefix if sep and prefix and secret else None
+
+    # ── Verification ─────────────────────────────────────────────────────────
+
+    def authenticate(self, raw_key: str, session=None) -> Optional[APIKeyRecord]:
+        """
+        Resolve a presented key
+
+        Args:
+            raw_key: Value of the X-API-Key header
+            session: DB session for cache misses (defaults to get_db_session())
+
+        Returns:
+            The key's record, or None if it is unknown, revoked or expired
+        """
+        digest = self.hash_key(raw_key)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(digest)
+                record = cached[1]
+            else:
+                record = None
+
+        if record is None:
+            record = self._load(raw_key, digest, session)
+            if record is None:
+                return None
+            with self._lock:
+                self._cache[digest] = (now + self.cache_ttl, record)
+                self._cache.move_to_end(digest)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        if record.expires_at is not None and record.expires_at <= datetime.utcnow():
+            return None
+        self._record_use(record.id)
+        return record
+
+    def invalidate(self, key_hash: str):
+        with self._lock:
+            self._cache.pop(key_hash, None)
+
+    def _load(self, raw_key: str, digest: str, session) -> Optional[APIKeyRecord]:
+        prefix = self.parse_prefix(raw_key)
+        if prefix is None:
+            return None
+        if session is None:
+            from src.core.database import get_db_session
+            session = get_db_session()
+        row = session.query(APIKey.id, APIKey.user_id, APIKey.key_hash, APIKey.expires_at)\
+            .filter(APIKey.prefix == prefix, APIKey.is_active.is_(True))\
+            .first()
+        if row is None or not hmac.compare_digest(row.key_hash, digest):
+            return None
+        return APIKeyRecord(id=row.id, user_id=row.user_id, expires_at=row.expires_at)
+
+    # ── last_used batching ───────────────────────────────────────────────────
+
+    def _record_use(self, key_id: int):
+        with self._lock:
+            self._pending[key_id] = datetime.utcnow()
+        if self.flush_interval > 0 and self._flusher is None:
+            self._start_flusher()
+
+    def flush(self, session=None) -> int:
+        """Write pending last_used timestamps in one batch; returns how many keys were updated"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        from src.core.database import db, get_db_session
+        own_session = session is None
+        session = session or get_db_session()
+        try:
+            # Core executemany: a key deleted since it was used matches no row instead of failing the batch
+            session.execute(
+                update(APIKey.__table__)
+                .where(APIKey.__table__.c.id == bindparam('key_id'))
+                .values(last_used=bindparam('used_at')),
+                [{'key_id': key_id, 'used_at': used_at} for key_id, used_at in pending.items()],
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to write API key last_used for {len(pending)} keys: {e}")
+            return 0
+        finally:
+            if own_session:
+                db.close_session()
+        return len(pending)
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='api-key-last-used', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"API key last_used flusher error: {e}")
+
+
+_api_key_authenticator = AppSingleton('api_key_authenticator', APIKeyAuthenticator.from_config)
+
+
+def get_api_key_authenticator() -> APIKeyAuthenticator:
+    """The current app's authenticator (configured from app.config), or a process default"""
+    return _api_key_authenticator.get()
+
+
+class APIKeyManager:
+    """
+    Creates, lists and revokes a user's API keys.
+    Always pass a db_session from the caller.
+    """
+
+    def __init__(self, db_session, authenticator: Optional[APIKeyAuthenticator] = None):
+        self.db = db_session
+        self.authenticator = authenticator or get_api_key_authenticator()
+
+    def create_key(self, user_id: int, name: Optional[str] = None,
+                   expires_in_days: Optional[int] = None) -> Tuple[APIKey, str]:
+        """Create a key and return (api_key, raw_key); the raw key is never stored"""
+        if expires_in_days is not None and expires_in_days <= 0:
+            raise APIKeyError("expires_in_days must be positive")
+        raw_key, prefix, key_hash = self.authenticator.generate()
+        api_key = APIKey(
+            user_id=user_id, prefix=prefix, key_hash=key_hash, name=name, is_active=True,
+            expires_at=datetime.utcnow() + timedelta(days=expires_in_days) if expires_in_days else None
+        )
+        self.db.add(api_key)
+        self.db.commit()
+        logger.info(f"API key {api_key.id} created for user {user_id}")
+        return api_key, raw_key
+
+    def list_keys(self, user_id: int) -> List[APIKey]:
+        return self.db.query(APIKey).filter_by(user_id=user_id).order_by(APIKey.created_at.desc()).all()
+
+    def revoke_key(self, user_id: int, key_id: int) -> APIKey:
+        api_key = self.db.query(APIKey).filter_by(id=key_id, user_id=user_id).first()
+        if not api_key:
+            raise APIKeyError("API key not found")
+        api_key.is_active = False
+        self.db.commit()
+        self.authenticator.invalidate(api_key.key_hash)
+        logger.info(f"API key {key_id} revoked by user {user_id}")
+        return api_key
+
+
+def authenticate_request_key(raw_key: str) -> Optional[APIKeyRecord]:
+    """
+    authenticate() a key presented with the current request, once per request
+
+    The rate limiter and the view decorator both need the verified key.
+    """
+    memo = request.environ.get(_REQUEST_KEY)
+    if memo is not None and memo[0] == raw_key:
+        return memo[1]
+    record = get_api_key_authenticator().authenticate(raw_key)
+    request.environ[_REQUEST_KEY] = (raw_key, record)
+    return record
+
+
+def api_key_or_jwt_required():
+    """
+    Like ``@jwt_required()``, but also accepts an ``X-API-Key`` header
+
+    An accepted key is kept with the request; views read the request's user
+    with ``current_identity()``, which covers both paths. Keys of
+    deactivated or deleted users are rejected.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            raw_key = request.headers.get(API_KEY_HEADER)
+            if raw_key is None:
+                verify_jwt_in_request()
+                return fn(*args, **kwargs)
+
+            record = authenticate_request_key(raw_key)
+            user = get_user_record(record.user_id) if record else None
+            if user is None or not user.is_active:
+                return jsonify({'error': 'Invalid API key'}), 401
+
+            request.environ[_REQUEST_IDENTITY] = record
+            return fn(*args, **kwargs)
+        return decorator
+    return wrapper
+
+
+def current_identity():
+    """
+    The request's user ID: a verified API key's owner, else ``get_jwt_identity()``
+
+    Raises RuntimeError, like ``get_jwt_identity()``, when the request was
+    authenticated by neither.
+    """
+    record = request.environ.get(_REQUEST_IDENTITY) if has_request_context() else None
+    if record is not None:
+        return record.user_id
+    return get_jwt_identity()
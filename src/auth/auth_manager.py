@@ -3,12 +3,13 @@ ADFLOWAI - Authentication Manager
 Fixed version: db session passed in per-call, not at init
 """
 
-import bcrypt
 import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Tuple
 from flask_jwt_extended import create_access_token, create_refresh_token
 
+from src.auth.password_hasher import PasswordHasher, PasswordHasherBusy, get_password_hasher
+from src.core.identity_cache import UserRecord, get_user_record, invalidate_user
 from src.models.campaign import User
 
 logger = logging.getLogger(__name__)
@@ -25,12 +26,14 @@ class AuthManager:
     Always pass a db_session from the caller - never resolves it at import time.
     """
 
-    def __init__(self, db_session):
+    def __init__(self, db_session, hasher: Optional[PasswordHasher] = None):
         """
         Args:
             db_session: Active SQLAlchemy session (from get_db_session() inside a route)
+            hasher: Password hasher (defaults to the app's bounded bcrypt pool)
         """
         self.db = db_session
+        self.hasher = hasher or get_password_hasher()
         self.password_min_length = 8
 
     # ── Public methods ──────────────────────────────────────────────────────
@@ -92,9 +95,17 @@ class AuthManager:
         if not self._verify_password(password, user.password_hash):
             raise AuthenticationError("Invalid username or password")
 
+        # Upgrade hashes made with an old cost factor while the password is at hand
+        if self.hasher.needs_rehash(user.password_hash):
+            try:
+                user.password_hash = self._hash_password(password)
+            except PasswordHasherBusy:
+                logger.info(f"Deferred password rehash for user {user.id}: hasher busy")
+
         try:
             user.last_login = datetime.utcnow()
             self.db.commit()
+            invalidate_user(user.id)
         except Exception as e:
             self.db.rollback()
             logger.warning(f"Could not update last_login: {e}")
@@ -106,8 +117,12 @@ class AuthManager:
     def get_user_by_id(self, user_id: int) -> Optional[User]:
         return self.db.query(User).filter_by(id=user_id).first()
 
+    def get_user_record(self, user_id: int) -> Optional[UserRecord]:
+        """Read-only user snapshot from the identity cache (no query on a hit)."""
+        return get_user_record(user_id, self.db)
+
     def refresh_access_token(self, user_id: int) -> str:
-        user = self.get_user_by_id(user_id)
+        user = self.get_user_record(user_id)
         if not user or not user.is_active:
             raise AuthenticationError("User not found or inactive")
         return create_access_token(
@@ -127,6 +142,7 @@ class AuthManager:
             )
         user.password_hash = self._hash_password(new_password)
         self.db.commit()
+        invalidate_user(user_id)
         logger.info(f"Password changed for user {user_id}")
         return True
 
@@ -155,10 +171,10 @@ class AuthManager:
             )
 
     def _hash_password(self, password: str) -> str:
-        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        return self.hasher.hash(password)
 
     def _verify_password(self, password: str, hashed: str) -> bool:
-        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+        return self.hasher.verify(password, hashed)
 
     def _generate_tokens(self, user: User) -> Dict:
         access = create_access_token(
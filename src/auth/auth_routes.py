@@ -1,6 +1,6 @@
 """
 ADFLOWAI - Authentication Routes
-All auth endpoints: register, login, refresh, me, change-password, logout
+All auth endpoints: register, login, refresh, me, change-password, logout, api-keys
 """
 
 from flask import Blueprint, request, jsonify
@@ -11,7 +11,9 @@ from flask_jwt_extended import (
 )
 import logging
 
+from src.auth.api_keys import APIKeyError, APIKeyManager
 from src.auth.auth_manager import AuthManager, AuthenticationError
+from src.auth.password_hasher import PasswordHasherBusy
 from src.core.database import get_db_session
 
 logger = logging.getLogger(__name__)
@@ -29,6 +31,12 @@ def _validation_failed(errors):
     return jsonify({"success": False, "error": "Validation failed", "errors": errors}), 400
 
 
+def _hasher_busy(error: PasswordHasherBusy):
+    response = jsonify({"success": False, "error": str(error)})
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response, 503
+
+
 # ── Register ─────────────────────────────────────────────────────────────────
 
 @auth_bp.route("/register", methods=["POST"])
@@ -75,6 +83,8 @@ def register():
             "tokens": tokens,
         }), 201
 
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
     except AuthenticationError as e:
         return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
@@ -111,6 +121,8 @@ def login():
             "tokens": tokens,
         }), 200
 
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
     except AuthenticationError as e:
         return jsonify({"success": False, "error": str(e)}), 401
     except Exception as e:
@@ -152,7 +164,7 @@ def me():
     try:
         user_id = get_jwt_identity()
         manager = _get_manager()
-        user = manager.get_user_by_id(user_id)
+        user = manager.get_user_record(user_id)
         if not user:
             return jsonify({"success": False, "error": "User not found"}), 404
         return jsonify({"success": True, "user": _user_dict(user)}), 200
@@ -189,6 +201,8 @@ def change_password():
         manager.change_password(user_id, data["old_password"], data["new_password"])
         return jsonify({"success": True, "message": "Password changed successfully"}), 200
 
+    except PasswordHasherBusy as e:
+        return _hasher_busy(e)
     except AuthenticationError as e:
         return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
@@ -210,6 +224,66 @@ def logout():
     return jsonify({"success": True, "message": "Logged out successfully"}), 200
 
 
+# ── API keys ──────────────────────────────────────────────────────────────────
+# Managed with a JWT only, so a leaked key can't mint or revoke keys
+
+@auth_bp.route("/api-keys", methods=["POST"])
+@jwt_required()
+def create_api_key():
+    """
+    POST /api/v1/auth/api-keys
+    Body: { name?, expires_in_days? }
+    The raw key is only returned here; send it as the X-API-Key header.
+    """
+    data = request.get_json(silent=True) or {}
+    expires_in_days = data.get("expires_in_days")
+    if expires_in_days is not None and not isinstance(expires_in_days, int):
+        return _validation_failed(["'expires_in_days' must be an integer"])
+
+    try:
+        manager = APIKeyManager(get_db_session())
+        api_key, raw_key = manager.create_key(get_jwt_identity(), data.get("name"), expires_in_days)
+        return jsonify({"success": True, "api_key": _api_key_dict(api_key), "key": raw_key}), 201
+
+    except APIKeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Create API key error: {e}")
+        return jsonify({"success": False, "error": "Could not create API key"}), 500
+
+
+@auth_bp.route("/api-keys", methods=["GET"])
+@jwt_required()
+def list_api_keys():
+    """
+    GET /api/v1/auth/api-keys
+    """
+    try:
+        keys = APIKeyManager(get_db_session()).list_keys(get_jwt_identity())
+        return jsonify({"success": True, "api_keys": [_api_key_dict(k) for k in keys]}), 200
+
+    except Exception as e:
+        logger.error(f"List API keys error: {e}")
+        return jsonify({"success": False, "error": "Could not list API keys"}), 500
+
+
+@auth_bp.route("/api-keys/<int:key_id>", methods=["DELETE"])
+@jwt_required()
+def revoke_api_key(key_id):
+    """
+    DELETE /api/v1/auth/api-keys/<key_id>
+    """
+    try:
+        APIKeyManager(get_db_session()).revoke_key(get_jwt_identity(), key_id)
+        return jsonify({"success": True, "message": "API key revoked"}), 200
+
+    except APIKeyError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        logger.error(f"Revoke API key error: {e}")
+        return jsonify({"success": False, "error": "Could not revoke API key"}), 500
+
+
 # ── Helper ────────────────────────────────────────────────────────────────────
 
 def _user_dict(user) -> dict:
@@ -223,3 +297,15 @@ def _user_dict(user) -> dict:
         "is_verified": user.is_verified,
         "last_login": user.last_login.isoformat() if user.last_login else None,
     }
+
+
+def _api_key_dict(api_key) -> dict:
+    return {
+        "id": api_key.id,
+        "name": api_key.name,
+        "prefix": api_key.prefix,
+        "is_active": api_key.is_active,
+        "last_used": api_key.last_used.isoformat() if api_key.last_used else None,
+        "created_at": api_key.created_at.isoformat() if api_key.created_at else None,
+        "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None,
+    }
@@ -0,0 +1,90 @@
+"""
+ADFLOWAI - Password Hasher
+Bounded bcrypt concurrency with fast rejection when saturated
+"""
+
+import logging
+import threading
+
+import bcrypt
+
+from src.core.app_singleton import AppSingleton
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing slot is taken; callers should answer 503"""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("Authentication service is busy, please retry shortly")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt inline in the calling thread, with bounded concurrency
+
+    bcrypt releases the GIL, so this bounds how many request threads can be
+    tied up in hashing at once: ``max_workers`` hash concurrently, up to
+    ``queue_depth`` more wait for a turn, and anything beyond that is
+    rejected immediately with PasswordHasherBusy instead of queueing behind
+    the burst. Keep ``max_workers + queue_depth`` below the server's threads
+    per process so campaign API requests always have a thread.
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 1, queue_depth: int = 0, retry_after: int = 1):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)   # running or waiting
+        self._running = threading.BoundedSemaphore(max_workers)
+
+    @classmethod
+    def from_config(cls, config) -> 'PasswordHasher':
+        return cls(
+            rounds=config['BCRYPT_ROUNDS'],
+            max_workers=config['PASSWORD_HASH_WORKERS'],
+            queue_depth=config['PASSWORD_HASH_QUEUE_DEPTH'],
+            retry_after=config['PASSWORD_HASH_RETRY_AFTER']
+        )
+
+    def hash(self, password: str) -> str:
+        """bcrypt hash of ``password`` at the configured cost"""
+        return self._run(self._hash, password)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        """Check ``password`` against a stored bcrypt hash"""
+        return self._run(self._verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True if the stored hash was made with a different cost factor"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Password hashing saturated, rejecting request")
+            raise PasswordHasherBusy(self.retry_after)
+        try:
+            with self._running:
+                return fn(*args)
+        finally:
+            self._slots.release()
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    @staticmethod
+    def _verify(password: str, hashed: str) -> bool:
+        return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+_password_hasher = AppSingleton('password_hasher', PasswordHasher.from_config)
+
+
+def get_password_hasher() -> PasswordHasher:
+    """The current app's hasher (configured from app.config), or a process default"""
+    return _password_hasher.get()
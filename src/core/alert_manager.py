@@ -0,0 +1,198 @@
+"""
+ADFLOWAI - Alert State Machine
+Deduplicates real-time alerts by (campaign, alert type) and emits transitions only
+"""
+
+import enum
+import logging
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AlertState(enum.Enum):
+    """Alert lifecycle states"""
+    OPEN = "open"
+    ONGOING = "ongoing"
+    RESOLVED = "resolved"
+
+
+@dataclass
+class AlertEvent:
+    """A single alert transition, published on the alert stream"""
+    campaign_id: int
+    alert_type: str
+    state: str
+    severity: str
+    message: str
+    opened_at: str
+    timestamp: str
+    occurrences: int
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class _TrackedAlert:
+    """Internal per-(campaign, type) tracking record"""
+    __slots__ = ('alert', 'hits', 'misses', 'confirmed', 'opened_at',
+                 'last_emitted', 'occurrences')
+
+    def __init__(self, alert: Dict, now: datetime):
+        self.alert = alert
+        self.hits = 0
+        self.misses = 0
+        self.confirmed = False
+        self.opened_at = now
+        self.last_emitted = now
+        self.occurrences = 0
+
+
+class AlertManager:
+    """
+    Turns the per-tick anomaly list into a low-volume stream of transitions.
+
+    - An alert opens after ``open_after`` consecutive detections
+    - While the condition holds it is ONGOING; a reminder is emitted at most
+      once every ``reminder_interval`` seconds
+    - It resolves only after ``resolve_after`` consecutive clear ticks
+      (hysteresis, so a flapping metric doesn't open/close every second)
+    """
+
+    def __init__(
+        self,
+        open_after: int = 2,
+        resolve_after: int = 10,
+        reminder_interval: float = 900,
+        persist: Optional[Callable[[List[AlertEvent]], None]] = None,
+        stream_size: int = 1000,
+    ):
+        self.open_after = max(1, open_after)
+        self.resolve_after = max(1, resolve_after)
+        self.reminder_interval = reminder_interval
+        self.persist = persist
+        # campaign_id -> alert_type -> tracking record
+        self._tracked: Dict[int, Dict[str, _TrackedAlert]] = {}
+        self.stream: Deque[AlertEvent] = deque(maxlen=stream_size)
+
+    def process(
+        self,
+        campaign_id: int,
+        alerts: List[Dict],
+        now: Optional[datetime] = None
+    ) -> List[AlertEvent]:
+        """
+        Feed one tick of detected alerts for a campaign
+
+        Args:
+            campaign_id: Campaign the alerts belong to
+            alerts: Raw alerts from anomaly detection (each with a 'type')
+            now: Tick timestamp (defaults to utcnow)
+
+        Returns:
+            Transitions emitted on this tick (usually empty)
+        """
+        now = now or datetime.utcnow()
+        events = []
+        seen = set()
+        campaign_alerts = self._tracked.setdefault(campaign_id, {})
+
+        for alert in alerts:
+            alert_type = alert['type']
+            seen.add(alert_type)
+            tracked = campaign_alerts.get(alert_type)
+            if tracked is None:
+                tracked = campaign_alerts[alert_type] = _TrackedAlert(alert, now)
+
+            tracked.alert = alert
+            tracked.hits += 1
+            tracked.misses = 0
+            tracked.occurrences += 1
+
+            if not tracked.confirmed:
+                if tracked.hits >= self.open_after:
+                    tracked.confirmed = True
+                    tracked.opened_at = now
+                    tracked.last_emitted = now
+                    events.append(self._event(campaign_id, alert_type, tracked, AlertState.OPEN, now))
+            elif (now - tracked.last_emitted).total_seconds() >= self.reminder_interval:
+                tracked.last_emitted = now
+                events.append(self._event(campaign_id, alert_type, tracked, AlertState.ONGOING, now))
+
+        for alert_type in [t for t in campaign_alerts if t not in seen]:
+            tracked = campaign_alerts[alert_type]
+            tracked.hits = 0
+            tracked.misses += 1
+            if not tracked.confirmed:
+                del campaign_alerts[alert_type]
+            elif tracked.misses >= self.resolve_after:
+                del campaign_alerts[alert_type]
+                events.append(self._event(campaign_id, alert_type, tracked, AlertState.RESOLVED, now))
+
+        if not campaign_alerts:
+            del self._tracked[campaign_id]
+
+        self._emit(events)
+        return events
+
+    def clear(self, campaign_id: int, now: Optional[datetime] = None) -> List[AlertEvent]:
+        """Resolve every open alert for a campaign (e.g. when monitoring stops)"""
+        now = now or datetime.utcnow()
+        events = []
+        for alert_type, tracked in self._tracked.pop(campaign_id, {}).items():
+            if tracked.confirmed:
+                events.append(self._event(campaign_id, alert_type, tracked, AlertState.RESOLVED, now))
+        self._emit(events)
+        return events
+
+    def get_active_alerts(self, campaign_id: Optional[int] = None) -> List[Dict]:
+        """Currently open alerts, optionally filtered by campaign"""
+        if campaign_id is None:
+            campaigns = self._tracked.items()
+        else:
+            campaigns = [(campaign_id, self._tracked.get(campaign_id, {}))]
+        return [
+            {
+                'campaign_id': cid,
+                'type': alert_type,
+                'severity': tracked.alert.get('severity', 'warning'),
+                'message': tracked.alert.get('message', ''),
+                'opened_at': tracked.opened_at.isoformat(),
+                'occurrences': tracked.occurrences,
+            }
+            for cid, campaign_alerts in campaigns
+            for alert_type, tracked in campaign_alerts.items()
+            if tracked.confirmed
+        ]
+
+    def recent_events(self, limit: int = 100) -> List[Dict]:
+        """Most recent transitions from the alert stream"""
+        return [e.to_dict() for e in list(self.stream)[-limit:]]
+
+    # ── Helpers ─────────────────────────────────────────────────────────────
+
+    def _event(self, campaign_id: int, alert_type: str, tracked: _TrackedAlert,
+               state: AlertState, now: datetime) -> AlertEvent:
+        return AlertEvent(
+            campaign_id=campaign_id,
+            alert_type=alert_type,
+            state=state.value,
+            severity=tracked.alert.get('severity', 'warning'),
+            message=tracked.alert.get('message', ''),
+            opened_at=tracked.opened_at.isoformat(),
+            timestamp=now.isoformat(),
+            occurrences=tracked.occurrences,
+        )
+
+    def _emit(self, events: List[AlertEvent]):
+        if not events:
+            return
+        self.stream.extend(events)
+        if self.persist:
+            try:
+                self.persist(events)
+            except Exception as e:
+                logger.error(f"Failed to persist alert transitions: {str(e)}")
@@ -0,0 +1,45 @@
+"""
+ADFLOWAI - App Singletons
+One configured instance per Flask app, with a process default outside an app
+"""
+
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+from flask import current_app, has_app_context
+
+T = TypeVar('T')
+
+
+class AppSingleton(Generic[T]):
+    """
+    Lazily built ``factory(config)`` instance per Flask app
+
+    Inside an app context the instance lives in ``app.extensions[name]`` and
+    is configured from ``app.config``. Outside one (Celery tasks, scripts)
+    a process-wide default is built from the Config settings on first use.
+    Lookups of an existing instance take no lock; only building does.
+    """
+
+    def __init__(self, name: str, factory: Callable[..., T]):
+        self.name = name
+        self.factory = factory
+        self._default: Optional[T] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        if has_app_context():
+            extensions = current_app.extensions
+            instance = extensions.get(self.name)
+            if instance is None:
+                with self._lock:
+                    if self.name not in extensions:
+                        extensions[self.name] = self.factory(current_app.config)
+                    instance = extensions[self.name]
+            return instance
+        if self._default is None:
+            with self._lock:
+                if self._default is None:
+                    from config.settings import Config
+                    self._default = self.factory(vars(Config))
+        return self._default
@@ -6,17 +6,28 @@ Core business logic for campaign management and operations
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from src.models.campaign import (
     Campaign, PlatformCampaign, MetricsHistory,
-    CampaignStatus, Platform, OptimizationLog
+    CampaignStatus, Platform, OptimizationLog, ScoreTrend, AlertLog
 )
 from src.ml.optimizer import AIOptimizer
+from src.ml.bandit import get_bandit_store
+from src.ml.budget_allocation import fit_response_curves
+from src.ml.trends import TREND_WINDOW, RunningTrend, least_squares_slopes
 from src.core.database import get_db_session
+from src.core.realtime_monitor import forget_campaign
 
 logger = logging.getLogger(__name__)
 
+# Cumulative figures a platform reports, kept in PlatformCampaign.platform_metrics
+PLATFORM_COUNTERS = ('impressions', 'clicks', 'conversions')
+PLATFORM_RATES = ('ctr', 'cpc', 'cpa', 'roas')
+
 
 class CampaignManager:
     """
@@ -128,26 +139,35 @@ class CampaignManager:
         self,
         campaign_id: int,
         platform: Optional[str] = None,
-        metrics: Dict = None
+        metrics: Dict = None,
+        campaign: Optional[Campaign] = None
     ) -> None:
         """
         Update campaign performance metrics
         
+        With a platform, ``metrics`` are that platform's own cumulative
+        figures: they are kept on its PlatformCampaign, the campaign totals
+        are summed over its platforms, and the platform-tagged snapshot
+        records the platform's figures.
+        
         Args:
             campaign_id: Campaign ID
             platform: Platform name (optional, for platform-specific updates)
             metrics: Dictionary of metrics to update
+            campaign: The campaign, if the caller already loaded it
         """
         try:
-            campaign = self.db.query(Campaign).filter_by(id=campaign_id).first()
-            if not campaign:
-                raise ValueError(f"Campaign {campaign_id} not found")
+            campaign = self._campaign(campaign_id, campaign)
+            platform_campaign = self._platform_campaign(campaign, platform) if platform else None
             
             # Update main campaign metrics
             if metrics:
-                for key, value in metrics.items():
-                    if hasattr(campaign, key):
-                        setattr(campaign, key, value)
+                if platform_campaign is not None:
+                    self._apply_platform_metrics(campaign, platform_campaign, metrics)
+                else:
+                    for key, value in metrics.items():
+                        if hasattr(campaign, key):
+                            setattr(campaign, key, value)
                 
                 # Recalculate performance score
                 campaign_data = {
@@ -169,36 +189,185 @@ class CampaignManager:
                 campaign.remaining_budget = campaign.total_budget - campaign.spent_budget
                 campaign.updated_at = datetime.utcnow()
             
+            reward = None
+            if platform_campaign is not None:
+                reward = self._platform_reward(campaign, platform_campaign)
+                figures = self._platform_figures(platform_campaign)
+            else:
+                figures = {key: getattr(campaign, key) for key in PLATFORM_COUNTERS + PLATFORM_RATES}
+                figures['spent'] = campaign.spent_budget
+            
             # Record metrics history
             metrics_record = MetricsHistory(
                 campaign_id=campaign_id,
-                platform=Platform[platform.upper()] if platform else None,
-                impressions=campaign.impressions,
-                clicks=campaign.clicks,
-                conversions=campaign.conversions,
-                spent=campaign.spent_budget,
-                ctr=campaign.ctr,
-                cpc=campaign.cpc,
-                cpa=campaign.cpa,
-                roas=campaign.roas,
-                performance_score=campaign.performance_score
+                platform=platform_campaign.platform if platform_campaign is not None else None,
+                performance_score=campaign.performance_score,
+                **figures
             )
             self.db.add(metrics_record)
+            self._push_score_trend(campaign)
             
             self.db.commit()
             logger.info(f"Metrics updated for campaign {campaign_id}")
+            if reward is not None:
+                self._record_platform_reward(campaign_id, platform_campaign.platform.value, reward)
             
         except Exception as e:
             self.db.rollback()
             logger.error(f"Error updating metrics: {str(e)}")
             raise
     
-    def optimize_campaign(self, campaign_id: int) -> List[str]:
+    def _platform_campaign(self, campaign: Campaign, platform: str) -> PlatformCampaign:
+        platform = Platform[platform.upper()]
+        for platform_campaign in campaign.platform_campaigns:
+            if platform_campaign.platform == platform:
+                return platform_campaign
+        raise ValueError(f"Campaign {campaign.id} does not run on {platform.value}")
+    
+    def _apply_platform_metrics(self, campaign: Campaign, platform_campaign: PlatformCampaign,
+                                metrics: Dict) -> None:
+        """Store one platform's cumulative metrics and roll the campaign totals up from its platforms"""
+        reported = dict(platform_campaign.platform_metrics or {})
+        reported.update({k: v for k, v in metrics.items() if k in PLATFORM_COUNTERS + PLATFORM_RATES})
+        platform_campaign.platform_metrics = reported
+        if 'spent_budget' in metrics:
+            platform_campaign.spent_budget = metrics['spent_budget']
+        platform_campaign.last_synced = datetime.utcnow()
+        
+        platforms = [self._platform_figures(pc) for pc in campaign.platform_campaigns]
+        for key in PLATFORM_COUNTERS:
+            setattr(campaign, key, sum(figures[key] or 0 for figures in platforms))
+        spent = sum(figures['spent'] for figures in platforms)
+        revenue = sum((figures['roas'] or 0.0) * figures['spent'] for figures in platforms)
+        campaign.spent_budget = spent
+        campaign.ctr = campaign.clicks / campaign.impressions if campaign.impressions else 0.0
+        campaign.cpc = spent / campaign.clicks if campaign.clicks else 0.0
+        campaign.cpa = spent / campaign.conversions if campaign.conversions else 0.0
+        campaign.roas = revenue / spent if spent else 0.0
+    
+    @staticmethod
+    def _platform_figures(platform_campaign: PlatformCampaign) -> Dict:
+        """A platform's own cumulative figures, keyed like MetricsHistory columns"""
+        reported = platform_campaign.platform_metrics or {}
+        figures = {key: reported.get(key, 0) for key in PLATFORM_COUNTERS}
+        figures.update({key: reported.get(key) for key in PLATFORM_RATES})
+        figures['spent'] = platform_campaign.spent_budget or 0.0
+        return figures
+    
+    def _platform_reward(self, campaign: Campaign, platform_campaign: PlatformCampaign) -> Optional[float]:
+        """ROAS the platform earned since its previous snapshot, or None without one"""
+        previous = self.db.query(MetricsHistory)\
+            .filter_by(campaign_id=campaign.id, platform=platform_campaign.platform)\
+            .order_by(MetricsHistory.recorded_at.desc())\
+            .first()
+        figures = self._platform_figures(platform_campaign)
+        if previous is None or figures['roas'] is None or previous.roas is None:
+            return None
+        spend = figures['spent'] - (previous.spent or 0.0)
+        if spend <= 0:
+            return None
+        revenue = figures['roas'] * figures['spent'] - previous.roas * (previous.spent or 0.0)
+        return revenue / spend
+
+    def _record_platform_reward(self, campaign_id: int, platform: str, reward: float) -> None:
+        """Feed a committed reward to the budget bandit; the metrics are saved either way"""
+        try:
+            get_bandit_store().record([campaign_id], [platform], [reward])
+        except Exception as e:
+            logger.error(f"Error recording bandit reward for campaign {campaign_id}: {str(e)}")
+    
+    def _push_score_trend(self, campaign: Campaign) -> None:
+        """Slide the campaign's stored score trend forward by its latest score"""
+        record = campaign.score_trend
+        if record is None:
+            return  # built from the recorded history on first use (score_trends)
+        trend = RunningTrend.from_dict(record.state)
+        trend.push(campaign.performance_score)
+        record.state = trend.to_dict()
+    
+    def score_trends(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        """
+        Slope of each campaign's recently recorded performance scores
+        
+        Campaigns with a stored running state are answered from it in O(1).
+        The rest are read in one query over MetricsHistory (the last
+        TREND_WINDOW stored scores each), fitted in one vectorized
+        least-squares pass, and their state is persisted for later updates.
+        
+        Args:
+            campaign_ids: Campaigns to evaluate
+            
+        Returns:
+            campaign_id -> {'slope', 'points'} (campaigns without scores omitted)
+        """
+        if not campaign_ids:
+            return {}
+        
+        trends = {}
+        for record in self.db.query(ScoreTrend).filter(ScoreTrend.campaign_id.in_(campaign_ids)):
+            state = RunningTrend.from_dict(record.state)
+            trends[record.campaign_id] = {'slope': state.slope, 'points': state.count}
+        
+        missing = [cid for cid in campaign_ids if cid not in trends]
+        if not missing:
+            return trends
+        
+        rank = func.row_number().over(
+            partition_by=MetricsHistory.campaign_id,
+            order_by=MetricsHistory.recorded_at.desc()
+        ).label('rank')
+        recent = self.db.query(
+            MetricsHistory.campaign_id, MetricsHistory.recorded_at, MetricsHistory.performance_score, rank
+        ).filter(
+            MetricsHistory.campaign_id.in_(missing),
+            MetricsHistory.performance_score.isnot(None)
+        ).subquery()
+        rows = self.db.query(recent)\
+            .filter(recent.c.rank <= TREND_WINDOW)\
+            .order_by(recent.c.campaign_id, recent.c.recorded_at)\
+            .all()
+        
+        series = {}
+        for row in rows:
+            series.setdefault(row.campaign_id, []).append(row.performance_score)
+        if not series:
+            return trends
+        
+        keys = list(series)
+        scores = np.full((len(keys), TREND_WINDOW), np.nan)
+        for i, key in enumerate(keys):
+            scores[i, :len(series[key])] = series[key]
+        slopes, counts = least_squares_slopes(scores)
+        
+        try:
+            for i, campaign_id in enumerate(keys):
+                trends[campaign_id] = {'slope': float(slopes[i]), 'points': int(counts[i])}
+                state = RunningTrend.from_scores(series[campaign_id])
+                self.db.add(ScoreTrend(campaign_id=campaign_id, state=state.to_dict()))
+            self.db.commit()
+        except Exception as e:
+            # A concurrent update created the state first; the computed slopes still stand
+            self.db.rollback()
+            logger.warning(f"Could not persist score trends: {str(e)}")
+        return trends
+    
+    def optimize_campaign(
+        self,
+        campaign_id: int,
+        platform_allocation: Optional[Dict[str, float]] = None,
+        score_trend: Optional[Dict] = None,
+        campaign: Optional[Campaign] = None
+    ) -> List[str]:
         """
         Run AI optimization on a campaign
         
         Args:
             campaign_id: Campaign ID
+            platform_allocation: Pre-computed optimal platform split (from
+                plan_budget_allocations in a sweep); solved here if omitted
+            score_trend: Pre-computed score trend (from score_trends in a
+                sweep); read here if omitted
+            campaign: The campaign, if the caller already loaded it
             
         Returns:
             List of actions taken
@@ -206,9 +375,7 @@ class CampaignManager:
         actions_taken = []
         
         try:
-            campaign = self.db.query(Campaign).filter_by(id=campaign_id).first()
-            if not campaign:
-                raise ValueError(f"Campaign {campaign_id} not found")
+            campaign = self._campaign(campaign_id, campaign)
             
             # Get campaign data
             campaign_data = {
@@ -225,16 +392,14 @@ class CampaignManager:
                 'conversions': campaign.conversions,
                 'start_date': campaign.start_date
             }
+            if score_trend is None:
+                score_trend = self.score_trends([campaign_id]).get(campaign_id)
+            if score_trend is not None:
+                campaign_data['score_trend'] = score_trend
             
-            # Get platform data
-            platform_data = {}
-            for pc in campaign.platform_campaigns:
-                platform_data[pc.platform.value] = {
-                    'allocated_budget': pc.allocated_budget,
-                    'spent_budget': pc.spent_budget,
-                    'performance_score': pc.performance_score,
-                    'is_active': pc.is_active
-                }
+            # Get platform data (with response curves unless already planned)
+            curves = {} if platform_allocation else self.fit_platform_response_curves([campaign_id])
+            platform_data = self._platform_data(campaign, curves.get(campaign_id, {}))
             
             # Get historical data
             history_records = self.db.query(MetricsHistory)\
@@ -255,7 +420,8 @@ class CampaignManager:
             recommendations = self.ai_optimizer.get_recommendations(
                 campaign_data,
                 platform_data,
-                history
+                history,
+                optimal_allocation=platform_allocation
             )
             
             # Execute recommendations
@@ -275,6 +441,111 @@ class CampaignManager:
             logger.error(f"Error optimizing campaign: {str(e)}")
             raise
     
+    def _platform_data(self, campaign: Campaign, curves: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Per-platform state handed to the optimizer"""
+        platform_data = {}
+        for pc in campaign.platform_campaigns:
+            platform_data[pc.platform.value] = {
+                'allocated_budget': pc.allocated_budget,
+                'spent_budget': pc.spent_budget,
+                'performance_score': pc.performance_score,
+                'is_active': pc.is_active
+            }
+            if pc.platform.value in curves:
+                platform_data[pc.platform.value]['response_curve'] = curves[pc.platform.value]
+        return platform_data
+    
+    def fit_platform_response_curves(
+        self,
+        campaign_ids: List[int],
+        history_window: int = 60
+    ) -> Dict[int, Dict[str, Dict]]:
+        """
+        Fit spend -> conversions response curves per (campaign, platform)
+        
+        Uses the most recent ``history_window`` platform snapshots (each the
+        platform's own cumulative spend and conversions, see
+        update_campaign_metrics) of every campaign in one query; curves are
+        fitted on the increments between consecutive snapshots (clicks stand
+        in for conversions when a series has fewer than 3 converting periods).
+        
+        Args:
+            campaign_ids: Campaigns to fit
+            history_window: Snapshots per platform to use
+            
+        Returns:
+            campaign_id -> platform -> {'scale', 'elasticity', 'observations'}
+        """
+        if not campaign_ids:
+            return {}
+        
+        rank = func.row_number().over(
+            partition_by=(MetricsHistory.campaign_id, MetricsHistory.platform),
+            order_by=MetricsHistory.recorded_at.desc()
+        ).label('rank')
+        recent = self.db.query(
+            MetricsHistory.campaign_id, MetricsHistory.platform, MetricsHistory.recorded_at,
+            MetricsHistory.spent, MetricsHistory.conversions, MetricsHistory.clicks, rank
+        ).filter(
+            MetricsHistory.campaign_id.in_(campaign_ids),
+            MetricsHistory.platform.isnot(None)
+        ).subquery()
+        rows = self.db.query(recent)\
+            .filter(recent.c.rank <= history_window)\
+            .order_by(recent.c.campaign_id, recent.c.platform, recent.c.recorded_at)\
+            .all()
+        
+        series = {}
+        for row in rows:
+            series.setdefault((row.campaign_id, row.platform), []).append(
+                (row.spent or 0.0, row.conversions or 0, row.clicks or 0)
+            )
+        if not series:
+            return {}
+        
+        keys = list(series)
+        width = max(len(v) for v in series.values())
+        snapshots = np.full((len(keys), width, 3), np.nan)
+        for i, key in enumerate(keys):
+            snapshots[i, :len(series[key])] = series[key]
+        deltas = np.diff(snapshots, axis=1)
+        spend, conversions, clicks = deltas[..., 0], deltas[..., 1], deltas[..., 2]
+        converting = ((spend > 0) & (conversions > 0)).sum(axis=1)
+        value = np.where((converting >= 3)[:, None], conversions, clicks)
+        
+        fitted = fit_response_curves(spend, value)
+        curves: Dict[int, Dict[str, Dict]] = {}
+        for i, (campaign_id, platform) in enumerate(keys):
+            if not np.isfinite(fitted.scale[i]):
+                continue
+            curves.setdefault(campaign_id, {})[platform.value] = {
+                'scale': float(fitted.scale[i]),
+                'elasticity': float(fitted.elasticity[i]),
+                'observations': int(fitted.observations[i])
+            }
+        return curves
+    
+    def plan_budget_allocations(self, campaigns: List[Campaign]) -> Dict[int, Dict[str, float]]:
+        """
+        Solve the platform split for a whole sweep in one vectorized call
+        
+        Args:
+            campaigns: Campaigns to allocate (their platform_campaigns are used)
+            
+        Returns:
+            campaign_id -> platform -> optimal budget (campaigns with < 2 platforms omitted)
+        """
+        campaigns = [c for c in campaigns if len(c.platform_campaigns) > 1]
+        if not campaigns:
+            return {}
+        curves = self.fit_platform_response_curves([c.id for c in campaigns])
+        requests = [
+            (c.total_budget, self._platform_data(c, curves.get(c.id, {})))
+            for c in campaigns
+        ]
+        allocations = self.ai_optimizer.optimize_budget_allocations(requests)
+        return {c.id: allocation for c, allocation in zip(campaigns, allocations)}
+    
     def _execute_recommendation(self, campaign: Campaign, recommendation) -> str:
         """
         Execute an optimization recommendation
@@ -315,12 +586,10 @@ class CampaignManager:
                 result = f"Budget decreased from ${old_budget:.2f} to ${campaign.total_budget:.2f}"
                 
             elif action == 'reallocate':
-                # Reallocate budgets across platforms
+                # Reallocate budgets across platforms (already loaded with the campaign)
+                by_platform = {pc.platform: pc for pc in campaign.platform_campaigns}
                 for platform_name, new_budget in recommendation.platform_allocations.items():
-                    platform_campaign = self.db.query(PlatformCampaign)\
-                        .filter_by(campaign_id=campaign.id)\
-                        .filter_by(platform=Platform[platform_name.upper()])\
-                        .first()
+                    platform_campaign = by_platform.get(Platform[platform_name.upper()])
                     
                     if platform_campaign:
                         platform_campaign.allocated_budget = new_budget
@@ -344,8 +613,16 @@ class CampaignManager:
             return f"Failed to execute {action}: {str(e)}"
     
     def get_campaign(self, campaign_id: int) -> Optional[Campaign]:
-        """Get campaign by ID"""
-        return self.db.query(Campaign).filter_by(id=campaign_id).first()
+        """Get campaign by ID (no query if the session already holds it)"""
+        return self.db.get(Campaign, campaign_id)
+    
+    def _campaign(self, campaign_id: int, campaign: Optional[Campaign] = None) -> Campaign:
+        """The caller's already-loaded campaign, else campaign_id loaded from the session"""
+        if campaign is None:
+            campaign = self.get_campaign(campaign_id)
+            if not campaign:
+                raise ValueError(f"Campaign {campaign_id} not found")
+        return campaign
     
     def get_user_campaigns(self, user_id: int, status: Optional[str] = None) -> List[Campaign]:
         """
@@ -369,21 +646,29 @@ class CampaignManager:
         
         return query.order_by(Campaign.created_at.desc()).all()
     
-    def delete_campaign(self, campaign_id: int) -> bool:
+    def delete_campaign(self, campaign_id: int, campaign: Optional[Campaign] = None) -> bool:
         """
         Delete a campaign
         
         Args:
             campaign_id: Campaign ID
+            campaign: The campaign, if the caller already loaded it
             
         Returns:
             True if deleted, False otherwise
         """
         try:
-            campaign = self.db.query(Campaign).filter_by(id=campaign_id).first()
+            campaign = campaign or self.get_campaign(campaign_id)
             if campaign:
-                self.db.delete(campaign)
+                # Bulk deletes instead of the ORM cascade, which loads and
+                # deletes the whole metrics history row by row
+                for child in (MetricsHistory, PlatformCampaign, ScoreTrend, OptimizationLog, AlertLog):
+                    self.db.query(child).filter(child.campaign_id == campaign_id)\
+                        .delete(synchronize_session=False)
+                self.db.expunge(campaign)
+                self.db.query(Campaign).filter_by(id=campaign_id).delete(synchronize_session=False)
                 self.db.commit()
+                forget_campaign(campaign_id)
                 logger.info(f"Campaign {campaign_id} deleted")
                 return True
             return False
@@ -392,19 +677,18 @@ class CampaignManager:
             logger.error(f"Error deleting campaign: {str(e)}")
             raise
     
-    def get_campaign_analytics(self, campaign_id: int) -> Dict:
+    def get_campaign_analytics(self, campaign_id: int, campaign: Optional[Campaign] = None) -> Dict:
         """
         Get comprehensive analytics for a campaign
         
         Args:
             campaign_id: Campaign ID
+            campaign: The campaign, if the caller already loaded it
             
         Returns:
             Dictionary with analytics data
         """
-        campaign = self.get_campaign(campaign_id)
-        if not campaign:
-            raise ValueError(f"Campaign {campaign_id} not found")
+        campaign = self._campaign(campaign_id, campaign)
         
         # Get platform breakdown
         platform_breakdown = []
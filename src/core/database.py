@@ -1,47 +1,221 @@
 """
 ADFLOWAI - Database Layer
-SQLAlchemy setup with proper pool handling for both Postgres and SQLite
+SQLAlchemy setup with proper pool handling for both Postgres and SQLite,
+plus optional read replicas for the read-heavy endpoints
 """
 
+import itertools
 import logging
-from sqlalchemy import create_engine
+import math
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Tuple
+
+from flask import g, has_request_context, request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.pool import StaticPool
 
+from src.core.db_instrumentation import REPLICA_LAG, TimedQueuePool, init_db_instrumentation
 from src.models.campaign import Base
 
 logger = logging.getLogger(__name__)
 
+_WROTE_KEY = 'adflowai.db_wrote'
+
+# Seconds the replica is behind, per dialect; dialects without a query
+# (SQLite files, tests) report 0. On Postgres a replica that has replayed
+# everything it received is current even if the primary has been idle.
+LAG_QUERIES = {
+    'postgresql': (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+def measure_replica_lag(engine) -> float:
+    """Replication lag of ``engine`` in seconds"""
+    query = LAG_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return 0.0
+    with engine.connect() as conn:
+        return float(conn.execute(text(query)).scalar() or 0)
+
+
+_SQLITE_WRITE = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+
+
+def _install_sqlite_writer_lock(engine, timeout: float):
+    """
+    Let one connection of ``engine`` write at a time
+
+    SQLite has a single write lock per file. Writers racing for it spin in
+    the busy handler, and a deferred transaction that has to upgrade from
+    read to write can fail at once. Instead, a connection takes this lock
+    before its first write statement and keeps it until it goes back to the
+    pool (after commit or rollback), so the process's writers wait their turn
+    here. Other processes on the same file still rely on busy_timeout.
+    """
+    lock = threading.Lock()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def acquire(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get("sqlite_writer") or not _SQLITE_WRITE.match(statement):
+            return
+        if not lock.acquire(timeout=timeout):
+            raise OperationalError(statement, parameters, sqlite3.OperationalError(
+                f"database is locked (waited {timeout:.1f}s for the writer lock)"
+            ))
+        conn.info["sqlite_writer"] = True
+
+    def release(dbapi_connection, connection_record, *args):
+        if connection_record.info.pop("sqlite_writer", False):
+            lock.release()
+
+    event.listen(engine, "checkin", release)
+    event.listen(engine, "invalidate", release)
+
+    return lock
+
+
+def _create_sqlite_engine(url: str, config):
+    # In-memory databases (tests) live in one connection
+    if _is_memory_sqlite(url):
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+    busy_timeout_ms = config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    pragmas = [
+        f"busy_timeout = {busy_timeout_ms}",
+        f"synchronous = {config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"cache_size = -{config.get('SQLITE_CACHE_SIZE_KB', 65536)}",
+        f"mmap_size = {config.get('SQLITE_MMAP_SIZE', 268435456)}",
+        "temp_store = MEMORY",
+    ]
+    if config.get("SQLITE_WAL", True):
+        # Readers no longer block the writer (or each other); persistent per file
+        pragmas.insert(0, "journal_mode = WAL")
+        pragmas.append("journal_size_limit = 67108864")
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+        poolclass=TimedQueuePool,
+        pool_size=config.get("SQLITE_POOL_SIZE", 8),
+        max_overflow=config.get("SQLALCHEMY_MAX_OVERFLOW", 5),
+        pool_timeout=config.get("SQLALCHEMY_POOL_TIMEOUT", 30),
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    _install_sqlite_writer_lock(engine, timeout=busy_timeout_ms / 1000)
+    return engine
+
+
+def _create_engine(url: str, config):
+    if url.startswith("sqlite"):
+        return _create_sqlite_engine(url, config)
+    return create_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=config.get("SQLALCHEMY_POOL_SIZE", 10),
+        max_overflow=config.get("SQLALCHEMY_MAX_OVERFLOW", 5),
+        pool_timeout=config.get("SQLALCHEMY_POOL_TIMEOUT", 30),
+        pool_pre_ping=True,
+    )
+
+
+def _create_probe_engine(url: str, config):
+    """
+    Engine for a replica's lag probes, apart from its read pool
+
+    One connection with short connect, checkout and statement timeouts, so
+    a probe of an unreachable or hung replica holds up the request that
+    runs it for about DB_REPLICA_PROBE_TIMEOUT seconds, not the pool's 30.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() not in LAG_QUERIES:
+        return None  # nothing to probe; the lag is always 0
+    timeout = config.get("DB_REPLICA_PROBE_TIMEOUT", 1)
+    connect_args = {}
+    if parsed.get_backend_name() == "postgresql":
+        connect_args = {
+            "connect_timeout": max(1, math.ceil(timeout)),
+            "options": f"-c statement_timeout={int(timeout * 1000)}",
+        }
+    return create_engine(
+        url,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=timeout,
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+
+def _display(url: str) -> str:
+    return url.split('@')[-1] if '@' in url else url
+
 
 class Database:
     def __init__(self):
         self.engine = None
         self.Session = None
+        self.replicas = []
+        self.ReadSession = None  # unbound factory; each read session is bound to the replica picked for it
+        self.max_lag = 0.0
+        self.lag_check_interval = 0.0
+        self.lag_probe = measure_replica_lag
+        self._probes = []  # per replica: engine lag probes run on (None = the replica's own)
+        self._probing = []  # per replica: held while one thread probes it
+        self._lag: Dict[int, Tuple[float, float]] = {}  # replica index -> (checked_at, lag)
+        self._next_replica = itertools.count()
+        self._recent_writes: Dict[str, float] = {}  # writer key -> monotonic time of its last commit
 
     def init_app(self, app):
         url = app.config["SQLALCHEMY_DATABASE_URI"]
+        self.engine = _create_engine(url, app.config)
+
+        factory = sessionmaker(bind=self.engine)
+        event.listen(factory, 'after_flush', self._mark_write)
+        event.listen(factory, 'do_orm_execute', self._mark_bulk_write)
+        event.listen(factory, 'after_commit', self._record_write)
+        event.listen(factory, 'after_rollback', lambda session: session.info.pop('wrote', None))
+        self.Session = scoped_session(factory)
+
+        replica_urls = app.config.get("DATABASE_REPLICA_URLS") or []
+        self.replicas = [_create_engine(u, app.config) for u in replica_urls]
+        self._probes = [_create_probe_engine(u, app.config) for u in replica_urls]
+        self._probing = [threading.Lock() for _ in replica_urls]
+        self.ReadSession = sessionmaker()
+        self.max_lag = app.config.get("DB_REPLICA_MAX_LAG", 5)
+        self.lag_check_interval = app.config.get("DB_REPLICA_LAG_CHECK_INTERVAL", 2)
+        self._lag.clear()
+        self._recent_writes.clear()
 
-        # SQLite (testing) needs special pool settings
-        if url.startswith("sqlite"):
-            self.engine = create_engine(
-                url,
-                connect_args={"check_same_thread": False},
-                poolclass=StaticPool,
-            )
-        else:
-            self.engine = create_engine(
-                url,
-                poolclass=QueuePool,
-                pool_size=app.config.get("SQLALCHEMY_POOL_SIZE", 10),
-                max_overflow=app.config.get("SQLALCHEMY_MAX_OVERFLOW", 5),
-                pool_timeout=app.config.get("SQLALCHEMY_POOL_TIMEOUT", 30),
-                pool_pre_ping=True,
-            )
-
-        self.Session = scoped_session(sessionmaker(bind=self.engine))
         app.db = self
         self.create_tables()
-        logger.info(f"Database ready: {url.split('@')[-1] if '@' in url else url}")
+        logger.info(f"Database ready: {_display(url)}")
+        for replica_url in replica_urls:
+            logger.info(f"Read replica: {_display(replica_url)}")
 
     def create_tables(self):
         Base.metadata.create_all(self.engine)
@@ -51,12 +225,98 @@ class Database:
         Base.metadata.drop_all(self.engine)
         logger.warning("All tables dropped")
 
+    def dispose_after_fork(self):
+        """
+        Drop pooled connections inherited from a parent process (gunicorn --preload)
+
+        ``close=False`` leaves the sockets to the parent, which still owns
+        them; the child opens its own on first use.
+        """
+        for engine in [self.engine, *self.replicas, *self._probes]:
+            if engine is not None:
+                engine.dispose(close=False)
+
     def get_session(self):
         return self.Session()
 
     def close_session(self):
         self.Session.remove()
 
+    # ── Read replicas ───────────────────────────────────────────────────────
+
+    def replica_lag(self, index: int) -> float:
+        """
+        Lag of replica ``index``, probed at most every DB_REPLICA_LAG_CHECK_INTERVAL seconds
+
+        One thread probes a replica at a time (within DB_REPLICA_PROBE_TIMEOUT);
+        the others use the last known lag meanwhile, or skip a replica that
+        has not answered a probe yet.
+        """
+        now = time.monotonic()
+        checked = self._lag.get(index)
+        if checked and now - checked[0] < self.lag_check_interval:
+            return checked[1]
+        probing = self._probing[index]
+        if not probing.acquire(blocking=False):
+            return checked[1] if checked else math.inf
+        try:
+            lag = float(self.lag_probe(self._probes[index] or self.replicas[index]))
+        except Exception as e:
+            logger.warning(f"Lag probe failed for replica {index}, treating it as unavailable: {e}")
+            lag = math.inf
+        finally:
+            probing.release()
+        self._lag[index] = (now, lag)
+        REPLICA_LAG.labels(str(index)).set(lag)
+        return lag
+
+    def pick_replica(self):
+        """Next replica (round-robin) within DB_REPLICA_MAX_LAG; None if all are behind or down"""
+        count = len(self.replicas)
+        start = next(self._next_replica)
+        for i in range(count):
+            index = (start + i) % count
+            if self.replica_lag(index) <= self.max_lag:
+                return self.replicas[index]
+        return None
+
+    def get_read_session(self):
+        """A new session on a healthy replica, else the primary session"""
+        engine = self.pick_replica() if self.replicas else None
+        if engine is None:
+            return self.get_session()
+        return self.ReadSession(bind=engine)
+
+    # ── Read-your-writes ────────────────────────────────────────────────────
+
+    def wrote_recently(self, key: str) -> bool:
+        """
+        Whether ``key`` committed within the last DB_REPLICA_MAX_LAG seconds
+
+        A replica is never further behind than that, so after the window any
+        replica we still read from has the write. Tracked per process: a
+        client whose next request lands on another worker may not see it.
+        """
+        at = self._recent_writes.get(key)
+        return at is not None and time.monotonic() - at < self.max_lag
+
+    def _mark_write(self, session, flush_context=None):
+        session.info['wrote'] = True
+        if has_request_context():
+            request.environ[_WROTE_KEY] = True
+
+    def _mark_bulk_write(self, orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            self._mark_write(orm_execute_state.session)
+
+    def _record_write(self, session):
+        if not session.info.pop('wrote', False) or not self.replicas or not has_request_context():
+            return
+        now = time.monotonic()
+        if len(self._recent_writes) >= 10000:
+            self._recent_writes = {k: t for k, t in self._recent_writes.items() if now - t < self.max_lag}
+        self._recent_writes[_writer_key()] = now
+
 
 # Singleton
 db = Database()
@@ -64,19 +324,95 @@ db = Database()
 
 def init_db(app):
     db.init_app(app)
+    init_db_instrumentation(app, db.engine, *db.replicas)
+
+    @app.teardown_request
+    def close_request_session(exc=None):
+        # The request's unit of work ends with the request, even when an
+        # enclosing app context (CLI, tests) outlives it
+        read_session = g.pop('db_read_session', None)
+        if read_session is not None:
+            read_session.close()
+        g.pop('db_session', None)
+        if g.pop('db_session_owned', False):
+            db.close_session()
 
     @app.teardown_appcontext
     def shutdown_session(exc=None):
         db.close_session()
 
 
+def _writer_key() -> str:
+    """Who a request writes for: its user (JWT or API key), else its address"""
+    from src.auth.api_keys import current_identity
+
+    try:
+        return f"user:{current_identity()}"
+    except RuntimeError:
+        return f"ip:{request.remote_addr}"
+
+
 def get_db_session():
     """
     Returns an active SQLAlchemy session.
     Must be called from within a Flask app context (i.e. inside a route or with app.app_context()).
+
+    Inside a request every caller (routes, managers, caches) gets the same
+    session, bound to ``g`` and closed when the request ends. If the thread
+    already had a session open before the request (a script or test holding
+    objects), the request shares it and leaves closing it to its owner.
     """
     if db.Session is None:
         raise RuntimeError(
             "Database not initialised. Call init_db(app) before using get_db_session()."
         )
-    return db.get_session()
+    if not has_request_context():
+        return db.get_session()
+    if 'db_session' not in g:
+        g.db_session_owned = not db.Session.registry.has()
+        g.db_session = db.get_session()
+    return g.db_session
+
+
+def release_request_session():
+    """
+    End the request's unit of work early
+
+    For handlers that go on to block (SSE streams, long-polls) after their
+    last query: the sessions it opened are closed now so their connections
+    go back to the pool instead of being held for the whole wait. A later
+    get_db_session() in the same request opens a new one.
+    """
+    read_session = g.pop('db_read_session', None)
+    if read_session is not None:
+        read_session.close()
+    g.pop('db_session', None)
+    if g.pop('db_session_owned', False):
+        db.close_session()
+
+
+def get_read_session():
+    """
+    Returns a session for read-only work (dashboard, analytics, reports, admin stats).
+
+    With DATABASE_REPLICA_URLS set this is a session on a replica no more
+    than DB_REPLICA_MAX_LAG seconds behind, shared for the rest of the
+    request. It is the primary session (get_db_session()) when there are no
+    replicas, when every replica is lagging or down, and - so clients read
+    their own writes - when this request has written or its user committed
+    within the last DB_REPLICA_MAX_LAG seconds. Never write through it.
+    """
+    if db.Session is None:
+        raise RuntimeError(
+            "Database not initialised. Call init_db(app) before using get_read_session()."
+        )
+    if not has_request_context():
+        return db.get_read_session()
+    if not db.replicas or request.environ.get(_WROTE_KEY) or db.wrote_recently(_writer_key()):
+        return get_db_session()
+    if 'db_read_session' not in g:
+        engine = db.pick_replica()
+        if engine is None:
+            return get_db_session()
+        g.db_read_session = db.ReadSession(bind=engine)
+    return g.db_read_session
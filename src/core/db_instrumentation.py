@@ -0,0 +1,174 @@
+"""
+ADFLOWAI - Database Instrumentation
+Per-request query counts, DB time, slowest statements and N+1 detection via SQLAlchemy cursor events
+"""
+
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from flask import current_app, has_request_context, request
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_KEY = 'adflowai.db_stats'
+
+QUERY_DURATION = Histogram(
+    'adflowai_db_query_duration_seconds', 'Duration of single SQL statements',
+    ['operation'], buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+REQUEST_QUERIES = Histogram(
+    'adflowai_db_queries_per_request', 'SQL statements executed per request',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+REQUEST_DB_TIME = Histogram(
+    'adflowai_db_time_per_request_seconds', 'Total SQL time per request',
+    ['endpoint'], buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+POOL_CHECKOUT_WAIT = Histogram(
+    'adflowai_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection',
+    buckets=(.0001, .0005, .001, .005, .01, .05, .1, .5, 1, 5, 30)
+)
+REPLICA_LAG = Gauge(
+    'adflowai_db_replica_lag_seconds', 'Last measured replication lag (+Inf when the replica is unreachable)',
+    ['replica'], multiprocess_mode='max'
+)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMS = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_POSTCOMPILE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_SPACE = re.compile(r"\s+")
+_SELECT_LIST = re.compile(r"^SELECT .+? FROM ")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalized SQL: literals become ?, parameter lists collapse to (?...)
+
+    Statements that differ only in values (or IN-list length) share a
+    fingerprint, which is what N+1 detection counts.
+    """
+    sql = _STRING.sub('?', statement)
+    sql = _NUMBER.sub('?', sql)
+    sql = _POSTCOMPILE.sub('(?...)', sql)
+    sql = _PARAMS.sub('(?...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def summarize(fp: str, limit: int = 200) -> str:
+    """Short form of a fingerprint for logs and headers: the select list is elided"""
+    return _SELECT_LIST.sub('SELECT ... FROM ', fp, count=1)[:limit]
+
+
+def _operation(statement: str) -> str:
+    head = statement.lstrip()[:6].upper()
+    return head if head in ('SELECT', 'INSERT', 'UPDATE', 'DELETE') else 'OTHER'
+
+
+@dataclass
+class QueryStats:
+    """Statements one request executed"""
+    count: int = 0
+    total_time: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+    slowest: List[Tuple[float, str]] = field(default_factory=list)  # min-heap of (seconds, fingerprint)
+
+    def record(self, statement: str, duration: float, keep_slowest: int):
+        self.count += 1
+        self.total_time += duration
+        fp = fingerprint(statement)
+        self.fingerprints[fp] += 1
+        if len(self.slowest) < keep_slowest:
+            heapq.heappush(self.slowest, (duration, fp))
+        elif keep_slowest and duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, fp))
+
+    def slowest_first(self) -> List[Tuple[float, str]]:
+        return sorted(self.slowest, reverse=True)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Fingerprints executed more than ``threshold`` times (likely N+1)"""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n > threshold]
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """The current request's stats (None outside a request or before its first query)"""
+    return request.environ.get(_REQUEST_KEY) if has_request_context() else None
+
+
+def instrument_engine(engine, keep_slowest: int = 5):
+    """
+    Time every statement on ``engine``; inside a request, also add it to the request's QueryStats
+
+    The start time lives on the statement's execution context, so a statement
+    that fails (no after_cursor_execute) leaves nothing behind on the connection.
+    """
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.adflowai_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'adflowai_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        QUERY_DURATION.labels(_operation(statement)).observe(duration)
+        if has_request_context():
+            stats = request.environ.get(_REQUEST_KEY)
+            if stats is None:
+                stats = request.environ[_REQUEST_KEY] = QueryStats()
+            stats.record(statement, duration, keep_slowest)
+
+
+def _finish_request(response):
+    config = current_app.config
+    stats = current_stats() or QueryStats()
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_QUERIES.labels(endpoint).observe(stats.count)
+    REQUEST_DB_TIME.labels(endpoint).observe(stats.total_time)
+
+    for fp, n in stats.repeated(config['DB_N_PLUS_ONE_THRESHOLD']):
+        logger.warning(f"Possible N+1 in {endpoint}: {n} executions of {summarize(fp, 300)}")
+
+    if current_app.debug or config['DB_QUERY_HEADERS']:
+        response.headers['X-DB-Query-Count'] = str(stats.count)
+        response.headers['X-DB-Time-Ms'] = f"{stats.total_time * 1000:.2f}"
+        slowest = stats.slowest_first()
+        if slowest:
+            seconds, fp = slowest[0]
+            response.headers['X-DB-Slowest'] = f"{seconds * 1000:.2f}ms {summarize(fp)}"
+    return response
+
+
+def init_db_instrumentation(app, *engines):
+    """Instrument ``engines`` (primary and replicas) and report per request (headers in debug, histograms always)"""
+    if not app.config['DB_INSTRUMENTATION_ENABLED']:
+        return
+    for engine in engines:
+        instrument_engine(engine, keep_slowest=app.config['DB_SLOW_QUERY_COUNT'])
+    app.after_request(_finish_request)
@@ -0,0 +1,138 @@
+"""
+ADFLOWAI - Identity Cache
+Request-scoped and short-TTL process caches of user records
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Optional
+
+from flask import has_request_context, request
+
+from src.core.app_singleton import AppSingleton
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_REQUEST_KEY = 'adflowai.identity_cache'
+
+
+@dataclass(frozen=True)
+class UserRecord:
+    """Immutable snapshot of the user fields authenticated requests read"""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    company: Optional[str]
+    role: str
+    is_active: bool
+    is_verified: bool
+    last_login: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user) -> 'UserRecord':
+        return cls(
+            id=user.id, username=user.username, email=user.email, full_name=user.full_name,
+            company=user.company, role=user.role, is_active=user.is_active,
+            is_verified=user.is_verified, last_login=user.last_login
+        )
+
+
+class IdentityCache:
+    """
+    Process-level cache of user records
+
+    Entries expire after ``ttl`` seconds, which bounds how stale another
+    process can be after a change; in this process the admin and auth write
+    paths invalidate explicitly. Inside a request, lookups are additionally
+    memoized on the request itself so one request never reads an entry twice.
+    Misses are not cached, so newly created rows are seen immediately.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config) -> 'IdentityCache':
+        return cls(ttl=config['IDENTITY_CACHE_TTL'], max_entries=config['IDENTITY_CACHE_MAX_ENTRIES'])
+
+    def user(self, user_id: int, loader: Callable[[int], Optional[UserRecord]]) -> Optional[UserRecord]:
+        return self._lookup(('user', user_id), user_id, loader)
+
+    def invalidate_user(self, user_id: int):
+        self._discard(lambda key, value: key == ('user', user_id))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if has_request_context():
+            request.environ.pop(_REQUEST_KEY, None)
+
+    def _lookup(self, key, ident, loader):
+        # Per request (not flask.g, which outlives the request under an enclosing app context)
+        memo = request.environ.setdefault(_REQUEST_KEY, {}) if has_request_context() else None
+        if memo is not None and key in memo:
+            return memo[key]
+
+        now = time.monotonic()
+        with self._lock:
+            expires, value = self._entries.get(key, (0.0, _MISSING))
+        if value is _MISSING or expires <= now:
+            value = loader(ident)
+            if value is not None:
+                with self._lock:
+                    if len(self._entries) >= self.max_entries:
+                        self._evict(now)
+                    self._entries[key] = (now + self.ttl, value)
+
+        if memo is not None:
+            memo[key] = value
+        return value
+
+    def _evict(self, now: float):
+        # Expired entries first; if everything is fresh, the oldest half goes
+        expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+        if not expired:
+            expired = sorted(self._entries, key=lambda key: self._entries[key][0])[:len(self._entries) // 2 or 1]
+        for key in expired:
+            del self._entries[key]
+
+    def _discard(self, predicate: Callable[[Hashable, object], bool]):
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(k, v)]:
+                del self._entries[key]
+        memo = request.environ.get(_REQUEST_KEY) if has_request_context() else None
+        if memo:
+            for key in [k for k, v in memo.items() if predicate(k, v)]:
+                del memo[key]
+
+
+_identity_cache = AppSingleton('identity_cache', IdentityCache.from_config)
+
+
+def get_identity_cache() -> IdentityCache:
+    """The current app's cache (configured from app.config), or a process default"""
+    return _identity_cache.get()
+
+
+def get_user_record(user_id: int, session=None) -> Optional[UserRecord]:
+    """Cached snapshot of a user, or None if there is no such user"""
+    from src.core.database import get_db_session
+    from src.models.campaign import User
+
+    def load(ident):
+        user = (session or get_db_session()).query(User).filter_by(id=ident).first()
+        return UserRecord.from_user(user) if user else None
+    return get_identity_cache().user(user_id, load)
+
+
+def invalidate_user(user_id: int):
+    get_identity_cache().invalidate_user(user_id)
+
@@ -0,0 +1,303 @@
+"""
+ADFLOWAI - Real-Time Metrics Sources
+Pluggable batch providers of live campaign metrics for the RealTimeMonitor
+"""
+
+import asyncio
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Keys every source returns for a campaign
+METRIC_KEYS = ('impressions_rate', 'clicks_rate', 'spend_rate', 'ctr', 'cpc', 'performance_score')
+
+
+class MetricsSource(ABC):
+    """
+    Interface the monitor pulls live metrics from, one batch per tick
+
+    ``fetch`` returns a dict mapping campaign_id to a metrics dict with the
+    METRIC_KEYS. Campaigns with no new data may simply be left out.
+    """
+
+    @abstractmethod
+    async def fetch(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        """Fetch current metrics for a batch of campaigns"""
+
+    async def close(self):
+        """Release any resources held by the source"""
+
+
+class SimulatedMetricsSource(MetricsSource):
+    """Random but plausible metrics, for demos and local development"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+
+    async def fetch(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        r = self._random
+        return {
+            campaign_id: {
+                'impressions_rate': r.uniform(10, 100),
+                'clicks_rate': r.uniform(0.1, 5),
+                'spend_rate': r.uniform(0.5, 10),
+                'ctr': r.uniform(0.01, 0.05),
+                'cpc': r.uniform(0.5, 3.0),
+                'performance_score': r.uniform(0.3, 0.9)
+            }
+            for campaign_id in campaign_ids
+        }
+
+
+class MetricsHistorySource(MetricsSource):
+    """
+    Reads the two most recent MetricsHistory rows per campaign in one query
+
+    Rates are derived from the difference between the two snapshots; ratios
+    (ctr, cpc, performance_score) come from the latest row.
+    """
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+
+    async def fetch(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        if not campaign_ids:
+            return {}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._fetch_sync, list(campaign_ids))
+
+    def _fetch_sync(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        from sqlalchemy import func
+        from src.models.campaign import MetricsHistory
+
+        if self._session_factory is None:
+            from src.core.database import db
+            if db.Session is None:
+                raise RuntimeError("Database not initialised for MetricsHistorySource")
+            self._session_factory = db.Session
+
+        session = self._session_factory()
+        try:
+            rank = func.row_number().over(
+                partition_by=MetricsHistory.campaign_id,
+                order_by=(MetricsHistory.recorded_at.desc(), MetricsHistory.id.desc())
+            ).label('rank')
+            ranked = session.query(MetricsHistory.id, rank)\
+                .filter(MetricsHistory.campaign_id.in_(campaign_ids))\
+                .subquery()
+            rows = session.query(MetricsHistory)\
+                .join(ranked, ranked.c.id == MetricsHistory.id)\
+                .filter(ranked.c.rank <= 2)\
+                .order_by(MetricsHistory.campaign_id, MetricsHistory.recorded_at.desc())\
+                .all()
+        finally:
+            session.close()
+
+        latest: Dict[int, list] = {}
+        for row in rows:
+            latest.setdefault(row.campaign_id, []).append(row)
+
+        return {campaign_id: self._to_metrics(pair) for campaign_id, pair in latest.items()}
+
+    @staticmethod
+    def _to_metrics(rows) -> Dict:
+        current = rows[0]
+        impressions_rate = clicks_rate = spend_rate = 0.0
+        if len(rows) > 1:
+            previous = rows[1]
+            elapsed = (current.recorded_at - previous.recorded_at).total_seconds()
+            if elapsed > 0:
+                impressions_rate = max(0, (current.impressions or 0) - (previous.impressions or 0)) / elapsed
+                clicks_rate = max(0, (current.clicks or 0) - (previous.clicks or 0)) / elapsed
+                spend_rate = max(0.0, (current.spent or 0) - (previous.spent or 0)) / elapsed
+        return {
+            'impressions_rate': impressions_rate,
+            'clicks_rate': clicks_rate,
+            'spend_rate': spend_rate,
+            'ctr': current.ctr or 0.0,
+            'cpc': current.cpc or 0.0,
+            'performance_score': current.performance_score if current.performance_score is not None else 0.5
+        }
+
+
+class RedisStreamSource(MetricsSource):
+    """
+    Consumes a Redis stream (XADD'ed by ingestion) and keeps the latest entry per campaign
+
+    Each stream entry carries a ``campaign_id`` field plus any METRIC_KEYS.
+    Requires an asyncio Redis client (``redis.asyncio``). Reading starts
+    after the entry that was newest on the first fetch.
+    """
+
+    def __init__(self, redis_client, stream: str = 'metrics:stream', batch_size: int = 10000):
+        self.redis = redis_client
+        self.stream = stream
+        self.batch_size = batch_size
+        self._last_id: Optional[str] = None
+        self._latest: Dict[int, Dict] = {}
+
+    async def _start_id(self) -> str:
+        # A non-blocking XREAD from '$' never returns anything, so resolve
+        # "now" to a concrete entry ID once
+        newest = await self.redis.xrevrange(self.stream, '+', '-', count=1)
+        return newest[0][0] if newest else '0-0'
+
+    async def fetch(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        if self._last_id is None:
+            self._last_id = await self._start_id()
+        while True:
+            response = await self.redis.xread(
+                {self.stream: self._last_id}, count=self.batch_size
+            )
+            if not response:
+                break
+            entries = response[0][1]
+            for entry_id, fields in entries:
+                self._ingest(fields)
+                self._last_id = entry_id
+            if len(entries) < self.batch_size:
+                break
+
+        return {c: self._latest[c] for c in campaign_ids if c in self._latest}
+
+    def _ingest(self, fields: Dict):
+        fields = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in fields.items()
+        }
+        try:
+            campaign_id = int(fields['campaign_id'])
+        except (KeyError, ValueError):
+            logger.warning(f"Skipping malformed stream entry: {fields}")
+            return
+        self._latest[campaign_id] = {k: float(fields.get(k, 0) or 0) for k in METRIC_KEYS}
+
+    async def close(self):
+        await self.redis.close()
+
+
+class TraceReplaySource(MetricsSource):
+    """
+    Deterministic replay of a recorded metrics trace at N× speed
+
+    The trace is a JSON-lines file, one record per line:
+    ``{"t": <seconds from start>, "campaign_id": 1, "metrics": {...}}``
+
+    Each fetch returns the records due at the current trace time (the first
+    one those at t=0), then advances it by ``speed * tick_interval`` seconds,
+    so a replay produces the same updates regardless of wall-clock jitter. With
+    ``loop=True`` the trace restarts once exhausted.
+
+    The file is streamed: records must be in time order (record_trace
+    writes them as given), and only the next not-yet-due record plus the
+    latest metrics per campaign are held in memory.
+    """
+
+    def __init__(self, path: str, speed: float = 1.0, tick_interval: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.tick_interval = tick_interval
+        self.loop = loop
+        self._file = None
+        self._pending: Optional[Tuple[float, int, Dict]] = None
+        self._read_any = False   # the current pass has yielded a record
+        self._last_t = 0.0       # time of the last record read in this pass
+        self._eof = False
+        self._clock = 0.0
+        self._latest: Dict[int, Dict] = {}
+
+    def _next_record(self) -> Optional[Tuple[float, int, Dict]]:
+        if self._pending is not None:
+            record, self._pending = self._pending, None
+            return record
+        if self._eof:
+            return None
+        if self._file is None:
+            self._file = open(self.path)
+        for line in self._file:
+            if line.strip():
+                data = json.loads(line)
+                self._read_any = True
+                self._last_t = float(data['t'])
+                return self._last_t, int(data['campaign_id']), data['metrics']
+        self._eof = True
+        return None
+
+    def _rewind(self):
+        self._file.seek(0)
+        self._eof = self._read_any = False
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.loop and self._eof and self._pending is None
+
+    async def fetch(self, campaign_ids: List[int]) -> Dict[int, Dict]:
+        while True:
+            record = self._next_record()
+            while record is not None and record[0] <= self._clock:
+                _, campaign_id, metrics = record
+                self._latest[campaign_id] = metrics
+                record = self._next_record()
+            if record is not None:
+                self._pending = record
+            elif self.loop and self._read_any:
+                self._clock -= self._last_t + 1.0
+                self._rewind()
+                continue
+            break
+
+        self._clock += self.speed * self.tick_interval
+        return {c: self._latest[c] for c in campaign_ids if c in self._latest}
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def record_trace(path: str, records: Iterable[Dict]):
+    """
+    Write a trace file for TraceReplaySource
+
+    Args:
+        path: Output file path
+        records: Dicts with 't', 'campaign_id' and 'metrics' keys
+    """
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps({
+                't': record['t'],
+                'campaign_id': record['campaign_id'],
+                'metrics': record['metrics']
+            }) + '\n')
+
+
+def create_metrics_source(config) -> MetricsSource:
+    """
+    Build the metrics source selected by REALTIME_METRICS_SOURCE
+
+    One of: simulated (default), history, redis, replay.
+    """
+    kind = getattr(config, 'REALTIME_METRICS_SOURCE', 'simulated')
+
+    if kind == 'history':
+        return MetricsHistorySource()
+    if kind == 'redis':
+        import redis.asyncio as aioredis
+        return RedisStreamSource(
+            aioredis.from_url(config.REDIS_URL),
+            stream=getattr(config, 'REALTIME_METRICS_STREAM', 'metrics:stream')
+        )
+    if kind == 'replay':
+        return TraceReplaySource(
+            config.REALTIME_TRACE_PATH,
+            speed=getattr(config, 'REALTIME_REPLAY_SPEED', 1.0),
+            loop=True
+        )
+    if kind != 'simulated':
+        logger.warning(f"Unknown metrics source '{kind}', using simulated metrics")
+    return SimulatedMetricsSource()
@@ -0,0 +1,174 @@
+"""
+ADFLOWAI - In-Memory Metrics Store
+Per-campaign NumPy ring buffers holding the live window of per-second metrics
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.metrics_sources import METRIC_KEYS
+
+
+class CampaignSeries:
+    """
+    Fixed-size ring buffer of one campaign's metrics
+
+    Preallocated once: a float64 timestamp column plus a float32
+    (capacity x n_metrics) value block. Appends overwrite the oldest sample.
+    """
+    __slots__ = ('timestamps', 'values', 'capacity', 'head', 'size')
+
+    def __init__(self, capacity: int, n_metrics: int):
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, n_metrics), dtype=np.float32)
+        self.capacity = capacity
+        self.head = 0   # next write position
+        self.size = 0
+
+    def append(self, timestamp: float, row: np.ndarray):
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = row
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The newest n samples in chronological order (copies)"""
+        n = min(n, self.size)
+        idx = (self.head - n + np.arange(n)) % self.capacity
+        return self.timestamps[idx], self.values[idx]
+
+    def since(self, cutoff: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Samples with timestamp >= cutoff in chronological order"""
+        # Timestamps are ascending within [head:size) and [0:head); binary-search
+        # both halves so only the requested tail is copied
+        if self.size < self.capacity:
+            n = self.size - np.searchsorted(self.timestamps[:self.size], cutoff, side='left')
+        else:
+            older = self.timestamps[self.head:]
+            newer = self.timestamps[:self.head]
+            n = len(newer) - np.searchsorted(newer, cutoff, side='left')
+            if n == len(newer):
+                n += len(older) - np.searchsorted(older, cutoff, side='left')
+        return self.last(int(n))
+
+
+class MetricsStore:
+    """
+    Compact time-series store for the monitor's live window (default: one hour
+    of per-second samples per campaign, ~110 KB each).
+
+    Written by the monitor loop only; readers (sparklines, the anomaly
+    detector, HTTP handlers) get copies and never touch Redis or the database.
+    """
+
+    def __init__(self, capacity: int = 3600, metrics: Iterable[str] = METRIC_KEYS):
+        self.capacity = capacity
+        self.metrics = tuple(metrics)
+        self._column = {name: i for i, name in enumerate(self.metrics)}
+        self._series: Dict[int, CampaignSeries] = {}
+
+    def append(self, campaign_id: int, metrics: Dict, timestamp: Optional[float] = None):
+        """Record one sample for a campaign"""
+        series = self._series.get(campaign_id)
+        if series is None:
+            series = self._series[campaign_id] = CampaignSeries(self.capacity, len(self.metrics))
+        row = np.fromiter((metrics.get(name, 0.0) or 0.0 for name in self.metrics),
+                          dtype=np.float32, count=len(self.metrics))
+        series.append(time.time() if timestamp is None else timestamp, row)
+
+    def drop(self, campaign_id: int):
+        """Forget a campaign's history"""
+        self._series.pop(campaign_id, None)
+
+    def campaigns(self) -> List[int]:
+        return list(self._series)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def count(self, campaign_id: int) -> int:
+        series = self._series.get(campaign_id)
+        return series.size if series else 0
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+
+    def last(self, campaign_id: int, metric: str, n: int) -> np.ndarray:
+        """Last n values of a metric (oldest first)"""
+        series = self._series.get(campaign_id)
+        if series is None:
+            return np.empty(0, dtype=np.float32)
+        _, values = series.last(n)
+        return values[:, self._column[metric]]
+
+    def window(
+        self,
+        campaign_id: int,
+        metric: str,
+        seconds: float,
+        now: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, values) of a metric over the trailing window"""
+        series = self._series.get(campaign_id)
+        if series is None:
+            return np.empty(0), np.empty(0, dtype=np.float32)
+        now = time.time() if now is None else now
+        timestamps, values = series.since(now - seconds)
+        return timestamps, values[:, self._column[metric]]
+
+    def aggregate(
+        self,
+        campaign_id: int,
+        metric: str,
+        seconds: float,
+        now: Optional[float] = None
+    ) -> Dict:
+        """count / mean / min / max / std / last of a metric over the trailing window"""
+        _, values = self.window(campaign_id, metric, seconds, now)
+        if values.size == 0:
+            return {'count': 0, 'mean': None, 'min': None, 'max': None, 'std': None, 'last': None}
+        values = values.astype(np.float64)
+        return {
+            'count': int(values.size),
+            'mean': float(values.mean()),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'std': float(values.std()),
+            'last': float(values[-1]),
+        }
+
+    def means(self, campaign_id: int, seconds: float, now: Optional[float] = None) -> Dict[str, float]:
+        """Mean of every metric over the trailing window (empty if no samples)"""
+        series = self._series.get(campaign_id)
+        if series is None:
+            return {}
+        now = time.time() if now is None else now
+        _, values = series.since(now - seconds)
+        if not len(values):
+            return {}
+        return dict(zip(self.metrics, values.mean(axis=0, dtype=np.float64).tolist()))
+
+    def sparkline(
+        self,
+        campaign_id: int,
+        metric: str,
+        seconds: float = 3600,
+        points: int = 60,
+        now: Optional[float] = None
+    ) -> List[Optional[float]]:
+        """
+        Bucketed means for a sparkline: ``points`` equal-width buckets over the
+        window, None for buckets without samples
+        """
+        now = time.time() if now is None else now
+        timestamps, values = self.window(campaign_id, metric, seconds, now)
+        if values.size == 0:
+            return [None] * points
+
+        start = now - seconds
+        buckets = np.minimum(((timestamps - start) / seconds * points).astype(np.int64), points - 1)
+        sums = np.bincount(buckets, weights=values.astype(np.float64), minlength=points)
+        counts = np.bincount(buckets, minlength=points)
+        means = np.divide(sums, counts, out=np.zeros(points), where=counts > 0)
+        return [round(float(m), 6) if c else None for m, c in zip(means, counts)]
@@ -0,0 +1,107 @@
+"""
+ADFLOWAI - Observability
+Prometheus metrics for the API, Celery tasks and real-time monitor, and the /metrics endpoint
+
+Under gunicorn (or any multi-process server) set PROMETHEUS_MULTIPROC_DIR
+before the app is imported - gunicorn.conf.py does - so every worker writes
+its samples to that directory and /metrics aggregates all of them.
+Database metrics live in db_instrumentation, optimizer metrics in
+src.ml.optimizer; all share the default registry.
+"""
+
+import logging
+import os
+import time
+from typing import Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_KEY = 'adflowai.request_started'
+
+# Flask is imported inside the request hooks: Celery beat and workers import
+# the task metrics below without needing the web stack
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+# ── API ─────────────────────────────────────────────────────────────────────
+
+HTTP_REQUEST_DURATION = Histogram(
+    'adflowai_http_request_duration_seconds', 'API request latency',
+    ['blueprint', 'endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+
+# ── Celery ──────────────────────────────────────────────────────────────────
+
+TASK_DURATION = Histogram(
+    'adflowai_task_duration_seconds', 'Celery task run time',
+    ['task', 'state'], buckets=(.1, .5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+)
+TASK_QUEUE_LAG = Histogram(
+    'adflowai_task_queue_lag_seconds', 'Time between publishing a Celery task and a worker starting it',
+    ['task'], buckets=(.01, .05, .1, .5, 1, 5, 10, 30, 60, 300, 900)
+)
+
+# ── Real-time monitor / gateway ─────────────────────────────────────────────
+
+MONITOR_TICK_DURATION = Histogram(
+    'adflowai_monitor_tick_seconds', 'RealTimeMonitor tick duration',
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5)
+)
+REALTIME_CLIENTS = Gauge(
+    'adflowai_realtime_clients', 'Connected real-time WebSocket clients', multiprocess_mode='livesum'
+)
+REALTIME_SEND_QUEUE_DEPTH = Gauge(
+    'adflowai_realtime_send_queue_depth', 'Messages waiting in client send queues', multiprocess_mode='livesum'
+)
+REALTIME_DROPPED_MESSAGES = Counter(
+    'adflowai_realtime_dropped_messages', 'Messages dropped from full client send queues'
+)
+
+
+def metrics_registry():
+    """The registry to expose: all workers' samples in multiprocess mode, else this process"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition body and content type for a /metrics endpoint"""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def _start_timer():
+    from flask import request
+    request.environ[_REQUEST_KEY] = time.perf_counter()
+
+
+def _observe_request(response):
+    from flask import request
+    started = request.environ.get(_REQUEST_KEY)
+    if started is not None and request.endpoint != 'metrics':
+        HTTP_REQUEST_DURATION.labels(
+            request.blueprint or 'app', request.endpoint or 'unmatched', request.method, str(response.status_code)
+        ).observe(time.perf_counter() - started)
+    return response
+
+
+def metrics_view():
+    from flask import Response
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+def init_metrics(app):
+    """Time every request and serve /metrics (when METRICS_ENABLED)"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
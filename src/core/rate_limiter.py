@@ -0,0 +1,188 @@
+"""
+ADFLOWAI - Rate Limiter
+Per-user / per-API-key token buckets enforcing API_RATE_LIMIT, in Redis or in-process
+"""
+
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+logger = logging.getLogger(__name__)
+
+# Endpoints with their own, smaller budget (endpoint -> bucket name)
+EXPENSIVE_ENDPOINTS = {
+    'api_v1.optimize_campaign': 'optimize',
+    'api_v1.update_campaign_metrics': 'metrics',
+    'reports.download_campaign_report': 'reports',
+}
+EXEMPT_ENDPOINTS = {'api_v1.health_check', 'health_check', 'index'}
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the next request would be allowed; 0 when allowed
+
+
+class MemoryRateLimiter:
+    """
+    In-process token buckets, stored as GCRA theoretical arrival times
+
+    A bucket of ``limit`` tokens refilling over ``period`` seconds is one
+    float per key: the time the bucket will be full again. There is no
+    lock; a concurrent read-modify-write on the same key can admit at most
+    one extra request per racing thread, which is fine for a per-process
+    fallback. Buckets that have refilled completely are pruned.
+    """
+
+    def __init__(self, prune_every: int = 10000):
+        self._tat: Dict[str, float] = {}
+        self.prune_every = prune_every
+        self._calls = 0
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        interval = period / limit
+        burst = (limit - 1) * interval
+        now = time.monotonic()
+        tat = max(self._tat.get(key, now), now)
+        if tat - now > burst:
+            return RateLimitResult(False, limit, 0, tat - now - burst)
+
+        self._tat[key] = tat + interval
+        self._calls += 1
+        if self._calls % self.prune_every == 0:
+            self._prune(now)
+        return RateLimitResult(True, limit, int((burst - (tat - now)) / interval), 0.0)
+
+    def _prune(self, now: float):
+        for key, tat in self._tat.copy().items():
+            if tat <= now:
+                self._tat.pop(key, None)
+
+
+# Same algorithm as MemoryRateLimiter, atomic on the server and timed by the
+# server clock so every worker sees one bucket.
+#   KEYS[1] bucket key; ARGV[1] seconds per token; ARGV[2] bucket size
+#   returns {allowed, retry_after (string), remaining}
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local burst = (limit - 1) * interval
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then tat = now end
+if tat - now > burst then
+    return {0, tostring(tat - now - burst), 0}
+end
+redis.call('SET', KEYS[1], tostring(tat + interval), 'PX', math.ceil((tat + interval - now) * 1000))
+return {1, '0', math.floor((burst - (tat - now)) / interval)}
+"""
+
+
+class RedisRateLimiter:
+    """
+    Token buckets shared by every worker, via one Lua script call per request
+
+    If Redis is unreachable the request is counted by an in-process
+    fallback instead, so an outage degrades to per-worker limits rather
+    than failing requests.
+    """
+
+    def __init__(self, redis_client, prefix: str = 'ratelimit'):
+        self.redis = redis_client
+        self.prefix = prefix
+        self._script = redis_client.register_script(GCRA_SCRIPT)
+        self._fallback = MemoryRateLimiter()
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        try:
+            allowed, retry_after, remaining = self._script(
+                keys=[f"{self.prefix}:{key}"], args=[period / limit, limit]
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, limiting in-process: {e}")
+            return self._fallback.hit(key, limit, period)
+        return RateLimitResult(bool(allowed), limit, int(remaining), float(retry_after))
+
+
+def create_rate_limiter(config):
+    """
+    Build the limiter selected by ``config['RATE_LIMIT_BACKEND']``
+
+    One of: memory (default, per process), redis (shared by all workers).
+    """
+    if config['RATE_LIMIT_BACKEND'] == 'redis':
+        import redis
+        timeout = config['REDIS_SOCKET_TIMEOUT']
+        client = redis.Redis.from_url(config['REDIS_URL'], socket_timeout=timeout, socket_connect_timeout=timeout)
+        return RedisRateLimiter(client, prefix=config['RATE_LIMIT_REDIS_PREFIX'])
+    return MemoryRateLimiter()
+
+
+def _client_key() -> str:
+    """Verified API key, then JWT user, then remote address"""
+    from src.auth.api_keys import API_KEY_HEADER, authenticate_request_key
+
+    raw_key = request.headers.get(API_KEY_HEADER)
+    if raw_key:
+        # Unknown or invalid keys count against the address, so made-up keys
+        # can't each open a fresh bucket
+        record = authenticate_request_key(raw_key)
+        return f"key:{record.id}" if record is not None else f"ip:{request.remote_addr}"
+    try:
+        if verify_jwt_in_request(optional=True):
+            return f"user:{get_jwt_identity()}"
+    except Exception:
+        pass  # invalid/expired token: the view answers 401, count it against the address
+    return f"ip:{request.remote_addr}"
+
+
+def _budget(endpoint: Optional[str]) -> Tuple[str, int]:
+    bucket = EXPENSIVE_ENDPOINTS.get(endpoint)
+    if bucket:
+        return bucket, current_app.config['API_RATE_LIMIT_EXPENSIVE']
+    return 'api', current_app.config['API_RATE_LIMIT']
+
+
+def _check_rate_limit():
+    config = current_app.config
+    if not config['RATE_LIMIT_ENABLED'] or request.method == 'OPTIONS' \
+            or request.endpoint in EXEMPT_ENDPOINTS or not request.path.startswith('/api/'):
+        return None
+
+    bucket, limit = _budget(request.endpoint)
+    result = current_app.extensions['rate_limiter'].hit(
+        f"{bucket}:{_client_key()}", limit, config['RATE_LIMIT_PERIOD']
+    )
+    request.environ['adflowai.rate_limit'] = result
+    if result.allowed:
+        return None
+
+    response = jsonify({'error': 'Rate limit exceeded', 'retry_after': math.ceil(result.retry_after)})
+    response.status_code = 429
+    return response
+
+
+def _add_rate_limit_headers(response):
+    result = request.environ.get('adflowai.rate_limit')
+    if result is not None:
+        response.headers['X-RateLimit-Limit'] = str(result.limit)
+        response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+        if not result.allowed:
+            response.headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+    return response
+
+
+def init_rate_limiter(app):
+    """Install the limiter; RATE_LIMIT_ENABLED is read per request"""
+    app.extensions['rate_limiter'] = create_rate_limiter(app.config)
+    app.before_request(_check_rate_limit)
+    app.after_request(_add_rate_limit_headers)
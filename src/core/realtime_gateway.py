@@ -0,0 +1,410 @@
+"""
+ADFLOWAI - Real-Time Gateway
+Standalone asyncio process that hosts RealTimeMonitor and serves WebSocket clients
+
+Long-lived connections don't belong in the gunicorn sync workers, so live
+updates are served from this separate process:
+
+    python -m src.core.realtime_gateway --port 8765
+
+Clients connect to ``/ws?token=<access JWT>&campaigns=1,2`` (or send an
+``Authorization: Bearer`` header) and may later send
+``{"action": "subscribe" | "unsubscribe", "campaigns": [...]}``.
+
+Horizontal scaling: campaigns are sharded across gateway instances by
+``campaign_id % shard_count``. The owning shard runs the monitor for a
+campaign and publishes its updates on Redis pub/sub; every gateway relays
+them to its own subscribers. Gateways announce which campaigns their clients
+watch on a control channel, and owners stop monitoring campaigns whose
+watch lease is not renewed.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import jwt
+from aiohttp import web, WSMsgType
+
+from config.settings import Config
+from src.core.metrics_sources import create_metrics_source
+from src.core.observability import (
+    REALTIME_CLIENTS, REALTIME_DROPPED_MESSAGES, REALTIME_SEND_QUEUE_DEPTH, render_metrics
+)
+from src.core.realtime_monitor import RealTimeMonitor
+
+logger = logging.getLogger(__name__)
+
+CONTROL_CHANNEL = 'realtime:control'
+
+
+def update_channel(campaign_id: int) -> str:
+    """Redis pub/sub channel carrying a campaign's updates"""
+    return f"realtime:updates:{campaign_id}"
+
+
+def shard_for(campaign_id: int, shard_count: int) -> int:
+    """Index of the gateway shard that monitors a campaign"""
+    return campaign_id % max(1, shard_count)
+
+
+def authenticate_token(token: str, secret: str, algorithm: str = 'HS256'):
+    """
+    Validate an access token issued by the Flask app
+
+    Returns:
+        The token identity (user ID)
+
+    Raises:
+        jwt.InvalidTokenError: If the token is missing, invalid or not an access token
+    """
+    if not token:
+        raise jwt.InvalidTokenError("Missing token")
+    claims = jwt.decode(token, secret, algorithms=[algorithm])
+    if claims.get('type') != 'access':
+        raise jwt.InvalidTokenError("Not an access token")
+    return claims['sub']
+
+
+def db_ownership_checker(user_id, campaign_ids: List[int]) -> Set[int]:
+    """Return the subset of campaign_ids owned by user_id (blocking, run in an executor)"""
+    from src.core.database import db
+    from src.models.campaign import Campaign
+
+    session = db.Session()
+    try:
+        rows = session.query(Campaign.id)\
+            .filter(Campaign.id.in_(campaign_ids), Campaign.user_id == user_id)\
+            .all()
+        return {row.id for row in rows}
+    finally:
+        db.Session.remove()
+
+
+class ClientConnection:
+    """A connected WebSocket client with a bounded send queue"""
+    __slots__ = ('ws', 'user_id', 'campaigns', 'queue', 'dropped')
+
+    def __init__(self, ws, user_id, queue_size: int):
+        self.ws = ws
+        self.user_id = user_id
+        self.campaigns: Set[int] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def enqueue(self, message: str):
+        """Queue a message; a slow client loses its oldest messages, never blocks others"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            REALTIME_DROPPED_MESSAGES.inc()
+        self.queue.put_nowait(message)
+
+
+class RealtimeGateway:
+    """
+    Hosts a RealTimeMonitor for this shard's campaigns and fans updates out to clients
+    """
+
+    def __init__(
+        self,
+        config=Config,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        redis_client=None,
+        redis_url: Optional[str] = None,
+        metrics_source=None,
+        ownership_checker: Optional[Callable] = None,
+    ):
+        self.config = config
+        self.redis_url = redis_url
+        self.shard_index = shard_index
+        self.shard_count = max(1, shard_count)
+        self.redis = redis_client
+        self.ownership_checker = ownership_checker or db_ownership_checker
+        self.queue_size = getattr(config, 'REALTIME_CLIENT_QUEUE_SIZE', 256)
+        self.watch_lease = getattr(config, 'REALTIME_WATCH_LEASE', 90)
+
+        self.monitor = RealTimeMonitor(
+            redis_client=redis_client,
+            metrics_source=metrics_source or create_metrics_source(config)
+        )
+        self.monitor.listeners.append(self._on_monitor_event)
+
+        self.clients: Set[ClientConnection] = set()
+        self.subscribers: Dict[int, Set[ClientConnection]] = {}
+        self._leases: Dict[int, float] = {}
+        self._pubsub = None
+        self._tasks: List[asyncio.Task] = []
+
+    def owns(self, campaign_id: int) -> bool:
+        return shard_for(campaign_id, self.shard_count) == self.shard_index
+
+    # ── Monitor → clients ───────────────────────────────────────────────────
+
+    async def _on_monitor_event(self, kind: str, campaign_id: int, payload: Dict):
+        message = json.dumps({'type': kind, **payload})
+        if self.redis:
+            await self.redis.publish(update_channel(campaign_id), message)
+        else:
+            self._fan_out(campaign_id, message)
+
+    def _fan_out(self, campaign_id: int, message: str):
+        for client in self.subscribers.get(campaign_id, ()):
+            client.enqueue(message)
+
+    # ── Subscriptions and watch leases ──────────────────────────────────────
+
+    async def subscribe(self, client: ClientConnection, campaign_ids: Iterable[int]):
+        campaign_ids = list(campaign_ids)
+        new_channels = []
+        for campaign_id in campaign_ids:
+            if campaign_id not in self.subscribers:
+                self.subscribers[campaign_id] = set()
+                new_channels.append(update_channel(campaign_id))
+            self.subscribers[campaign_id].add(client)
+            client.campaigns.add(campaign_id)
+
+        if self._pubsub and new_channels:
+            await self._pubsub.subscribe(*new_channels)
+        await self._watch(campaign_ids)
+
+    async def unsubscribe(self, client: ClientConnection, campaign_ids: Iterable[int]):
+        stale_channels = []
+        for campaign_id in list(campaign_ids):
+            client.campaigns.discard(campaign_id)
+            subscribers = self.subscribers.get(campaign_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(client)
+            if not subscribers:
+                del self.subscribers[campaign_id]
+                stale_channels.append(update_channel(campaign_id))
+
+        if self._pubsub and stale_channels:
+            await self._pubsub.unsubscribe(*stale_channels)
+
+    async def _watch(self, campaign_ids: List[int]):
+        """Tell the owning shards these campaigns have viewers"""
+        if not campaign_ids:
+            return
+        if self.redis:
+            await self.redis.publish(CONTROL_CHANNEL, json.dumps({'watch': campaign_ids}))
+        else:
+            await self._renew_leases(campaign_ids)
+
+    async def _renew_leases(self, campaign_ids: Iterable[int]):
+        expiry = asyncio.get_running_loop().time() + self.watch_lease
+        for campaign_id in campaign_ids:
+            if not self.owns(campaign_id):
+                continue
+            self._leases[campaign_id] = expiry
+            if campaign_id not in self.monitor.active_campaigns:
+                await self.monitor.start_monitoring(campaign_id)
+
+    async def _lease_loop(self):
+        """Re-announce local watches and stop monitoring campaigns nobody watches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.watch_lease / 3)
+            try:
+                await self._watch(list(self.subscribers))
+                now = loop.time()
+                for campaign_id, expiry in list(self._leases.items()):
+                    if expiry < now:
+                        del self._leases[campaign_id]
+                        await self.monitor.stop_monitoring(campaign_id)
+            except Exception as e:
+                logger.error(f"Lease maintenance failed: {str(e)}")
+
+    async def _pubsub_loop(self):
+        async for message in self._pubsub.listen():
+            if message['type'] != 'message':
+                continue
+            channel = message['channel']
+            channel = channel.decode() if isinstance(channel, bytes) else channel
+            data = message['data']
+            data = data.decode() if isinstance(data, bytes) else data
+            try:
+                if channel == CONTROL_CHANNEL:
+                    await self._renew_leases(json.loads(data).get('watch', []))
+                else:
+                    self._fan_out(int(channel.rsplit(':', 1)[1]), data)
+            except Exception as e:
+                logger.error(f"Bad pub/sub message on {channel}: {str(e)}")
+
+    # ── HTTP / WebSocket handlers ───────────────────────────────────────────
+
+    async def handle_ws(self, request: web.Request):
+        token = request.query.get('token', '')
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            token = auth_header[7:]
+        try:
+            user_id = authenticate_token(
+                token,
+                self.config.JWT_SECRET_KEY,
+                getattr(self.config, 'JWT_ALGORITHM', 'HS256')
+            )
+        except jwt.InvalidTokenError as e:
+            return web.json_response({'error': f'Unauthorized: {str(e)}'}, status=401)
+
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        client = ClientConnection(ws, user_id, self.queue_size)
+        self.clients.add(client)
+        REALTIME_CLIENTS.inc()
+        writer = asyncio.create_task(self._writer(client))
+
+        try:
+            initial = _parse_ids(request.query.get('campaigns', ''))
+            if initial:
+                await self._handle_subscribe(client, initial)
+
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    command = json.loads(msg.data)
+                    campaign_ids = [int(c) for c in command.get('campaigns', [])]
+                except (ValueError, TypeError, AttributeError):
+                    client.enqueue(json.dumps({'type': 'error', 'error': 'Malformed message'}))
+                    continue
+                if command.get('action') == 'subscribe':
+                    await self._handle_subscribe(client, campaign_ids)
+                elif command.get('action') == 'unsubscribe':
+                    await self.unsubscribe(client, campaign_ids)
+                else:
+                    client.enqueue(json.dumps({'type': 'error', 'error': 'Unknown action'}))
+        finally:
+            await self.unsubscribe(client, list(client.campaigns))
+            self.clients.discard(client)
+            REALTIME_CLIENTS.dec()
+            writer.cancel()
+
+        return ws
+
+    async def _handle_subscribe(self, client: ClientConnection, campaign_ids: List[int]):
+        loop = asyncio.get_running_loop()
+        allowed = await loop.run_in_executor(None, self.ownership_checker, client.user_id, campaign_ids)
+        denied = sorted(set(campaign_ids) - set(allowed))
+        if denied:
+            client.enqueue(json.dumps({'type': 'error', 'error': 'Unauthorized', 'campaign_ids': denied}))
+        if allowed:
+            await self.subscribe(client, sorted(allowed))
+            client.enqueue(json.dumps({'type': 'subscribed', 'campaign_ids': sorted(client.campaigns)}))
+
+    async def _writer(self, client: ClientConnection):
+        try:
+            while True:
+                message = await client.queue.get()
+                await client.ws.send_str(message)
+        except (asyncio.CancelledError, ConnectionResetError):
+            pass
+
+    async def handle_health(self, request: web.Request):
+        return web.json_response({
+            'status': 'healthy',
+            'service': 'ADFLOWAI Real-Time Gateway',
+            'shard': {'index': self.shard_index, 'count': self.shard_count},
+            'clients': len(self.clients),
+            'watched_campaigns': len(self.subscribers),
+            'monitored_campaigns': len(self.monitor.active_campaigns),
+        })
+
+    async def handle_metrics(self, request: web.Request):
+        # Queue depth is sampled at scrape time rather than on every message
+        REALTIME_SEND_QUEUE_DEPTH.set(sum(client.queue.qsize() for client in self.clients))
+        body, content_type = render_metrics()
+        return web.Response(body=body, headers={'Content-Type': content_type})
+
+    # ── Application lifecycle ───────────────────────────────────────────────
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/ws', self.handle_ws)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        if self.redis is None and self.redis_url:
+            self.redis = await _connect_redis(self.redis_url, required=self.shard_count > 1)
+            self.monitor.redis = self.redis
+        if self.redis:
+            self._pubsub = self.redis.pubsub()
+            await self._pubsub.subscribe(CONTROL_CHANNEL)
+            self._tasks.append(asyncio.create_task(self._pubsub_loop()))
+        self._tasks.append(asyncio.create_task(self._lease_loop()))
+        logger.info(f"Real-time gateway shard {self.shard_index + 1}/{self.shard_count} started")
+
+    async def _on_cleanup(self, app):
+        for task in self._tasks:
+            task.cancel()
+        for campaign_id in list(self.monitor.active_campaigns):
+            await self.monitor.stop_monitoring(campaign_id)
+        await self.monitor.metrics_source.close()
+        if self._pubsub:
+            await self._pubsub.close()
+        if self.redis:
+            await self.redis.close()
+
+
+def _parse_ids(raw: str) -> List[int]:
+    try:
+        return sorted({int(c) for c in raw.split(',') if c.strip()})
+    except ValueError:
+        return []
+
+
+async def _connect_redis(url: str, required: bool):
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(url)
+    try:
+        await client.ping()
+        return client
+    except Exception as e:
+        await client.close()
+        if required:
+            raise RuntimeError(f"Redis is required for sharded gateways: {str(e)}")
+        logger.warning(f"Redis unavailable ({str(e)}); running as a single unsharded gateway")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADFLOWAI real-time WebSocket gateway")
+    parser.add_argument('--host', default=os.getenv('REALTIME_GATEWAY_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=Config.REALTIME_GATEWAY_PORT)
+    parser.add_argument('--shard-index', type=int, default=Config.REALTIME_SHARD_INDEX)
+    parser.add_argument('--shard-count', type=int, default=Config.REALTIME_SHARD_COUNT)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, os.getenv('LOG_LEVEL', 'INFO')),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    # Reuse the app's database layer for ownership checks and history-backed metrics
+    from flask import Flask
+    from src.core.database import db
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(Config)
+    db.init_app(flask_app)
+
+    gateway = RealtimeGateway(
+        Config,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+        redis_url=Config.REDIS_URL,
+    )
+    web.run_app(gateway.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
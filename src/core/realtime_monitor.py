@@ -5,11 +5,20 @@ Real-time streaming analytics with WebSocket support
 
 import asyncio
 import json
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Set
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Set
+from dataclasses import dataclass, fields
 import logging
 
+from config.settings import Config
+from src.core.alert_manager import AlertManager, AlertEvent
+from src.core.metrics_store import MetricsStore
+from src.core.realtime_stream import UpdateStream
+from src.core.metrics_sources import MetricsSource, SimulatedMetricsSource, create_metrics_source
+from src.core.observability import MONITOR_TICK_DURATION
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,6 +36,10 @@ class RealTimeMetrics:
     prediction_next_hour: Dict
     alerts: List[Dict]
     recommendations: List[str]
+    
+    def to_dict(self) -> Dict:
+        """Shallow dict for serialisation (asdict deep-copies every nested value)"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
 
 
 class RealTimeMonitor:
@@ -35,22 +48,48 @@ class RealTimeMonitor:
     
     Features:
     - WebSocket streaming
-    - Live performance tracking
+    - Sequence-numbered update stream for SSE / long-poll clients
+    - Live performance tracking (in-memory ring buffer of the last hour)
     - Anomaly detection in real-time
-    - Predictive alerts
+    - Deduplicated alert stream (open / ongoing / resolved)
     - Auto-scaling recommendations
     """
     
-    def __init__(self, redis_client=None):
+    def __init__(
+        self,
+        redis_client=None,
+        metrics_source: MetricsSource = None,
+        tick_interval: float = 1.0,
+        window_size: int = 3600,
+        idle_ttl: float = 120.0
+    ):
         self.redis = redis_client
+        self.metrics_source = metrics_source or SimulatedMetricsSource()
+        self.tick_interval = tick_interval
         self.active_campaigns: Set[int] = set()
+        # Campaigns started through ensure_monitoring -> monotonic time a
+        # request last asked for them; stopped after idle_ttl without one
+        self.idle_ttl = idle_ttl
+        self._requested_at: Dict[int, float] = {}
         self.websocket_clients: Set = set()
+        # Async callbacks (kind, campaign_id, payload) for every update / alert
+        self.listeners: List[Callable] = []
         self.alert_thresholds = {
             'ctr_drop': 0.20,  # 20% drop triggers alert
             'cpc_spike': 0.30,  # 30% increase triggers alert
             'spend_rate_high': 0.90,  # 90% of budget spent
             'performance_drop': 0.40  # Performance score drops below 0.4
         }
+        # Relative (ctr_drop / cpc_spike) alerts compare against this trailing window
+        self.baseline_window = 300
+        self.baseline_min_samples = 30
+        self.store = MetricsStore(capacity=window_size)
+        # Transitions are persisted from the loop via an executor, not inline
+        self.alert_manager = AlertManager()
+        self.updates = UpdateStream()
+        self._loop_task = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
         
         logger.info("Real-time monitor initialized")
     
@@ -64,78 +103,137 @@ class RealTimeMonitor:
         self.active_campaigns.add(campaign_id)
         logger.info(f"Started real-time monitoring for campaign {campaign_id}")
         
-        # Start monitoring loop
-        asyncio.create_task(self._monitor_loop(campaign_id))
+        # One loop serves every active campaign
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._monitor_loop())
+    
+    def ensure_monitoring(self, campaign_ids: List[int]):
+        """
+        Make sure the given campaigns are being monitored (thread-safe)
+
+        Used from sync code such as Flask request handlers: the monitor loop is
+        hosted on a background event loop thread that is started on first use.
+        Each call renews the campaigns' lease; a campaign no request has asked
+        for in ``idle_ttl`` seconds is stopped by the loop.
+        """
+        now = time.monotonic()
+        for campaign_id in campaign_ids:
+            self._requested_at[campaign_id] = now
+
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name='realtime-monitor',
+                    daemon=True
+                ).start()
+        
+        for campaign_id in campaign_ids:
+            if campaign_id not in self.active_campaigns:
+                asyncio.run_coroutine_threadsafe(
+                    self.start_monitoring(campaign_id), self._loop
+                )
     
     async def stop_monitoring(self, campaign_id: int):
         """Stop monitoring a campaign"""
         self.active_campaigns.discard(campaign_id)
+        self.store.drop(campaign_id)
+        events = self.alert_manager.clear(campaign_id)
+        await self._publish_alert_events(events)
         logger.info(f"Stopped monitoring campaign {campaign_id}")
     
-    async def _monitor_loop(self, campaign_id: int):
+    def forget(self, campaign_id: int):
+        """Stop monitoring a campaign from sync code, e.g. once it is deleted (thread-safe)"""
+        self._requested_at.pop(campaign_id, None)
+        if campaign_id not in self.active_campaigns:
+            return
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop_monitoring(campaign_id), self._loop)
+        else:
+            self.active_campaigns.discard(campaign_id)
+            self.store.drop(campaign_id)
+    
+    async def _stop_idle(self):
+        """Stop campaigns whose lease from ensure_monitoring has run out"""
+        cutoff = time.monotonic() - self.idle_ttl
+        for campaign_id, requested_at in list(self._requested_at.items()):
+            if requested_at < cutoff:
+                self._requested_at.pop(campaign_id, None)
+                await self.stop_monitoring(campaign_id)
+    
+    async def _monitor_loop(self):
         """
-        Main monitoring loop - runs continuously
+        Main monitoring loop - runs while any campaign is monitored
         
-        Collects metrics every second and streams to clients
+        Pulls one batch of metrics per tick and streams updates to clients
         """
-        while campaign_id in self.active_campaigns:
+        loop = asyncio.get_running_loop()
+        while self.active_campaigns:
+            started = loop.time()
             try:
-                # Collect real-time metrics
-                metrics = await self._collect_metrics(campaign_id)
-                
-                # Check for anomalies
-                alerts = await self._detect_anomalies(campaign_id, metrics)
-                
-                # Generate predictions
-                predictions = await self._generate_predictions(campaign_id, metrics)
-                
-                # Create real-time update
-                update = RealTimeMetrics(
-                    campaign_id=campaign_id,
-                    timestamp=datetime.utcnow().isoformat(),
-                    impressions_per_second=metrics.get('impressions_rate', 0),
-                    clicks_per_second=metrics.get('clicks_rate', 0),
-                    spend_rate=metrics.get('spend_rate', 0),
-                    current_ctr=metrics.get('ctr', 0),
-                    current_cpc=metrics.get('cpc', 0),
-                    performance_score=metrics.get('performance_score', 0.5),
-                    prediction_next_hour=predictions,
-                    alerts=alerts,
-                    recommendations=await self._generate_recommendations(metrics, alerts)
-                )
-                
-                # Stream to WebSocket clients
-                await self._broadcast_update(update)
-                
-                # Cache in Redis for dashboards
-                if self.redis:
-                    await self._cache_metrics(campaign_id, update)
-                
-                # Wait before next collection
-                await asyncio.sleep(1)  # Update every second
-                
+                await self._stop_idle()
+                await self.tick()
+                MONITOR_TICK_DURATION.observe(loop.time() - started)
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {str(e)}")
                 await asyncio.sleep(5)  # Wait longer on error
+                continue
+            
+            # Wait before next collection
+            await asyncio.sleep(max(0.0, self.tick_interval - (loop.time() - started)))
     
-    async def _collect_metrics(self, campaign_id: int) -> Dict:
+    async def tick(self) -> int:
         """
-        Collect current metrics from platform APIs
+        Run one monitoring pass over all active campaigns
         
-        In production, this would call actual platform APIs
-        For now, simulate with realistic data
+        Returns:
+            Number of campaign updates produced
         """
-        # TODO: Replace with actual API calls
-        import random
+        campaign_ids = sorted(self.active_campaigns)
+        if not campaign_ids:
+            return 0
         
-        return {
-            'impressions_rate': random.uniform(10, 100),
-            'clicks_rate': random.uniform(0.1, 5),
-            'spend_rate': random.uniform(0.5, 10),
-            'ctr': random.uniform(0.01, 0.05),
-            'cpc': random.uniform(0.5, 3.0),
-            'performance_score': random.uniform(0.3, 0.9)
-        }
+        batch = await self.metrics_source.fetch(campaign_ids)
+        for campaign_id in campaign_ids:
+            metrics = batch.get(campaign_id)
+            if metrics is not None:
+                await self._process_metrics(campaign_id, metrics)
+        return len(batch)
+    
+    async def _process_metrics(self, campaign_id: int, metrics: Dict):
+        """Turn one campaign's metrics into alerts, predictions and an update"""
+        # Check for anomalies; only state transitions go out to clients
+        now = datetime.utcnow()
+        alerts = await self._detect_anomalies(campaign_id, metrics)
+        self.store.append(campaign_id, metrics)
+        alert_events = self.alert_manager.process(campaign_id, alerts)
+        await self._publish_alert_events(alert_events)
+        
+        # Generate predictions
+        predictions = await self._generate_predictions(campaign_id, metrics)
+        
+        # Create real-time update
+        update = RealTimeMetrics(
+            campaign_id=campaign_id,
+            timestamp=now.isoformat(),
+            impressions_per_second=metrics.get('impressions_rate', 0),
+            clicks_per_second=metrics.get('clicks_rate', 0),
+            spend_rate=metrics.get('spend_rate', 0),
+            current_ctr=metrics.get('ctr', 0),
+            current_cpc=metrics.get('cpc', 0),
+            performance_score=metrics.get('performance_score', 0.5),
+            prediction_next_hour=predictions,
+            alerts=[e.to_dict() for e in alert_events],
+            recommendations=await self._generate_recommendations(metrics, alerts)
+        )
+        
+        # Stream to WebSocket clients
+        await self._broadcast_update(update)
+        
+        # Cache in Redis for dashboards
+        if self.redis:
+            await self._cache_metrics(campaign_id, update)
     
     async def _detect_anomalies(self, campaign_id: int, metrics: Dict) -> List[Dict]:
         """
@@ -165,6 +263,33 @@ class RealTimeMonitor:
                 'action_required': 'Consider pausing campaign'
             })
         
+        # Drops / spikes relative to the trailing baseline window
+        if self.store.count(campaign_id) >= self.baseline_min_samples:
+            baseline = self.store.means(campaign_id, self.baseline_window)
+            ctr_baseline = baseline.get('ctr')
+            ctr = metrics.get('ctr', 0)
+            if ctr_baseline and ctr < ctr_baseline * (1 - self.alert_thresholds['ctr_drop']):
+                alerts.append({
+                    'type': 'ctr_drop',
+                    'severity': 'warning',
+                    'message': f"CTR {ctr*100:.2f}% is {(1 - ctr / ctr_baseline)*100:.0f}% below "
+                               f"the {self.baseline_window // 60}-minute average",
+                    'threshold': f"-{self.alert_thresholds['ctr_drop']:.0%}",
+                    'action_required': 'Check for creative fatigue or a targeting change'
+                })
+            
+            cpc_baseline = baseline.get('cpc')
+            cpc = metrics.get('cpc', 0)
+            if cpc_baseline and cpc > cpc_baseline * (1 + self.alert_thresholds['cpc_spike']):
+                alerts.append({
+                    'type': 'cpc_spike',
+                    'severity': 'warning',
+                    'message': f"CPC ${cpc:.2f} is {(cpc / cpc_baseline - 1)*100:.0f}% above "
+                               f"the {self.baseline_window // 60}-minute average",
+                    'threshold': f"+{self.alert_thresholds['cpc_spike']:.0%}",
+                    'action_required': 'Review bids and auction competition'
+                })
+        
         # Performance drop
         if metrics.get('performance_score', 1.0) < 0.4:
             alerts.append({
@@ -258,16 +383,84 @@ class RealTimeMonitor:
         """
         Broadcast update to all connected WebSocket clients
         """
-        message = json.dumps(asdict(update))
+        payload = update.to_dict()
+        message = json.dumps(payload)
+        self.updates.publish(update.campaign_id, payload)
+        await self._notify_listeners('update', update.campaign_id, payload)
         
         # Send to all connected clients
-        for client in self.websocket_clients:
+        for client in list(self.websocket_clients):
             try:
                 await client.send(message)
             except Exception as e:
                 logger.error(f"Failed to send to client: {str(e)}")
                 self.websocket_clients.discard(client)
     
+    async def _notify_listeners(self, kind: str, campaign_id: int, payload: Dict):
+        for listener in self.listeners:
+            try:
+                await listener(kind, campaign_id, payload)
+            except Exception as e:
+                logger.error(f"Update listener failed: {str(e)}")
+    
+    async def _publish_alert_events(self, events: List[AlertEvent]):
+        """
+        Publish alert transitions on the low-volume alert stream
+
+        Sent to WebSocket clients as ``{"type": "alert", ...}`` messages, published
+        on the ``realtime:alerts`` Redis channel and persisted to ``alert_logs``.
+        """
+        if not events:
+            return
+        
+        for event in events:
+            self.updates.publish(event.campaign_id, event.to_dict(), kind='alert')
+            await self._notify_listeners('alert', event.campaign_id, event.to_dict())
+            message = json.dumps({'type': 'alert', **event.to_dict()})
+            for client in list(self.websocket_clients):
+                try:
+                    await client.send(message)
+                except Exception as e:
+                    logger.error(f"Failed to send alert to client: {str(e)}")
+                    self.websocket_clients.discard(client)
+            
+            if self.redis:
+                try:
+                    await self.redis.publish('realtime:alerts', message)
+                except Exception as e:
+                    logger.error(f"Failed to publish alert: {str(e)}")
+        
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._persist_alert_events, events)
+    
+    def _persist_alert_events(self, events: List[AlertEvent]):
+        """Write alert transitions to the alert_logs table (runs in an executor)"""
+        from src.core.database import db
+        from src.models.campaign import AlertLog
+        
+        if db.Session is None:
+            return
+        
+        session = db.Session()
+        try:
+            for event in events:
+                session.add(AlertLog(
+                    campaign_id=event.campaign_id,
+                    alert_type=event.alert_type,
+                    state=event.state,
+                    severity=event.severity,
+                    message=event.message,
+                    occurrences=event.occurrences,
+                    opened_at=datetime.fromisoformat(event.opened_at),
+                    recorded_at=datetime.fromisoformat(event.timestamp),
+                ))
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Failed to persist alert transitions: {str(e)}")
+        finally:
+            db.Session.remove()
+    
     async def _cache_metrics(self, campaign_id: int, metrics: RealTimeMetrics):
         """
         Cache metrics in Redis for dashboard retrieval
@@ -276,7 +469,7 @@ class RealTimeMonitor:
             return
         
         key = f"realtime:campaign:{campaign_id}"
-        value = json.dumps(asdict(metrics))
+        value = json.dumps(metrics.to_dict())
         
         # Store with 5-minute expiration
         await self.redis.setex(key, 300, value)
@@ -311,7 +504,41 @@ class RealTimeMonitor:
     def get_active_campaigns(self) -> List[int]:
         """Get list of actively monitored campaigns"""
         return list(self.active_campaigns)
+    
+    def get_active_alerts(self, campaign_id: int = None) -> List[Dict]:
+        """Get currently open (deduplicated) alerts"""
+        return self.alert_manager.get_active_alerts(campaign_id)
+    
+    def get_sparkline(self, campaign_id: int, metric: str, seconds: int = 3600, points: int = 60) -> Dict:
+        """Bucketed recent values of one metric plus window aggregates, from memory"""
+        now = time.time()
+        return {
+            'campaign_id': campaign_id,
+            'metric': metric,
+            'seconds': seconds,
+            'points': self.store.sparkline(campaign_id, metric, seconds, points, now=now),
+            'summary': self.store.aggregate(campaign_id, metric, seconds, now=now),
+        }
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor() -> RealTimeMonitor:
+    """Process-wide monitor, created from the settings on first use"""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = RealTimeMonitor(
+                metrics_source=create_metrics_source(Config),
+                window_size=Config.REALTIME_WINDOW_SIZE,
+                idle_ttl=Config.REALTIME_MONITOR_IDLE_TTL
+            )
+        return _monitor
 
 
-# Global monitor instance
-monitor = RealTimeMonitor()
+def forget_campaign(campaign_id: int):
+    """Stop this process's monitor watching a campaign, if there is a monitor"""
+    if _monitor is not None:
+        _monitor.forget(campaign_id)
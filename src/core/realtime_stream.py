@@ -0,0 +1,133 @@
+"""
+ADFLOWAI - Real-Time Update Stream
+Sequence-numbered fan-out of monitor updates for SSE and long-poll clients
+"""
+
+import secrets
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+
+class UpdateStream:
+    """
+    Thread-safe buffer of the monitor's update stream.
+
+    Every published update or alert gets a monotonically increasing sequence
+    number. HTTP handlers (running in request threads) block on ``wait`` until
+    an event newer than the sequence they already have arrives, so clients only
+    ever receive data they haven't seen.
+
+    Sequences are only meaningful within one process, so clients are handed
+    cursors of the form ``<epoch>-<sequence>``: a cursor from before a
+    restart or from another worker is recognised and answered like a new
+    client, with the latest snapshot.
+    """
+
+    def __init__(self, history_size: int = 5000):
+        self.epoch = secrets.token_hex(4)
+        self._cond = threading.Condition()
+        self._sequence = 0
+        self._events: Deque[Dict] = deque(maxlen=history_size)
+        self._latest: Dict[int, Dict] = {}
+        self._last_sequence: Dict[int, int] = {}      # newest event of any kind per campaign
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the newest event"""
+        return self._sequence
+
+    def cursor(self, sequence: int) -> str:
+        """Client-facing cursor for ``sequence``"""
+        return f"{self.epoch}-{sequence}"
+
+    def parse_cursor(self, cursor: Optional[str]) -> int:
+        """Sequence of a cursor this stream issued; 0 (latest snapshot) for anything else"""
+        epoch, _, sequence = (cursor or '').rpartition('-')
+        if epoch != self.epoch:
+            return 0
+        try:
+            return int(sequence)
+        except ValueError:
+            return 0
+
+    def publish(self, campaign_id: int, payload: Dict, kind: str = 'update') -> int:
+        """
+        Append an event and wake up waiting readers
+
+        Args:
+            campaign_id: Campaign the event belongs to
+            payload: JSON-serialisable event body
+            kind: 'update' for metric snapshots, 'alert' for alert transitions
+
+        Returns:
+            Sequence number assigned to the event
+        """
+        with self._cond:
+            self._sequence += 1
+            event = {
+                'sequence': self._sequence,
+                'event': kind,
+                'campaign_id': campaign_id,
+                'data': payload,
+            }
+            self._events.append(event)
+            if kind == 'update':
+                self._latest[campaign_id] = event
+            self._last_sequence[campaign_id] = self._sequence
+            self._cond.notify_all()
+            return self._sequence
+
+    def since(self, sequence: int, campaign_ids: Iterable[int]) -> Tuple[int, List[Dict]]:
+        """
+        Events newer than ``sequence`` for the given campaigns
+
+        If the client is too far behind, new (``sequence`` = 0) or ahead of
+        this stream (a sequence from another process) it gets the latest
+        snapshot per campaign instead of a partial history.
+        """
+        wanted = set(campaign_ids)
+        with self._cond:
+            if self._needs_snapshot(sequence):
+                events = sorted(
+                    (e for cid, e in self._latest.items() if cid in wanted),
+                    key=lambda e: e['sequence']
+                )
+            else:
+                events = [
+                    e for e in self._events
+                    if e['sequence'] > sequence and e['campaign_id'] in wanted
+                ]
+            return self._sequence, events
+
+    def wait(
+        self,
+        sequence: int,
+        campaign_ids: Iterable[int],
+        timeout: Optional[float] = None
+    ) -> Tuple[int, List[Dict]]:
+        """
+        Block until there are events newer than ``sequence`` or ``timeout`` expires
+
+        Returns:
+            Tuple of (current sequence, new events); events is empty on timeout
+        """
+        campaign_ids = set(campaign_ids)
+        with self._cond:
+            current, events = self.since(sequence, campaign_ids)
+            if events:
+                return current, events
+            # O(watched campaigns) per wake-up; the history is scanned once there is news
+            self._cond.wait_for(lambda: self._has_news(sequence, campaign_ids), timeout=timeout)
+            return self.since(sequence, campaign_ids)
+
+    def _needs_snapshot(self, sequence: int) -> bool:
+        # New, too far behind the history, or ahead of this stream (another process)
+        oldest = self._events[0]['sequence'] if self._events else self._sequence + 1
+        return sequence <= 0 or sequence < oldest - 1 or sequence > self._sequence
+
+    def _has_news(self, sequence: int, campaign_ids: Iterable[int]) -> bool:
+        """Whether ``since(sequence, campaign_ids)`` would return events; call with the lock held"""
+        if self._needs_snapshot(sequence):
+            return any(c in self._latest for c in campaign_ids)
+        return any(self._last_sequence.get(c, 0) > sequence for c in campaign_ids)
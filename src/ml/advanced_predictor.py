@@ -3,28 +3,51 @@ ADFLOWAI - Advanced Predictive Analytics Engine
 Deep learning models for campaign performance forecasting
 """
 
+from __future__ import annotations
+
 import numpy as np
-import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Union
 from datetime import datetime, timedelta
 import logging
 
+from src.core.app_singleton import AppSingleton
+from src.ml.bandit import BanditStore, get_bandit_store, thompson_shares
+from src.ml.features import FeaturePipeline, FeatureSet
+from src.ml.forecasting import PortfolioForecaster
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used, like src.ml.features
+
 logger = logging.getLogger(__name__)
 
 
 class AdvancedPredictiveEngine:
     """
     Advanced ML/AI engine with multiple models:
-    - LSTM for time series forecasting
+    - Holt smoothing + lag-feature ridge ensemble for time series forecasting
     - XGBoost for performance prediction
     - Isolation Forest for anomaly detection
-    - Reinforcement Learning for budget optimization
+    - Thompson-sampling bandit for budget optimization
     """
     
-    def __init__(self, model_path='models/'):
+    def __init__(self, model_path='models/', bandit_store: Optional[BanditStore] = None):
         self.model_path = model_path
         self.models = {}
+        self.feature_pipeline = FeaturePipeline()
+        self.forecaster = PortfolioForecaster()
+        self._bandit_store = bandit_store
+        self.rng = np.random.default_rng()
         self.load_models()
+
+    @classmethod
+    def from_config(cls, config) -> 'AdvancedPredictiveEngine':
+        return cls(model_path=config['ML_MODEL_PATH'])
+    
+    @property
+    def bandit(self) -> BanditStore:
+        if self._bandit_store is None:
+            self._bandit_store = get_bandit_store()
+        return self._bandit_store
         
     def load_models(self):
         """Load pre-trained models"""
@@ -51,7 +74,10 @@ class AdvancedPredictiveEngine:
         forecast_days: int = 7
     ) -> Dict:
         """
-        Forecast campaign performance for next N days using LSTM
+        Forecast campaign performance for next N days
+        
+        The fitted model is cached per campaign; repeated calls only absorb
+        days that weren't seen before.
         
         Args:
             campaign_id: Campaign to forecast
@@ -62,24 +88,54 @@ class AdvancedPredictiveEngine:
             Dict with forecasted metrics
         """
         logger.info(f"Forecasting {forecast_days} days for campaign {campaign_id}")
+        return self.forecast_portfolio({campaign_id: historical_data}, forecast_days)[campaign_id]
+    
+    def forecast_portfolio(
+        self,
+        histories: Union[Dict[int, pd.DataFrame], pd.DataFrame],
+        forecast_days: int = 7
+    ) -> Dict[int, Dict]:
+        """
+        Forecast many campaigns in one vectorized pass (e.g. the nightly run)
         
-        # Feature engineering
-        features = self._engineer_time_series_features(historical_data)
-        
-        # Generate forecast (using LSTM in production)
-        forecast = self._lstm_forecast(features, forecast_days)
-        
-        # Calculate confidence intervals
-        confidence = self._calculate_confidence_intervals(forecast)
-        
-        return {
-            'campaign_id': campaign_id,
-            'forecast_period': forecast_days,
-            'predictions': forecast,
-            'confidence_intervals': confidence,
-            'model_accuracy': 0.87,
-            'recommendations': self._generate_forecast_recommendations(forecast)
-        }
+        Args:
+            histories: campaign_id -> historical performance data, or one long
+                frame with a campaign_id column
+            forecast_days: Number of days to forecast
+            
+        Returns:
+            campaign_id -> forecast dict (same shape as forecast_performance)
+        """
+        import pandas as pd
+
+        if isinstance(histories, pd.DataFrame):
+            series = self.forecaster.split_portfolio(histories)
+        else:
+            series = {c: self.forecaster.daily_values(data) for c, data in histories.items()}
+        self.forecaster.observe_series(series)
+        campaign_ids = list(series)
+        fitted = [c for c in campaign_ids if c in self.forecaster]
+        values = self.forecaster.forecast(fitted, forecast_days)
+        lower, upper = self.forecaster.intervals(fitted, forecast_days, (0.025, 0.975), point=values)
+        position = {campaign_id: i for i, campaign_id in enumerate(fitted)}
+        
+        results = {}
+        for campaign_id in campaign_ids:
+            i = position.get(campaign_id)
+            if i is not None:
+                forecast = self._format_forecast(campaign_id, values[i])
+                confidence = self._calculate_confidence_intervals(lower[i], upper[i])
+            else:
+                forecast, confidence = [], {}
+            results[campaign_id] = {
+                'campaign_id': campaign_id,
+                'forecast_period': forecast_days,
+                'predictions': forecast,
+                'confidence_intervals': confidence,
+                'model_accuracy': self.forecaster.accuracy(campaign_id),
+                'recommendations': self._generate_forecast_recommendations(forecast)
+            }
+        return results
     
     def _engineer_time_series_features(self, data: pd.DataFrame) -> np.ndarray:
         """
@@ -89,77 +145,74 @@ class AdvancedPredictiveEngine:
         - Lag features (t-1, t-2, t-7)
         - Rolling statistics (mean, std over 3, 7, 14 days)
         - Day of week, hour of day
-        - Trend and seasonality components
-        """
-        features = []
-        
-        # Lag features
-        for lag in [1, 2, 7]:
-            features.append(data['performance_score'].shift(lag))
-            features.append(data['ctr'].shift(lag))
-            features.append(data['spend'].shift(lag))
-        
-        # Rolling statistics
-        for window in [3, 7, 14]:
-            features.append(data['performance_score'].rolling(window).mean())
-            features.append(data['performance_score'].rolling(window).std())
-            features.append(data['spend'].rolling(window).sum())
-        
-        # Time-based features
-        features.append(pd.to_datetime(data['date']).dt.dayofweek)
-        features.append(pd.to_datetime(data['date']).dt.hour)
         
-        # Combine all features
-        X = np.column_stack([f.fillna(0) for f in features])
+        Single-campaign view of engineer_portfolio_features.
+        """
+        features = self.feature_pipeline.transform(data.drop(columns='campaign_id', errors='ignore'))
+        if not len(features.lengths):
+            return np.empty((0, len(features.names)), dtype=np.float32)
+        return features.values[0, :features.lengths[0]]
+    
+    def engineer_portfolio_features(self, history: pd.DataFrame, refresh_key=None) -> FeatureSet:
+        """
+        Engineer time series features for every campaign in long-format history
         
-        return X
+        Args:
+            history: Rows with campaign_id, date, performance_score, ctr, spend
+            refresh_key: Snapshot identifier; repeated calls with the same key
+                (training and inference in one refresh) reuse the result
+            
+        Returns:
+            FeatureSet with a float32 (campaigns, time, features) tensor and its index
+        """
+        return self.feature_pipeline.transform(history, refresh_key=refresh_key)
     
-    def _lstm_forecast(self, features: np.ndarray, days: int) -> List[Dict]:
+    def _format_forecast(self, campaign_id: int, values: np.ndarray) -> List[Dict]:
         """
-        Generate forecast using LSTM model
+        Turn one campaign's (days, targets) forecast into per-day dicts
         
-        In production, this uses a trained LSTM network
-        For now, generates realistic predictions
+        Metrics the campaign has never reported come back as None.
         """
-        forecasts = []
+        column = {target: j for j, target in enumerate(self.forecaster.targets)}
+        start = self.forecaster.last_date(campaign_id) or datetime.now()
         
-        # Simulate LSTM predictions (replace with actual model)
-        base_performance = 0.65
-        base_ctr = 0.025
-        base_spend = 150.0
+        def value(row, target, cast=float):
+            v = row[column[target]]
+            return None if np.isnan(v) else cast(round(v) if cast is int else v)
         
-        for day in range(days):
-            # Add some randomness and trend
-            trend_factor = 1 - (day * 0.01)  # Slight decline over time
-            noise = np.random.normal(0, 0.05)
-            
-            forecasts.append({
+        return [
+            {
                 'day': day + 1,
-                'date': (datetime.now() + timedelta(days=day+1)).strftime('%Y-%m-%d'),
-                'predicted_performance': max(0.3, min(0.9, base_performance * trend_factor + noise)),
-                'predicted_ctr': max(0.01, base_ctr * (1 + noise)),
-                'predicted_spend': base_spend * (1 + day * 0.02),
-                'predicted_conversions': int(20 * (1 + noise)),
-                'predicted_roi': max(1.5, 3.5 * trend_factor)
-            })
-        
-        return forecasts
+                'date': (start + timedelta(days=day + 1)).strftime('%Y-%m-%d'),
+                'predicted_performance': value(row, 'performance_score'),
+                'predicted_ctr': value(row, 'ctr'),
+                'predicted_spend': value(row, 'spend'),
+                'predicted_conversions': value(row, 'conversions', int),
+                'predicted_roi': value(row, 'roi')
+            }
+            for day, row in enumerate(values)
+        ]
     
-    def _calculate_confidence_intervals(self, forecast: List[Dict]) -> Dict:
+    def _calculate_confidence_intervals(self, lower: np.ndarray, upper: np.ndarray) -> Dict:
         """
-        Calculate 95% confidence intervals for predictions
+        Format 95% prediction intervals for one campaign
         
-        Uses bootstrapping or model uncertainty estimates
+        Bounds come from the forecaster's residual bootstrap, shape (days, targets).
         """
         confidence_intervals = {}
         
-        for metric in ['predicted_performance', 'predicted_ctr', 'predicted_spend']:
-            values = [day[metric] for day in forecast]
-            std = np.std(values)
+        for metric, target in [('predicted_performance', 'performance_score'),
+                               ('predicted_ctr', 'ctr'),
+                               ('predicted_spend', 'spend'),
+                               ('predicted_conversions', 'conversions'),
+                               ('predicted_roi', 'roi')]:
+            j = self.forecaster.targets.index(target)
+            if np.isnan(lower[:, j]).any():
+                continue
             
             confidence_intervals[metric] = {
-                'lower_bound': [v - 1.96 * std for v in values],
-                'upper_bound': [v + 1.96 * std for v in values],
+                'lower_bound': lower[:, j].tolist(),
+                'upper_bound': upper[:, j].tolist(),
                 'confidence_level': 0.95
             }
         
@@ -168,38 +221,44 @@ class AdvancedPredictiveEngine:
     def _generate_forecast_recommendations(self, forecast: List[Dict]) -> List[str]:
         """Generate recommendations based on forecast"""
         recommendations = []
+        if not forecast:
+            return recommendations
+        
+        def series(metric):
+            return [day[metric] for day in forecast if day[metric] is not None]
         
         # Check for declining trend
-        performances = [day['predicted_performance'] for day in forecast]
-        if performances[-1] < performances[0] * 0.9:  # 10% decline
+        performances = series('predicted_performance')
+        if performances and performances[-1] < performances[0] * 0.9:  # 10% decline
             recommendations.append(
                 "⚠️ Forecast shows declining performance - plan optimization"
             )
         
         # Check for increasing costs
-        spends = [day['predicted_spend'] for day in forecast]
-        if spends[-1] > spends[0] * 1.3:  # 30% increase
+        spends = series('predicted_spend')
+        if spends and spends[-1] > spends[0] * 1.3:  # 30% increase
             recommendations.append(
                 "💰 Budget expected to increase 30% - review allocation"
             )
         
         # Check for good performance
-        avg_performance = np.mean(performances)
-        if avg_performance > 0.75:
+        if performances and np.mean(performances) > 0.75:
             recommendations.append(
                 "✅ Strong performance predicted - consider scaling up"
             )
         
         # ROI projection
-        avg_roi = np.mean([day['predicted_roi'] for day in forecast])
-        if avg_roi > 3.0:
-            recommendations.append(
-                f"🎯 Excellent ROI forecast ({avg_roi:.1f}x) - increase investment"
-            )
-        elif avg_roi < 2.0:
-            recommendations.append(
-                f"⚠️ Low ROI forecast ({avg_roi:.1f}x) - optimize or pause"
-            )
+        rois = series('predicted_roi')
+        if rois:
+            avg_roi = np.mean(rois)
+            if avg_roi > 3.0:
+                recommendations.append(
+                    f"🎯 Excellent ROI forecast ({avg_roi:.1f}x) - increase investment"
+                )
+            elif avg_roi < 2.0:
+                recommendations.append(
+                    f"⚠️ Low ROI forecast ({avg_roi:.1f}x) - optimize or pause"
+                )
         
         return recommendations
     
@@ -375,61 +434,137 @@ class AdvancedPredictiveEngine:
         self,
         campaign_budget: float,
         platform_states: Dict[str, Dict],
-        historical_rewards: List[float]
-    ) -> Dict[str, float]:
+        historical_rewards: Union[List, Dict[str, List[float]]],
+        campaign_id: Optional[int] = None
+    ) -> Dict:
         """
-        Use Reinforcement Learning to optimize budget allocation
+        Allocate budget across platforms by Thompson sampling
         
-        This is an advanced RL agent that learns optimal budget allocation
-        based on historical performance (rewards)
+        Each (campaign, platform) arm has a Normal-Gamma posterior over its
+        reward (interval ROAS), built from the rewards recorded at metrics
+        ingestion plus ``historical_rewards``. Budget is split in proportion
+        to each platform's posterior probability of being the best one.
         
         Args:
             campaign_budget: Total budget to allocate
-            platform_states: Current state of each platform
-            historical_rewards: Past rewards (ROI) from each allocation
+            platform_states: Current state of each platform ('roas' seeds the
+                prior, 'is_active': False excludes the platform)
+            historical_rewards: Past rewards. Per-platform rewards (a dict of
+                platform -> list, or a list of {platform: reward} dicts) are
+                added as evidence; plain floats (campaign-level ROI) set the
+                prior mean for platforms without a 'roas'
+            campaign_id: Campaign whose recorded rewards to use
             
         Returns:
             Optimal budget allocation per platform
         """
-        logger.info("Running RL-based budget optimization")
-        
-        # In production, this would use a trained RL agent (DQN, PPO, etc.)
-        # For now, simulate intelligent allocation
-        
-        allocation = {}
-        num_platforms = len(platform_states)
-        
-        # Calculate performance-weighted allocation
-        total_performance = sum(state.get('performance_score', 0.5) 
-                              for state in platform_states.values())
+        logger.info("Running Thompson-sampling budget optimization")
+        return self.optimize_budget_allocations_rl(
+            [(campaign_id, campaign_budget, platform_states, historical_rewards)]
+        )[0]
+    
+    def optimize_budget_allocations_rl(
+        self,
+        requests: List[Tuple[Optional[int], float, Dict[str, Dict], Union[List, Dict, None]]],
+        n_draws: int = 1000,
+        min_share: float = 0.05
+    ) -> List[Dict]:
+        """
+        Thompson-sampling allocations for many campaigns in one batched draw
         
-        for platform, state in platform_states.items():
-            performance = state.get('performance_score', 0.5)
-            
-            # RL-inspired allocation (exploration + exploitation)
-            base_allocation = (performance / total_performance) * campaign_budget
-            
-            # Add exploration bonus for underperforming platforms
-            if performance < 0.4:
-                exploration_bonus = campaign_budget * 0.05  # 5% for exploration
-            else:
-                exploration_bonus = 0
+        Args:
+            requests: (campaign_id, budget, platform_states, historical_rewards) tuples
+            n_draws: Posterior samples per arm
+            min_share: Exploration floor per active platform (capped at an even split)
             
-            allocation[platform] = base_allocation + exploration_bonus
-        
-        # Ensure total equals budget
-        total_allocated = sum(allocation.values())
-        allocation = {k: (v / total_allocated) * campaign_budget 
-                     for k, v in allocation.items()}
-        
-        return {
-            'allocations': allocation,
-            'strategy': 'rl_thompson_sampling',
-            'exploration_rate': 0.15,
-            'expected_improvement': '12-18%',
-            'confidence': 0.82
-        }
+        Returns:
+            One result dict per request, as ``optimize_budget_allocation_rl``
+        """
+        if not requests:
+            return []
+        state = self.bandit.refresh()
+        n = len(requests)
+        width = max(1, max(len(states) for _, _, states, _ in requests))
+        
+        names: List[List[str]] = []
+        keys, positions = [], []
+        mask = np.zeros((n, width), dtype=bool)
+        prior = np.full((n, width), state.prior_mean)
+        evidence = np.zeros((n, width, 3))
+        
+        for i, (campaign_id, _, states, rewards) in enumerate(requests):
+            names.append(list(states))
+            flat, per_platform = self._split_rewards(rewards)
+            campaign_prior = float(np.mean(flat)) if flat else state.prior_mean
+            for j, (platform, platform_state) in enumerate(states.items()):
+                mask[i, j] = platform_state.get('is_active', True)
+                roas = platform_state.get('roas')
+                prior[i, j] = roas if isinstance(roas, (int, float)) and np.isfinite(roas) else campaign_prior
+                values = np.asarray(per_platform.get(platform, []), dtype=float)
+                values = values[np.isfinite(values)]
+                evidence[i, j] = (len(values), values.sum(), (values * values).sum())
+                if campaign_id is not None:
+                    keys.append((campaign_id, platform))
+                    positions.append((i, j))
+            if not mask[i, :len(states)].any():
+                mask[i, :len(states)] = True     # nothing active: spread over all platforms
+        
+        rows = np.full((n, width), -1, dtype=np.int64)
+        if keys:
+            index = np.array(positions)
+            rows[index[:, 0], index[:, 1]] = state.rows(keys)
+        stats = state.statistics(rows) + evidence
+        
+        wins, means = thompson_shares(state, stats, mask, prior, n_draws=n_draws, rng=self.rng)
+        # Every active platform keeps a floor share so it goes on being measured
+        active_count = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        floor = np.minimum(min_share, 1.0 / active_count)
+        shares = np.where(mask, floor + (1.0 - active_count * floor) * wins, 0.0)
+        
+        results = []
+        for i, (_, budget, _, _) in enumerate(requests):
+            platforms = names[i]
+            active = mask[i, :len(platforms)]
+            mu = means[i, :len(platforms)]
+            favourite = int(np.nanargmax(mu)) if active.any() else 0
+            even = float(np.nanmean(mu)) if active.any() else 0.0
+            expected = float(np.nansum(shares[i, :len(platforms)] * np.nan_to_num(mu)))
+            improvement = expected / even - 1.0 if even > 0 else 0.0
+            results.append({
+                'allocations': {p: float(shares[i, j] * budget) for j, p in enumerate(platforms)},
+                'strategy': 'rl_thompson_sampling',
+                'exploration_rate': round(float(1.0 - shares[i, favourite]), 4),
+                'expected_improvement': f"{100 * improvement:.1f}%",
+                'confidence': round(float(wins[i].max()), 4),
+                'expected_rewards': {
+                    p: (float(mu[j]) if active[j] else None) for j, p in enumerate(platforms)
+                }
+            })
+        return results
+    
+    @staticmethod
+    def _split_rewards(rewards) -> Tuple[List[float], Dict[str, List[float]]]:
+        """Separate campaign-level reward floats from per-platform rewards"""
+        flat: List[float] = []
+        per_platform: Dict[str, List[float]] = {}
+        if isinstance(rewards, dict):
+            for platform, values in rewards.items():
+                per_platform.setdefault(platform, []).extend(
+                    values if isinstance(values, (list, tuple, np.ndarray)) else [values]
+                )
+            return flat, per_platform
+        for reward in rewards or []:
+            if isinstance(reward, dict):
+                for platform, value in reward.items():
+                    per_platform.setdefault(platform, []).append(value)
+            elif reward is not None and np.isfinite(reward):
+                flat.append(float(reward))
+        return flat, per_platform
+
+
+_advanced_engine = AppSingleton('advanced_engine', AdvancedPredictiveEngine.from_config)
 
 
-# Global instance
-advanced_engine = AdvancedPredictiveEngine()
+def get_advanced_engine() -> AdvancedPredictiveEngine:
+    """The current app's engine (configured from app.config), or a process default"""
+    return _advanced_engine.get()
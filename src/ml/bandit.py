@@ -0,0 +1,351 @@
+"""
+ADFLOWAI - Thompson Sampling Bandit
+Normal-Gamma posteriors per (campaign, platform) arm with batched posterior sampling
+"""
+
+import io
+import logging
+import os
+import time
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.core.app_singleton import AppSingleton
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+STATISTICS = ('n', 'sum', 'sum_sq')
+
+
+class BanditState:
+    """
+    Reward statistics for every (campaign, platform) arm, stored columnar
+
+    Each arm keeps only its sufficient statistics (count, sum and sum of
+    squares of observed rewards, 24 bytes), so updates are additive: a batch
+    of observations is a scatter-add, two states merge by addition and
+    workers can share one state through atomic increments (see BanditStore).
+
+    The posterior is Normal-Gamma over the arm's mean reward and precision,
+    derived on demand from the statistics and a prior. ``max_observations``
+    caps the evidence an arm carries, which bounds how narrow its posterior
+    gets so a well-observed arm keeps being explored. It is not forgetting:
+    old and new rewards are scaled alike, so the posterior mean stays the
+    all-time mean and a platform whose returns drift is tracked slowly.
+    """
+
+    def __init__(
+        self,
+        prior_mean: float = 1.0,
+        prior_strength: float = 1.0,
+        prior_shape: float = 2.0,
+        prior_rate: float = 1.0,
+        max_observations: float = 90.0,
+        capacity: int = 1024
+    ):
+        self.prior_mean = prior_mean
+        self.prior_strength = prior_strength
+        self.prior_shape = prior_shape
+        self.prior_rate = prior_rate
+        self.max_observations = max_observations
+        self.campaign_ids = np.zeros(capacity, dtype=np.int64)
+        self.platform_codes = np.zeros(capacity, dtype=np.int16)
+        self.stats = np.zeros((capacity, len(STATISTICS)))
+        self.platforms: Dict[str, int] = {}
+        self._index: Dict[Tuple[int, int], int] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _platform_code(self, platform: str) -> int:
+        if platform not in self.platforms:
+            self.platforms[platform] = len(self.platforms)
+        return self.platforms[platform]
+
+    def _grow(self, needed: int):
+        capacity = len(self.campaign_ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, 2 * capacity)
+        for name in ('campaign_ids', 'platform_codes', 'stats'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def rows(self, keys: Sequence[Tuple[int, str]], create: bool = False) -> np.ndarray:
+        """
+        Row index of each (campaign_id, platform) arm
+
+        Args:
+            keys: Arms to look up
+            create: Add missing arms (with empty statistics) instead of returning -1
+
+        Returns:
+            int64 array of rows, -1 for unknown arms
+        """
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        for i, (campaign_id, platform) in enumerate(keys):
+            code = self.platforms.get(platform)
+            row = None if code is None else self._index.get((int(campaign_id), code))
+            if row is None and create:
+                code = self._platform_code(platform)
+                self._grow(self.size + 1)
+                row = self.size
+                self.campaign_ids[row] = campaign_id
+                self.platform_codes[row] = code
+                self._index[(int(campaign_id), code)] = row
+                self.size += 1
+            if row is not None:
+                rows[i] = row
+        return rows
+
+    def update(self, campaign_ids: Sequence[int], platforms: Sequence[str], rewards: Sequence[float]):
+        """Fold a batch of observed rewards into the arms' statistics"""
+        rewards = np.asarray(rewards, dtype=float)
+        keep = np.isfinite(rewards)
+        keys = [(c, p) for c, p, k in zip(campaign_ids, platforms, keep) if k]
+        if not keys:
+            return
+        rows = self.rows(keys, create=True)
+        rewards = rewards[keep]
+        np.add.at(self.stats, rows, np.stack([np.ones_like(rewards), rewards, rewards * rewards], axis=1))
+
+    def merge(self, other: 'BanditState'):
+        """Add another state's statistics into this one"""
+        inverse = {code: name for name, code in other.platforms.items()}
+        keys = [(int(c), inverse[int(p)]) for c, p in
+                zip(other.campaign_ids[:other.size], other.platform_codes[:other.size])]
+        if keys:
+            np.add.at(self.stats, self.rows(keys, create=True), other.stats[:other.size])
+
+    def statistics(self, rows: np.ndarray) -> np.ndarray:
+        """Statistics for ``rows`` (any shape, -1 for no data); shape rows.shape + (3,)"""
+        rows = np.asarray(rows)
+        stats = self.stats[np.where(rows >= 0, rows, 0)]
+        return np.where((rows >= 0)[..., None], stats, 0.0)
+
+    def posterior(
+        self,
+        stats: np.ndarray,
+        prior_mean: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Normal-Gamma posterior parameters from sufficient statistics
+
+        Args:
+            stats: (..., 3) count / sum / sum of squares
+            prior_mean: Prior mean reward broadcastable to stats[..., 0]
+
+        Returns:
+            Tuple of (mu, kappa, alpha, beta)
+        """
+        n, total, squares = stats[..., 0], stats[..., 1], stats[..., 2]
+        # Cap the evidence (posterior width only; the mean is unchanged):
+        # scale all three statistics so n <= max_observations
+        discount = np.where(n > self.max_observations, self.max_observations / np.maximum(n, 1e-12), 1.0)
+        n, total, squares = n * discount, total * discount, squares * discount
+
+        mu0 = self.prior_mean if prior_mean is None else prior_mean
+        kappa0 = self.prior_strength
+        safe_n = np.maximum(n, 1e-12)
+        spread = np.where(n > 0, np.maximum(squares - total * total / safe_n, 0.0), 0.0)
+        surprise = np.where(n > 0, (total - n * mu0) ** 2 / safe_n, 0.0)
+
+        kappa = kappa0 + n
+        mu = (kappa0 * mu0 + total) / kappa
+        alpha = self.prior_shape + 0.5 * n
+        beta = self.prior_rate + 0.5 * spread + 0.5 * kappa0 * surprise / kappa
+        return mu, kappa, alpha, beta
+
+    def to_bytes(self) -> bytes:
+        """Compact snapshot (npz) for checkpoints or shipping between processes"""
+        buffer = io.BytesIO()
+        names = sorted(self.platforms, key=self.platforms.get)
+        np.savez_compressed(
+            buffer,
+            version=np.array(FORMAT_VERSION),
+            campaign_ids=self.campaign_ids[:self.size],
+            platform_codes=self.platform_codes[:self.size],
+            stats=self.stats[:self.size],
+            platforms=np.array(names, dtype=str),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, payload: bytes, **prior) -> 'BanditState':
+        """Restore a snapshot written by ``to_bytes``"""
+        with np.load(io.BytesIO(payload)) as data:
+            if int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported bandit state version {int(data['version'])}")
+            size = len(data['campaign_ids'])
+            state = cls(capacity=max(size, 1), **prior)
+            state.platforms = {str(name): code for code, name in enumerate(data['platforms'])}
+            state.campaign_ids[:size] = data['campaign_ids']
+            state.platform_codes[:size] = data['platform_codes']
+            state.stats[:size] = data['stats']
+        state.size = size
+        state._index = {(int(c), int(p)): row for row, (c, p) in
+                        enumerate(zip(state.campaign_ids[:size], state.platform_codes[:size]))}
+        return state
+
+
+def thompson_shares(
+    state: BanditState,
+    stats: np.ndarray,
+    mask: np.ndarray,
+    prior_mean: Optional[np.ndarray] = None,
+    n_draws: int = 1000,
+    rng: Optional[np.random.Generator] = None,
+    max_chunk_bytes: int = 64 * 1024 * 1024
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Probability that each arm is the best one, by posterior sampling
+
+    For every campaign, ``n_draws`` (precision, mean) pairs are drawn from each
+    arm's Normal-Gamma posterior and the arm with the highest sampled mean
+    wins the draw; win frequencies are the Thompson allocation shares. All
+    campaigns are sampled together, chunked so memory stays bounded.
+
+    Args:
+        state: Bandit whose prior and evidence cap apply
+        stats: (n, p, 3) arm statistics, zeros where an arm has no data
+        mask: (n, p) True for arms that may receive budget
+        prior_mean: (n, p) prior mean reward per arm (state's prior if None)
+        n_draws: Posterior samples per arm
+
+    Returns:
+        Tuple of (shares (n, p), posterior means (n, p)); masked arms are 0 / NaN
+    """
+    rng = rng or np.random.default_rng()
+    mu, kappa, alpha, beta = state.posterior(stats, prior_mean)
+    mu, kappa, alpha, beta = (np.broadcast_to(x, mask.shape) for x in (mu, kappa, alpha, beta))
+    n, p = mask.shape
+    shares = np.zeros((n, p))
+
+    chunk = max(1, max_chunk_bytes // max(3 * p * n_draws * 4, 1))
+    for start in range(0, n, chunk):
+        part = slice(start, min(start + chunk, n))
+        active = mask[part]
+        # Only arms that may receive budget are sampled; the rest never win
+        a, b, k, m = alpha[part][active], beta[part][active], kappa[part][active], mu[part][active]
+        precision = rng.standard_gamma(a[:, None], size=(len(a), n_draws), dtype=np.float32)
+        precision /= b[:, None]
+        sampled = rng.standard_normal((len(a), n_draws), dtype=np.float32)
+        sampled /= np.sqrt(k[:, None] * precision)
+        sampled += m[:, None]
+        draws = np.full(active.shape + (n_draws,), -np.inf, dtype=np.float32)
+        draws[active] = sampled
+        best = draws.argmax(axis=1)                                  # (c, draws)
+        wins = (best[:, None, :] == np.arange(p)[None, :, None]).sum(axis=-1)
+        shares[part] = np.where(active, wins / n_draws, 0.0)
+
+    return shares, np.where(mask, mu, np.nan)
+
+
+class BanditStore:
+    """
+    Bandit state shared by every web and Celery worker
+
+    Rewards are recorded into the local state and, when a Redis client is
+    configured, into three Redis hashes (``<prefix>:n``, ``<prefix>:sum``,
+    ``<prefix>:sum_sq``, one field per ``campaign_id:platform`` arm) with
+    HINCRBYFLOAT. Because the statistics are additive, concurrent workers
+    never overwrite each other's updates; each worker reloads the
+    authoritative totals at most every ``refresh_interval`` seconds.
+    """
+
+    def __init__(self, redis_client=None, prefix: str = 'bandit', refresh_interval: float = 60.0, **prior):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.refresh_interval = refresh_interval
+        self.prior = prior
+        self.state = BanditState(**prior)
+        self._loaded_at = 0.0
+
+    def record(self, campaign_ids: Sequence[int], platforms: Sequence[str], rewards: Sequence[float]):
+        """Record observed rewards (e.g. interval ROAS) for a batch of arms"""
+        self.state.update(campaign_ids, platforms, rewards)
+        if not self.redis:
+            return
+        observation = BanditState(**self.prior)
+        observation.update(campaign_ids, platforms, rewards)
+        if not len(observation):
+            return
+        try:
+            inverse = {code: name for name, code in observation.platforms.items()}
+            pipe = self.redis.pipeline(transaction=True)
+            for row in range(observation.size):
+                field = f"{observation.campaign_ids[row]}:{inverse[int(observation.platform_codes[row])]}"
+                for j, name in enumerate(STATISTICS):
+                    pipe.hincrbyfloat(f"{self.prefix}:{name}", field, float(observation.stats[row, j]))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error persisting bandit rewards: {str(e)}")
+
+    def refresh(self, force: bool = False) -> BanditState:
+        """Reload the shared statistics from Redis when stale; returns the current state"""
+        if not self.redis or (not force and time.monotonic() - self._loaded_at < self.refresh_interval):
+            return self.state
+        try:
+            pipe = self.redis.pipeline(transaction=True)
+            for name in STATISTICS:
+                pipe.hgetall(f"{self.prefix}:{name}")
+            columns = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error loading bandit state: {str(e)}")
+            return self.state
+
+        state = BanditState(capacity=max(len(columns[0]), 1), **self.prior)
+        fields = list(columns[0])
+        keys = []
+        for field in fields:
+            campaign_id, platform = _decode(field).split(':', 1)
+            keys.append((int(campaign_id), platform))
+        rows = state.rows(keys, create=True)
+        for j, column in enumerate(columns):
+            state.stats[rows, j] = [float(column.get(field, 0.0)) for field in fields]
+        self.state = state
+        self._loaded_at = time.monotonic()
+        return state
+
+    def save(self, path: str):
+        """Write a snapshot of the current state to ``path`` (atomically)"""
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(self.state.to_bytes())
+        os.replace(temporary, path)
+
+    def load(self, path: str):
+        """Replace the local state with a snapshot from ``path``"""
+        with open(path, 'rb') as handle:
+            self.state = BanditState.from_bytes(handle.read(), **self.prior)
+
+
+def _decode(value: Hashable) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def create_bandit_store(config) -> BanditStore:
+    """
+    Build the bandit store selected by ``config['BANDIT_STATE_BACKEND']``
+
+    One of: memory (default, per process), redis (shared by all workers).
+    """
+    if config['BANDIT_STATE_BACKEND'] == 'redis':
+        import redis
+        timeout = config['REDIS_SOCKET_TIMEOUT']
+        client = redis.Redis.from_url(config['REDIS_URL'], socket_timeout=timeout, socket_connect_timeout=timeout)
+        return BanditStore(client, prefix=config['BANDIT_REDIS_PREFIX'])
+    return BanditStore()
+
+
+_bandit_store = AppSingleton('bandit_store', create_bandit_store)
+
+
+def get_bandit_store() -> BanditStore:
+    """The current app's bandit store (configured from app.config), or a process default"""
+    return _bandit_store.get()
@@ -0,0 +1,196 @@
+"""
+ADFLOWAI - Budget Allocation Engine
+Per-platform response curves and a batched water-filling solver for cross-platform budgets
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Square-root response (a common media-mix prior) when a platform has no usable history
+DEFAULT_ELASTICITY = 0.5
+MIN_ELASTICITY = 0.05
+MAX_ELASTICITY = 0.95
+
+
+@dataclass
+class ResponseCurves:
+    """
+    Fitted ``value = scale * spend ** elasticity`` curves, one per series
+
+    ``scale`` is NaN where a series had no usable history.
+    """
+    scale: np.ndarray
+    elasticity: np.ndarray
+    observations: np.ndarray
+
+
+def fit_response_curves(
+    spend: np.ndarray,
+    value: np.ndarray,
+    prior_elasticity: float = DEFAULT_ELASTICITY,
+    prior_strength: float = 5.0
+) -> ResponseCurves:
+    """
+    Fit power-law response curves by log-log least squares, all series at once
+
+    Each row is one (campaign, platform) series of per-period spend and value
+    (e.g. conversions) increments, NaN-padded. The elasticity is shrunk towards
+    ``prior_elasticity`` with the weight of ``prior_strength`` observations and
+    kept in (0, 1), so every curve has diminishing returns.
+
+    Args:
+        spend: Spend per period, shape (s, T)
+        value: Value per period, shape (s, T)
+
+    Returns:
+        ResponseCurves with arrays of shape (s,)
+    """
+    spend = np.asarray(spend, dtype=float)
+    value = np.asarray(value, dtype=float)
+    valid = np.isfinite(spend) & np.isfinite(value) & (spend > 0) & (value > 0)
+    n = valid.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_x = np.where(valid, np.log(np.where(valid, spend, 1.0)), 0.0)
+        log_y = np.where(valid, np.log(np.where(valid, value, 1.0)), 0.0)
+        mean_x = log_x.sum(axis=1) / np.maximum(n, 1)
+        mean_y = log_y.sum(axis=1) / np.maximum(n, 1)
+        dx = np.where(valid, log_x - mean_x[:, None], 0.0)
+        dy = np.where(valid, log_y - mean_y[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        sxy = (dx * dy).sum(axis=1)
+        slope = np.where(sxx > 1e-12, sxy / np.where(sxx > 1e-12, sxx, 1.0), prior_elasticity)
+
+    # Too little spread in spend means the slope is noise: lean on the prior
+    weight = np.where(sxx > 1e-12, n, 0)
+    elasticity = (weight * slope + prior_strength * prior_elasticity) / (weight + prior_strength)
+    elasticity = np.clip(elasticity, MIN_ELASTICITY, MAX_ELASTICITY)
+
+    # Scale so the curve passes through the geometric-mean point of the data
+    scale = np.where(n > 0, np.exp(mean_y - elasticity * mean_x), np.nan)
+    return ResponseCurves(scale=scale, elasticity=elasticity, observations=n)
+
+
+def allocate(
+    budget: np.ndarray,
+    scale: np.ndarray,
+    elasticity: np.ndarray,
+    lower: Optional[np.ndarray] = None,
+    upper: Optional[np.ndarray] = None,
+    iterations: int = 100,
+    tolerance: float = 1e-10
+) -> np.ndarray:
+    """
+    Maximise sum_i scale_i * x_i ** elasticity_i subject to sum_i x_i = budget
+    and lower_i <= x_i <= upper_i, for many campaigns in one vectorized solve
+
+    The problem is concave, so the optimum equalises marginal returns:
+    x_i(lambda) = clip((lambda / (scale_i * elasticity_i)) ** (1 / (elasticity_i - 1)), lower_i, upper_i)
+    and total spend is monotone in lambda. lambda is found per campaign by
+    safeguarded Newton steps in log space (water-filling): a step that leaves
+    the current bracket falls back to bisection, so it converges in a few
+    iterations and never diverges.
+
+    Infeasible bounds are resolved rather than rejected: if the floors exceed
+    the budget they are scaled down pro rata; if the caps are below the budget
+    every platform gets its cap.
+
+    Args:
+        budget: Budget per campaign, shape (n,)
+        scale, elasticity: Curve parameters, shape (n, p); pad unused slots with scale 0
+        lower, upper: Per-platform bounds, shape (n, p); set upper to 0 to exclude a slot
+        iterations: Maximum Newton / bisection steps
+        tolerance: Stop once every campaign's spend is within this fraction of its budget
+
+    Returns:
+        Allocations, shape (n, p)
+    """
+    budget = np.asarray(budget, dtype=float)
+    scale = np.asarray(scale, dtype=float)
+    elasticity = np.clip(np.asarray(elasticity, dtype=float), MIN_ELASTICITY, MAX_ELASTICITY)
+    upper = np.broadcast_to(budget[:, None], scale.shape).astype(float) if upper is None else np.asarray(upper, dtype=float)
+    lower = np.zeros_like(scale) if lower is None else np.minimum(np.asarray(lower, dtype=float), upper)
+
+    floors = lower.sum(axis=1)
+    lower = lower * np.where(floors > budget, budget / np.where(floors > 0, floors, 1.0), 1.0)[:, None]
+
+    productive = (scale > 0) & (upper > lower)
+    with np.errstate(divide='ignore'):
+        log_gain = np.where(productive, np.log(np.where(productive, scale * elasticity, 1.0)), -np.inf)
+    exponent = 1.0 / (elasticity - 1.0)    # negative: spend falls as lambda rises
+
+    def spend_at(log_lambda, rows=slice(None)):
+        raw = np.exp(np.minimum((log_lambda[:, None] - log_gain[rows]) * exponent[rows], 700.0))
+        raw = np.where(productive[rows], raw, 0.0)
+        free = productive[rows] & (raw > lower[rows]) & (raw < upper[rows])
+        return np.clip(raw, lower[rows], upper[rows]), free, raw
+
+    # Bracket lambda between the marginal return at the caps and at (near) zero
+    tiny = np.maximum(budget * 1e-12, 1e-12)[:, None]
+    marginal_at_upper = log_gain + (elasticity - 1.0) * np.log(np.maximum(upper, tiny))
+    marginal_at_zero = log_gain + (elasticity - 1.0) * np.log(np.maximum(lower, tiny))
+    low = np.where(productive, marginal_at_upper, np.inf).min(axis=1) - 1.0
+    high = np.where(productive, marginal_at_zero, -np.inf).max(axis=1) + 1.0
+    has_curve = np.isfinite(low) & np.isfinite(high)
+    low = np.where(has_curve, low, 0.0)
+    high = np.where(has_curve, high, 0.0)
+
+    # Campaigns whose answer is fixed by the bounds need no search
+    capped = upper.sum(axis=1) <= budget
+    settled = ~has_curve | capped | (lower.sum(axis=1) >= budget)
+
+    # Start from the unconstrained solution with a common (average) exponent
+    mean_exponent = np.where(productive, exponent, 0.0).sum(axis=1) / np.maximum(productive.sum(axis=1), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(productive, -exponent * log_gain, -np.inf)
+        peak = weights.max(axis=1)
+        log_total = peak + np.log(np.exp(weights - np.where(np.isfinite(peak), peak, 0.0)[:, None]).sum(axis=1))
+        guess = (np.log(np.maximum(budget, 1e-12)) - log_total) / mean_exponent
+    current = np.where(np.isfinite(guess) & (guess > low) & (guess < high), guess, 0.5 * (low + high))
+
+    # Only campaigns still searching are evaluated, so a few stragglers stay cheap
+    todo = np.flatnonzero(~settled)
+    for _ in range(iterations):
+        if not todo.size:
+            break
+        position, bottom, top = current[todo], low[todo], high[todo]
+        allocation, free, raw = spend_at(position, todo)
+        total = allocation.sum(axis=1)
+        excess = total - budget[todo]
+        done = (np.abs(excess) <= tolerance * np.maximum(budget[todo], 1.0)) | (top - bottom < 1e-12)
+        over = excess > 0
+        bottom = np.where(over, position, bottom)      # spending too much: raise lambda
+        top = np.where(over, top, position)
+        # Newton on log(spend), which is linear in log(lambda) while no bound binds
+        slope = np.where(free, raw * exponent[todo], 0.0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = position - np.log(total / budget[todo]) * total / slope
+        inside = (slope < 0) & (step > bottom) & (step < top)
+        current[todo] = np.where(done, position, np.where(inside, step, 0.5 * (bottom + top)))
+        low[todo], high[todo] = bottom, top
+        todo = todo[~done]
+
+    allocation, _, _ = spend_at(current)
+
+    # Absorb the last rounding error: trim above the floors or fill headroom, pro rata
+    remainder = budget - allocation.sum(axis=1)
+    slack = np.where(productive, allocation - lower, 0.0)
+    headroom = np.where(productive, upper - allocation, 0.0)
+    room = np.where(remainder > 0, headroom.sum(axis=1), slack.sum(axis=1))
+    weights = np.where((remainder > 0)[:, None], headroom, -slack)
+    share = np.where(room[:, None] > 0, weights / np.where(room > 0, room, 1.0)[:, None], 0.0)
+    allocation = allocation + share * np.clip(np.abs(remainder), 0.0, room)[:, None]
+
+    # Caps below the budget: everything goes to the caps
+    return np.where(capped[:, None], upper, allocation)
+
+
+def expected_value(allocation: np.ndarray, scale: np.ndarray, elasticity: np.ndarray) -> np.ndarray:
+    """Total modelled value of an allocation per campaign"""
+    scale = np.where(np.isfinite(scale), scale, 0.0)
+    return (scale * np.power(np.maximum(allocation, 0.0), elasticity)).sum(axis=-1)
@@ -0,0 +1,254 @@
+"""
+ADFLOWAI - Time-Series Feature Pipeline
+Vectorized lag / rolling / calendar features for many campaigns at once
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used: importing this module shouldn't cost a pandas import
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HistoryTensor:
+    """
+    Long-format history pivoted to one padded row per campaign
+
+    Rows are right-padded: campaign i occupies positions [0, lengths[i]).
+    """
+    campaign_ids: np.ndarray   # (n,)
+    timestamps: np.ndarray     # (n, T) datetime64[ns], NaT padded
+    values: np.ndarray         # (n, T, c) float64, NaN padded
+    lengths: np.ndarray        # (n,)
+    columns: Tuple[str, ...]
+
+    @property
+    def mask(self) -> np.ndarray:
+        """(n, T) True for real observations"""
+        return np.arange(self.values.shape[1])[None, :] < self.lengths[:, None]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[..., self.columns.index(name)]
+
+
+def to_tensor(
+    data: pd.DataFrame,
+    columns: Sequence[str],
+    time_column: str = 'date',
+    id_column: str = 'campaign_id'
+) -> HistoryTensor:
+    """
+    Pivot long-format history into a (campaigns, time, columns) tensor
+
+    One sort and one scatter for the whole portfolio; the time column is
+    parsed once. Frames without an id column are treated as one campaign.
+    Missing value columns come back as NaN.
+    """
+    import pandas as pd
+
+    columns = tuple(columns)
+    ids = data[id_column].to_numpy() if id_column in data else np.zeros(len(data), dtype=np.int64)
+    timestamps = pd.to_datetime(data[time_column]).to_numpy().astype('datetime64[ns]')
+    order = np.lexsort((timestamps, ids))
+    ids, timestamps = ids[order], timestamps[order]
+
+    campaign_ids, starts, lengths = np.unique(ids, return_index=True, return_counts=True)
+    group = np.repeat(np.arange(len(campaign_ids)), lengths)
+    position = np.arange(len(ids)) - starts[group]
+    length = int(lengths.max()) if len(lengths) else 0
+
+    values = np.full((len(campaign_ids), length, len(columns)), np.nan)
+    for j, name in enumerate(columns):
+        if name in data:
+            values[group, position, j] = pd.to_numeric(data[name], errors='coerce').to_numpy(dtype=float)[order]
+    padded_times = np.full((len(campaign_ids), length), np.datetime64('NaT'), dtype='datetime64[ns]')
+    padded_times[group, position] = timestamps
+
+    return HistoryTensor(campaign_ids, padded_times, values, lengths, columns)
+
+
+def shift(values: np.ndarray, lag: int) -> np.ndarray:
+    """Shift (n, T, ...) forward by ``lag`` steps along time, NaN-filling the start"""
+    shifted = np.full_like(values, np.nan)
+    if lag < values.shape[1]:
+        shifted[:, lag:] = values[:, :values.shape[1] - lag]
+    return shifted
+
+
+def rolling(values: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """
+    Trailing-window sum / mean / std (ddof=1) along time, via cumulative sums
+
+    Matches pandas ``rolling(window)`` with the default min_periods: any
+    window that is incomplete or contains a NaN yields NaN.
+
+    Args:
+        values: (n, T) or (n, T, c)
+
+    Returns:
+        Dict with 'sum', 'mean' and 'std' arrays shaped like ``values``
+    """
+    missing = np.isnan(values)
+    filled = np.where(missing, 0.0, values)
+    zeros = np.zeros_like(filled[:, :1])
+    totals = np.concatenate([zeros, np.cumsum(filled, axis=1)], axis=1)
+    squares = np.concatenate([zeros, np.cumsum(filled * filled, axis=1)], axis=1)
+    gaps = np.concatenate([zeros, np.cumsum(missing, axis=1)], axis=1)
+
+    end = np.arange(1, values.shape[1] + 1)
+    start = np.maximum(end - window, 0)
+    window_sum = totals[:, end] - totals[:, start]
+    window_squares = squares[:, end] - squares[:, start]
+    complete = ((end - start) == window).reshape((1, -1) + (1,) * (values.ndim - 2))
+    valid = complete & (gaps[:, end] - gaps[:, start] == 0)
+
+    mean = window_sum / window
+    if window > 1:
+        variance = np.maximum(window_squares - window_sum * mean, 0.0) / (window - 1)
+    else:
+        variance = np.full_like(mean, np.nan)
+    return {
+        'sum': np.where(valid, window_sum, np.nan),
+        'mean': np.where(valid, mean, np.nan),
+        'std': np.where(valid, np.sqrt(variance), np.nan),
+    }
+
+
+def lag_features(Y: np.ndarray, lags: Sequence[int], window: int) -> np.ndarray:
+    """
+    Autoregressive design for every time step of every series
+
+    Row t holds [1, y[t-l] for l in lags, mean(y[t-window:t])]; rows that
+    reach before the start of the series are NaN.
+
+    Args:
+        Y: Observations, shape (n, T, m)
+
+    Returns:
+        Design array, shape (n, T, m, len(lags) + 2)
+    """
+    columns = [np.ones(Y.shape)]
+    columns += [shift(Y, lag) for lag in lags]
+    columns.append(shift(rolling(Y, window)['mean'], 1))
+    return np.stack(columns, axis=-1)
+
+
+@dataclass
+class FeatureSet:
+    """Engineered features for a portfolio: float32 tensor plus its index"""
+    values: np.ndarray         # (n, T, F) float32, zero-filled
+    names: Tuple[str, ...]
+    campaign_ids: np.ndarray   # (n,)
+    timestamps: np.ndarray     # (n, T) datetime64[ns], NaT padded
+    lengths: np.ndarray        # (n,)
+
+    def campaign(self, campaign_id) -> np.ndarray:
+        """(length, F) feature matrix for one campaign"""
+        i = int(np.searchsorted(self.campaign_ids, campaign_id))
+        if i >= len(self.campaign_ids) or self.campaign_ids[i] != campaign_id:
+            raise KeyError(campaign_id)
+        return self.values[i, :self.lengths[i]]
+
+    def rows(self) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Flatten to a 2-D training matrix
+
+        Returns:
+            Tuple of (X (rows, F) float32, index frame with campaign_id / date)
+        """
+        import pandas as pd
+
+        mask = np.arange(self.values.shape[1])[None, :] < self.lengths[:, None]
+        index = pd.DataFrame({
+            'campaign_id': np.repeat(self.campaign_ids, self.lengths),
+            'date': self.timestamps[mask],
+        })
+        return self.values[mask], index
+
+
+class FeaturePipeline:
+    """
+    Lag, rolling and calendar features computed for every campaign in one pass
+
+    Features (in order):
+    - Lags of each lag column (t-1, t-2, t-7)
+    - Rolling mean / std of performance_score and rolling sum of spend (3, 7, 14)
+    - Day of week, hour of day
+
+    The last result is kept; callers pass a ``refresh_key`` (e.g. the
+    snapshot timestamp) so training and inference in the same refresh share
+    one computation.
+    """
+
+    def __init__(
+        self,
+        lags: Sequence[int] = (1, 2, 7),
+        windows: Sequence[int] = (3, 7, 14),
+        lag_columns: Sequence[str] = ('performance_score', 'ctr', 'spend')
+    ):
+        self.lags = tuple(lags)
+        self.windows = tuple(windows)
+        self.lag_columns = tuple(lag_columns)
+        self._cached_key: Optional[Hashable] = None
+        self._cached: Optional[FeatureSet] = None
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        names = [f"{column}_lag{lag}" for lag in self.lags for column in self.lag_columns]
+        for window in self.windows:
+            names += [f"performance_score_mean{window}", f"performance_score_std{window}",
+                      f"spend_sum{window}"]
+        return tuple(names + ['day_of_week', 'hour'])
+
+    def transform(self, data: pd.DataFrame, refresh_key: Optional[Hashable] = None) -> FeatureSet:
+        """
+        Engineer features for long-format history
+
+        Args:
+            data: Rows with 'date', optional 'campaign_id' and the lag columns
+            refresh_key: Reuse the previous result when equal to the last key
+
+        Returns:
+            FeatureSet (missing values filled with 0)
+        """
+        if refresh_key is not None and refresh_key == self._cached_key:
+            return self._cached
+
+        columns = tuple(dict.fromkeys(self.lag_columns + ('performance_score', 'spend')))
+        history = to_tensor(data, columns)
+        n, T = history.timestamps.shape
+
+        features = np.empty((n, T, len(self.names)), dtype=np.float32)
+        f = 0
+        lagged = history.values[..., [columns.index(c) for c in self.lag_columns]]
+        for lag in self.lags:
+            features[..., f:f + len(self.lag_columns)] = shift(lagged, lag)
+            f += len(self.lag_columns)
+
+        performance = history.column('performance_score')
+        spend = history.column('spend')
+        for window in self.windows:
+            stats = rolling(performance, window)
+            features[..., f] = stats['mean']
+            features[..., f + 1] = stats['std']
+            features[..., f + 2] = rolling(spend, window)['sum']
+            f += 3
+
+        days = history.timestamps.astype('datetime64[D]')
+        features[..., f] = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        features[..., f + 1] = (history.timestamps - days).astype('timedelta64[h]').astype(np.int64)
+        features[~history.mask] = 0.0
+        np.nan_to_num(features, copy=False, nan=0.0)
+
+        result = FeatureSet(features, self.names, history.campaign_ids, history.timestamps, history.lengths)
+        if refresh_key is not None:
+            self._cached_key, self._cached = refresh_key, result
+        return result
@@ -0,0 +1,582 @@
+"""
+ADFLOWAI - Portfolio Forecaster
+Vectorized damped-trend Holt smoothing and lag-feature ridge regression, fitted in closed form
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd  # imported where used, like src.ml.features
+
+from src.ml.features import lag_features
+from src.ml.intervals import BootstrapIntervals
+
+logger = logging.getLogger(__name__)
+
+# Daily series forecast for every campaign
+TARGETS = ('performance_score', 'ctr', 'spend', 'conversions', 'roi')
+# Summed (rather than averaged) when several rows fall on the same day
+SUMMED_TARGETS = ('spend', 'conversions')
+# Clip ranges applied to forecasts
+TARGET_BOUNDS = {'performance_score': (0.0, 1.0)}
+
+ALPHA_GRID = (0.1, 0.2, 0.3, 0.5, 0.7)
+BETA_GRID = (0.05, 0.1, 0.2, 0.4)
+DAMPING = 0.98
+
+
+def holt_filter(
+    Y: np.ndarray,
+    alpha,
+    beta,
+    phi: float = DAMPING,
+    level: Optional[np.ndarray] = None,
+    trend: Optional[np.ndarray] = None,
+    return_errors: bool = False
+):
+    """
+    Run the damped-trend Holt recursion (error-correction form) over a batch
+
+        e_t = y_t - (l + phi * b)
+        l   = l + phi * b + alpha * e_t
+        b   = phi * b + alpha * beta * e_t
+
+    NaN observations are skipped; a series starts at its first observation.
+
+    Args:
+        Y: Observations, shape (n, T, m)
+        alpha, beta: Smoothing parameters broadcastable against (n, m),
+            e.g. (G, 1, 1) to evaluate a grid of G parameter pairs at once
+        phi: Trend damping factor
+        level, trend: Starting state (defaults to "not started")
+        return_errors: Also return the one-step errors, shape (..., n, T, m)
+
+    Returns:
+        Tuple of (level, trend, sse, count[, errors])
+    """
+    n, T, m = Y.shape
+    shape = np.broadcast_shapes(np.shape(alpha), np.shape(beta), (n, m))
+    level = np.full(shape, np.nan) if level is None else np.broadcast_to(level, shape).astype(float)
+    trend = np.zeros(shape) if trend is None else np.broadcast_to(trend, shape).astype(float)
+    trend = np.where(np.isnan(trend), 0.0, trend)
+    sse = np.zeros(shape)
+    count = np.zeros(shape)
+    errors = np.full((T,) + shape, np.nan) if return_errors else None
+    gain_trend = alpha * beta
+
+    for t in range(T):
+        y = Y[:, t, :]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level)
+        step = observed & started
+        predicted = level + phi * trend
+        err = np.where(step, y - predicted, 0.0)
+        level = np.where(step, predicted + alpha * err, np.where(observed, y, level))
+        trend = np.where(step, phi * trend + gain_trend * err, trend)
+        sse += err * err
+        count += step
+        if return_errors:
+            errors[t] = np.where(step, err, np.nan)
+
+    if return_errors:
+        return level, trend, sse, count, np.moveaxis(errors, 0, -2)
+    return level, trend, sse, count
+
+
+def fit_holt(
+    Y: np.ndarray,
+    alphas: Sequence[float] = ALPHA_GRID,
+    betas: Sequence[float] = BETA_GRID,
+    phi: float = DAMPING
+) -> Dict[str, np.ndarray]:
+    """
+    Pick (alpha, beta) per series by one-step-ahead SSE over a parameter grid
+
+    The whole grid is evaluated in one pass of the recursion.
+
+    Args:
+        Y: Observations, shape (n, T, m)
+
+    Returns:
+        Dict of (n, m) arrays: alpha, beta, level, trend, sse, count
+    """
+    grid_alpha, grid_beta = (g.ravel() for g in np.meshgrid(alphas, betas, indexing='ij'))
+    level, trend, sse, count = holt_filter(
+        Y, grid_alpha[:, None, None], grid_beta[:, None, None], phi
+    )
+    mse = np.where(count > 0, sse / np.maximum(count, 1), np.inf)
+    best = np.argmin(mse, axis=0)[None]
+
+    def pick(values):
+        return np.take_along_axis(np.broadcast_to(values, mse.shape), best, axis=0)[0]
+
+    return {
+        'alpha': grid_alpha[best[0]],
+        'beta': grid_beta[best[0]],
+        'level': pick(level),
+        'trend': pick(trend),
+        'sse': pick(sse),
+        'count': pick(count),
+    }
+
+
+def holt_forecast(level: np.ndarray, trend: np.ndarray, horizon: int, phi: float = DAMPING) -> np.ndarray:
+    """Damped-trend forecast, shape (n, horizon, m) from (n, m) states"""
+    damping = np.cumsum(phi ** np.arange(1, horizon + 1))
+    return level[:, None, :] + damping[None, :, None] * trend[:, None, :]
+
+
+def ridge_statistics(X: np.ndarray, Y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sufficient statistics X'X, X'y and row counts per series, skipping incomplete rows
+
+    Args:
+        X: Design, shape (n, T, m, k)
+        Y: Targets, shape (n, T, m)
+
+    Returns:
+        Tuple of xtx (n, m, k, k), xty (n, m, k), rows (n, m)
+    """
+    valid = ~np.isnan(Y) & ~np.isnan(X).any(axis=-1)
+    Xv = np.where(valid[..., None], X, 0.0)
+    Yv = np.where(valid, Y, 0.0)
+    xtx = np.einsum('ntmk,ntml->nmkl', Xv, Xv)
+    xty = np.einsum('ntmk,ntm->nmk', Xv, Yv)
+    return xtx, xty, valid.sum(axis=1)
+
+
+def ridge_solve(xtx: np.ndarray, xty: np.ndarray, penalty: float) -> np.ndarray:
+    """
+    Closed-form ridge weights for a batch of systems
+
+    The penalty is relative to each feature's own X'X diagonal, so it is
+    scale-free across metrics (ctr ~ 0.02 vs spend ~ 100); the intercept
+    is not penalised.
+    """
+    k = xtx.shape[-1]
+    diagonal = np.diagonal(xtx, axis1=-2, axis2=-1)
+    scale = np.concatenate([np.full(diagonal.shape[:-1] + (1,), 1e-9), penalty * diagonal[..., 1:] + 1e-9], axis=-1)
+    A = xtx + scale[..., None] * np.eye(k)
+    return np.linalg.solve(A, xty[..., None])[..., 0]
+
+
+class _CampaignState:
+    """Cached fit for one campaign (all arrays are per target)"""
+    __slots__ = ('history', 'last_date', 'alpha', 'beta', 'level', 'trend',
+                 'holt_sse', 'holt_count', 'xtx', 'xty', 'rows', 'weights',
+                 'ridge_sse', 'ridge_count', 'since_refit')
+
+
+class PortfolioForecaster:
+    """
+    Forecasts daily campaign metrics for many campaigns at once
+
+    Two models per (campaign, metric), combined by inverse in-sample MSE:
+    - Damped-trend Holt smoothing, parameters picked from a grid per series
+    - Ridge regression on lag / rolling-mean features, solved in closed form
+
+    Fitted state is cached per campaign. New history is absorbed incrementally
+    (Holt state is filtered forward, ridge sufficient statistics are extended),
+    with a full re-fit of the smoothing parameters every ``refit_every`` days.
+    """
+
+    def __init__(
+        self,
+        targets: Sequence[str] = TARGETS,
+        lags: Sequence[int] = (1, 2, 7),
+        window: int = 7,
+        ridge_penalty: float = 0.1,
+        refit_every: int = 30,
+        history_size: int = 400,
+        chunk_size: int = 1024,
+        phi: float = DAMPING
+    ):
+        self.targets = tuple(targets)
+        self.lags = tuple(lags)
+        self.window = window
+        self.ridge_penalty = ridge_penalty
+        self.refit_every = refit_every
+        self.history_size = history_size
+        self.chunk_size = chunk_size
+        self.phi = phi
+        self.context = max(max(self.lags), self.window)
+        self.n_features = len(self.lags) + 2
+        self.bootstrap = BootstrapIntervals(phi=phi)
+        self._states: Dict[int, _CampaignState] = {}
+
+    def __contains__(self, campaign_id: int) -> bool:
+        return campaign_id in self._states
+
+    def forget(self, campaign_id: int):
+        self._states.pop(campaign_id, None)
+
+    # ── Data preparation ─────────────────────────────────────────────────────
+
+    def _frame_arrays(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Days (datetime64[D]) and target values (NaN where a column is missing) of a frame"""
+        import pandas as pd
+
+        days = pd.to_datetime(data['date']).to_numpy().astype('datetime64[D]')
+        values = np.full((len(data), len(self.targets)), np.nan)
+        for j, target in enumerate(self.targets):
+            if target in data:
+                values[:, j] = pd.to_numeric(data[target], errors='coerce').to_numpy(dtype=float)
+        return days, values
+
+    def _collapse_days(self, days: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        One row per calendar day from rows sorted by day: mean, or sum for
+        SUMMED_TARGETS, and NaN on days without rows
+        """
+        if len(days) > 1 and not (days[1:] > days[:-1]).all():
+            unique, starts = np.unique(days, return_index=True)
+            observed = ~np.isnan(values)
+            sums = np.add.reduceat(np.where(observed, values, 0.0), starts, axis=0)
+            seen = np.add.reduceat(observed, starts, axis=0)
+            summed = np.array([t in SUMMED_TARGETS for t in self.targets])
+            collapsed = np.where(summed, sums, sums / np.maximum(seen, 1))
+            days, values = unique, np.where(seen > 0, collapsed, np.nan)
+        return self._fill_calendar(days, values)
+
+    @staticmethod
+    def _fill_calendar(days: np.ndarray, values: np.ndarray, after=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Reindex unique sorted days onto a contiguous daily calendar
+
+        Lags and rolling means count rows, so a missing day would otherwise
+        pair each value with the wrong lag. Missing days become NaN rows: the
+        ridge design skips rows whose lags touch them and Holt steps over them.
+
+        Args:
+            after: Last day already seen; the calendar starts the day after it
+        """
+        if not len(days):
+            return days, values
+        one_day = np.timedelta64(1, 'D')
+        first = days[0] if after is None else after + one_day
+        calendar = np.arange(first, days[-1] + one_day)
+        if len(calendar) == len(days):
+            return days, values
+        filled = np.full((len(calendar), values.shape[1]), np.nan)
+        filled[(days - first).astype(int)] = values
+        return calendar, filled
+
+    def daily_values(self, data: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Collapse a history frame to one row per calendar day
+
+        Returns:
+            Tuple of (contiguous dates as datetime64[D], values (T, m) with NaN
+            for missing metrics and missing days)
+        """
+        if data is None or len(data) == 0 or 'date' not in data:
+            return np.empty(0, dtype='datetime64[D]'), np.empty((0, len(self.targets)))
+        days, values = self._frame_arrays(data)
+        order = np.argsort(days, kind='stable')
+        return self._collapse_days(days[order], values[order])
+
+    def split_portfolio(self, data: pd.DataFrame) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Split one long history frame (with a campaign_id column) into daily series
+
+        Much cheaper than building a frame per campaign for a portfolio-wide run.
+
+        Returns:
+            campaign_id -> (dates, values), ready for fit()
+        """
+        if len(data) == 0:
+            return {}
+        days, values = self._frame_arrays(data)
+        campaign_ids = data['campaign_id'].to_numpy()
+        order = np.lexsort((days, campaign_ids))
+        days, values, campaign_ids = days[order], values[order], campaign_ids[order]
+
+        ids, starts = np.unique(campaign_ids, return_index=True)
+        ends = np.append(starts[1:], len(campaign_ids))
+        return {
+            int(campaign_id): self._collapse_days(days[start:end], values[start:end])
+            for campaign_id, start, end in zip(ids, starts, ends)
+        }
+
+    @staticmethod
+    def _stack(series: List[np.ndarray], m: int) -> np.ndarray:
+        """Right-pad (T_i, m) arrays with NaN into one (n, T, m) batch"""
+        length = max((len(s) for s in series), default=0)
+        batch = np.full((len(series), length, m), np.nan)
+        for i, values in enumerate(series):
+            batch[i, :len(values)] = values
+        return batch
+
+    # ── Fitting ──────────────────────────────────────────────────────────────
+
+    def observe(self, campaign_id: int, data: pd.DataFrame):
+        """Fit or incrementally update one campaign from its history frame"""
+        self.observe_many({campaign_id: data})
+
+    def observe_many(self, histories: Dict[int, pd.DataFrame]):
+        """
+        Fit new campaigns and absorb only unseen days for cached ones
+
+        Args:
+            histories: campaign_id -> history frame with a 'date' column and
+                any of the target columns
+        """
+        self.observe_series({c: self.daily_values(data) for c, data in histories.items()})
+
+    def observe_series(self, series: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        """
+        observe_many() for already-prepared (dates, values) series
+
+        The last cached day may have been partial (observed mid-day); if the
+        series now has a different value for it, the campaign is re-fitted
+        from its cached history with that day replaced, since the Holt state
+        and ridge statistics have already absorbed the old value.
+        """
+        fresh, updates = {}, {}
+        for campaign_id, (dates, values) in series.items():
+            if not len(dates):
+                continue
+            state = self._states.get(campaign_id)
+            if state is None:
+                fresh[campaign_id] = (dates, values)
+                continue
+            last = np.searchsorted(dates, state.last_date)
+            if (last < len(dates) and dates[last] == state.last_date
+                    and not np.array_equal(values[last], state.history[-1], equal_nan=True)):
+                days, tail = self._fill_calendar(dates[last:], values[last:])
+                fresh[campaign_id] = (days, np.vstack([state.history[:-1], tail]))
+                continue
+            new = dates > state.last_date
+            if new.any():
+                updates[campaign_id] = self._fill_calendar(dates[new], values[new], after=state.last_date)
+
+        if fresh:
+            self.fit(fresh)
+        if updates:
+            self.update(updates)
+
+    def fit(self, series: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        """
+        Full fit from scratch for a batch of campaigns
+
+        Args:
+            series: campaign_id -> (dates, values (T, m))
+        """
+        ids = list(series)
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            histories = [series[c][1][-self.history_size:] for c in chunk]
+            Y = self._stack(histories, len(self.targets))
+
+            holt = fit_holt(Y, phi=self.phi)
+            X = lag_features(Y, self.lags, self.window)
+            xtx, xty, rows = ridge_statistics(X, Y)
+            weights = ridge_solve(xtx, xty, self.ridge_penalty)
+            ridge_sse, ridge_count = self._residuals(X, Y, weights)
+
+            for i, campaign_id in enumerate(chunk):
+                state = _CampaignState()
+                state.history = histories[i]
+                state.last_date = series[campaign_id][0][-1]
+                state.alpha, state.beta = holt['alpha'][i], holt['beta'][i]
+                state.level, state.trend = holt['level'][i], holt['trend'][i]
+                state.holt_sse, state.holt_count = holt['sse'][i], holt['count'][i]
+                state.xtx, state.xty, state.rows = xtx[i], xty[i], rows[i]
+                state.weights = weights[i]
+                state.ridge_sse, state.ridge_count = ridge_sse[i], ridge_count[i]
+                state.since_refit = 0
+                self._states[campaign_id] = state
+
+    def update(self, series: Dict[int, Tuple[np.ndarray, np.ndarray]]):
+        """
+        Absorb new days for already-fitted campaigns
+
+        Holt states are filtered forward with the cached parameters and the
+        ridge sufficient statistics are extended with the new rows, so the cost
+        is proportional to the new data. Campaigns due for a re-fit are re-fitted
+        from their cached history.
+        """
+        ids = [c for c in series if c in self._states]
+        refit = {}
+        for start in range(0, len(ids), self.chunk_size):
+            chunk = ids[start:start + self.chunk_size]
+            states = [self._states[c] for c in chunk]
+            new_values = [series[c][1] for c in chunk]
+            m = len(self.targets)
+
+            # Holt: continue the recursion from the cached state
+            Y_new = self._stack(new_values, m)
+            level, trend, sse, count = holt_filter(
+                Y_new,
+                np.stack([s.alpha for s in states]),
+                np.stack([s.beta for s in states]),
+                self.phi,
+                level=np.stack([s.level for s in states]),
+                trend=np.stack([s.trend for s in states])
+            )
+
+            # Ridge: design rows for the new days need the trailing context
+            context = [s.history[-self.context:] for s in states]
+            padded = [np.vstack([np.full((self.context - len(c), m), np.nan), c, v])
+                      for c, v in zip(context, new_values)]
+            Y_ctx = self._stack(padded, m)
+            X = lag_features(Y_ctx, self.lags, self.window)[:, self.context:]
+            Y_ctx = Y_ctx[:, self.context:]
+            xtx, xty, rows = ridge_statistics(X, Y_ctx)
+            old_weights = np.stack([s.weights for s in states])
+            ridge_sse, ridge_count = self._residuals(X, Y_ctx, old_weights)
+
+            xtx += np.stack([s.xtx for s in states])
+            xty += np.stack([s.xty for s in states])
+            weights = ridge_solve(xtx, xty, self.ridge_penalty)
+
+            for i, (campaign_id, state) in enumerate(zip(chunk, states)):
+                state.history = np.vstack([state.history, new_values[i]])[-self.history_size:]
+                state.last_date = series[campaign_id][0][-1]
+                state.level, state.trend = level[i], trend[i]
+                state.holt_sse = state.holt_sse + sse[i]
+                state.holt_count = state.holt_count + count[i]
+                state.xtx, state.xty, state.rows = xtx[i], xty[i], state.rows + rows[i]
+                state.weights = weights[i]
+                state.ridge_sse = state.ridge_sse + ridge_sse[i]
+                state.ridge_count = state.ridge_count + ridge_count[i]
+                state.since_refit += len(new_values[i])
+                if state.since_refit >= self.refit_every:
+                    refit[campaign_id] = (np.array([state.last_date]), state.history)
+
+        if refit:
+            logger.info(f"Re-fitting smoothing parameters for {len(refit)} campaigns")
+            self.fit(refit)
+
+    @staticmethod
+    def _residuals(X: np.ndarray, Y: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        fitted = np.einsum('ntmk,nmk->ntm', X, weights)
+        residuals = Y - fitted
+        valid = ~np.isnan(residuals)
+        return np.where(valid, residuals * residuals, 0.0).sum(axis=1), valid.sum(axis=1)
+
+    # ── Forecasting ──────────────────────────────────────────────────────────
+
+    def forecast(self, campaign_ids: Iterable[int], horizon: int) -> np.ndarray:
+        """
+        Forecast cached campaigns
+
+        Args:
+            campaign_ids: Campaigns to forecast (must have been observed)
+            horizon: Number of days ahead
+
+        Returns:
+            Array (n, horizon, m); NaN for metrics a campaign never reported
+        """
+        states = [self._states[c] for c in campaign_ids]
+        if not states:
+            return np.empty((0, horizon, len(self.targets)))
+        m = len(self.targets)
+
+        level = np.stack([s.level for s in states])
+        trend = np.stack([s.trend for s in states])
+        holt = holt_forecast(level, trend, horizon, self.phi)
+
+        # Ridge: recursive multi-step forecast, feeding predictions back as lags
+        weights = np.stack([s.weights for s in states])
+        rows = np.stack([s.rows for s in states])
+        buffer = self._stack(
+            [np.vstack([np.full((max(0, self.context - len(s.history)), m), np.nan), s.history[-self.context:]])
+             for s in states],
+            m
+        )
+        ridge = np.empty_like(holt)
+        for h in range(horizon):
+            features = [np.ones(level.shape)] + [buffer[:, -lag] for lag in self.lags]
+            features.append(buffer[:, -self.window:].mean(axis=1))
+            prediction = (np.stack(features, axis=-1) * weights).sum(axis=-1)
+            prediction = np.where(np.isnan(prediction), holt[:, h], prediction)
+            ridge[:, h] = prediction
+            buffer = np.concatenate([buffer[:, 1:], prediction[:, None]], axis=1)
+
+        # Inverse-MSE weighting; ridge needs a few complete rows to count
+        holt_mse = np.stack([s.holt_sse / np.maximum(s.holt_count, 1) for s in states])
+        ridge_mse = np.stack([s.ridge_sse / np.maximum(s.ridge_count, 1) for s in states])
+        eps = 1e-12
+        w_holt = 1.0 / (holt_mse + eps)
+        w_ridge = np.where(rows > self.n_features, 1.0 / (ridge_mse + eps), 0.0)
+        total = w_holt + w_ridge
+        combined = (w_holt[:, None] * holt + w_ridge[:, None] * ridge) / total[:, None]
+
+        return self._clip(combined)
+
+    def intervals(
+        self,
+        campaign_ids: Sequence[int],
+        horizon: int,
+        quantiles: Sequence[float] = (0.025, 0.975),
+        point: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Empirical prediction intervals around the forecast
+
+        Holt paths are simulated by residual bootstrap (see BootstrapIntervals)
+        and their quantile deviations are applied to the point forecast.
+
+        Args:
+            campaign_ids: Campaigns to forecast (must have been observed)
+            horizon: Number of days ahead
+            quantiles: Quantile levels, e.g. (0.025, 0.975) for a 95% band
+            point: Point forecast from forecast() if already computed
+
+        Returns:
+            Array (len(quantiles), n, horizon, m)
+        """
+        campaign_ids = list(campaign_ids)
+        states = [self._states[c] for c in campaign_ids]
+        if not states:
+            return np.empty((len(quantiles), 0, horizon, len(self.targets)))
+        if point is None:
+            point = self.forecast(campaign_ids, horizon)
+
+        alpha = np.stack([s.alpha for s in states])
+        beta = np.stack([s.beta for s in states])
+        history = self._stack([s.history for s in states], len(self.targets))
+        # Replaying the history with the cached parameters reproduces the in-sample errors
+        _, _, _, _, errors = holt_filter(history, alpha, beta, self.phi, return_errors=True)
+        missing = np.isnan(errors)
+        pool = np.take_along_axis(errors, np.argsort(missing, axis=1, kind='stable'), axis=1)
+        counts = (~missing).sum(axis=1)
+
+        deviations = self.bootstrap.quantiles(
+            alpha, beta, pool, counts, horizon, quantiles, keys=campaign_ids
+        )
+        return self._clip(point[None] + deviations)
+
+    def _clip(self, values: np.ndarray) -> np.ndarray:
+        for j, target in enumerate(self.targets):
+            low, high = TARGET_BOUNDS.get(target, (0.0, np.inf))
+            values[..., j] = np.clip(values[..., j], low, high)
+        return values
+
+    def accuracy(self, campaign_id: int, target: str = 'performance_score') -> Optional[float]:
+        """1 - in-sample one-step RMSE relative to the series' mean level"""
+        state = self._states.get(campaign_id)
+        if state is None:
+            return None
+        j = self.targets.index(target)
+        if state.holt_count[j] == 0:
+            return None
+        scale = np.nanmean(np.abs(state.history[:, j]))
+        if not scale:
+            return None
+        rmse = np.sqrt(state.holt_sse[j] / state.holt_count[j])
+        return float(np.clip(1.0 - rmse / scale, 0.0, 1.0))
+
+    def last_date(self, campaign_id: int) -> Optional[datetime]:
+        state = self._states.get(campaign_id)
+        if state is None:
+            return None
+        import pandas as pd
+        return pd.Timestamp(state.last_date).to_pydatetime()
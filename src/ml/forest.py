@@ -0,0 +1,236 @@
+"""
+ADFLOWAI - Compiled Forest Inference
+Flat NumPy export of a trained RandomForestRegressor and a batched traversal kernel
+
+Usage:
+    python -m src.ml.forest --rows 10000 --trees 100 --depth 10
+"""
+
+import argparse
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_MAX_CHUNK_BYTES = 2 * 1024 * 1024
+
+
+@dataclass
+class CompiledForest:
+    """
+    Every tree of a fitted forest packed into one set of node arrays
+
+    Node ``i`` sends a sample to ``children[i]`` when
+    ``x[feature[i]] <= threshold[i]`` and to ``children[i] + 1`` otherwise
+    (siblings are stored next to each other). Leaves point at themselves
+    with an infinite threshold, so a fixed ``depth`` of steps lands every
+    sample on its leaf without tracking which samples are done.
+    """
+    feature: np.ndarray          # (nodes,) intp
+    threshold: np.ndarray        # (nodes,) float32
+    children: np.ndarray         # (nodes,) intp, global index of the left child
+    missing_right: np.ndarray    # (nodes,) bool: a NaN feature value goes right
+    value: np.ndarray            # (nodes,) float64 leaf prediction
+    roots: np.ndarray            # (trees,) intp
+    depth: int
+    n_features: int
+    route: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Child index and feature packed into one word: one gather per step instead of two
+        self.feature_bits = max(1, (self.n_features - 1).bit_length())
+        self.route = (self.children << self.feature_bits) | self.feature
+
+    @classmethod
+    def from_sklearn(cls, model) -> 'CompiledForest':
+        """
+        Export a fitted single-output RandomForestRegressor (or any forest of
+        sklearn regression trees exposing ``estimators_``)
+
+        Raises:
+            ValueError: If the model is not a fitted single-output tree ensemble
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not estimators or getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Expected a fitted single-output tree ensemble")
+
+        trees = [estimator.tree_ for estimator in estimators]
+        counts = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        left = np.concatenate([np.where(t.children_left < 0, -1, t.children_left + o) for t, o in zip(trees, offsets)])
+        right = np.concatenate([np.where(t.children_right < 0, -1, t.children_right + o) for t, o in zip(trees, offsets)])
+        feature = np.concatenate([t.feature for t in trees])
+        threshold = np.concatenate([t.threshold for t in trees])
+        missing_left = np.concatenate([
+            getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8)) for t in trees
+        ]).astype(bool)
+        value = np.concatenate([t.value[:, 0, 0] for t in trees])
+
+        # Renumber level by level across all trees, so each traversal step reads
+        # one contiguous block, with the two children of a split side by side
+        internal = left >= 0
+        level = np.zeros(len(left), dtype=np.intp)
+        frontier, depth = offsets, 0
+        while frontier.size:
+            level[frontier] = depth
+            frontier = frontier[internal[frontier]]
+            frontier = np.concatenate([left[frontier], right[frontier]])
+            depth += 1
+        parents = np.flatnonzero(internal)
+        parents = parents[np.argsort(level[parents], kind='stable')]
+        rank = np.empty(len(left), dtype=np.intp)
+        rank[parents] = np.arange(len(parents))
+        position = np.empty(len(left), dtype=np.intp)
+        position[offsets] = np.arange(len(trees))
+        position[left[internal]] = len(trees) + 2 * rank[internal]
+        position[right[internal]] = len(trees) + 2 * rank[internal] + 1
+        order = np.empty_like(position)
+        order[position] = np.arange(len(position))
+
+        leaf = ~internal[order]
+        children = np.where(leaf, np.arange(len(order)), position[np.where(internal, left, 0)][order])
+
+        # sklearn compares float32 features with float64 thresholds; for a
+        # float32 x, x <= t exactly when x <= t rounded down to float32
+        rounded = threshold[order].astype(np.float32)
+        above = rounded.astype(np.float64) > threshold[order]
+        rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+        rounded[leaf] = np.inf
+
+        return cls(
+            feature=np.where(leaf, 0, feature[order]).astype(np.intp),
+            threshold=rounded,
+            children=children.astype(np.intp),
+            missing_right=~missing_left[order] & ~leaf,
+            value=value[order].astype(np.float64),
+            roots=np.arange(len(trees), dtype=np.intp),
+            depth=int(max(tree.max_depth for tree in trees)),
+            n_features=int(model.n_features_in_)
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X, max_chunk_bytes: int = DEFAULT_MAX_CHUNK_BYTES) -> np.ndarray:
+        """
+        Forest prediction for a batch, identical to ``model.predict(X)``
+
+        Features are compared in float32 and tree outputs are summed in tree
+        order, exactly as sklearn does, so results match bit for bit.
+
+        Args:
+            X: Features, shape (n, n_features)
+            max_chunk_bytes: Bound on each (trees, rows) working array; small
+                enough to stay in cache is fastest
+
+        Returns:
+            Predictions, shape (n,)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected features of shape (n, {self.n_features}), got {X.shape}")
+
+        predictions = np.empty(len(X))
+        chunk = max(1, max_chunk_bytes // (self.n_trees * 8))
+        for start in range(0, len(X), chunk):
+            predictions[start:start + chunk] = self._predict_chunk(X[start:start + chunk])
+        return predictions
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        rows, width = X.shape
+        flat = X.ravel()
+        offsets = np.arange(rows, dtype=np.intp) * width
+        check_missing = np.isnan(flat).any()
+
+        # Preallocated buffers; mode='clip' skips bounds checks (indices are valid by construction)
+        node = np.repeat(self.roots[:, None], rows, axis=1)          # (trees, rows)
+        route = np.empty_like(node)
+        index = np.empty_like(node)
+        x = np.empty(node.shape, dtype=np.float32)
+        threshold = np.empty(node.shape, dtype=np.float32)
+        go_right = np.empty(node.shape, dtype=bool)
+        feature_mask = (1 << self.feature_bits) - 1
+        for _ in range(self.depth):
+            np.take(self.threshold, node, out=threshold, mode='clip')
+            np.take(self.route, node, out=route, mode='clip')
+            np.bitwise_and(route, feature_mask, out=index)
+            index += offsets
+            np.take(flat, index, out=x, mode='clip')
+            np.greater(x, threshold, out=go_right)
+            if check_missing:
+                go_right |= np.isnan(x) & self.missing_right[node]
+            np.right_shift(route, self.feature_bits, out=node)
+            node += go_right
+
+        leaves = self.value[node]
+        total = np.zeros(rows)
+        for tree_values in leaves:
+            total += tree_values
+        return total / self.n_trees
+
+
+def benchmark(model, X: np.ndarray, repeats: int = 5) -> Dict[str, float]:
+    """
+    Best-of-``repeats`` latency of sklearn vs compiled prediction, single row and batch
+
+    Returns:
+        Timings in milliseconds and whether the outputs were identical
+    """
+    compiled = CompiledForest.from_sklearn(model)
+
+    def best(fn, *args):
+        times = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - started)
+        return min(times) * 1000.0
+
+    single = X[:1]
+    return {
+        'rows': len(X),
+        'trees': compiled.n_trees,
+        'depth': compiled.depth,
+        'sklearn_single_ms': best(model.predict, single),
+        'compiled_single_ms': best(compiled.predict, single),
+        'sklearn_batch_ms': best(model.predict, X),
+        'compiled_batch_ms': best(compiled.predict, X),
+        'identical': bool(np.array_equal(model.predict(X), compiled.predict(X)))
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from sklearn.ensemble import RandomForestRegressor
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--trees', type=int, default=100)
+    parser.add_argument('--depth', type=int, default=10)
+    parser.add_argument('--train-rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    X = rng.normal(size=(args.train_rows + args.rows, 10))
+    y = np.tanh(X[:, 0] + 0.5 * X[:, 3] * X[:, 4]) + rng.normal(0, 0.1, len(X))
+    model = RandomForestRegressor(n_estimators=args.trees, max_depth=args.depth, random_state=42)
+    model.fit(X[:args.train_rows], y[:args.train_rows])
+
+    result = benchmark(model, X[args.train_rows:])
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['trees']} trees, depth {result['depth']}, {result['rows']} rows "
+          f"(identical: {result['identical']})")
+    print(f"{'':>10} {'sklearn':>12} {'compiled':>12}")
+    print(f"{'1 row':>10} {result['sklearn_single_ms']:>10.3f}ms {result['compiled_single_ms']:>10.3f}ms")
+    print(f"{str(result['rows']) + ' rows':>10} {result['sklearn_batch_ms']:>10.3f}ms "
+          f"{result['compiled_batch_ms']:>10.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
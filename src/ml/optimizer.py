@@ -4,17 +4,60 @@ Machine Learning models for campaign performance prediction and optimization
 """
 
 import logging
+import os
+import time
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
 from dataclasses import dataclass
 
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingClassifier
-from sklearn.preprocessing import StandardScaler
-import joblib
+from prometheus_client import Histogram
+
+from src.ml.budget_allocation import DEFAULT_ELASTICITY, allocate
+from src.ml.forest import CompiledForest
+from src.ml.training import load_latest_artifact
+from src.ml.trends import TREND_WINDOW, least_squares_slopes
 
 logger = logging.getLogger(__name__)
 
+SCORING_BATCH_SIZE = Histogram(
+    'adflowai_optimizer_batch_size', 'Rows scored per AIOptimizer batch',
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+)
+SCORING_DURATION = Histogram(
+    'adflowai_optimizer_scoring_seconds', 'AIOptimizer batch scoring latency',
+    ['predictor'], buckets=(.0001, .0005, .001, .0025, .005, .01, .025, .05, .1, .5)
+)
+
+
+def rule_based_scores(
+    ctr: np.ndarray,
+    roas: np.ndarray,
+    conversion_rate: np.ndarray,
+    budget_used_ratio: np.ndarray
+) -> np.ndarray:
+    """
+    Vectorized ``AIOptimizer._rule_based_performance`` for arrays of campaigns
+
+    Args:
+        ctr, roas, conversion_rate, budget_used_ratio: Broadcastable metric arrays
+
+    Returns:
+        Performance scores in [0, 1]
+    """
+    ctr, roas, conversion_rate, budget_used_ratio = (
+        np.asarray(a, dtype=float) for a in (ctr, roas, conversion_rate, budget_used_ratio)
+    )
+    # Same tiers as the scalar rules, written as sums of threshold steps
+    score = (
+        0.5
+        + 0.05 * (ctr > 0.01) + 0.05 * (ctr > 0.02) + 0.05 * (ctr > 0.03) - 0.15 * (ctr < 0.005)
+        + 0.10 * (roas > 2.0) + 0.05 * (roas > 3.0) + 0.05 * (roas > 4.0) - 0.20 * (roas < 1.0)
+        + 0.05 * (conversion_rate > 0.03) + 0.05 * (conversion_rate > 0.05) - 0.10 * (conversion_rate < 0.01)
+        + 0.05 * ((budget_used_ratio >= 0.3) & (budget_used_ratio <= 0.8)) - 0.05 * (budget_used_ratio > 0.95)
+    )
+    return np.clip(score, 0.0, 1.0)
+
 
 @dataclass
 class OptimizationRecommendation:
@@ -27,6 +70,65 @@ class OptimizationRecommendation:
     platform_allocations: Optional[Dict[str, float]] = None
 
 
+class RecommendationContext:
+    """
+    Scores for one campaign's recommendation pass, computed once
+    
+    The campaign, its history rows and its platforms are featurized together
+    and scored in a single batched model call on first use; every decision
+    rule then reads the memoized scores instead of calling the model again.
+    History rows that carry the ``performance_score`` recorded at the time
+    keep it and are not re-scored.
+    """
+    
+    def __init__(
+        self,
+        optimizer: 'AIOptimizer',
+        campaign_data: Dict,
+        platform_data: Optional[Dict[str, Dict]] = None,
+        history: Optional[List[Dict]] = None
+    ):
+        self.optimizer = optimizer
+        self.campaign_data = campaign_data
+        self.platform_data = platform_data or {}
+        self.history = history or []
+        self._scores: Optional[np.ndarray] = None
+    
+    @property
+    def scores(self) -> np.ndarray:
+        """Scores of every row: campaign, then history, then platforms"""
+        if self._scores is None:
+            stored = np.array([
+                float(h['performance_score']) if isinstance(h.get('performance_score'), (int, float)) else np.nan
+                for h in self.history
+            ])
+            unscored = [h for h, score in zip(self.history, stored) if np.isnan(score)]
+            rows = [self.campaign_data] + unscored + list(self.platform_data.values())
+            predicted = self.optimizer.predict_performance_batch(rows)
+            
+            history = stored.copy()
+            history[np.isnan(stored)] = predicted[1:1 + len(unscored)]
+            self._scores = np.concatenate([predicted[:1], history, predicted[1 + len(unscored):]])
+        return self._scores
+    
+    @property
+    def campaign_score(self) -> float:
+        return float(self.scores[0])
+    
+    def history_scores(self, last: Optional[int] = None) -> np.ndarray:
+        """Scores of the history rows (only the final ``last`` rows if given)"""
+        scores = self.scores[1:1 + len(self.history)]
+        return scores[-last:] if last else scores
+    
+    @property
+    def platform_scores(self) -> Dict[str, float]:
+        offset = 1 + len(self.history)
+        return {
+            platform: float(score)
+            for platform, score in zip(self.platform_data, self.scores[offset:])
+        }
+
+
 class AIOptimizer:
     """
     AI-powered campaign optimization engine
@@ -48,12 +150,16 @@ class AIOptimizer:
         self.model_path = model_path
         self.performance_model = None
         self.pause_classifier = None
-        self.scaler = StandardScaler()
+        self._compiled_model = None      # CompiledForest of performance_model, built on first use
+        self._compiled_source = None
+        self.model_metadata: Optional[Dict] = None
+        self.scaler = None  # fitted StandardScaler, set with performance_model
         
         # Thresholds (can be configured)
         self.high_performance_threshold = 0.8
         self.low_performance_threshold = 0.3
         self.min_data_points = 10
+        self.min_platform_share = 0.10  # Testing floor per platform (capped at half the budget overall)
         
         logger.info("AI Optimizer initialized")
     
@@ -67,23 +173,65 @@ class AIOptimizer:
         Returns:
             Performance score between 0 and 1
         """
-        try:
-            features = self._extract_features(campaign_data)
+        return float(self.predict_performance_batch([campaign_data])[0])
+    
+    def predict_performance_batch(self, rows: Sequence[Dict]) -> np.ndarray:
+        """
+        Predict performance scores for many campaign / platform dicts in one model call
+        
+        Rows whose features can't be extracted (missing or non-numeric values)
+        get the neutral score 0.5, as a failed single prediction would.
+        
+        Args:
+            rows: Metric dictionaries
             
+        Returns:
+            Array of scores between 0 and 1
+        """
+        scores = np.full(len(rows), 0.5)
+        if not len(rows):
+            return scores
+        started = time.perf_counter()
+        SCORING_BATCH_SIZE.observe(len(rows))
+        features, numeric = self._feature_matrix(rows)
+        
+        try:
             if self.performance_model is None:
-                # Use rule-based prediction if no trained model
-                return self._rule_based_performance(campaign_data)
-            
-            # ML-based prediction
-            features_scaled = self.scaler.transform([features])
-            score = self.performance_model.predict(features_scaled)[0]
-            
-            # Ensure score is between 0 and 1
-            return max(0.0, min(1.0, score))
-            
+                # Rule-based prediction needs ctr, roas, conversion rate and budget use
+                valid = numeric[:, [0, 3, 4, 5]].all(axis=1)
+                if valid.any():
+                    scores[valid] = rule_based_scores(*features[valid][:, [0, 3, 4, 5]].T)
+            else:
+                # ML-based prediction, one call for all rows
+                valid = numeric.all(axis=1)
+                if valid.any():
+                    predicted = self._model_predict(self.scaler.transform(features[valid]))
+                    scores[valid] = np.clip(predicted, 0.0, 1.0)
         except Exception as e:
             logger.error(f"Error predicting performance: {str(e)}")
-            return 0.5  # Default neutral score
+            scores[:] = 0.5  # Default neutral score
+        
+        predictor = 'rules' if self.performance_model is None else \
+            'compiled' if self._compiled_model is not None else 'model'
+        SCORING_DURATION.labels(predictor).observe(time.perf_counter() - started)
+        return scores
+    
+    def _model_predict(self, X: np.ndarray) -> np.ndarray:
+        """
+        Predict with the performance model, through its compiled form when it is a forest
+        
+        The forest is compiled once per model object (so a retrained or
+        reloaded model is picked up); other estimators use their own predict.
+        """
+        if self._compiled_source is not self.performance_model:
+            self._compiled_source = self.performance_model
+            try:
+                self._compiled_model = CompiledForest.from_sklearn(self.performance_model)
+            except ValueError:
+                self._compiled_model = None
+        if self._compiled_model is not None:
+            return self._compiled_model.predict(X)
+        return self.performance_model.predict(X)
     
     def _rule_based_performance(self, campaign_data: Dict) -> float:
         """
@@ -137,13 +285,19 @@ class AIOptimizer:
         
         return max(0.0, min(1.0, score))
     
-    def should_pause_campaign(self, campaign_data: Dict, history: List[Dict]) -> Tuple[bool, str]:
+    def should_pause_campaign(
+        self,
+        campaign_data: Dict,
+        history: List[Dict],
+        context: Optional[RecommendationContext] = None
+    ) -> Tuple[bool, str]:
         """
         Determine if a campaign should be paused
         
         Args:
             campaign_data: Current campaign data
             history: Historical performance data
+            context: Scores already computed for this campaign (optional)
             
         Returns:
             Tuple of (should_pause, reason)
@@ -152,18 +306,22 @@ class AIOptimizer:
         if len(history) < self.min_data_points:
             return False, "Insufficient data for decision"
         
-        performance_score = self.predict_performance(campaign_data)
+        context = context or RecommendationContext(self, campaign_data, history=history)
+        performance_score = context.campaign_score
         
         # Low performance check
         if performance_score < self.low_performance_threshold:
             return True, f"Low performance score: {performance_score:.2f}"
         
-        # Declining trend check
-        recent_scores = [self.predict_performance(h) for h in history[-7:]]  # Last 7 data points
-        if len(recent_scores) >= 3:
-            trend = np.polyfit(range(len(recent_scores)), recent_scores, 1)[0]
-            if trend < -0.05:  # Declining trend
-                return True, f"Declining performance trend: {trend:.3f}"
+        # Declining trend check (maintained trend state if supplied, else last 7 data points)
+        score_trend = campaign_data.get('score_trend')
+        if score_trend is not None:
+            trend, points = score_trend['slope'], score_trend['points']
+        else:
+            slopes, counts = least_squares_slopes(context.history_scores(last=TREND_WINDOW)[None, :])
+            trend, points = float(slopes[0]), int(counts[0])
+        if points >= 3 and trend < -0.05:  # Declining trend
+            return True, f"Declining performance trend: {trend:.3f}"
         
         # Budget burn without results
         spent_ratio = campaign_data.get('spent_budget', 0) / campaign_data.get('total_budget', 1)
@@ -182,7 +340,8 @@ class AIOptimizer:
     def optimize_budget_allocation(
         self, 
         campaign_budget: float,
-        platform_performances: Dict[str, Dict]
+        platform_performances: Dict[str, Dict],
+        platform_scores: Optional[Dict[str, float]] = None
     ) -> Dict[str, float]:
         """
         Optimize budget allocation across platforms based on performance
@@ -190,47 +349,96 @@ class AIOptimizer:
         Args:
             campaign_budget: Total campaign budget
             platform_performances: Dict mapping platform to performance metrics
+            platform_scores: Predicted performance per platform, if already scored
             
         Returns:
             Dict mapping platform to allocated budget
         """
-        allocations = {}
-        
-        # Calculate performance scores for each platform
-        platform_scores = {}
-        for platform, metrics in platform_performances.items():
-            score = self.predict_performance(metrics)
-            platform_scores[platform] = score
-        
-        # Ensure minimum allocation (10%) for each platform to allow testing
-        min_allocation = 0.10
-        num_platforms = len(platform_scores)
-        remaining_budget = campaign_budget * (1 - (min_allocation * num_platforms))
-        
-        # Allocate minimum to all
-        for platform in platform_scores:
-            allocations[platform] = campaign_budget * min_allocation
-        
-        # Distribute remaining based on performance scores
-        total_score = sum(platform_scores.values())
-        
-        if total_score > 0:
-            for platform, score in platform_scores.items():
-                additional = (score / total_score) * remaining_budget
-                allocations[platform] += additional
-        else:
-            # Equal distribution if no clear winner
-            equal_share = remaining_budget / num_platforms
-            for platform in allocations:
-                allocations[platform] += equal_share
+        return self.optimize_budget_allocations(
+            [(campaign_budget, platform_performances)],
+            platform_scores=None if platform_scores is None else [platform_scores]
+        )[0]
+    
+    def optimize_budget_allocations(
+        self,
+        requests: List[Tuple[float, Dict[str, Dict]]],
+        platform_scores: Optional[List[Dict[str, float]]] = None
+    ) -> List[Dict[str, float]]:
+        """
+        Allocate budgets for many campaigns in one vectorized solve
         
-        return allocations
+        Each platform's return is modelled as ``scale * spend ** elasticity``.
+        A platform's metrics may carry a fitted ``response_curve``
+        ({'scale', 'elasticity'}) and ``min_budget`` / ``max_budget`` bounds;
+        if any platform of a campaign lacks a fitted curve, the whole campaign
+        falls back to square-root curves scaled by predicted performance so the
+        platforms stay comparable. Inactive platforms get nothing.
+        
+        Args:
+            requests: (campaign_budget, platform_performances) per campaign
+            platform_scores: Predicted performance per platform for each request;
+                missing scores are predicted in one batched call
+            
+        Returns:
+            Allocation dict per request, in order
+        """
+        if not requests:
+            return []
+        
+        # Campaigns without fitted curves for every platform use predicted performance
+        def fitted(curve):
+            return bool(curve) and np.isfinite(curve.get('scale', np.nan)) and curve['scale'] > 0
+        fallback = {
+            i for i, (_, platforms) in enumerate(requests)
+            if not all(fitted(m.get('response_curve')) for m in platforms.values())
+        }
+        scores = [dict(s) for s in platform_scores] if platform_scores else [{} for _ in requests]
+        missing = [(i, p, m) for i in sorted(fallback) for p, m in requests[i][1].items() if p not in scores[i]]
+        if missing:
+            predicted = self.predict_performance_batch([m for _, _, m in missing])
+            for (i, platform, _), score in zip(missing, predicted):
+                scores[i][platform] = float(score)
+        
+        width = max(1, max(len(platforms) for _, platforms in requests))
+        shape = (len(requests), width)
+        budgets = np.array([max(0.0, float(budget or 0)) for budget, _ in requests])
+        scale = np.zeros(shape)
+        elasticity = np.full(shape, DEFAULT_ELASTICITY)
+        lower = np.zeros(shape)
+        upper = np.zeros(shape)
+        
+        for i, (budget, platforms) in enumerate(requests):
+            if not platforms:
+                continue
+            budget = budgets[i]
+            floor = budget * min(self.min_platform_share, 0.5 / len(platforms))
+            
+            for j, (platform, metrics) in enumerate(platforms.items()):
+                if i in fallback:
+                    scale[i, j] = max(scores[i][platform], 1e-3)
+                else:
+                    curve = metrics['response_curve']
+                    scale[i, j] = curve['scale']
+                    elasticity[i, j] = curve.get('elasticity', DEFAULT_ELASTICITY)
+                
+                if metrics.get('is_active', True) is False:
+                    continue
+                upper[i, j] = min(metrics.get('max_budget', budget), budget)
+                lower[i, j] = min(metrics.get('min_budget', floor), upper[i, j])
+        
+        allocations = allocate(budgets, scale, elasticity, lower, upper)
+        
+        return [
+            {platform: float(allocations[i, j]) for j, platform in enumerate(platforms)}
+            for i, (_, platforms) in enumerate(requests)
+        ]
     
     def get_recommendations(
         self,
         campaign_data: Dict,
         platform_data: Dict[str, Dict],
-        history: List[Dict]
+        history: List[Dict],
+        optimal_allocation: Optional[Dict[str, float]] = None
     ) -> List[OptimizationRecommendation]:
         """
         Generate optimization recommendations for a campaign
@@ -239,17 +447,21 @@ class AIOptimizer:
             campaign_data: Main campaign data
             platform_data: Platform-specific performance data
             history: Historical performance data
+            optimal_allocation: Platform split already solved in a batch (optional)
             
         Returns:
             List of optimization recommendations
         """
         recommendations = []
         
+        # Campaign, history and platforms are scored together, once
+        context = RecommendationContext(self, campaign_data, platform_data, history)
+        
         # Overall performance check
-        performance_score = self.predict_performance(campaign_data)
+        performance_score = context.campaign_score
         
         # Check if campaign should be paused
-        should_pause, pause_reason = self.should_pause_campaign(campaign_data, history)
+        should_pause, pause_reason = self.should_pause_campaign(campaign_data, history, context)
         if should_pause:
             recommendations.append(OptimizationRecommendation(
                 campaign_id=campaign_data['id'],
@@ -286,10 +498,12 @@ class AIOptimizer:
         
         # Platform reallocation recommendations
         if len(platform_data) > 1:
-            optimal_allocation = self.optimize_budget_allocation(
-                current_budget,
-                platform_data
-            )
+            if optimal_allocation is None:
+                optimal_allocation = self.optimize_budget_allocation(
+                    current_budget,
+                    platform_data,
+                    platform_scores=context.platform_scores
+                )
             
             # Check if reallocation is significantly different
             current_allocation = {p: d.get('allocated_budget', 0) for p, d in platform_data.items()}
@@ -309,16 +523,39 @@ class AIOptimizer:
         
         return recommendations
     
-    def _extract_features(self, campaign_data: Dict) -> List[float]:
+    def _feature_matrix(self, rows: Sequence[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Feature matrix for many rows, plus a mask of which entries are numeric
+        
+        Returns:
+            Tuple of (features (rows, 10) float, numeric (rows, 10) bool)
+        """
+        now = datetime.utcnow()
+        features = np.zeros((len(rows), 10))
+        numeric = np.zeros((len(rows), 10), dtype=bool)
+        for i, row in enumerate(rows):
+            try:
+                values = self._extract_features(row, now)
+            except Exception:
+                continue
+            for j, value in enumerate(values):
+                if isinstance(value, (int, float, np.number)):
+                    features[i, j] = value
+                    numeric[i, j] = True
+        return features, numeric
+    
+    def _extract_features(self, campaign_data: Dict, now: Optional[datetime] = None) -> List[float]:
         """
         Extract features from campaign data for ML models
         
         Args:
             campaign_data: Campaign metrics dictionary
+            now: Reference time for campaign age (defaults to the current time)
             
         Returns:
             List of feature values
         """
+        now = now or datetime.utcnow()
         return [
             campaign_data.get('ctr', 0),
             campaign_data.get('cpc', 0),
@@ -329,7 +566,7 @@ class AIOptimizer:
             campaign_data.get('impressions', 0),
             campaign_data.get('clicks', 0),
             campaign_data.get('conversions', 0),
-            (datetime.utcnow() - campaign_data.get('start_date', datetime.utcnow())).days
+            (now - campaign_data.get('start_date', now)).days
         ]
     
     def train_models(self, training_data: List[Dict], labels: List[float]):
@@ -340,19 +577,27 @@ class AIOptimizer:
             training_data: List of campaign data dictionaries
             labels: Performance scores or outcomes
         """
+        # Deferred: scikit-learn and joblib take longer to import than the rest
+        # of the web process, which only ever scores with a trained model
+        import joblib
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.preprocessing import StandardScaler
+
         try:
             # Extract features
             X = np.array([self._extract_features(data) for data in training_data])
             y = np.array(labels)
             
             # Scale features
+            self.scaler = StandardScaler()
             X_scaled = self.scaler.fit_transform(X)
             
             # Train performance prediction model
             self.performance_model = RandomForestRegressor(
                 n_estimators=100,
                 max_depth=10,
-                random_state=42
+                random_state=42,
+                n_jobs=-1
             )
             self.performance_model.fit(X_scaled, y)
             
@@ -367,9 +612,18 @@ class AIOptimizer:
             raise
     
     def load_models(self):
-        """Load pre-trained models from disk"""
+        """Load pre-trained models from disk (the latest training-pipeline artifact if any)"""
         try:
-            self.performance_model = joblib.load(f"{self.model_path}performance_model.pkl")
+            artifact = load_latest_artifact(self.model_path)
+            if artifact is not None:
+                self.performance_model, self.scaler, self.model_metadata = artifact
+                logger.info(f"Performance model {self.model_metadata['version']} loaded")
+                return
+            legacy_model = f"{self.model_path}performance_model.pkl"
+            if not os.path.exists(legacy_model):
+                raise FileNotFoundError(legacy_model)
+            import joblib
+            self.performance_model = joblib.load(legacy_model)
             self.scaler = joblib.load(f"{self.model_path}scaler.pkl")
             logger.info("ML models loaded successfully")
         except FileNotFoundError:
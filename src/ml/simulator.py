@@ -0,0 +1,503 @@
+"""
+ADFLOWAI - Offline Policy Simulator
+Vectorized synthetic campaign fleets for benchmarking optimizer strategies
+
+Usage:
+    python -m src.ml.simulator --campaigns 100000 --days 90
+    python -m src.ml.simulator --campaigns 5000 --strategies rules,thompson --json
+"""
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.ml.bandit import BanditState, thompson_shares
+from src.ml.budget_allocation import DEFAULT_ELASTICITY, allocate, fit_response_curves
+from src.ml.optimizer import AIOptimizer, rule_based_scores
+
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ('google_ads', 'facebook', 'instagram', 'linkedin', 'twitter', 'tiktok')
+
+
+@dataclass
+class FleetConfig:
+    """Parameters of a synthetic campaign fleet"""
+    campaigns: int = 1000
+    days: int = 90
+    platforms: Sequence[str] = PLATFORMS
+    mean_budget: float = 3000.0          # lifetime budget per campaign
+    mean_roas: float = 2.0               # platform ROAS at an even daily split
+    roas_spread: float = 0.6             # lognormal sigma of ROAS across arms
+    min_elasticity: float = 0.3
+    max_elasticity: float = 0.85
+    daily_noise: float = 0.3             # lognormal sigma of daily returns
+    drift: float = 0.02                  # daily random-walk sigma of log ROAS
+    seed: int = 0
+
+
+@dataclass
+class Fleet:
+    """
+    Ground truth for every (campaign, platform) arm, shapes (n, p)
+
+    Daily revenue of an arm is ``roas * reference * (spend / reference) ** elasticity``
+    where ``reference`` is the arm's spend under an even split; conversions are
+    Poisson with mean revenue / value_per_conversion.
+    """
+    active: np.ndarray
+    roas: np.ndarray
+    reference: np.ndarray
+    elasticity: np.ndarray
+    value_per_conversion: np.ndarray
+    ctr: np.ndarray
+    cpc: np.ndarray
+    budget: np.ndarray                  # (n,)
+    platforms: Sequence[str]
+    days: int
+
+    @property
+    def shape(self):
+        return self.active.shape
+
+
+def generate_fleet(config: FleetConfig) -> Fleet:
+    """Draw a random fleet; each campaign runs on 1..p platforms"""
+    rng = np.random.default_rng(config.seed)
+    n, p = config.campaigns, len(config.platforms)
+
+    platform_count = rng.integers(1, p + 1, n)
+    rank = rng.random((n, p)).argsort(axis=1).argsort(axis=1)
+    active = rank < platform_count[:, None]
+
+    budget = config.mean_budget * rng.lognormal(-0.125, 0.5, n)
+    reference = np.where(active, (budget / config.days / platform_count)[:, None], 0.0)
+    platform_effect = rng.normal(0.0, 0.2, p)           # some platforms are better on average
+    roas = config.mean_roas * np.exp(platform_effect + rng.normal(0.0, config.roas_spread, (n, p)))
+
+    return Fleet(
+        active=active,
+        roas=np.where(active, roas, 0.0),
+        reference=reference,
+        elasticity=rng.uniform(config.min_elasticity, config.max_elasticity, (n, p)),
+        value_per_conversion=40.0 * rng.lognormal(0.0, 0.4, (n, p)),
+        ctr=np.clip(0.02 * rng.lognormal(0.0, 0.5, (n, p)), 0.001, 0.2),
+        cpc=1.5 * rng.lognormal(0.0, 0.4, (n, p)),
+        budget=budget,
+        platforms=tuple(config.platforms),
+        days=config.days,
+    )
+
+
+class SimulationState:
+    """
+    What a strategy can see and change during a run
+
+    Strategies observe cumulative and trailing-window metrics and act by
+    editing ``shares`` (platform split), ``budget`` and ``paused``.
+    """
+
+    def __init__(self, fleet: Fleet, window: int = 28):
+        n, p = fleet.shape
+        self.fleet = fleet
+        self.day = 0
+        self.budget = fleet.budget.copy()
+        self.roas = fleet.roas.copy()        # true, drifting ROAS; only the oracle reads it
+        self.paused = np.zeros(n, dtype=bool)
+        count = fleet.active.sum(axis=1, keepdims=True)
+        self.shares = np.where(fleet.active, 1.0 / np.maximum(count, 1), 0.0)
+
+        # Cumulative per-arm totals
+        self.spend = np.zeros((n, p))
+        self.revenue = np.zeros((n, p))
+        self.conversions = np.zeros((n, p))
+        self.clicks = np.zeros((n, p))
+        self.impressions = np.zeros((n, p))
+
+        # Latest day and a trailing window of daily spend / conversions
+        self.daily_spend = np.zeros((n, p))
+        self.daily_revenue = np.zeros((n, p))
+        self.window = window
+        self.spend_window = np.full((window, n, p), np.nan, dtype=np.float32)
+        self.conversion_window = np.full((window, n, p), np.nan, dtype=np.float32)
+
+    @property
+    def spent(self) -> np.ndarray:
+        return self.spend.sum(axis=1)
+
+    def record(self, spend, revenue, conversions, clicks, impressions):
+        self.spend += spend
+        self.revenue += revenue
+        self.conversions += conversions
+        self.clicks += clicks
+        self.impressions += impressions
+        self.daily_spend = spend
+        self.daily_revenue = revenue
+        # Inactive arms stay NaN from __init__, so only active arms are written
+        slot = self.day % self.window
+        np.copyto(self.spend_window[slot], spend, where=self.fleet.active)
+        np.copyto(self.conversion_window[slot], conversions, where=self.fleet.active)
+
+
+class Strategy:
+    """Base policy: keeps the even split and never touches budgets"""
+    name = 'static'
+    interval = 1        # days between decisions
+
+    def reset(self, state: SimulationState, rng: np.random.Generator):
+        pass
+
+    def decide(self, state: SimulationState, rng: np.random.Generator):
+        pass
+
+
+class RuleStrategy(Strategy):
+    """
+    The production rules of ``AIOptimizer.get_recommendations``, vectorized
+
+    Pause on a low score, declining score trend or spend without conversions;
+    +50% budget above the high threshold, -30% when underperforming with more
+    than 30% spent; reallocate when the solved split differs by over 15%.
+
+    Runs weekly like the other strategies, and increases only redistribute
+    the fleet's total budget: compounding +50% steps would otherwise grow it
+    without bound and make the revenue comparison meaningless.
+    """
+    name = 'rules'
+    interval = 7
+
+    def __init__(self, optimizer: Optional[AIOptimizer] = None):
+        self.optimizer = optimizer or AIOptimizer()
+
+    def reset(self, state, rng):
+        self.scores = np.full((len(state.budget), 7), np.nan)
+        self.decisions = 0
+
+    def decide(self, state, rng):
+        opt = self.optimizer
+        fleet = state.fleet
+        spend, clicks = state.spent, state.clicks.sum(axis=1)
+        conversions = state.conversions.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            used = spend / state.budget
+            score = rule_based_scores(
+                np.nan_to_num(clicks / state.impressions.sum(axis=1)),
+                np.nan_to_num(state.revenue.sum(axis=1) / spend),
+                np.nan_to_num(conversions / clicks),
+                used,
+            )
+        self.scores = np.roll(self.scores, -1, axis=1)
+        self.scores[:, -1] = score
+        self.decisions += 1
+
+        # Least-squares slope of the last (up to) 7 scores
+        points = min(self.decisions, 7)
+        recent = self.scores[:, -points:]
+        x = np.arange(points) - (points - 1) / 2
+        slope = (recent * x).sum(axis=1) / max((x * x).sum(), 1e-12) if points >= 3 else np.zeros_like(score)
+
+        live = ~state.paused
+        pause = live & (state.day + 1 >= opt.min_data_points) & (
+            (score < opt.low_performance_threshold) | (slope < -0.05) | ((used > 0.5) & (conversions == 0))
+        )
+        state.paused |= pause
+        live &= ~pause
+
+        increase = live & (score > opt.high_performance_threshold)
+        decrease = live & ~increase & (score < 0.5) & (used > 0.3)
+        budget = np.where(increase, state.budget * 1.5, np.where(decrease, state.budget * 0.7, state.budget))
+
+        # Keep the fleet total: shrink every unspent budget pro rata to pay for increases
+        unspent = np.maximum(budget - spend, 0.0)
+        available = max(fleet.budget.sum() - spend.sum(), 0.0)
+        if unspent.sum() > available:
+            budget = np.where(budget > spend, spend + unspent * (available / unspent.sum()), budget)
+        state.budget = budget
+
+        # Platform split from the production solver (performance-scaled sqrt curves)
+        count = fleet.active.sum(axis=1)
+        rows = np.flatnonzero(live & (count > 1))
+        if not rows.size:
+            return
+        active, budget = fleet.active[rows], state.budget[rows]
+        allocated = budget[:, None] * state.shares[rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            platform_scores = rule_based_scores(
+                np.nan_to_num(state.clicks[rows] / state.impressions[rows]),
+                np.nan_to_num(state.revenue[rows] / state.spend[rows]),
+                np.nan_to_num(state.conversions[rows] / state.clicks[rows]),
+                np.nan_to_num(state.spend[rows] / allocated),
+            )
+        floor = budget * np.minimum(opt.min_platform_share, 0.5 / count[rows])
+        upper = np.where(active, budget[:, None], 0.0)
+        optimal = allocate(
+            budget, np.where(active, np.maximum(platform_scores, 1e-3), 0.0),
+            np.full(active.shape, DEFAULT_ELASTICITY), np.minimum(floor[:, None], upper), upper,
+        )
+        moved = np.abs(optimal - allocated).max(axis=1) > 0.15 * budget
+        state.shares[rows[moved]] = optimal[moved] / budget[moved, None]
+
+
+class ResponseCurveStrategy(Strategy):
+    """
+    Refit spend -> conversions curves on the trailing window and solve the split
+
+    Mirrors ``CampaignManager.plan_budget_allocations``: curves are fitted on
+    conversion counts, as in production.
+    """
+    name = 'curves'
+    interval = 7
+
+    def __init__(self, chunk: int = 20000):
+        self.chunk = chunk
+
+    def decide(self, state, rng):
+        if state.day + 1 < 7:
+            return
+        fleet = state.fleet
+        n, p = fleet.shape
+        # Inactive arms have no history: fit the active ones only, in chunks of arms
+        arms = np.flatnonzero(fleet.active)
+        spend_window = state.spend_window.reshape(state.window, -1)
+        conversion_window = state.conversion_window.reshape(state.window, -1)
+        scale = np.full(n * p, np.nan)
+        elasticity = np.full(n * p, DEFAULT_ELASTICITY)
+        for start in range(0, len(arms), self.chunk * p):
+            part = arms[start:start + self.chunk * p]
+            curves = fit_response_curves(spend_window[:, part].T, conversion_window[:, part].T)
+            scale[part] = curves.scale
+            elasticity[part] = curves.elasticity
+        scale, elasticity = scale.reshape(n, p), elasticity.reshape(n, p)
+        fitted = (np.isfinite(scale) | ~fleet.active).all(axis=1)
+        scale = np.where(fleet.active, np.nan_to_num(scale), 0.0)
+        remaining = np.maximum(state.budget - state.spent, 0.0)
+        optimal = allocate(np.where(fitted, remaining, 0.0), scale, elasticity,
+                           upper=np.where(fleet.active, remaining[:, None], 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shares = optimal / remaining[:, None]
+        state.shares = np.where((fitted & (remaining > 0))[:, None], shares, state.shares)
+
+
+class ThompsonStrategy(Strategy):
+    """Daily ROAS as the bandit reward; the split follows posterior win probabilities"""
+    name = 'thompson'
+    interval = 7
+
+    def __init__(self, n_draws: int = 16, min_share: float = 0.05):
+        self.n_draws = n_draws
+        self.min_share = min_share
+        self.bandit = BanditState()
+
+    def reset(self, state, rng):
+        self.stats = np.zeros(state.fleet.shape + (3,))
+
+    def observe(self, state):
+        spent = state.daily_spend > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reward = np.where(spent, state.daily_revenue / state.daily_spend, 0.0)
+        self.stats[..., 0] += spent
+        self.stats[..., 1] += reward
+        self.stats[..., 2] += reward * reward
+
+    def decide(self, state, rng):
+        mask = state.fleet.active
+        wins, _ = thompson_shares(self.bandit, self.stats, mask, n_draws=self.n_draws, rng=rng)
+        count = np.maximum(mask.sum(axis=1, keepdims=True), 1)
+        floor = np.minimum(self.min_share, 1.0 / count)
+        state.shares = np.where(mask, floor + (1.0 - count * floor) * wins, 0.0)
+
+
+class OracleStrategy(Strategy):
+    """Solves the split with the true (drifting) curves: an upper bound for the others"""
+    name = 'oracle'
+    interval = 7
+
+    def decide(self, state, rng):
+        fleet = state.fleet
+        # revenue = roas * ref * (s / ref) ** e = [roas * ref ** (1 - e)] * s ** e
+        with np.errstate(divide='ignore'):
+            scale = np.where(fleet.active, state.roas * fleet.reference ** (1 - fleet.elasticity), 0.0)
+        daily = np.ones(len(state.budget))
+        optimal = allocate(daily, scale, fleet.elasticity,
+                           upper=np.where(fleet.active, 1.0, 0.0))
+        state.shares = optimal
+
+
+STRATEGIES = {
+    cls.name: cls for cls in (Strategy, RuleStrategy, ResponseCurveStrategy, ThompsonStrategy, OracleStrategy)
+}
+
+
+@dataclass
+class SimulationResult:
+    """Outcome and cost of one strategy over one fleet"""
+    strategy: str
+    campaigns: int
+    days: int
+    spend: float
+    revenue: float
+    conversions: float
+    roas: float
+    paused_fraction: float
+    budget_growth: float
+    elapsed_seconds: float
+    campaigns_per_second: float
+    campaign_days_per_second: float
+    peak_memory_mb: Optional[float] = None
+    revenue_vs_oracle: Optional[float] = None
+    spend_vs_oracle: Optional[float] = None
+    extra: Dict = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class PolicySimulator:
+    """
+    Discrete-time (daily) simulation of a fleet under a strategy
+
+    Every step is a handful of array operations over all (campaign, platform)
+    arms, so a 100k-campaign, 90-day run takes seconds to tens of seconds
+    depending on the strategy. All strategies see the
+    same fleet and the same random outcomes for equal seeds.
+    """
+
+    def __init__(self, config: Optional[FleetConfig] = None, fleet: Optional[Fleet] = None):
+        self.config = config or FleetConfig()
+        self.fleet = fleet or generate_fleet(self.config)
+
+    def run(self, strategy: Strategy, track_memory: bool = True) -> SimulationResult:
+        """Play ``strategy`` over the fleet's horizon"""
+        fleet, config = self.fleet, self.config
+        rng = np.random.default_rng(config.seed + 1)
+        state = SimulationState(fleet)
+        strategy.reset(state, rng)
+
+        if track_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+
+        # Outcomes are drawn for active arms only, then scattered back to (n, p)
+        arms = np.flatnonzero(fleet.active)
+        reference, elasticity, value, cpc, ctr = (
+            getattr(fleet, name).reshape(-1)[arms]
+            for name in ('reference', 'elasticity', 'value_per_conversion', 'cpc', 'ctr')
+        )
+        roas = state.roas.reshape(-1)
+
+        def scatter(values):
+            full = np.zeros(fleet.active.size)
+            full[arms] = values
+            return full.reshape(fleet.shape)
+
+        for day in range(fleet.days):
+            state.day = day
+            remaining = np.maximum(state.budget - state.spent, 0.0)
+            daily = np.where(state.paused, 0.0, remaining / (fleet.days - day))
+            spend = daily[:, None] * state.shares
+            arm_spend = spend.reshape(-1)[arms]
+
+            shocks = rng.standard_normal((2, len(arms)), dtype=np.float32)
+            noise = np.exp(config.daily_noise * shocks[0] - 0.5 * config.daily_noise ** 2)
+            expected = roas[arms] * reference * (arm_spend / reference) ** elasticity * noise
+            conversions = rng.poisson(expected / value).astype(float)
+            clicks = np.floor(arm_spend / cpc)
+            state.record(spend, scatter(conversions * value), scatter(conversions),
+                         scatter(clicks), scatter(clicks / ctr))
+
+            if hasattr(strategy, 'observe'):
+                strategy.observe(state)
+            if (day + 1) % strategy.interval == 0:
+                strategy.decide(state, rng)
+
+            roas[arms] *= np.exp(config.drift * shocks[1])
+
+        elapsed = time.perf_counter() - started
+        peak = None
+        if track_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+
+        spend, revenue = state.spend.sum(), state.revenue.sum()
+        n = len(state.budget)
+        return SimulationResult(
+            strategy=strategy.name,
+            campaigns=n,
+            days=fleet.days,
+            spend=float(spend),
+            revenue=float(revenue),
+            conversions=float(state.conversions.sum()),
+            roas=float(revenue / spend) if spend else 0.0,
+            paused_fraction=float(state.paused.mean()),
+            budget_growth=float(state.budget.sum() / fleet.budget.sum()),
+            elapsed_seconds=elapsed,
+            campaigns_per_second=n / elapsed if elapsed else float('inf'),
+            campaign_days_per_second=n * fleet.days / elapsed if elapsed else float('inf'),
+            peak_memory_mb=peak,
+        )
+
+    def compare(self, strategies: Sequence[Strategy], track_memory: bool = True) -> List[SimulationResult]:
+        """
+        Run several strategies on the same fleet
+
+        Revenue and spend are reported relative to the oracle if present; a
+        strategy that pauses campaigns earns less partly because it spends less.
+        """
+        results = [self.run(strategy, track_memory) for strategy in strategies]
+        oracle = next((r for r in results if r.strategy == 'oracle'), None)
+        if oracle and oracle.revenue:
+            for result in results:
+                result.revenue_vs_oracle = result.revenue / oracle.revenue
+                result.spend_vs_oracle = result.spend / oracle.spend
+        return results
+
+
+def format_results(results: Sequence[SimulationResult]) -> str:
+    """Plain-text table of simulation results"""
+    header = (f"{'strategy':<10} {'spend':>14} {'revenue':>14} {'roas':>6} {'vs oracle':>9} {'spend vs':>9} "
+              f"{'paused':>7} {'budget':>7} {'secs':>7} {'campaigns/s':>12} {'peak MB':>8}")
+    lines = [header, '-' * len(header)]
+    for r in results:
+        versus = f"{r.revenue_vs_oracle:.1%}" if r.revenue_vs_oracle is not None else '-'
+        spend_versus = f"{r.spend_vs_oracle:.1%}" if r.spend_vs_oracle is not None else '-'
+        peak = f"{r.peak_memory_mb:.0f}" if r.peak_memory_mb is not None else '-'
+        lines.append(
+            f"{r.strategy:<10} {r.spend:>14,.0f} {r.revenue:>14,.0f} {r.roas:>6.2f} {versus:>9} {spend_versus:>9} "
+            f"{r.paused_fraction:>7.1%} {r.budget_growth:>6.2f}x {r.elapsed_seconds:>7.2f} "
+            f"{r.campaigns_per_second:>12,.0f} {peak:>8}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campaigns', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                        help=f"Comma-separated subset of: {', '.join(STRATEGIES)}")
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc (slightly faster)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"Unknown strategies: {', '.join(unknown)}")
+
+    simulator = PolicySimulator(FleetConfig(campaigns=args.campaigns, days=args.days, seed=args.seed))
+    results = simulator.compare([STRATEGIES[name]() for name in names], track_memory=not args.no_memory)
+    if args.json:
+        print(json.dumps([r.to_dict() for r in results], indent=2))
+    else:
+        print(format_results(results))
+
+
+if __name__ == '__main__':
+    main()
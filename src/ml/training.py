@@ -0,0 +1,350 @@
+"""
+ADFLOWAI - Model Training Pipeline
+Chunked, warm-startable training of the performance model from stored metrics history
+
+Usage:
+    python -m src.ml.training                 # full retrain
+    python -m src.ml.training --warm-start    # add trees for rows newer than the last artifact
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.ml.forest import CompiledForest
+
+# scikit-learn and joblib are imported where they are used: the web process
+# imports this module (via the optimizer) but only trains in Celery/CLI
+
+logger = logging.getLogger(__name__)
+
+# Same order as AIOptimizer._extract_features
+FEATURE_NAMES = (
+    'ctr', 'cpc', 'cpa', 'roas', 'conversion_rate', 'budget_used',
+    'impressions', 'clicks', 'conversions', 'age_days'
+)
+ARTIFACT_DIR = 'performance'
+LATEST_FILE = 'LATEST'
+ARTIFACT_FORMAT = 1
+
+
+@dataclass
+class TrainingConfig:
+    """Knobs for a training run"""
+    chunk_size: int = 250_000            # rows held in memory at once
+    n_estimators: int = 100              # trees per full retrain
+    trees_per_chunk: Optional[int] = None  # default: n_estimators spread over the chunks
+    max_estimators: int = 300            # warm starts drop the oldest trees beyond this
+    max_depth: int = 10
+    n_jobs: int = -1
+    holdout_every: int = 20              # every n-th row (by id) is held out for metrics
+    max_holdout_rows: int = 200_000
+    random_state: int = 42
+
+    @classmethod
+    def from_config(cls, config) -> 'TrainingConfig':
+        return cls(
+            chunk_size=config.ML_TRAINING_CHUNK_SIZE,
+            n_estimators=config.ML_TRAINING_ESTIMATORS,
+            max_estimators=config.ML_TRAINING_MAX_ESTIMATORS,
+            n_jobs=config.ML_TRAINING_JOBS
+        )
+
+
+def history_chunks(
+    session,
+    chunk_size: int,
+    after_id: int = 0,
+    label: str = 'performance_score'
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stream MetricsHistory rows as feature chunks, oldest first
+
+    Pages by primary key (``id > last``), so each page is an index range scan
+    and no cursor is held open between chunks. Rows with missing or
+    non-finite features are dropped, as prediction would score them 0.5.
+
+    Args:
+        session: Database session
+        chunk_size: Rows per page
+        after_id: Only rows with a larger id (the previous artifact's watermark)
+        label: MetricsHistory column used as the training target
+
+    Yields:
+        Tuples of (ids (n,), features (n, 10), labels (n,))
+    """
+    from src.models.campaign import Campaign, MetricsHistory
+
+    target = getattr(MetricsHistory, label)
+    query = session.query(
+        MetricsHistory.id, MetricsHistory.ctr, MetricsHistory.cpc, MetricsHistory.cpa, MetricsHistory.roas,
+        MetricsHistory.conversions, MetricsHistory.clicks, MetricsHistory.impressions, MetricsHistory.spent,
+        Campaign.total_budget, MetricsHistory.recorded_at, Campaign.start_date, target
+    ).join(Campaign, Campaign.id == MetricsHistory.campaign_id)\
+        .filter(target.isnot(None))\
+        .order_by(MetricsHistory.id)
+
+    last_id = after_id
+    while True:
+        rows = query.filter(MetricsHistory.id > last_id).limit(chunk_size).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        columns = list(zip(*rows))
+        ids = np.array(columns[0], dtype=np.int64)
+        ctr, cpc, cpa, roas, conversions, clicks, impressions, spent, total_budget = (
+            np.array(column, dtype=float) for column in columns[1:10]
+        )
+        recorded_at = np.array(columns[10], dtype='datetime64[s]')
+        start_date = np.array(columns[11], dtype='datetime64[s]')
+        y = np.array(columns[12], dtype=float)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conversion_rate = np.where(clicks > 0, conversions / clicks, 0.0)
+            budget_used = np.where(total_budget != 0, spent / total_budget, np.nan)
+        age_days = np.floor((recorded_at - start_date) / np.timedelta64(1, 'D'))
+
+        X = np.column_stack([
+            ctr, cpc, cpa, roas, conversion_rate, budget_used, impressions, clicks, conversions, age_days
+        ])
+        valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+        yield ids[valid], X[valid], y[valid]
+
+
+class PerformanceModelTrainer:
+    """
+    Trains the performance forest without holding the training set in memory
+
+    A full run makes two streaming passes: the first fits the scaler with
+    ``partial_fit``, the second grows the forest chunk by chunk with
+    ``warm_start`` (each chunk contributes its own trees, fitted on all cores).
+    A warm start keeps the previous artifact's scaler and trees and only adds
+    trees for rows recorded since its watermark.
+
+    Each run writes a new versioned directory under ``<model_path>/performance/``
+    (model, scaler, metadata.json with metrics and timings) and then points
+    ``LATEST`` at it, so readers never see a half-written artifact.
+    """
+
+    def __init__(self, model_path: str = 'models/', config: Optional[TrainingConfig] = None):
+        self.model_path = model_path
+        self.config = config or TrainingConfig()
+
+    @property
+    def artifact_root(self) -> str:
+        return os.path.join(self.model_path, ARTIFACT_DIR)
+
+    def train(self, session, warm_start: bool = False, label: str = 'performance_score') -> Dict:
+        """
+        Run a training pass and publish the artifact
+
+        Args:
+            session: Database session to stream MetricsHistory from
+            warm_start: Extend the latest artifact instead of retraining
+            label: MetricsHistory column used as the target
+
+        Returns:
+            The new artifact's metadata (``trained`` is False if a warm start found no new rows)
+
+        Raises:
+            ValueError: If a full retrain finds no usable rows
+        """
+        from sklearn.ensemble import RandomForestRegressor
+        from sklearn.preprocessing import StandardScaler
+
+        config = self.config
+        started = time.perf_counter()
+        timings = {}
+
+        previous = load_latest_artifact(self.model_path) if warm_start else None
+        if warm_start and previous is None:
+            logger.info("No previous artifact, running a full retrain")
+        after_id = previous[2]['watermark'] if previous else 0
+
+        # Pass 1: scaler statistics (a warm start must keep the scaler its trees were fitted on)
+        if previous:
+            model, scaler = previous[0], previous[1]
+            rows, chunks = self._count_rows(session, after_id, label)
+        else:
+            model, scaler = None, StandardScaler()
+            rows = chunks = 0
+            for _, X, _ in history_chunks(session, config.chunk_size, after_id, label):
+                scaler.partial_fit(X)
+                rows += len(X)
+                chunks += 1
+            timings['scaler_seconds'] = time.perf_counter() - started
+            if not rows:
+                raise ValueError("No usable training rows in metrics history")
+
+        if not rows:
+            logger.info("Warm start found no new training rows")
+            return {**previous[2], 'trained': False}
+
+        trees_per_chunk = config.trees_per_chunk or max(1, math.ceil(config.n_estimators / max(chunks, 1)))
+        if model is None:
+            model = RandomForestRegressor(
+                n_estimators=trees_per_chunk, max_depth=config.max_depth,
+                random_state=config.random_state, n_jobs=config.n_jobs, warm_start=True
+            )
+        else:
+            model.set_params(warm_start=True, n_jobs=config.n_jobs)
+
+        # Pass 2: every chunk adds its own trees
+        fit_started = time.perf_counter()
+        holdout_X, holdout_y = [], []
+        holdout_rows = trained_rows = trees_added = 0
+        watermark = after_id
+        for ids, X, y in history_chunks(session, config.chunk_size, after_id, label):
+            held = ids % config.holdout_every == 0
+            if holdout_rows < config.max_holdout_rows and held.any():
+                take = np.flatnonzero(held)[:config.max_holdout_rows - holdout_rows]
+                holdout_X.append(X[take])
+                holdout_y.append(y[take])
+                holdout_rows += len(take)
+            X, y = X[~held], y[~held]
+            if len(X) >= 2:
+                model.n_estimators = len(getattr(model, 'estimators_', [])) + trees_per_chunk
+                model.fit(scaler.transform(X), y)
+                trained_rows += len(X)
+                trees_added += trees_per_chunk
+            if len(ids):
+                watermark = int(ids[-1])
+        timings['fit_seconds'] = time.perf_counter() - fit_started
+
+        if not getattr(model, 'estimators_', None):
+            raise ValueError("Not enough training rows to fit the model")
+        if len(model.estimators_) > config.max_estimators:
+            model.estimators_ = model.estimators_[-config.max_estimators:]
+            model.n_estimators = config.max_estimators
+
+        evaluate_started = time.perf_counter()
+        metrics = self._evaluate(model, scaler, holdout_X, holdout_y)
+        timings['evaluate_seconds'] = time.perf_counter() - evaluate_started
+
+        metadata = {
+            'format': ARTIFACT_FORMAT,
+            'version': datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ'),
+            'created_at': datetime.utcnow().isoformat(),
+            'trained': True,
+            'warm_start': previous is not None,
+            'parent_version': previous[2]['version'] if previous else None,
+            'label': label,
+            'features': list(FEATURE_NAMES),
+            'watermark': watermark,
+            'rows': trained_rows,
+            'total_rows': trained_rows + (previous[2]['total_rows'] if previous else 0),
+            'holdout_rows': holdout_rows,
+            'trees_added': trees_added,
+            'n_estimators': len(model.estimators_),
+            'config': asdict(config),
+            'metrics': metrics,
+            'timings': timings,
+        }
+        model.set_params(warm_start=False)
+        timings['total_seconds'] = time.perf_counter() - started
+        self._publish(model, scaler, metadata)
+        logger.info(
+            f"Performance model {metadata['version']} trained on {trained_rows} rows "
+            f"({metadata['n_estimators']} trees) in {timings['total_seconds']:.1f}s"
+        )
+        return metadata
+
+    def _count_rows(self, session, after_id: int, label: str) -> Tuple[int, int]:
+        from sqlalchemy import func
+        from src.models.campaign import MetricsHistory
+
+        target = getattr(MetricsHistory, label)
+        rows = session.query(func.count(MetricsHistory.id))\
+            .filter(MetricsHistory.id > after_id, target.isnot(None))\
+            .scalar() or 0
+        return rows, math.ceil(rows / self.config.chunk_size)
+
+    def _evaluate(self, model, scaler, holdout_X, holdout_y) -> Dict:
+        if not holdout_X:
+            return {'mae': None, 'rmse': None, 'r2': None}
+        X, y = np.concatenate(holdout_X), np.concatenate(holdout_y)
+        predicted = CompiledForest.from_sklearn(model).predict(scaler.transform(X))
+        residual = predicted - y
+        variance = float(np.var(y))
+        return {
+            'mae': float(np.abs(residual).mean()),
+            'rmse': float(np.sqrt((residual ** 2).mean())),
+            'r2': float(1.0 - (residual ** 2).mean() / variance) if variance > 0 else None,
+        }
+
+    def _publish(self, model, scaler, metadata: Dict):
+        import joblib
+
+        os.makedirs(self.artifact_root, exist_ok=True)
+        final = os.path.join(self.artifact_root, metadata['version'])
+        staging = final + '.tmp'
+        os.makedirs(staging)
+        try:
+            joblib.dump(model, os.path.join(staging, 'model.pkl'))
+            joblib.dump(scaler, os.path.join(staging, 'scaler.pkl'))
+            with open(os.path.join(staging, 'metadata.json'), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.replace(staging, final)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer = os.path.join(self.artifact_root, LATEST_FILE)
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(metadata['version'])
+        os.replace(pointer + '.tmp', pointer)
+
+
+def load_latest_artifact(model_path: str) -> Optional[Tuple[object, object, Dict]]:
+    """
+    Load the artifact ``LATEST`` points at
+
+    Returns:
+        Tuple of (model, scaler, metadata), or None if nothing was published yet
+    """
+    root = os.path.join(model_path, ARTIFACT_DIR)
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    directory = os.path.join(root, version)
+    with open(os.path.join(directory, 'metadata.json')) as f:
+        metadata = json.load(f)
+    import joblib
+    model = joblib.load(os.path.join(directory, 'model.pkl'))
+    scaler = joblib.load(os.path.join(directory, 'scaler.pkl'))
+    return model, scaler, metadata
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from app import create_app
+    from config.settings import Config
+    from src.core.database import get_db_session
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--warm-start', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=Config.ML_TRAINING_CHUNK_SIZE)
+    parser.add_argument('--estimators', type=int, default=Config.ML_TRAINING_ESTIMATORS)
+    parser.add_argument('--jobs', type=int, default=Config.ML_TRAINING_JOBS)
+    parser.add_argument('--model-path', default=Config.ML_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    config = TrainingConfig.from_config(Config)
+    config.chunk_size, config.n_estimators, config.n_jobs = args.chunk_size, args.estimators, args.jobs
+    with create_app().app_context():
+        metadata = PerformanceModelTrainer(args.model_path, config).train(get_db_session(), warm_start=args.warm_start)
+    print(json.dumps(metadata, indent=2))
+
+
+if __name__ == '__main__':
+    main()
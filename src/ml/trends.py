@@ -0,0 +1,97 @@
+"""
+ADFLOWAI - Score Trends
+Closed-form least-squares slopes over recent performance scores, batched or running
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TREND_WINDOW = 7
+
+
+def least_squares_slopes(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Slope of a straight-line fit through each row, all rows at once
+
+    Matches ``np.polyfit(range(k), y, 1)[0]`` on each row's valid points:
+    NaNs are dropped and the remaining points are indexed 0..k-1 in order.
+
+    Args:
+        values: Scores, shape (n, T), oldest first, NaN for missing
+
+    Returns:
+        Tuple of (slopes (n,), counts (n,)); slope is 0 where fewer than 2 points
+    """
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=1)
+    x = np.where(valid, np.cumsum(valid, axis=1) - 1, 0).astype(float)
+    y = np.where(valid, values, 0.0)
+
+    sum_x = count * (count - 1) / 2.0
+    sum_xx = (count - 1) * count * (2 * count - 1) / 6.0
+    sum_y = y.sum(axis=1)
+    sum_xy = (x * y).sum(axis=1)
+    denominator = count * sum_xx - sum_x * sum_x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slopes = np.where(denominator > 0, (count * sum_xy - sum_x * sum_y) / denominator, 0.0)
+    return slopes, count
+
+
+@dataclass
+class RunningTrend:
+    """
+    Sliding-window regression state for one campaign's score series
+
+    Keeps the window's count, sum of y and sum of x*y (x = 0..count-1, so
+    the x sums follow from the count). Pushing a score is O(1): the oldest
+    point leaves, the remaining points shift down one x, the new point
+    enters at the end.
+    """
+    window: int = TREND_WINDOW
+    count: int = 0
+    sum_y: float = 0.0
+    sum_xy: float = 0.0
+    recent: List[float] = field(default_factory=list)
+
+    def push(self, score: Optional[float]):
+        if score is None or not np.isfinite(score):
+            return
+        if self.count == self.window:
+            self.sum_y -= self.recent.pop(0)
+            self.sum_xy -= self.sum_y        # every remaining x decreases by one
+            self.count -= 1
+        self.sum_xy += self.count * score
+        self.sum_y += score
+        self.count += 1
+        self.recent.append(float(score))
+
+    @property
+    def slope(self) -> float:
+        n = self.count
+        sum_x = n * (n - 1) / 2.0
+        denominator = n * (n - 1) * n * (2 * n - 1) / 6.0 - sum_x * sum_x
+        return (n * self.sum_xy - sum_x * self.sum_y) / denominator if denominator > 0 else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'window': self.window, 'count': self.count, 'sum_y': self.sum_y,
+            'sum_xy': self.sum_xy, 'recent': list(self.recent),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RunningTrend':
+        return cls(**{key: data[key] for key in ('window', 'count', 'sum_y', 'sum_xy', 'recent')})
+
+    @classmethod
+    def from_scores(cls, scores, window: int = TREND_WINDOW) -> 'RunningTrend':
+        """Build the state from a chronological score series"""
+        trend = cls(window=window)
+        for score in list(scores)[-window:]:
+            trend.push(score)
+        return trend
@@ -74,6 +74,9 @@ class Campaign(Base):
     # Relationships
     platform_campaigns = relationship("PlatformCampaign", back_populates="campaign", cascade="all, delete-orphan")
     metrics_history = relationship("MetricsHistory", back_populates="campaign", cascade="all, delete-orphan")
+    score_trend = relationship("ScoreTrend", uselist=False, cascade="all, delete-orphan")
+    optimization_logs = relationship("OptimizationLog", cascade="all, delete-orphan")
+    alert_logs = relationship("AlertLog", cascade="all, delete-orphan")
     
     # User relationship (for multi-tenant)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
@@ -177,6 +180,18 @@ class MetricsHistory(Base):
         return f"<MetricsHistory(campaign_id={self.campaign_id}, recorded_at='{self.recorded_at}')>"
 
 
+class ScoreTrend(Base):
+    """Running regression state over a campaign's recorded performance scores"""
+    __tablename__ = 'score_trends'
+    
+    campaign_id = Column(Integer, ForeignKey('campaigns.id'), primary_key=True)
+    state = Column(JSON, nullable=False)  # RunningTrend.to_dict()
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ScoreTrend(campaign_id={self.campaign_id})>"
+
+
 class User(Base):
     """User model for authentication and multi-tenancy"""
     __tablename__ = 'users'
@@ -214,7 +229,9 @@ class APIKey(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     
-    key = Column(String(255), unique=True, nullable=False, index=True)
+    # Only an HMAC of the key is stored; the prefix is the lookup index
+    prefix = Column(String(16), unique=True, nullable=False, index=True)
+    key_hash = Column(String(64), nullable=False)
     name = Column(String(100))
     
     is_active = Column(Boolean, default=True, index=True)
@@ -255,3 +272,23 @@ class OptimizationLog(Base):
     
     def __repr__(self):
         return f"<OptimizationLog(id={self.id}, campaign_id={self.campaign_id}, action='{self.action}')>"
+
+
+class AlertLog(Base):
+    """Log of real-time alert transitions (open / ongoing / resolved)"""
+    __tablename__ = 'alert_logs'
+    
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id'), nullable=False, index=True)
+    
+    alert_type = Column(String(50), nullable=False, index=True)
+    state = Column(String(20), nullable=False)  # open, ongoing, resolved
+    severity = Column(String(20))
+    message = Column(Text)
+    occurrences = Column(Integer, default=1)
+    
+    opened_at = Column(DateTime)
+    recorded_at = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<AlertLog(campaign_id={self.campaign_id}, type='{self.alert_type}', state='{self.state}')>"
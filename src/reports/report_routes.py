@@ -9,7 +9,7 @@ import logging
 from src.reports.report_generator import ReportGenerator
 from src.core.campaign_manager import CampaignManager
 from src.auth.auth_manager import AuthManager
-from src.core.database import get_db_session
+from src.core.database import get_read_session
 
 logger = logging.getLogger(__name__)
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/v1/reports')
@@ -27,7 +27,7 @@ def download_campaign_report():
         return jsonify({'error': "format must be csv, json, or html"}), 400
 
     user_id = get_jwt_identity()
-    db      = get_db_session()
+    db      = get_read_session()
 
     # Get campaigns
     mgr       = CampaignManager(db_session=db)
@@ -36,7 +36,7 @@ def download_campaign_report():
 
     # Get user info
     auth      = AuthManager(db_session=db)
-    user      = auth.get_user_by_id(user_id)
+    user      = auth.get_user_record(user_id)
     user_info = {'username': user.username, 'company': user.company} if user else {}
 
     # Generate report
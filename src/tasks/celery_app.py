@@ -5,8 +5,14 @@ Background task processing for campaign optimization
 
 import os
 import logging
+import time
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import (
+    before_task_publish, task_postrun, task_prerun, worker_init, worker_process_shutdown
+)
+
+from src.core.observability import TASK_DURATION, TASK_QUEUE_LAG
 
 logger = logging.getLogger(__name__)
 
@@ -42,6 +48,10 @@ def make_celery():
                 'task': 'src.tasks.celery_app.sync_all_metrics',
                 'schedule': crontab(hour=2, minute=0),  # Daily at 2 AM UTC
             },
+            'retrain-performance-model-nightly': {
+                'task': 'src.tasks.celery_app.retrain_performance_model',
+                'schedule': crontab(hour=3, minute=0),  # Daily at 3 AM UTC, after the sync
+            },
         }
     )
     
@@ -51,6 +61,73 @@ def make_celery():
 celery_app = make_celery()
 
 
+# ── Metrics ──────────────────────────────────────────────────────────────────
+
+_task_started = {}
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    """Stamp publish time on the message so workers can measure queue lag"""
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def _task_started_metrics(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = task.request.get('published_at') or (task.request.headers or {}).get('published_at')
+    if published_at and not task.request.eta:  # delayed tasks wait on purpose
+        TASK_QUEUE_LAG.labels(task.name).observe(max(0.0, time.time() - float(published_at)))
+
+
+@task_postrun.connect
+def _task_finished_metrics(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+def _forks_pool_processes(worker) -> bool:
+    """Whether ``worker`` runs tasks in child processes (the prefork pool)"""
+    pool = getattr(worker, 'pool_cls', None)
+    name = pool if isinstance(pool, str) else getattr(pool, '__module__', '')
+    return name in ('prefork', 'processes') or name.endswith('.prefork')
+
+
+@worker_init.connect
+def _serve_worker_metrics(sender=None, **kwargs):
+    """
+    Serve /metrics from the worker's main process when CELERY_METRICS_PORT is set
+
+    With the prefork pool the task metrics are recorded in the pool's child
+    processes, so the exporter only sees them in Prometheus multiprocess
+    mode: PROMETHEUS_MULTIPROC_DIR must be set (and emptied) before the
+    worker starts. Without it the exporter is not started.
+    """
+    port = int(os.getenv('CELERY_METRICS_PORT', 0))
+    if not port:
+        return
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR') and _forks_pool_processes(sender):
+        logger.error(
+            "CELERY_METRICS_PORT is set but PROMETHEUS_MULTIPROC_DIR is not; task metrics are "
+            "recorded in the prefork pool's processes, so worker metrics are not served"
+        )
+        return
+    from prometheus_client import start_http_server
+    from src.core.observability import metrics_registry
+    start_http_server(port, registry=metrics_registry())
+    logger.info(f"Celery worker metrics on :{port}/metrics")
+
+
+@worker_process_shutdown.connect
+def _mark_pool_process_dead(pid=None, **kwargs):
+    """Drop an exiting pool process's live gauges from the multiprocess directory"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
 # ── Tasks ────────────────────────────────────────────────────────────────────
 
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
@@ -102,11 +179,29 @@ def optimize_all_campaigns(self):
                 status=CampaignStatus.ACTIVE
             ).all()
             
+            # Platform splits for the whole sweep come from one vectorized solve
+            try:
+                plans = CampaignManager(session).plan_budget_allocations(active)
+            except Exception as e:
+                logger.error(f"[TASK] Batched budget allocation failed, solving per campaign: {e}")
+                plans = {}
+            
+            # Score trends for the sweep: stored running states, one batched backfill
+            try:
+                trends = CampaignManager(session).score_trends([c.id for c in active])
+            except Exception as e:
+                logger.error(f"[TASK] Batched score trends failed, reading per campaign: {e}")
+                trends = {}
+            
             results = []
             for campaign in active:
                 try:
                     manager = CampaignManager()
-                    actions = manager.optimize_campaign(campaign.id)
+                    actions = manager.optimize_campaign(
+                        campaign.id,
+                        platform_allocation=plans.get(campaign.id),
+                        score_trend=trends.get(campaign.id)
+                    )
                     results.append({'campaign_id': campaign.id, 'actions': actions})
                 except Exception as e:
                     logger.error(f"[TASK] Failed to optimize campaign {campaign.id}: {e}")
@@ -137,3 +232,41 @@ def sync_all_metrics(self):
     except Exception as exc:
         logger.error(f"[TASK] Metrics sync failed: {exc}")
         raise self.retry(exc=exc)
+
+
+@celery_app.task(bind=True, max_retries=1)
+def retrain_performance_model(self, warm_start: bool = None):
+    """
+    Background task: Retrain the performance model from metrics history (runs nightly)
+    
+    Args:
+        warm_start: Add trees for new rows only (defaults to ML_TRAINING_WARM_START)
+    """
+    try:
+        logger.info("[TASK] Retraining performance model")
+        
+        from app import create_app
+        from config.settings import Config
+        from src.core.database import get_db_session
+        from src.ml.training import PerformanceModelTrainer, TrainingConfig
+        
+        if warm_start is None:
+            warm_start = Config.ML_TRAINING_WARM_START
+        
+        flask_app = create_app()
+        with flask_app.app_context():
+            trainer = PerformanceModelTrainer(Config.ML_MODEL_PATH, TrainingConfig.from_config(Config))
+            metadata = trainer.train(get_db_session(), warm_start=warm_start)
+            logger.info(f"[TASK] Performance model {metadata['version']}: {metadata['metrics']}")
+            return {
+                'status': 'success',
+                'version': metadata['version'],
+                'trained': metadata['trained'],
+                'rows': metadata['rows'],
+                'metrics': metadata['metrics'],
+                'timings': metadata['timings']
+            }
+    
+    except Exception as exc:
+        logger.error(f"[TASK] Model retraining failed: {exc}")
+        raise self.retry(exc=exc)
@@ -55,3 +55,38 @@ def auth_headers(client):
         'Authorization':  f'Bearer {token}',
         'Content-Type':   'application/json',
     }
+
+
+class QueryLog(list):
+    """SQL statements executed inside a count_queries() block"""
+
+    def matching(self, fragment):
+        return [statement for statement in self if fragment in statement]
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Context manager recording every statement sent to the test database:
+
+        with count_queries() as queries:
+            client.get(...)
+        assert len(queries) == 2
+    """
+    from contextlib import contextmanager
+    from sqlalchemy import event
+    from src.core.database import db
+
+    @contextmanager
+    def counting():
+        queries = QueryLog()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield queries
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+    return counting
@@ -33,3 +33,32 @@ class TestAdminEndpoints:
     def test_users_requires_admin(self, client, auth_headers):
         res = client.get('/api/v1/admin/users', headers=auth_headers)
         assert res.status_code == 403
+
+
+class TestAdminManager:
+
+    def test_delete_user_removes_campaign_logs(self, app):
+        import uuid
+        from datetime import datetime
+        from src.admin.admin_manager import AdminManager
+        from src.core.campaign_manager import CampaignManager
+        from src.core.database import get_db_session
+        from src.models.campaign import AlertLog, OptimizationLog, User
+
+        session = get_db_session()
+        name = f'doomed_{uuid.uuid4().hex[:8]}'
+        user = User(username=name, email=f'{name}@test.com', password_hash='x', role='user', is_active=True)
+        session.add(user)
+        session.commit()
+        campaign = CampaignManager(session).create_campaign(
+            user_id=user.id, name='Doomed', total_budget=1000, platforms=['google_ads'],
+            start_date=datetime.utcnow()
+        )
+        campaign_id = campaign.id
+        session.add(AlertLog(campaign_id=campaign_id, alert_type='ctr_drop', state='open'))
+        session.add(OptimizationLog(campaign_id=campaign_id, action='pause'))
+        session.commit()
+
+        AdminManager(session).delete_user(user.id)
+        for log in (AlertLog, OptimizationLog):
+            assert session.query(log).filter_by(campaign_id=campaign_id).count() == 0
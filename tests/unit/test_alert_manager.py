@@ -0,0 +1,59 @@
+"""Unit tests for the real-time alert state machine"""
+from datetime import datetime, timedelta
+
+from src.core.alert_manager import AlertManager
+
+
+def cpc_alert():
+    return {'type': 'cpc_high', 'severity': 'critical', 'message': 'CPC spike'}
+
+
+def run(manager, ticks, campaign_id=1, start=None):
+    """Feed a sequence of booleans (alert present?) one second apart"""
+    start = start or datetime(2026, 1, 1)
+    events = []
+    for i, present in enumerate(ticks):
+        alerts = [cpc_alert()] if present else []
+        events += manager.process(campaign_id, alerts, now=start + timedelta(seconds=i))
+    return events
+
+
+class TestAlertManager:
+
+    def test_one_hour_incident_emits_open_and_resolve_only(self):
+        manager = AlertManager(open_after=2, resolve_after=5, reminder_interval=86400)
+        events = run(manager, [True] * 3600 + [False] * 10)
+        assert [e.state for e in events] == ['open', 'resolved']
+        assert events[-1].occurrences == 3600
+
+    def test_single_blip_does_not_open(self):
+        manager = AlertManager(open_after=2)
+        assert run(manager, [True, False, False]) == []
+        assert manager.get_active_alerts() == []
+
+    def test_hysteresis_keeps_flapping_alert_open(self):
+        manager = AlertManager(open_after=1, resolve_after=3)
+        events = run(manager, [True, False, True, False, False, True, False, False, False])
+        assert [e.state for e in events] == ['open', 'resolved']
+
+    def test_ongoing_reminders_are_rate_limited(self):
+        manager = AlertManager(open_after=1, reminder_interval=600)
+        events = run(manager, [True] * 1800)
+        assert [e.state for e in events] == ['open', 'ongoing', 'ongoing']
+
+    def test_deduplicated_per_campaign_and_type(self):
+        manager = AlertManager(open_after=1)
+        manager.process(1, [cpc_alert(), cpc_alert()])
+        manager.process(2, [cpc_alert()])
+        active = manager.get_active_alerts()
+        assert sorted(a['campaign_id'] for a in active) == [1, 2]
+        assert len(manager.get_active_alerts(1)) == 1
+
+    def test_clear_resolves_and_persists(self):
+        persisted = []
+        manager = AlertManager(open_after=1, persist=persisted.extend)
+        manager.process(1, [cpc_alert()])
+        events = manager.clear(1)
+        assert [e.state for e in events] == ['resolved']
+        assert [e.state for e in persisted] == ['open', 'resolved']
+        assert [e['state'] for e in manager.recent_events()] == ['open', 'resolved']
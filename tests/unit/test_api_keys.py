@@ -0,0 +1,171 @@
+"""Unit tests for hashed, prefix-indexed API key authentication"""
+import uuid
+
+import pytest
+
+from src.auth.api_keys import (
+    APIKeyAuthenticator, APIKeyError, APIKeyManager, api_key_or_jwt_required, current_identity
+)
+
+
+@pytest.fixture
+def session(app):
+    from src.core.database import get_db_session
+    return get_db_session()
+
+
+@pytest.fixture
+def user(session):
+    from src.models.campaign import User
+    name = f'keys_{uuid.uuid4().hex[:8]}'
+    user = User(username=name, email=f'{name}@test.com', password_hash='x', role='user', is_active=True)
+    session.add(user)
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def authenticator():
+    return APIKeyAuthenticator('test-secret', cache_ttl=60, cache_size=100, flush_interval=0)
+
+
+class CountingAuthenticator(APIKeyAuthenticator):
+    """Counts database lookups"""
+    loads = 0
+
+    def _load(self, raw_key, digest, session):
+        self.loads += 1
+        return super()._load(raw_key, digest, session)
+
+
+class TestAPIKeyAuthenticator:
+
+    def test_only_the_hmac_is_stored(self, session, user, authenticator):
+        api_key, raw_key = APIKeyManager(session, authenticator).create_key(user.id, 'ingest')
+        assert raw_key.startswith(f'adf_{api_key.prefix}_')
+        assert raw_key not in (api_key.key_hash, api_key.prefix)
+        assert api_key.key_hash == authenticator.hash_key(raw_key)
+        assert APIKeyAuthenticator('other-secret').hash_key(raw_key) != api_key.key_hash
+
+    def test_verified_keys_are_served_from_cache(self, session, user):
+        authenticator = CountingAuthenticator('test-secret', flush_interval=0)
+        _, raw_key = APIKeyManager(session, authenticator).create_key(user.id)
+        for _ in range(5):
+            assert authenticator.authenticate(raw_key, session).user_id == user.id
+        assert authenticator.loads == 1
+
+    def test_rejects_unknown_tampered_and_malformed_keys(self, session, user, authenticator):
+        _, raw_key = APIKeyManager(session, authenticator).create_key(user.id)
+        assert authenticator.authenticate(raw_key[:-1] + ('A' if raw_key[-1] != 'A' else 'B'), session) is None
+        assert authenticator.authenticate('adf_000000000000_nope', session) is None
+        assert authenticator.authenticate('garbage', session) is None
+
+    def test_revoked_and_expired_keys_are_rejected(self, session, user, authenticator):
+        from datetime import datetime, timedelta
+        manager = APIKeyManager(session, authenticator)
+        api_key, raw_key = manager.create_key(user.id)
+        assert authenticator.authenticate(raw_key, session)
+        manager.revoke_key(user.id, api_key.id)
+        assert authenticator.authenticate(raw_key, session) is None
+
+        api_key, raw_key = manager.create_key(user.id, expires_in_days=1)
+        assert authenticator.authenticate(raw_key, session)
+        api_key.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.commit()
+        authenticator.invalidate(api_key.key_hash)
+        assert authenticator.authenticate(raw_key, session) is None
+
+        with pytest.raises(APIKeyError):
+            manager.revoke_key(user.id + 1, api_key.id)
+
+    def test_last_used_is_written_in_one_batch(self, session, user, authenticator):
+        manager = APIKeyManager(session, authenticator)
+        keys = [manager.create_key(user.id) for _ in range(2)]
+        for _ in range(3):
+            for _, raw_key in keys:
+                authenticator.authenticate(raw_key, session)
+        assert all(api_key.last_used is None for api_key, _ in keys)
+
+        assert authenticator.flush(session) == 2
+        session.expire_all()
+        assert all(api_key.last_used is not None for api_key, _ in keys)
+        assert authenticator.flush(session) == 0
+
+    def test_flush_skips_keys_deleted_since_use(self, session, user, authenticator):
+        manager = APIKeyManager(session, authenticator)
+        (kept, kept_raw), (deleted, deleted_raw) = [manager.create_key(user.id) for _ in range(2)]
+        authenticator.authenticate(kept_raw, session)
+        authenticator.authenticate(deleted_raw, session)
+        session.delete(deleted)
+        session.commit()
+
+        assert authenticator.flush(session) == 2
+        session.expire_all()
+        assert kept.last_used is not None
+
+    def test_cache_is_bounded(self, session, user):
+        authenticator = APIKeyAuthenticator('test-secret', cache_size=2, flush_interval=0)
+        manager = APIKeyManager(session, authenticator)
+        for _ in range(4):
+            authenticator.authenticate(manager.create_key(user.id)[1], session)
+        assert len(authenticator._cache) == 2
+
+
+class TestAPIKeyRoutes:
+
+    def test_key_authenticates_campaign_routes(self, app, client, auth_headers):
+        created = client.post('/api/v1/auth/api-keys', headers=auth_headers, json={'name': 'ingest'})
+        assert created.status_code == 201
+        body = created.get_json()
+        headers = {'X-API-Key': body['key']}
+
+        assert client.get('/api/v1/campaigns', headers=headers).status_code == 200
+        assert client.get('/api/v1/campaigns', headers={'X-API-Key': 'adf_bad_key'}).status_code == 401
+        listed = client.get('/api/v1/auth/api-keys', headers=auth_headers).get_json()['api_keys']
+        assert body['api_key']['id'] in [k['id'] for k in listed]
+        assert all('key' not in k and 'key_hash' not in k for k in listed)
+
+        # Keys can't manage keys
+        assert client.post('/api/v1/auth/api-keys', headers=headers, json={}).status_code == 401
+
+        revoked = client.delete(f"/api/v1/auth/api-keys/{body['api_key']['id']}", headers=auth_headers)
+        assert revoked.status_code == 200
+        assert client.get('/api/v1/campaigns', headers=headers).status_code == 401
+
+    def test_deactivated_users_keys_are_rejected(self, app, client, session, user):
+        from src.admin.admin_manager import AdminManager
+        _, raw_key = APIKeyManager(session).create_key(user.id)
+        headers = {'X-API-Key': raw_key}
+        assert client.get('/api/v1/dashboard', headers=headers).status_code == 200
+        AdminManager(session).toggle_active(user.id)
+        assert client.get('/api/v1/dashboard', headers=headers).status_code == 401
+
+    def test_current_identity_covers_keys_and_tokens(self, app, session, user):
+        from flask_jwt_extended import create_access_token
+        _, raw_key = APIKeyManager(session).create_key(user.id)
+        view = api_key_or_jwt_required()(current_identity)
+
+        with app.test_request_context(headers={'X-API-Key': raw_key}):
+            assert view() == user.id
+        with app.test_request_context(headers={'Authorization': f'Bearer {create_access_token(identity=user.id)}'}):
+            assert view() == user.id
+
+
+class TestAPIKeyMigration:
+
+    def test_legacy_table_is_recreated(self, tmp_path):
+        from sqlalchemy import create_engine, inspect, text
+        from scripts.init_db import upgrade_api_keys_table
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE api_keys (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+                              "key VARCHAR(255) NOT NULL UNIQUE, name VARCHAR(100), is_active BOOLEAN, "
+                              "last_used DATETIME, created_at DATETIME, expires_at DATETIME)"))
+            conn.execute(text("INSERT INTO api_keys (user_id, key) VALUES (1, 'plaintext')"))
+
+        assert upgrade_api_keys_table(engine)
+        columns = {c['name'] for c in inspect(engine).get_columns('api_keys')}
+        assert {'prefix', 'key_hash'} <= columns and 'key' not in columns
+        assert not upgrade_api_keys_table(engine)
+        engine.dispose()
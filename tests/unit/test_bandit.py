@@ -0,0 +1,250 @@
+"""Unit tests for the Thompson-sampling budget bandit"""
+import numpy as np
+import pytest
+
+from src.ml.advanced_predictor import AdvancedPredictiveEngine
+from src.ml.bandit import BanditState, BanditStore, thompson_shares
+
+
+class HashClient:
+    """Just enough of a Redis client for the store: hashes via a pipeline"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.commands = []
+
+    def pipeline(self, transaction=True):
+        self.commands = []
+        return self
+
+    def hincrbyfloat(self, key, field, amount):
+        self.commands.append(('incr', key, field, amount))
+
+    def hgetall(self, key):
+        self.commands.append(('get', key))
+
+    def execute(self):
+        results = []
+        for command in self.commands:
+            table = self.hashes.setdefault(command[1], {})
+            if command[0] == 'incr':
+                table[command[2].encode()] = str(float(table.get(command[2].encode(), 0)) + command[3]).encode()
+                results.append(table[command[2].encode()])
+            else:
+                results.append(dict(table))
+        return results
+
+
+def make_engine(store=None):
+    engine = AdvancedPredictiveEngine(bandit_store=store or BanditStore())
+    engine.rng = np.random.default_rng(0)
+    return engine
+
+
+class TestBanditState:
+
+    def test_posterior_matches_closed_form(self):
+        state = BanditState(prior_mean=1.0, prior_strength=2.0, prior_shape=3.0, prior_rate=0.5)
+        rewards = np.array([1.5, 2.0, 2.5, 1.0])
+        state.update([1] * 4, ['facebook'] * 4, rewards)
+        mu, kappa, alpha, beta = state.posterior(state.statistics(state.rows([(1, 'facebook')])))
+
+        n, mean = len(rewards), rewards.mean()
+        assert kappa[0] == pytest.approx(2.0 + n)
+        assert mu[0] == pytest.approx((2.0 * 1.0 + n * mean) / (2.0 + n))
+        assert alpha[0] == pytest.approx(3.0 + n / 2)
+        expected_beta = 0.5 + 0.5 * ((rewards - mean) ** 2).sum() + 2.0 * n * (mean - 1.0) ** 2 / (2 * (2.0 + n))
+        assert beta[0] == pytest.approx(expected_beta)
+
+    def test_batched_update_equals_sequential(self):
+        rng = np.random.default_rng(0)
+        campaigns = rng.integers(0, 50, 500)
+        platforms = rng.choice(['google_ads', 'facebook', 'tiktok'], 500)
+        rewards = rng.normal(1.5, 0.5, 500)
+        batch, sequential = BanditState(), BanditState(capacity=1)
+        batch.update(campaigns, platforms, rewards)
+        for c, p, r in zip(campaigns, platforms, rewards):
+            sequential.update([c], [p], [r])
+        keys = list(zip(campaigns.tolist(), platforms.tolist()))
+        np.testing.assert_allclose(batch.statistics(batch.rows(keys)),
+                                   sequential.statistics(sequential.rows(keys)))
+
+    def test_evidence_is_capped(self):
+        state = BanditState(max_observations=10)
+        state.update([1] * 100, ['facebook'] * 100, np.full(100, 3.0))
+        _, kappa, alpha, _ = state.posterior(state.statistics(state.rows([(1, 'facebook')])))
+        assert kappa[0] == pytest.approx(11.0)
+        assert alpha[0] == pytest.approx(state.prior_shape + 5.0)
+
+    def test_snapshot_round_trip_and_merge(self):
+        state = BanditState()
+        state.update([1, 1, 2], ['facebook', 'google_ads', 'facebook'], [1.0, 2.0, 3.0])
+        restored = BanditState.from_bytes(state.to_bytes())
+        keys = [(1, 'facebook'), (1, 'google_ads'), (2, 'facebook')]
+        np.testing.assert_array_equal(restored.statistics(restored.rows(keys)),
+                                      state.statistics(state.rows(keys)))
+        restored.merge(state)
+        assert restored.statistics(restored.rows([(2, 'facebook')]))[0].tolist() == [2.0, 6.0, 18.0]
+
+    def test_unknown_arms_get_the_prior(self):
+        state = BanditState()
+        assert state.rows([(9, 'linkedin')]).tolist() == [-1]
+        assert state.statistics(np.array([-1])).tolist() == [[0.0, 0.0, 0.0]]
+
+
+class TestThompsonShares:
+
+    def test_favours_the_better_arm(self):
+        state = BanditState()
+        rng = np.random.default_rng(1)
+        state.update([1] * 40, ['a'] * 20 + ['b'] * 20,
+                     np.concatenate([rng.normal(3.0, 0.3, 20), rng.normal(1.0, 0.3, 20)]))
+        rows = state.rows([(1, 'a'), (1, 'b')])[None, :]
+        shares, means = thompson_shares(state, state.statistics(rows), np.ones((1, 2), bool), rng=rng)
+        assert shares[0, 0] > 0.99
+        assert means[0, 0] == pytest.approx(3.0, abs=0.2)
+
+    def test_masked_arms_never_win(self):
+        state = BanditState()
+        mask = np.array([[True, False, True]])
+        shares, _ = thompson_shares(state, np.zeros((1, 3, 3)), mask, rng=np.random.default_rng(2))
+        assert shares[0, 1] == 0.0
+        assert shares.sum() == pytest.approx(1.0)
+
+    def test_chunked_sampling_covers_every_campaign(self):
+        state = BanditState()
+        mask = np.ones((300, 4), dtype=bool)
+        shares, _ = thompson_shares(state, np.zeros((300, 4, 3)), mask, n_draws=200,
+                                    rng=np.random.default_rng(3), max_chunk_bytes=20000)
+        np.testing.assert_allclose(shares.sum(axis=1), 1.0)
+
+
+class TestBanditStore:
+
+    def test_workers_share_additive_updates(self):
+        client = HashClient()
+        first, second = BanditStore(client), BanditStore(client)
+        first.record([1, 1], ['facebook', 'google_ads'], [2.0, 1.0])
+        second.record([1], ['facebook'], [4.0])
+        state = second.refresh(force=True)
+        assert state.statistics(state.rows([(1, 'facebook')]))[0].tolist() == [2.0, 6.0, 20.0]
+
+    def test_snapshot_file(self, tmp_path):
+        store = BanditStore()
+        store.record([3], ['tiktok'], [1.25])
+        store.save(str(tmp_path / 'bandit.npz'))
+        other = BanditStore()
+        other.load(str(tmp_path / 'bandit.npz'))
+        assert other.state.statistics(other.state.rows([(3, 'tiktok')]))[0, 1] == 1.25
+
+
+class TestOptimizeBudgetAllocationRL:
+
+    def test_uses_historical_rewards(self):
+        result = make_engine().optimize_budget_allocation_rl(
+            1000, {'google_ads': {}, 'facebook': {}},
+            {'google_ads': [3.0, 3.2, 2.9, 3.1], 'facebook': [0.8, 1.0, 0.9, 1.1]}
+        )
+        allocations = result['allocations']
+        assert sum(allocations.values()) == pytest.approx(1000)
+        assert allocations['google_ads'] > allocations['facebook']
+        assert 50 <= allocations['facebook'] < 100               # exploration floor
+        assert result['strategy'] == 'rl_thompson_sampling'
+        assert result['confidence'] > 0.9
+
+    def test_recorded_rewards_drive_campaign_allocation(self):
+        store = BanditStore()
+        store.record([5] * 10, ['facebook'] * 10, np.full(10, 4.0))
+        store.record([5] * 10, ['google_ads'] * 10, np.full(10, 1.0))
+        engine = make_engine(store)
+        result = engine.optimize_budget_allocation_rl(500, {'google_ads': {}, 'facebook': {}}, [], campaign_id=5)
+        assert result['allocations']['facebook'] > 400
+
+    def test_inactive_platform_gets_nothing(self):
+        result = make_engine().optimize_budget_allocation_rl(
+            1000, {'google_ads': {}, 'facebook': {'is_active': False}, 'tiktok': {}}, [1.2, 1.4]
+        )
+        assert result['allocations']['facebook'] == 0.0
+        assert result['expected_rewards']['facebook'] is None
+        assert result['expected_rewards']['tiktok'] == pytest.approx(1.3)
+
+    def test_batch_covers_every_request(self):
+        engine = make_engine()
+        requests = [(c, 100.0 * c, {'google_ads': {'roas': 2.0}, 'facebook': {'roas': 1.0}}, None)
+                    for c in range(1, 201)]
+        results = engine.optimize_budget_allocations_rl(requests, n_draws=200)
+        assert len(results) == 200
+        assert sum(results[9]['allocations'].values()) == pytest.approx(1000)
+
+
+class TestMetricsIngestion:
+
+    def test_platform_metrics_update_records_interval_roas(self, app):
+        from datetime import datetime
+        from src.core.campaign_manager import CampaignManager
+        from src.ml.bandit import get_bandit_store
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Bandit', total_budget=1000,
+                                           platforms=['facebook'], start_date=datetime.utcnow())
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 100.0, 'roas': 2.0})
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 300.0, 'roas': 3.0})
+
+        state = get_bandit_store().state
+        stats = state.statistics(state.rows([(campaign.id, 'facebook')]))[0]
+        # revenue 200 -> 900 on 200 extra spend
+        assert stats[:2].tolist() == [1.0, pytest.approx(3.5)]
+
+    def test_reward_uses_the_platforms_own_spend_and_revenue(self, app):
+        from datetime import datetime
+        from src.core.campaign_manager import CampaignManager
+        from src.ml.bandit import get_bandit_store
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Bandit split', total_budget=1000,
+                                           platforms=['facebook', 'google_ads'], start_date=datetime.utcnow())
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 100.0, 'roas': 2.0})
+        manager.update_campaign_metrics(campaign.id, 'google_ads', {'spent_budget': 500.0, 'roas': 5.0})
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 200.0, 'roas': 1.5})
+
+        state = get_bandit_store().state
+        stats = state.statistics(state.rows([(campaign.id, 'facebook'), (campaign.id, 'google_ads')]))
+        # facebook revenue 200 -> 300 on 100 extra spend; google has a single snapshot
+        assert stats[0][:2].tolist() == [1.0, pytest.approx(1.0)]
+        assert stats[1][0] == 0.0
+
+    def test_reward_is_recorded_only_after_commit(self, app, monkeypatch):
+        from datetime import datetime
+        from src.core.campaign_manager import CampaignManager
+        from src.ml.bandit import get_bandit_store
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Bandit rollback', total_budget=1000,
+                                           platforms=['facebook'], start_date=datetime.utcnow())
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 100.0, 'roas': 2.0})
+
+        def fail():
+            raise RuntimeError('commit failed')
+        monkeypatch.setattr(manager.db, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 300.0, 'roas': 3.0})
+
+        state = get_bandit_store().state
+        assert state.statistics(state.rows([(campaign.id, 'facebook')]))[0][0] == 0.0
+
+
+class TestSingletons:
+
+    def test_store_is_per_app(self, app):
+        from src.ml.bandit import get_bandit_store
+
+        assert get_bandit_store() is app.extensions['bandit_store'] is get_bandit_store()
+
+    def test_engine_is_per_app(self, app):
+        from src.ml.advanced_predictor import get_advanced_engine
+        from src.ml.bandit import get_bandit_store
+
+        engine = get_advanced_engine()
+        assert engine is app.extensions['advanced_engine'] is get_advanced_engine()
+        assert engine.model_path == app.config['ML_MODEL_PATH']
+        assert engine.bandit is get_bandit_store()
@@ -0,0 +1,142 @@
+"""Unit tests for response-curve fitting and the batched budget allocator"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.ml.budget_allocation import allocate, expected_value, fit_response_curves
+from src.ml.optimizer import AIOptimizer
+
+
+class TestAllocate:
+
+    def test_equalises_marginal_returns(self):
+        # sqrt curves: optimum is proportional to scale ** 2
+        x = allocate(np.array([1000.0]), np.array([[3.0, 1.0]]), np.array([[0.5, 0.5]]))
+        np.testing.assert_allclose(x, [[900.0, 100.0]], rtol=1e-9)
+
+    def test_beats_proportional_split(self):
+        scale = np.array([[2.0, 1.5, 1.0]])
+        elasticity = np.array([[0.3, 0.6, 0.8]])
+        x = allocate(np.array([500.0]), scale, elasticity)
+        proportional = 500.0 * scale / scale.sum()
+        assert expected_value(x, scale, elasticity) > expected_value(proportional, scale, elasticity)
+
+    def test_bounds_respected(self):
+        x = allocate(np.array([1000.0]), np.array([[5.0, 1.0, 1.0]]), np.array([[0.5, 0.5, 0.5]]),
+                     lower=np.array([[0.0, 150.0, 0.0]]), upper=np.array([[400.0, 1000.0, 1000.0]]))
+        assert x.sum() == pytest.approx(1000.0)
+        assert x[0, 0] == pytest.approx(400.0)
+        assert x[0, 1] >= 150.0
+
+    def test_floors_exceeding_budget_are_scaled(self):
+        floors = np.full((1, 15), 100.0)
+        x = allocate(np.array([1000.0]), np.ones((1, 15)), np.full((1, 15), 0.5), lower=floors)
+        assert x.sum() == pytest.approx(1000.0)
+        np.testing.assert_allclose(x, 1000.0 / 15)
+
+    def test_caps_below_budget(self):
+        x = allocate(np.array([1000.0]), np.ones((1, 2)), np.full((1, 2), 0.5),
+                     upper=np.array([[100.0, 200.0]]))
+        np.testing.assert_allclose(x, [[100.0, 200.0]])
+
+    def test_batch_equals_individual(self):
+        rng = np.random.default_rng(0)
+        budgets = rng.uniform(100, 10000, 50)
+        scale = rng.uniform(0.1, 5, (50, 4))
+        elasticity = rng.uniform(0.2, 0.9, (50, 4))
+        batch = allocate(budgets, scale, elasticity)
+        single = allocate(budgets[7:8], scale[7:8], elasticity[7:8])
+        np.testing.assert_allclose(batch[7:8], single)
+        np.testing.assert_allclose(batch.sum(axis=1), budgets)
+
+
+class TestFitResponseCurves:
+
+    def test_recovers_power_law(self):
+        rng = np.random.default_rng(1)
+        spend = rng.uniform(10, 1000, (2, 200))
+        value = np.stack([3.0 * spend[0] ** 0.4, 0.5 * spend[1] ** 0.8]) * np.exp(rng.normal(0, 0.05, (2, 200)))
+        curves = fit_response_curves(spend, value)
+        np.testing.assert_allclose(curves.elasticity, [0.4, 0.8], atol=0.03)
+        np.testing.assert_allclose(curves.scale, [3.0, 0.5], rtol=0.2)
+
+    def test_series_without_data(self):
+        curves = fit_response_curves(np.array([[np.nan, 0.0]]), np.array([[np.nan, 0.0]]))
+        assert np.isnan(curves.scale[0])
+        assert curves.observations[0] == 0
+
+
+class TestOptimizer:
+
+    def test_many_platforms_stay_within_budget(self):
+        platforms = {f'p{i}': {'ctr': 0.005 * i, 'roas': i / 3} for i in range(12)}
+        allocation = AIOptimizer().optimize_budget_allocation(1000, platforms)
+        assert sum(allocation.values()) == pytest.approx(1000)
+        assert min(allocation.values()) > 0
+
+    def test_inactive_platform_gets_nothing(self):
+        allocation = AIOptimizer().optimize_budget_allocation(
+            1000, {'google_ads': {'ctr': 0.03}, 'facebook': {'ctr': 0.03, 'is_active': False}})
+        assert allocation == {'google_ads': pytest.approx(1000), 'facebook': 0.0}
+
+    def test_fitted_curves_drive_allocation(self):
+        allocation = AIOptimizer().optimize_budget_allocation(1000, {
+            'google_ads': {'response_curve': {'scale': 2.0, 'elasticity': 0.5}},
+            'facebook': {'response_curve': {'scale': 1.0, 'elasticity': 0.5}},
+        })
+        assert allocation['google_ads'] == pytest.approx(800)
+
+
+class TestCampaignManagerCurves:
+
+    def test_fits_curves_from_platform_history(self, app):
+        from src.core.campaign_manager import CampaignManager
+        from src.core.database import get_db_session
+        from src.models.campaign import MetricsHistory, Platform
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Curves', total_budget=1000,
+                                           platforms=['google_ads', 'facebook'],
+                                           start_date=datetime.utcnow())
+        session = get_db_session()
+        start = datetime.utcnow() - timedelta(days=30)
+        spent = conversions = 0.0
+        rng = np.random.default_rng(2)
+        for day in range(20):
+            step = rng.uniform(20, 200)
+            spent += step
+            conversions += 0.8 * step ** 0.6
+            session.add(MetricsHistory(campaign_id=campaign.id, platform=Platform.GOOGLE_ADS,
+                                       recorded_at=start + timedelta(days=day),
+                                       spent=spent, conversions=int(conversions), clicks=0))
+        session.commit()
+
+        curves = manager.fit_platform_response_curves([campaign.id])
+        curve = curves[campaign.id]['google_ads']
+        assert curve['observations'] == 19
+        assert 0.3 < curve['elasticity'] < 0.8
+        assert 'facebook' not in curves[campaign.id]
+
+        plans = manager.plan_budget_allocations([campaign])
+        # facebook has no curve, so the campaign falls back to performance-scaled priors
+        assert sum(plans[campaign.id].values()) == pytest.approx(1000)
+
+    def test_platform_updates_snapshot_the_platforms_own_figures(self, app):
+        from src.core.campaign_manager import CampaignManager
+        from src.core.database import get_db_session
+        from src.models.campaign import MetricsHistory, Platform
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Split', total_budget=1000,
+                                           platforms=['google_ads', 'facebook'],
+                                           start_date=datetime.utcnow())
+        manager.update_campaign_metrics(campaign.id, 'google_ads', {'spent_budget': 100.0, 'conversions': 10})
+        manager.update_campaign_metrics(campaign.id, 'facebook', {'spent_budget': 300.0, 'conversions': 6})
+        manager.update_campaign_metrics(campaign.id, 'google_ads', {'spent_budget': 150.0, 'conversions': 14})
+
+        assert (campaign.spent_budget, campaign.conversions) == (450.0, 20)
+        snapshots = get_db_session().query(MetricsHistory.spent, MetricsHistory.conversions)\
+            .filter_by(campaign_id=campaign.id, platform=Platform.GOOGLE_ADS)\
+            .order_by(MetricsHistory.id).all()
+        assert [tuple(s) for s in snapshots] == [(100.0, 10), (150.0, 14)]
@@ -0,0 +1,79 @@
+"""Unit tests for per-request SQL instrumentation"""
+import logging
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.core.db_instrumentation import QueryStats, fingerprint, instrument_engine, summarize
+
+
+class TestFingerprint:
+
+    def test_literals_and_parameter_lists_are_normalized(self):
+        assert fingerprint("SELECT * FROM campaigns WHERE id = 42 AND name = 'it''s'") == \
+            "SELECT * FROM campaigns WHERE id = ? AND name = ?"
+        assert fingerprint("SELECT id FROM t WHERE id IN (?, ?, ?)") == \
+            fingerprint("SELECT id FROM t\n  WHERE id IN (?)") == "SELECT id FROM t WHERE id IN (?...)"
+        assert fingerprint("SELECT id FROM t WHERE id IN (__[POSTCOMPILE_id_1])") == \
+            "SELECT id FROM t WHERE id IN (?...)"
+        assert fingerprint("SELECT t1.x FROM t1") == "SELECT t1.x FROM t1"
+
+    def test_summary_elides_select_list(self):
+        assert summarize("SELECT a.id AS a_id, a.x AS a_x FROM a WHERE a.id = ?") == "SELECT ... FROM a WHERE a.id = ?"
+
+
+class TestQueryStats:
+
+    def test_keeps_slowest_and_flags_repeats(self):
+        stats = QueryStats()
+        for i, seconds in enumerate([0.001, 0.005, 0.002, 0.010]):
+            stats.record(f"SELECT * FROM a WHERE id = {i}", seconds, keep_slowest=2)
+        stats.record("SELECT * FROM b", 0.003, keep_slowest=2)
+
+        assert stats.count == 5
+        assert [s for s, _ in stats.slowest_first()] == [0.010, 0.005]
+        assert stats.repeated(3) == [("SELECT * FROM a WHERE id = ?", 4)]
+        assert stats.repeated(4) == []
+
+
+class TestEngineInstrumentation:
+
+    def test_failing_statements_leave_no_timing_state(self):
+        engine = create_engine('sqlite://')
+        instrument_engine(engine)
+        labels = {'operation': 'SELECT'}
+        before = REGISTRY.get_sample_value('adflowai_db_query_duration_seconds_count', labels) or 0
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM missing_table"))
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+            assert not conn.info
+        assert REGISTRY.get_sample_value('adflowai_db_query_duration_seconds_count', labels) == before + 1
+        engine.dispose()
+
+
+class TestRequestInstrumentation:
+
+    def test_debug_headers_and_histograms(self, client, auth_headers):
+        labels = {'endpoint': 'api_v1.get_campaigns'}
+        before = REGISTRY.get_sample_value('adflowai_db_queries_per_request_count', labels) or 0
+
+        response = client.get('/api/v1/campaigns', headers=auth_headers)
+        assert response.headers['X-DB-Query-Count'] == '1'
+        assert float(response.headers['X-DB-Time-Ms']) >= 0
+        assert response.headers['X-DB-Slowest'].endswith('SELECT ... FROM campaigns WHERE campaigns.user_id = ? '
+                                                          'ORDER BY campaigns.created_at DESC')
+        assert REGISTRY.get_sample_value('adflowai_db_queries_per_request_count', labels) == before + 1
+
+    def test_repeated_statements_are_logged(self, app, client, auth_headers, caplog):
+        threshold = app.config['DB_N_PLUS_ONE_THRESHOLD']
+        app.config['DB_N_PLUS_ONE_THRESHOLD'] = 0
+        try:
+            with caplog.at_level(logging.WARNING, logger='src.core.db_instrumentation'):
+                client.get('/api/v1/campaigns', headers=auth_headers)
+        finally:
+            app.config['DB_N_PLUS_ONE_THRESHOLD'] = threshold
+        assert any('Possible N+1 in api_v1.get_campaigns' in r.message for r in caplog.records)
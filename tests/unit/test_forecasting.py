@@ -0,0 +1,159 @@
+"""Unit tests for the vectorized portfolio forecaster"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ml.advanced_predictor import AdvancedPredictiveEngine
+from src.ml.forecasting import PortfolioForecaster, holt_filter, fit_holt
+
+
+def make_history(days=90, slope=1.0, seed=0, start='2026-01-01'):
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    return pd.DataFrame({
+        'date': pd.date_range(start, periods=days, freq='D'),
+        'performance_score': 0.5 + 0.001 * t + rng.normal(0, 0.005, days),
+        'ctr': 0.02 + 0.005 * np.sin(2 * np.pi * t / 7),
+        'spend': 100 + slope * t + rng.normal(0, 1, days),
+    })
+
+
+class TestHoltFilter:
+
+    def test_tracks_linear_trend(self):
+        Y = (10 + 2.0 * np.arange(50))[None, :, None]
+        level, trend, _, count = holt_filter(Y, 0.5, 0.3, phi=1.0)
+        assert level[0, 0] == pytest.approx(108, abs=0.5)
+        assert trend[0, 0] == pytest.approx(2.0, abs=0.1)
+        assert count[0, 0] == 49
+
+    def test_skips_missing_observations(self):
+        Y = np.array([[np.nan], [np.nan], [5.0], [np.nan], [5.0]])[None]
+        level, _, sse, count = holt_filter(Y, 0.5, 0.1)
+        assert level[0, 0] == pytest.approx(5.0)
+        assert count[0, 0] == 1 and sse[0, 0] == 0
+
+    def test_grid_prefers_fast_smoothing_for_random_walk(self):
+        rng = np.random.default_rng(1)
+        Y = np.cumsum(rng.normal(0, 1, (1, 300, 1)), axis=1)
+        assert fit_holt(Y)['alpha'][0, 0] >= 0.5
+
+
+class TestPortfolioForecaster:
+
+    def test_forecast_follows_trend(self):
+        forecaster = PortfolioForecaster()
+        forecaster.observe(1, make_history(slope=2.0))
+        spend = forecaster.forecast([1], 7)[0, :, forecaster.targets.index('spend')]
+        assert spend[0] == pytest.approx(100 + 2.0 * 90, rel=0.05)
+        assert np.all(np.diff(spend) > 0)
+
+    def test_missing_metrics_are_nan(self):
+        forecaster = PortfolioForecaster()
+        forecaster.observe(1, make_history())
+        values = forecaster.forecast([1], 3)[0]
+        assert np.isnan(values[:, forecaster.targets.index('roi')]).all()
+        assert not np.isnan(values[:, forecaster.targets.index('ctr')]).any()
+
+    def test_incremental_update_matches_full_fit(self):
+        history = make_history(days=100)
+        incremental = PortfolioForecaster(refit_every=1000)
+        incremental.observe(1, history.iloc[:80])
+        incremental.observe(1, history)
+
+        full = PortfolioForecaster()
+        full.observe(1, history)
+
+        np.testing.assert_allclose(incremental._states[1].xtx, full._states[1].xtx, atol=1e-9)
+        np.testing.assert_allclose(incremental._states[1].weights, full._states[1].weights, atol=1e-9)
+        assert incremental.last_date(1) == full.last_date(1)
+
+    def test_split_portfolio_collapses_intraday_rows(self):
+        frame = pd.DataFrame({
+            'campaign_id': [2, 1, 1, 1],
+            'date': ['2026-01-01 12:00', '2026-01-02 10:00', '2026-01-01 09:00', '2026-01-01 18:00'],
+            'spend': [5.0, 7.0, 1.0, 2.0],
+            'ctr': [0.01, 0.03, 0.02, 0.04],
+        })
+        series = PortfolioForecaster().split_portfolio(frame)
+        dates, values = series[1]
+        assert [str(d) for d in dates] == ['2026-01-01', '2026-01-02']
+        assert values[:, 2].tolist() == [3.0, 7.0]                 # spend summed
+        assert values[:, 1].tolist() == pytest.approx([0.03, 0.03])  # ctr averaged
+        assert len(series[2][0]) == 1
+
+    def test_missing_days_are_reindexed_as_nan(self):
+        history = make_history(days=60)
+        gappy = history.drop(index=[30, 57])
+        forecaster = PortfolioForecaster()
+        dates, values = forecaster.daily_values(gappy)
+        assert len(dates) == 60 and (np.diff(dates) == np.timedelta64(1, 'D')).all()
+        assert np.isnan(values[[30, 57]]).all() and not np.isnan(values[29, :3]).any()
+
+        forecaster.observe(1, gappy)
+        complete = PortfolioForecaster()
+        complete.observe(1, history)
+        # Only design rows whose target, lags or window touch a missing day
+        # are dropped: days 30-37, and 57-59 at the end of the series
+        spend = forecaster.targets.index('spend')
+        assert complete._states[1].rows[spend] - forecaster._states[1].rows[spend] == 8 + 3
+        forecast = forecaster.forecast([1], 3)[0, :, spend]
+        assert forecast == pytest.approx(complete.forecast([1], 3)[0, :, spend], rel=0.05)
+
+    def test_update_across_a_gap_keeps_the_calendar(self):
+        history = make_history(days=50)
+        forecaster = PortfolioForecaster(refit_every=1000)
+        forecaster.observe(1, history.iloc[:40])
+        forecaster.observe(1, history.iloc[43:])
+        state = forecaster._states[1]
+        assert len(state.history) == 50
+        assert np.isnan(state.history[40:43]).all()
+
+    def test_partial_last_day_is_replaced(self):
+        history = make_history(days=50)
+        partial = history.iloc[:49].copy()
+        partial.loc[48, 'spend'] = 10.0                  # only the morning's spend so far
+        forecaster = PortfolioForecaster(refit_every=1000)
+        forecaster.observe(1, partial)
+        forecaster.observe(1, history)
+
+        complete = PortfolioForecaster()
+        complete.observe(1, history)
+        np.testing.assert_array_equal(forecaster._states[1].history, complete._states[1].history)
+        np.testing.assert_allclose(forecaster._states[1].weights, complete._states[1].weights, atol=1e-9)
+        assert forecaster.last_date(1) == complete.last_date(1)
+
+        # Observing the same day again with unchanged values is a no-op
+        state = forecaster._states[1]
+        forecaster.observe(1, history)
+        assert forecaster._states[1] is state
+
+    def test_batch_forecast_equals_individual(self):
+        histories = {c: make_history(seed=c, slope=c) for c in range(1, 6)}
+        batch = PortfolioForecaster()
+        batch.observe_many(histories)
+        single = PortfolioForecaster()
+        single.observe(3, histories[3])
+        np.testing.assert_allclose(batch.forecast([3], 5), single.forecast([3], 5))
+
+
+class TestForecastPerformance:
+
+    def test_output_format(self):
+        result = AdvancedPredictiveEngine().forecast_performance(7, make_history(), forecast_days=5)
+        assert result['campaign_id'] == 7
+        assert len(result['predictions']) == 5
+        first = result['predictions'][0]
+        assert first['date'] == '2026-04-01'
+        assert 0.0 <= first['predicted_performance'] <= 1.0
+        assert first['predicted_roi'] is None
+        assert 0.0 <= result['model_accuracy'] <= 1.0
+        assert 'predicted_spend' in result['confidence_intervals']
+
+    def test_confidence_intervals_bracket_forecast(self):
+        result = AdvancedPredictiveEngine().forecast_performance(7, make_history(), forecast_days=5)
+        spend = [day['predicted_spend'] for day in result['predictions']]
+        band = result['confidence_intervals']['predicted_spend']
+        assert band['confidence_level'] == 0.95
+        assert all(lo < v < hi for lo, v, hi in zip(band['lower_bound'], spend, band['upper_bound']))
+        assert 'predicted_roi' not in result['confidence_intervals']
@@ -0,0 +1,78 @@
+"""Unit tests for compiled random-forest inference"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from src.ml.forest import CompiledForest, benchmark
+from src.ml.optimizer import AIOptimizer
+
+
+@pytest.fixture(scope='module')
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6))
+    y = np.tanh(X[:, 0] + 0.5 * X[:, 1] * X[:, 2]) + rng.normal(0, 0.1, len(X))
+    return RandomForestRegressor(n_estimators=20, max_depth=8, random_state=42).fit(X, y)
+
+
+class TestCompiledForest:
+
+    def test_identical_to_sklearn(self, forest):
+        X = np.random.default_rng(1).normal(size=(3000, 6)) * 3
+        np.testing.assert_array_equal(CompiledForest.from_sklearn(forest).predict(X), forest.predict(X))
+
+    def test_values_at_split_thresholds(self, forest):
+        # Thresholds are float64 midpoints; sklearn compares float32 features against them
+        compiled = CompiledForest.from_sklearn(forest)
+        tree = forest.estimators_[0].tree_
+        split = tree.children_left >= 0
+        X = np.zeros((split.sum() * 3, 6))
+        for k, offset in enumerate((-1e-7, 0.0, 1e-7)):
+            X[k::3, tree.feature[split]] = tree.threshold[split] + offset
+        np.testing.assert_array_equal(compiled.predict(X), forest.predict(X))
+
+    def test_chunking_does_not_change_results(self, forest):
+        X = np.random.default_rng(2).normal(size=(500, 6))
+        compiled = CompiledForest.from_sklearn(forest)
+        np.testing.assert_array_equal(compiled.predict(X, max_chunk_bytes=1), compiled.predict(X))
+
+    def test_rejects_other_models_and_shapes(self, forest):
+        with pytest.raises(ValueError):
+            CompiledForest.from_sklearn(LinearRegression())
+        with pytest.raises(ValueError):
+            CompiledForest.from_sklearn(forest).predict(np.zeros((2, 5)))
+
+    def test_benchmark_reports_both_paths(self, forest):
+        result = benchmark(forest, np.random.default_rng(3).normal(size=(50, 6)), repeats=1)
+        assert result['identical'] and result['trees'] == 20
+        assert result['compiled_single_ms'] > 0 and result['sklearn_batch_ms'] > 0
+
+
+class TestOptimizerInference:
+
+    def test_trained_model_is_served_compiled(self, tmp_path):
+        rng = np.random.default_rng(4)
+        rows = [{
+            'ctr': rng.uniform(0, 0.05), 'cpc': rng.uniform(0.5, 3), 'cpa': rng.uniform(5, 50),
+            'roas': rng.uniform(0, 5), 'conversion_rate': rng.uniform(0, 0.1),
+            'spent_budget': rng.uniform(0, 1000), 'total_budget': 1000, 'impressions': int(rng.integers(1000, 100000)),
+            'clicks': int(rng.integers(10, 1000)), 'conversions': int(rng.integers(0, 50)),
+            'start_date': datetime.utcnow() - timedelta(days=int(rng.integers(1, 60))),
+        } for _ in range(200)]
+        labels = [min(1.0, r['roas'] / 5) for r in rows]
+
+        optimizer = AIOptimizer(model_path=f"{tmp_path}/")
+        optimizer.train_models(rows, labels)
+        scores = optimizer.predict_performance_batch(rows)
+        assert isinstance(optimizer._compiled_model, CompiledForest)
+
+        features, _ = optimizer._feature_matrix(rows)
+        expected = np.clip(optimizer.performance_model.predict(optimizer.scaler.transform(features)), 0, 1)
+        np.testing.assert_array_equal(scores, expected)
+
+        optimizer.train_models(rows[:100], labels[:100])
+        optimizer.predict_performance_batch(rows[:1])
+        assert optimizer._compiled_source is optimizer.performance_model
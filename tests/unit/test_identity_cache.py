@@ -0,0 +1,137 @@
+"""Unit tests for the user identity cache"""
+import time
+import uuid
+from datetime import datetime
+
+from src.core.identity_cache import IdentityCache
+
+
+class Loader:
+    """Counts loads and returns a fixed value"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self, ident):
+        self.calls += 1
+        return self.value
+
+
+class TestIdentityCache:
+
+    def test_hits_until_ttl_expires(self):
+        cache, load = IdentityCache(ttl=0.05), Loader('record')
+        assert cache.user(1, load) == 'record'
+        assert cache.user(1, load) == 'record'
+        assert load.calls == 1
+        time.sleep(0.06)
+        cache.user(1, load)
+        assert load.calls == 2
+
+    def test_misses_are_not_cached(self):
+        cache, load = IdentityCache(), Loader(None)
+        assert cache.user(1, load) is None
+        cache.user(1, load)
+        assert load.calls == 2
+
+    def test_invalidate_user_drops_only_that_user(self):
+        cache = IdentityCache()
+        cache.user(7, Loader('record'))
+        cache.user(8, Loader('record'))
+        cache.invalidate_user(7)
+        assert set(cache._entries) == {('user', 8)}
+
+    def test_request_memo_outlives_process_entries(self, app):
+        cache, load = IdentityCache(ttl=0), Loader('record')
+        with app.test_request_context():
+            cache.user(1, load)
+            cache.user(1, load)
+            assert load.calls == 1
+            cache.invalidate_user(1)
+            cache.user(1, load)
+            assert load.calls == 2
+
+    def test_full_cache_evicts(self):
+        cache = IdentityCache(max_entries=4)
+        for user_id in range(10):
+            cache.user(user_id, Loader('record'))
+        assert len(cache._entries) <= 4
+        assert ('user', 9) in cache._entries
+
+
+class TestIdentityCacheIntegration:
+
+    def test_one_instance_per_app(self, app):
+        from flask import Flask
+        from src.core.app_singleton import AppSingleton
+        singleton = AppSingleton('test_singleton', lambda config: {'name': config.get('NAME')})
+
+        other = Flask(__name__)
+        other.config['NAME'] = 'other'
+        with other.app_context():
+            built = singleton.get()
+            assert singleton.get() is built and built == {'name': 'other'}
+        assert singleton.get() is app.extensions.pop('test_singleton') is not built
+
+    def test_concurrent_first_use_builds_once(self):
+        import threading
+        from flask import Flask
+        from src.core.app_singleton import AppSingleton
+        built, barrier = [], threading.Barrier(8)
+
+        def factory(config):
+            built.append(config)
+            return object()
+        singleton, other = AppSingleton('test_concurrent', factory), Flask(__name__)
+
+        def use():
+            with other.app_context():
+                barrier.wait()
+                seen.append(singleton.get())
+        seen = []
+        threads = [threading.Thread(target=use) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(built) == 1 and len(set(map(id, seen))) == 1
+
+    def test_admin_changes_are_seen_immediately(self, app):
+        from src.admin.admin_manager import AdminManager
+        from src.core.database import get_db_session
+        from src.core.identity_cache import get_user_record
+        from src.models.campaign import User
+
+        session = get_db_session()
+        name = f'cached_{uuid.uuid4().hex[:8]}'
+        user = User(username=name, email=f'{name}@test.com', password_hash='x', role='user', is_active=True)
+        session.add(user)
+        session.commit()
+
+        assert get_user_record(user.id).is_active
+        AdminManager(session).toggle_active(user.id)
+        assert not get_user_record(user.id).is_active
+        AdminManager(session).set_role(user.id, 'agency')
+        assert get_user_record(user.id).role == 'agency'
+        user_id = user.id
+        AdminManager(session).delete_user(user_id)
+        assert get_user_record(user_id) is None
+
+    def test_ownership_checks(self, client, auth_headers):
+        created = client.post('/api/v1/campaigns', headers=auth_headers, json={
+            'name': 'Cached owner', 'total_budget': 1000, 'platforms': ['google_ads'],
+            'start_date': datetime.utcnow().isoformat()
+        })
+        campaign_id = created.get_json()['campaign']['id']
+        assert client.get(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 200
+
+        other = client.post('/api/v1/auth/register', json={
+            'username': f'other_{uuid.uuid4().hex[:8]}', 'email': f'{uuid.uuid4().hex[:8]}@test.com',
+            'password': 'TestPass123!'
+        }).get_json()['tokens']['access_token']
+        response = client.get(f'/api/v1/campaigns/{campaign_id}', headers={'Authorization': f'Bearer {other}'})
+        assert response.status_code == 403
+
+        assert client.delete(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 200
+        assert client.get(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 404
@@ -0,0 +1,65 @@
+"""Unit tests for residual-bootstrap prediction intervals"""
+import numpy as np
+import pytest
+
+from src.ml.intervals import BootstrapIntervals
+
+
+def simulate_recursively(alpha, beta, phi, errors):
+    """Deviation of one Holt path from the noise-free forecast, step by step"""
+    level = trend = 0.0
+    deviations = []
+    for error in errors:
+        predicted = level + phi * trend
+        deviations.append(predicted + error)
+        level = predicted + alpha * error
+        trend = phi * trend + alpha * beta * error
+    return np.array(deviations)
+
+
+class TestBootstrapIntervals:
+
+    def test_impulse_matrix_matches_recursion(self):
+        engine = BootstrapIntervals(phi=0.9)
+        errors = np.random.default_rng(0).normal(size=12)
+        impulse = engine._impulse_matrix(np.array([[0.4]]), np.array([[0.2]]), 12)[0, 0]
+        np.testing.assert_allclose(impulse @ errors, simulate_recursively(0.4, 0.2, 0.9, errors), rtol=1e-5)
+
+    def test_one_step_band_matches_residual_quantiles(self):
+        rng = np.random.default_rng(1)
+        residuals = rng.normal(0, 2.0, (1, 5000, 1))
+        bands = BootstrapIntervals(n_paths=20000).quantiles(
+            np.array([[0.3]]), np.array([[0.1]]), residuals, np.array([[5000]]), horizon=1
+        )
+        assert bands[0, 0, 0, 0] == pytest.approx(-1.96 * 2.0, rel=0.05)
+        assert bands[1, 0, 0, 0] == pytest.approx(1.96 * 2.0, rel=0.05)
+
+    def test_bands_widen_with_horizon(self):
+        residuals = np.random.default_rng(2).normal(size=(1, 200, 1))
+        bands = BootstrapIntervals().quantiles(
+            np.array([[0.5]]), np.array([[0.2]]), residuals, np.array([[200]]), horizon=10
+        )
+        width = bands[1, 0, :, 0] - bands[0, 0, :, 0]
+        assert np.all(np.diff(width) > 0)
+
+    def test_seeded_per_campaign_regardless_of_chunking(self):
+        rng = np.random.default_rng(3)
+        residuals = rng.normal(size=(4, 50, 2))
+        alpha, beta = np.full((4, 2), 0.3), np.full((4, 2), 0.1)
+        counts = np.full((4, 2), 50)
+
+        whole = BootstrapIntervals(n_paths=500).quantiles(alpha, beta, residuals, counts, 5, keys=[10, 11, 12, 13])
+        chunked = BootstrapIntervals(n_paths=500, max_chunk_bytes=1).quantiles(
+            alpha, beta, residuals, counts, 5, keys=[10, 11, 12, 13])
+        alone = BootstrapIntervals(n_paths=500).quantiles(
+            alpha[2:3], beta[2:3], residuals[2:3], counts[2:3], 5, keys=[12])
+
+        np.testing.assert_array_equal(whole, chunked)
+        np.testing.assert_array_equal(whole[:, 2:3], alone)
+
+    def test_series_without_residuals_has_zero_width(self):
+        residuals = np.full((1, 3, 1), np.nan)
+        bands = BootstrapIntervals(n_paths=100).quantiles(
+            np.array([[0.3]]), np.array([[0.1]]), residuals, np.array([[0]]), horizon=3
+        )
+        assert np.all(bands == 0)
@@ -0,0 +1,156 @@
+"""Unit tests for real-time metrics sources and the batched monitor tick"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.metrics_sources import (
+    MetricsHistorySource, RedisStreamSource, SimulatedMetricsSource, TraceReplaySource, record_trace
+)
+from src.core.realtime_monitor import RealTimeMonitor
+
+
+def metrics(score):
+    return {'impressions_rate': 10, 'clicks_rate': 1, 'spend_rate': 2,
+            'ctr': 0.02, 'cpc': 1.0, 'performance_score': score}
+
+
+@pytest.fixture
+def trace(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    record_trace(path, [
+        {'t': 0, 'campaign_id': 1, 'metrics': metrics(0.5)},
+        {'t': 0, 'campaign_id': 2, 'metrics': metrics(0.6)},
+        {'t': 1, 'campaign_id': 1, 'metrics': metrics(0.7)},
+        {'t': 3, 'campaign_id': 1, 'metrics': metrics(0.9)},
+    ])
+    return path
+
+
+class TestTraceReplaySource:
+
+    def test_replay_is_deterministic_at_speed(self, trace):
+        source = TraceReplaySource(trace, speed=2.0)
+        first = asyncio.run(source.fetch([1, 2]))
+        assert first[1]['performance_score'] == 0.5
+        assert first[2]['performance_score'] == 0.6
+        assert asyncio.run(source.fetch([1]))[1]['performance_score'] == 0.7
+        assert asyncio.run(source.fetch([1]))[1]['performance_score'] == 0.9
+        assert source.exhausted
+
+    def test_every_second_of_a_trace_is_delivered(self, tmp_path):
+        path = str(tmp_path / 'dense.jsonl')
+        record_trace(path, [{'t': t, 'campaign_id': c, 'metrics': metrics(t / 10)}
+                            for t in range(10) for c in (1, 2, 3)])
+        source = TraceReplaySource(path, speed=1.0)
+        seen = [asyncio.run(source.fetch([1, 2, 3])) for _ in range(10)]
+        assert [batch[c]['performance_score'] for batch in seen for c in (1, 2, 3)] == \
+            [t / 10 for t in range(10) for _ in range(3)]
+
+    def test_loop_restarts_trace(self, trace):
+        source = TraceReplaySource(trace, speed=1.0, loop=True)
+        scores = [asyncio.run(source.fetch([1]))[1]['performance_score'] for _ in range(6)]
+        assert scores == [0.5, 0.7, 0.7, 0.9, 0.5, 0.7]
+        assert not source.exhausted
+
+
+    def test_trace_is_streamed(self, trace):
+        # A record beyond the replay window is not parsed until it is due
+        with open(trace, 'a') as f:
+            f.write('{"t": 50, "campaign_id": 1, "metrics": not json}\n')
+        source = TraceReplaySource(trace, speed=1.0)
+        assert asyncio.run(source.fetch([1]))[1]['performance_score'] == 0.5
+        asyncio.run(source.close())
+
+
+class FakeStreamRedis:
+    """The XADD / XREAD / XREVRANGE subset of redis.asyncio over an in-memory stream"""
+
+    def __init__(self):
+        self.entries = []
+
+    def xadd(self, stream, fields):
+        entry_id = f"{len(self.entries) + 1}-0".encode()
+        self.entries.append((entry_id, {k.encode(): str(v).encode() for k, v in fields.items()}))
+        return entry_id
+
+    async def xrevrange(self, stream, max_id, min_id, count=None):
+        return list(reversed(self.entries))[:count]
+
+    async def xread(self, streams, count=None, block=None):
+        (stream, last_id), = streams.items()
+        if last_id == '$':
+            return []  # only a blocking XREAD waits for new entries
+        after = int(last_id.decode().split('-')[0] if isinstance(last_id, bytes) else last_id.split('-')[0])
+        entries = [e for e in self.entries if int(e[0].decode().split('-')[0]) > after][:count]
+        return [[stream.encode(), entries]] if entries else []
+
+
+class TestRedisStreamSource:
+
+    def test_reads_entries_added_after_start(self):
+        redis = FakeStreamRedis()
+        redis.xadd('metrics:stream', {'campaign_id': 1, **metrics(0.1)})  # before the source started
+        source = RedisStreamSource(redis, batch_size=2)
+
+        assert asyncio.run(source.fetch([1, 2])) == {}
+        for campaign_id, score in [(1, 0.5), (2, 0.6), (1, 0.7)]:
+            redis.xadd('metrics:stream', {'campaign_id': campaign_id, **metrics(score)})
+        batch = asyncio.run(source.fetch([1, 2]))
+        assert batch[1]['performance_score'] == 0.7
+        assert batch[2]['performance_score'] == 0.6
+
+        redis.xadd('metrics:stream', {'campaign_id': 2, **metrics(0.9)})
+        assert asyncio.run(source.fetch([2]))[2]['performance_score'] == 0.9
+
+    def test_empty_stream_starts_from_the_beginning(self):
+        redis = FakeStreamRedis()
+        source = RedisStreamSource(redis)
+        assert asyncio.run(source.fetch([1])) == {}
+        redis.xadd('metrics:stream', {'campaign_id': 1, **metrics(0.4)})
+        assert asyncio.run(source.fetch([1]))[1]['performance_score'] == 0.4
+
+
+class TestMetricsHistorySource:
+
+    def test_latest_two_rows_drive_rates(self, app):
+        from src.core.database import db
+        from src.models.campaign import Campaign, MetricsHistory, User
+
+        session = db.get_session()
+        user = User(username='srcuser', email='src@test.com', password_hash='x')
+        session.add(user)
+        session.flush()
+        campaign = Campaign(name='Src', total_budget=100, start_date=datetime.utcnow(), user_id=user.id)
+        session.add(campaign)
+        session.flush()
+        now = datetime.utcnow()
+        for seconds, impressions, score in [(0, 100, 0.4), (10, 300, 0.5), (20, 700, 0.8)]:
+            session.add(MetricsHistory(
+                campaign_id=campaign.id, recorded_at=now + timedelta(seconds=seconds),
+                impressions=impressions, clicks=0, spent=0.0, ctr=0.02, cpc=1.0,
+                performance_score=score))
+        session.commit()
+
+        batch = MetricsHistorySource(session_factory=db.Session)._fetch_sync([campaign.id, 99999])
+        assert list(batch) == [campaign.id]
+        assert batch[campaign.id]['impressions_rate'] == pytest.approx(40.0)
+        assert batch[campaign.id]['performance_score'] == 0.8
+
+
+class TestMonitorTick:
+
+    def test_tick_pulls_one_batch_for_all_campaigns(self):
+        class CountingSource(SimulatedMetricsSource):
+            calls = []
+
+            async def fetch(self, campaign_ids):
+                self.calls.append(list(campaign_ids))
+                return await super().fetch(campaign_ids)
+
+        source = CountingSource(seed=1)
+        monitor = RealTimeMonitor(metrics_source=source)
+        monitor.active_campaigns.update({3, 1, 2})
+        assert asyncio.run(monitor.tick()) == 3
+        assert source.calls == [[1, 2, 3]]
+        assert monitor.updates.sequence == 3
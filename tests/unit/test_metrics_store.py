@@ -0,0 +1,61 @@
+"""Unit tests for the in-memory ring-buffer metrics store"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.core.metrics_store import MetricsStore
+from src.core.realtime_monitor import RealTimeMonitor
+
+
+class TestMetricsStore:
+
+    def test_ring_buffer_overwrites_oldest(self):
+        store = MetricsStore(capacity=5)
+        for i in range(8):
+            store.append(1, {'ctr': float(i)}, timestamp=float(i))
+        assert store.count(1) == 5
+        np.testing.assert_array_equal(store.last(1, 'ctr', 10), [3, 4, 5, 6, 7])
+        np.testing.assert_array_equal(store.last(1, 'ctr', 2), [6, 7])
+        assert store.last(1, 'ctr', 2).dtype == np.float32
+
+    def test_window_aggregate(self):
+        store = MetricsStore(capacity=100)
+        for i in range(20):
+            store.append(1, {'cpc': float(i)}, timestamp=100.0 + i)
+        summary = store.aggregate(1, 'cpc', seconds=5, now=119.0)
+        assert summary['count'] == 6
+        assert summary['mean'] == pytest.approx(16.5)
+        assert (summary['min'], summary['max'], summary['last']) == (14.0, 19.0, 19.0)
+
+    def test_unknown_campaign_is_empty(self):
+        store = MetricsStore()
+        assert store.last(42, 'ctr', 10).size == 0
+        assert store.aggregate(42, 'ctr', 60)['count'] == 0
+        assert store.sparkline(42, 'ctr', 60, points=3) == [None, None, None]
+
+    def test_sparkline_buckets(self):
+        store = MetricsStore(capacity=100)
+        for i in range(60):
+            store.append(1, {'ctr': 1.0 if i < 30 else 3.0}, timestamp=float(i))
+        assert store.sparkline(1, 'ctr', seconds=60, points=2, now=60.0) == [1.0, 3.0]
+
+
+class TestMonitorBaselineAlerts:
+
+    def test_ctr_drop_against_trailing_window(self):
+        monitor = RealTimeMonitor()
+        steady = {'ctr': 0.04, 'cpc': 1.0, 'performance_score': 0.7, 'spend_rate': 1}
+        for _ in range(monitor.baseline_min_samples):
+            monitor.store.append(1, steady)
+
+        alerts = asyncio.run(monitor._detect_anomalies(1, {**steady, 'ctr': 0.02, 'cpc': 1.5}))
+        assert {a['type'] for a in alerts} == {'ctr_drop', 'cpc_spike'}
+
+        alerts = asyncio.run(monitor._detect_anomalies(1, steady))
+        assert alerts == []
+
+    def test_no_relative_alerts_without_history(self):
+        monitor = RealTimeMonitor()
+        alerts = asyncio.run(monitor._detect_anomalies(1, {'ctr': 0.02, 'cpc': 1.5, 'performance_score': 0.7}))
+        assert alerts == []
@@ -0,0 +1,133 @@
+"""Unit tests for the Prometheus metrics surface"""
+import pytest
+from prometheus_client import REGISTRY
+
+from src.core.observability import metrics_registry
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestMetricsEndpoint:
+
+    def test_request_latency_is_exposed(self, client):
+        labels = dict(blueprint='api_v1', endpoint='api_v1.get_supported_platforms', method='GET', status='200')
+        before = sample('adflowai_http_request_duration_seconds_count', **labels)
+        client.get('/api/v1/platforms')
+        assert sample('adflowai_http_request_duration_seconds_count', **labels) == before + 1
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        body = response.get_data(as_text=True)
+        assert 'adflowai_http_request_duration_seconds_bucket{' in body
+        assert 'adflowai_db_queries_per_request' in body
+        assert 'endpoint="metrics"' not in body
+
+    def test_multiprocess_registry_reads_the_shared_directory(self, tmp_path, monkeypatch):
+        assert metrics_registry() is REGISTRY
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        registry = metrics_registry()
+        assert registry is not REGISTRY
+        assert list(registry.collect()) == []   # no worker has written samples yet
+
+
+class TestComponentMetrics:
+
+    def test_optimizer_batches(self):
+        from src.ml.optimizer import AIOptimizer
+        before = sample('adflowai_optimizer_batch_size_sum')
+        before_rules = sample('adflowai_optimizer_scoring_seconds_count', predictor='rules')
+        AIOptimizer().predict_performance_batch([
+            {'ctr': 0.03, 'roas': 3.0, 'conversions': 5, 'clicks': 100, 'spent_budget': 10, 'total_budget': 100}
+        ] * 3)
+        assert sample('adflowai_optimizer_batch_size_sum') == before + 3
+        assert sample('adflowai_optimizer_scoring_seconds_count', predictor='rules') == before_rules + 1
+
+    def test_celery_task_duration_and_queue_lag(self):
+        from src.tasks.celery_app import (
+            _stamp_published_at, _task_finished_metrics, _task_started_metrics, sync_all_metrics
+        )
+        headers = {}
+        _stamp_published_at(headers=headers)
+        headers['published_at'] -= 2.0
+
+        name = sync_all_metrics.name
+        lag_before = sample('adflowai_task_queue_lag_seconds_sum', task=name)
+        runs_before = sample('adflowai_task_duration_seconds_count', task=name, state='SUCCESS')
+        sync_all_metrics.push_request(id='t-1', **headers)
+        try:
+            _task_started_metrics(task_id='t-1', task=sync_all_metrics)
+            _task_finished_metrics(task_id='t-1', task=sync_all_metrics, state='SUCCESS')
+        finally:
+            sync_all_metrics.pop_request()
+        assert sample('adflowai_task_queue_lag_seconds_sum', task=name) - lag_before == pytest.approx(2.0, abs=0.5)
+        assert sample('adflowai_task_duration_seconds_count', task=name, state='SUCCESS') == runs_before + 1
+
+    def test_worker_exporter_requires_multiprocess_mode_with_prefork(self, tmp_path, monkeypatch):
+        import prometheus_client
+        from prometheus_client import multiprocess
+        from src.tasks.celery_app import _mark_pool_process_dead, _serve_worker_metrics
+
+        class Worker:
+            pool_cls = 'prefork'
+
+        served, dead = [], []
+        monkeypatch.setattr(prometheus_client, 'start_http_server', lambda port, registry: served.append(registry))
+        monkeypatch.setattr(multiprocess, 'mark_process_dead', dead.append)
+        monkeypatch.setenv('CELERY_METRICS_PORT', '9808')
+        monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+
+        _serve_worker_metrics(sender=Worker())
+        assert served == []
+        Worker.pool_cls = 'solo'   # tasks run in the main process
+        _serve_worker_metrics(sender=Worker())
+        assert served == [REGISTRY]
+
+        Worker.pool_cls = 'prefork'
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        _serve_worker_metrics(sender=Worker())
+        assert len(served) == 2 and served[1] is not REGISTRY
+        _mark_pool_process_dead(pid=4242)
+        assert dead == [4242]
+
+    def test_gateway_queue_depth_and_drops(self):
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        from config.settings import Config
+        from src.core.metrics_sources import SimulatedMetricsSource
+        from src.core.realtime_gateway import ClientConnection, RealtimeGateway
+
+        gateway = RealtimeGateway(Config, metrics_source=SimulatedMetricsSource(seed=7),
+                                  ownership_checker=lambda user_id, ids: set(ids))
+        dropped_before = sample('adflowai_realtime_dropped_messages_total')
+
+        async def scenario():
+            slow = ClientConnection(ws=None, user_id=1, queue_size=2)
+            for message in 'abc':
+                slow.enqueue(message)
+            gateway.clients.add(slow)
+            async with TestClient(TestServer(gateway.create_app())) as client:
+                return await (await client.get('/metrics')).text()
+
+        body = asyncio.run(scenario())
+        assert 'adflowai_realtime_send_queue_depth 2.0' in body
+        assert sample('adflowai_realtime_dropped_messages_total') == dropped_before + 1
+
+    def test_monitor_tick_duration(self):
+        import asyncio
+        from src.core.metrics_sources import SimulatedMetricsSource
+        from src.core.realtime_monitor import RealTimeMonitor
+
+        monitor = RealTimeMonitor(metrics_source=SimulatedMetricsSource(seed=1), tick_interval=0.01)
+        before = sample('adflowai_monitor_tick_seconds_count')
+
+        async def scenario():
+            await monitor.start_monitoring(1)
+            await asyncio.sleep(0.05)
+            await monitor.stop_monitoring(1)
+            await asyncio.sleep(0.02)
+
+        asyncio.run(scenario())
+        assert sample('adflowai_monitor_tick_seconds_count') > before
@@ -0,0 +1,105 @@
+"""Unit tests for the bounded bcrypt password hasher"""
+import threading
+import uuid
+
+import pytest
+
+from src.auth.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+def saturate(hasher):
+    """Occupy every slot of ``hasher``; returns a callable that frees them"""
+    started, release = threading.Event(), threading.Event()
+
+    def block(_):
+        started.set()
+        release.wait(5)
+        return 'blocked'
+
+    thread = threading.Thread(target=hasher._run, args=(block, None))
+    thread.start()
+    started.wait(5)
+
+    def free():
+        release.set()
+        thread.join(5)
+    return free
+
+
+class TestPasswordHasher:
+
+    def test_hash_and_verify_at_configured_cost(self):
+        hasher = PasswordHasher(rounds=4)
+        hashed = hasher.hash('Secret123')
+        assert hashed.startswith('$2b$04$')
+        assert hasher.verify('Secret123', hashed)
+        assert not hasher.verify('Secret124', hashed)
+
+    def test_needs_rehash_when_cost_changes(self):
+        hashed = PasswordHasher(rounds=4).hash('Secret123')
+        assert not PasswordHasher(rounds=4).needs_rehash(hashed)
+        assert PasswordHasher(rounds=5).needs_rehash(hashed)
+        assert PasswordHasher(rounds=4).needs_rehash('not-a-bcrypt-hash')
+
+    def test_saturated_pool_rejects_immediately(self):
+        hasher = PasswordHasher(rounds=4, max_workers=1, queue_depth=0, retry_after=3)
+        free = saturate(hasher)
+        try:
+            with pytest.raises(PasswordHasherBusy) as exc:
+                hasher.hash('Secret123')
+            assert exc.value.retry_after == 3
+        finally:
+            free()
+        assert hasher.verify('Secret123', hasher.hash('Secret123'))
+
+    def test_queued_calls_wait_for_a_turn(self):
+        hasher = PasswordHasher(rounds=4, max_workers=1, queue_depth=1)
+        free = saturate(hasher)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(hasher.hash('Secret123')))
+        try:
+            waiter.start()
+            waiter.join(0.2)
+            assert waiter.is_alive() and not results           # queued behind the running call
+            with pytest.raises(PasswordHasherBusy):
+                hasher.hash('Secret123')
+        finally:
+            free()
+            waiter.join(5)
+        assert hasher.verify('Secret123', results[0])
+
+
+class TestAuthIntegration:
+
+    def test_login_rehashes_with_new_cost(self, app):
+        from src.auth.auth_manager import AuthManager
+        from src.core.database import get_db_session
+
+        name = f'rehash_{uuid.uuid4().hex[:8]}'
+        session = get_db_session()
+        user, _ = AuthManager(session, hasher=PasswordHasher(rounds=4)).register_user(
+            name, f'{name}@test.com', 'Secret123'
+        )
+        assert user.password_hash.startswith('$2b$04$')
+
+        AuthManager(session, hasher=PasswordHasher(rounds=5)).login(name, 'Secret123')
+        assert user.password_hash.startswith('$2b$05$')
+        AuthManager(session, hasher=PasswordHasher(rounds=4)).login(name, 'Secret123')
+
+    def test_busy_hasher_answers_503(self, app, client):
+        from src.auth.password_hasher import get_password_hasher
+
+        name = f'busy_{uuid.uuid4().hex[:8]}'
+        client.post('/api/v1/auth/register', json={
+            'username': name, 'email': f'{name}@test.com', 'password': 'Secret123'
+        })
+        original = get_password_hasher()
+        app.extensions['password_hasher'] = PasswordHasher(rounds=4, max_workers=1, queue_depth=0)
+        free = saturate(app.extensions['password_hasher'])
+        try:
+            response = client.post('/api/v1/auth/login', json={'username': name, 'password': 'Secret123'})
+        finally:
+            free()
+            app.extensions['password_hasher'] = original
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,105 @@
+"""Query budgets of the campaign endpoints (one campaign load per request)"""
+import uuid
+
+import pytest
+
+METRICS = {
+    'impressions': 1000, 'clicks': 50, 'conversions': 5, 'spent_budget': 100.0,
+    'ctr': 0.05, 'cpc': 2.0, 'cpa': 20.0, 'roas': 3.0
+}
+
+
+@pytest.fixture
+def campaign_id(client, auth_headers):
+    created = client.post('/api/v1/campaigns', headers=auth_headers, json={
+        'name': 'Query budget', 'total_budget': 1000, 'platforms': ['google_ads', 'facebook'],
+        'start_date': '2026-01-01T00:00:00'
+    })
+    campaign_id = created.get_json()['campaign']['id']
+    client.post(f'/api/v1/campaigns/{campaign_id}/metrics', headers=auth_headers, json=METRICS)
+    return campaign_id
+
+
+def campaign_loads(queries):
+    return len(queries.matching('FROM campaigns'))
+
+
+class TestCampaignQueryCounts:
+
+    def test_get(self, client, auth_headers, campaign_id, count_queries):
+        with count_queries() as queries:
+            assert client.get(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 200
+        assert len(queries) == 1
+
+    def test_metrics(self, client, auth_headers, campaign_id, count_queries):
+        with count_queries() as queries:
+            response = client.post(f'/api/v1/campaigns/{campaign_id}/metrics', headers=auth_headers, json=METRICS)
+        assert response.status_code == 200
+        assert campaign_loads(queries) == 1
+        assert len(queries) == 4          # campaign, score trend, UPDATE, INSERT history
+
+    def test_analytics(self, client, auth_headers, campaign_id, count_queries):
+        with count_queries() as queries:
+            response = client.get(f'/api/v1/campaigns/{campaign_id}/analytics', headers=auth_headers)
+        assert response.status_code == 200
+        assert len(queries) == 3          # campaign, platforms, history
+
+    def test_optimize(self, client, auth_headers, campaign_id, count_queries):
+        client.post(f'/api/v1/campaigns/{campaign_id}/optimize', headers=auth_headers)  # backfills the score trend
+        with count_queries() as queries:
+            response = client.post(f'/api/v1/campaigns/{campaign_id}/optimize', headers=auth_headers)
+        assert response.status_code == 200
+        assert campaign_loads(queries) == 1
+        assert len(queries.matching('SELECT')) == 5   # campaign, trend, curves, platforms, history
+
+    def test_delete_does_not_load_history(self, client, auth_headers, campaign_id, count_queries):
+        from src.core.database import db
+        from src.models.campaign import AlertLog, OptimizationLog
+
+        for _ in range(5):
+            client.post(f'/api/v1/campaigns/{campaign_id}/metrics', headers=auth_headers, json=METRICS)
+        client.post(f'/api/v1/campaigns/{campaign_id}/optimize', headers=auth_headers)
+        session = db.get_session()
+        session.add(OptimizationLog(campaign_id=campaign_id, action='budget_increase'))
+        session.add(AlertLog(campaign_id=campaign_id, alert_type='ctr_drop', state='open'))
+        session.commit()
+
+        with count_queries() as queries:
+            assert client.delete(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 200
+        assert len(queries) == 7          # campaign, then one DELETE per table
+        assert client.get(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers).status_code == 404
+        for log in (OptimizationLog, AlertLog):
+            assert session.query(log).filter_by(campaign_id=campaign_id).count() == 0
+
+    def test_foreign_campaign_costs_one_query(self, client, campaign_id, count_queries):
+        name = f'other_{uuid.uuid4().hex[:8]}'
+        token = client.post('/api/v1/auth/register', json={
+            'username': name, 'email': f'{name}@test.com', 'password': 'TestPass123!'
+        }).get_json()['tokens']['access_token']
+        with count_queries() as queries:
+            response = client.post(f'/api/v1/campaigns/{campaign_id}/optimize',
+                                   headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 403
+        assert len(queries) == 1
+
+
+class TestRequestSession:
+
+    def test_one_session_per_request_closed_at_teardown(self, app):
+        from flask import g
+        from src.core.database import db, get_db_session
+
+        db.close_session()
+        with app.test_request_context():
+            session = get_db_session()
+            assert get_db_session() is session and g.db_session is session
+            assert g.db_session_owned
+        assert not db.Session.registry.has()
+
+    def test_request_shares_an_outer_session(self, app):
+        from src.core.database import db, get_db_session
+
+        outer = get_db_session()
+        with app.test_request_context():
+            assert get_db_session() is outer
+        assert db.Session.registry.has() and get_db_session() is outer
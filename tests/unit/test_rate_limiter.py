@@ -0,0 +1,111 @@
+"""Unit tests for the token-bucket rate limiter"""
+import time
+
+import pytest
+
+from src.core.rate_limiter import MemoryRateLimiter, RedisRateLimiter
+
+
+class FakeScriptRedis:
+    """Just enough of a Redis client for the limiter: a registered script with canned replies"""
+
+    def __init__(self, reply=None, error=None):
+        self.reply, self.error, self.calls = reply, error, []
+
+    def register_script(self, source):
+        def script(keys, args):
+            self.calls.append((keys, args))
+            if self.error:
+                raise self.error
+            return self.reply
+        return script
+
+
+@pytest.fixture
+def limited(app):
+    """Enable limiting on the shared app with a tiny, fresh in-process budget"""
+    config = app.config
+    saved = {k: config[k] for k in ('RATE_LIMIT_ENABLED', 'API_RATE_LIMIT', 'API_RATE_LIMIT_EXPENSIVE')}
+    limiter = app.extensions['rate_limiter']
+    config.update(RATE_LIMIT_ENABLED=True, API_RATE_LIMIT=3, API_RATE_LIMIT_EXPENSIVE=1)
+    app.extensions['rate_limiter'] = MemoryRateLimiter()
+    yield app
+    config.update(saved)
+    app.extensions['rate_limiter'] = limiter
+
+
+class TestMemoryRateLimiter:
+
+    def test_bucket_allows_burst_then_rejects(self):
+        limiter = MemoryRateLimiter()
+        results = [limiter.hit('a', limit=3, period=60) for _ in range(4)]
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert [r.remaining for r in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after == pytest.approx(20, abs=0.1)
+        assert limiter.hit('b', limit=3, period=60).allowed
+
+    def test_tokens_refill(self):
+        limiter = MemoryRateLimiter()
+        assert limiter.hit('a', limit=1, period=0.05).allowed
+        assert not limiter.hit('a', limit=1, period=0.05).allowed
+        time.sleep(0.06)
+        assert limiter.hit('a', limit=1, period=0.05).allowed
+
+    def test_full_buckets_are_pruned(self):
+        limiter = MemoryRateLimiter(prune_every=3)
+        limiter.hit('a', limit=10, period=0.01)
+        time.sleep(0.02)
+        limiter.hit('b', limit=10, period=60)
+        limiter.hit('c', limit=10, period=60)
+        assert set(limiter._tat) == {'b', 'c'}
+
+
+class TestRedisRateLimiter:
+
+    def test_passes_bucket_parameters_to_script(self):
+        client = FakeScriptRedis(reply=[0, '2.5', 0])
+        result = RedisRateLimiter(client, prefix='rl').hit('api:user:1', limit=120, period=60)
+        assert client.calls == [(['rl:api:user:1'], [0.5, 120])]
+        assert not result.allowed and result.retry_after == 2.5
+
+    def test_redis_outage_falls_back_to_memory(self):
+        limiter = RedisRateLimiter(FakeScriptRedis(error=ConnectionError('down')))
+        assert [limiter.hit('a', 2, 60).allowed for _ in range(3)] == [True, True, False]
+
+
+class TestRateLimitMiddleware:
+
+    def test_429_with_retry_after(self, limited, client):
+        responses = [client.get('/api/v1/platforms') for _ in range(4)]
+        assert [r.status_code for r in responses] == [200, 200, 200, 429]
+        assert responses[0].headers['X-RateLimit-Limit'] == '3'
+        assert responses[2].headers['X-RateLimit-Remaining'] == '0'
+        assert int(responses[3].headers['Retry-After']) >= 1
+        assert client.get('/api/v1/health').status_code == 200
+
+    def test_users_and_expensive_endpoints_have_own_buckets(self, limited, client, auth_headers):
+        created = client.post('/api/v1/campaigns', headers=auth_headers, json={
+            'name': 'Limited', 'total_budget': 1000, 'platforms': ['google_ads'],
+            'start_date': '2026-01-01T00:00:00'
+        })
+        campaign_id = created.get_json()['campaign']['id']
+
+        assert client.post(f'/api/v1/campaigns/{campaign_id}/optimize', headers=auth_headers).status_code != 429
+        assert client.post(f'/api/v1/campaigns/{campaign_id}/optimize', headers=auth_headers).status_code == 429
+        # The general budget is separate, and anonymous callers have their own
+        assert client.get('/api/v1/campaigns', headers=auth_headers).status_code == 200
+        assert client.get('/api/v1/platforms').status_code == 200
+
+    def test_only_verified_api_keys_get_their_own_bucket(self, limited, client, auth_headers):
+        raw_key = client.post('/api/v1/auth/api-keys', headers=auth_headers, json={}).get_json()['key']
+        anonymous = {'REMOTE_ADDR': '10.9.0.1'}
+
+        # Made-up keys share the address's bucket
+        statuses = [client.get('/api/v1/platforms', headers={'X-API-Key': f'adf_fake{i}_secret'},
+                               environ_base=anonymous).status_code for i in range(4)]
+        assert statuses == [200, 200, 200, 429]
+        assert client.get('/api/v1/platforms', environ_base=anonymous).status_code == 429
+
+        # A real key from the same address has its own
+        assert client.get('/api/v1/platforms', headers={'X-API-Key': raw_key},
+                          environ_base=anonymous).status_code == 200
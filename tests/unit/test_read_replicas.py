@@ -0,0 +1,165 @@
+"""Unit tests for read-replica routing (primary and replica are two SQLite files)"""
+import math
+import threading
+import time
+
+import pytest
+from flask import Flask
+from prometheus_client import REGISTRY
+
+from src.core import database
+from src.models.campaign import Base, User
+
+
+def _user(name):
+    return User(username=name, email=f'{name}@adflowai.com', password_hash='x')
+
+
+@pytest.fixture
+def replicated(tmp_path, monkeypatch):
+    """A Database with one replica; the replica starts with a row the primary lacks"""
+    from config.settings import TestingConfig
+
+    app = Flask(__name__)
+    app.config.from_object(TestingConfig)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+        DATABASE_REPLICA_URLS=[f"sqlite:///{tmp_path / 'replica.db'}"],
+        DB_REPLICA_MAX_LAG=0.2,
+        DB_REPLICA_LAG_CHECK_INTERVAL=0,
+    )
+    test_db = database.Database()
+    monkeypatch.setattr(database, 'db', test_db)
+    database.init_db(app)
+
+    Base.metadata.create_all(test_db.replicas[0])
+    session = test_db.ReadSession(bind=test_db.replicas[0])
+    session.add(_user('replica_only'))
+    session.commit()
+    session.close()
+
+    yield app, test_db
+    test_db.close_session()
+    for engine in [test_db.engine, *test_db.replicas]:
+        engine.dispose()
+
+
+def _reads_replica():
+    return database.get_read_session().query(User).filter_by(username='replica_only').count() == 1
+
+
+class TestReadRouting:
+
+    def test_reads_go_to_the_replica(self, replicated):
+        app, _ = replicated
+        with app.test_request_context():
+            assert _reads_replica()
+            assert database.get_read_session() is database.get_read_session()
+            assert database.get_db_session().query(User).count() == 0
+
+    def test_lagging_or_unreachable_replica_falls_back_to_primary(self, replicated):
+        app, test_db = replicated
+        test_db.lag_probe = lambda engine: 1.0
+        with app.test_request_context():
+            assert database.get_read_session() is database.get_db_session()
+
+        def unreachable(engine):
+            raise ConnectionError('replica down')
+        test_db.lag_probe = unreachable
+        with app.test_request_context():
+            assert not _reads_replica()
+        assert REGISTRY.get_sample_value('adflowai_db_replica_lag_seconds', {'replica': '0'}) == math.inf
+
+    def test_lag_is_probed_once_per_interval(self, replicated):
+        app, test_db = replicated
+        probes = []
+        test_db.lag_probe = lambda engine: probes.append(engine) or 0.0
+        test_db.lag_check_interval = 60
+        test_db._lag.clear()
+        for _ in range(3):
+            with app.test_request_context():
+                assert _reads_replica()
+        assert len(probes) == 1
+
+
+    def test_a_slow_probe_does_not_hold_up_other_requests(self, replicated):
+        app, test_db = replicated
+        test_db._lag.clear()
+        release = threading.Event()
+        test_db.lag_probe = lambda engine: release.wait(5) and 0.0
+        prober = threading.Thread(target=test_db.replica_lag, args=(0,))
+        prober.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        with app.test_request_context():
+            # No lag known yet: skip the replica rather than wait for the probe
+            assert not _reads_replica()
+        assert time.monotonic() - started < 1
+        release.set()
+        prober.join()
+        assert test_db.replica_lag(0) == 0.0
+
+    def test_probe_engine_has_short_timeouts(self):
+        from sqlalchemy import event
+        probe = database._create_probe_engine('postgresql://u:p@replica.invalid/db',
+                                              {'DB_REPLICA_PROBE_TIMEOUT': 0.5})
+        assert (probe.pool.size(), probe.pool.timeout()) == (1, 0.5)
+        captured = {}
+
+        @event.listens_for(probe, 'do_connect')
+        def capture(dialect, connection_record, cargs, cparams):
+            captured.update(cparams)
+            raise ConnectionError('no network in tests')
+        with pytest.raises(Exception):
+            database.measure_replica_lag(probe)
+        assert captured['connect_timeout'] == 1
+        assert captured['options'] == '-c statement_timeout=500'
+        assert database._create_probe_engine('sqlite:///replica.db', {}) is None
+
+
+    def test_forked_worker_drops_inherited_connections(self, replicated):
+        app, test_db = replicated
+        with app.test_request_context():
+            assert _reads_replica()
+        pools = [test_db.engine.pool, test_db.replicas[0].pool]
+        assert any(pool.checkedin() for pool in pools)
+
+        test_db.dispose_after_fork()
+        assert test_db.engine.pool is not pools[0] and test_db.replicas[0].pool is not pools[1]
+        assert all(pool.checkedin() == 0 for pool in (test_db.engine.pool, test_db.replicas[0].pool))
+        with app.test_request_context():
+            assert _reads_replica()
+
+
+class TestReadYourWrites:
+
+    def test_writer_reads_primary_until_replicas_catch_up(self, replicated):
+        app, test_db = replicated
+        client = {'REMOTE_ADDR': '10.0.0.1'}
+        with app.test_request_context(environ_base=client):
+            assert _reads_replica()
+            session = database.get_db_session()
+            session.add(_user('written'))
+            session.commit()
+            # Same request: the write is only on the primary
+            assert database.get_read_session() is session
+
+        with app.test_request_context(environ_base=client):
+            assert database.get_read_session().query(User).filter_by(username='written').count() == 1
+        with app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.2'}):
+            assert _reads_replica()
+
+        time.sleep(test_db.max_lag)
+        with app.test_request_context(environ_base=client):
+            assert _reads_replica()
+
+    def test_reads_do_not_count_as_writes(self, replicated):
+        app, _ = replicated
+        client = {'REMOTE_ADDR': '10.0.0.3'}
+        with app.test_request_context(environ_base=client):
+            session = database.get_db_session()
+            session.query(User).count()
+            session.commit()
+            assert _reads_replica()
+        with app.test_request_context(environ_base=client):
+            assert _reads_replica()
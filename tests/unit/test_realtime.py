@@ -0,0 +1,209 @@
+"""Unit tests for the real-time update stream and SSE / long-poll endpoints"""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from src.core.metrics_sources import SimulatedMetricsSource
+from src.core.realtime_monitor import RealTimeMonitor, get_monitor
+from src.core.realtime_stream import UpdateStream
+
+
+@pytest.fixture
+def campaign_id(client, auth_headers, app):
+    app.config['REALTIME_LOCAL_MONITOR'] = False
+    res = client.post('/api/v1/campaigns', json={
+        'name': 'Live Campaign', 'total_budget': 1000,
+        'platforms': ['google_ads'], 'start_date': datetime.utcnow().isoformat(),
+    }, headers=auth_headers)
+    return res.get_json()['campaign']['id']
+
+
+class TestUpdateStream:
+
+    def test_since_filters_by_campaign_and_sequence(self):
+        stream = UpdateStream()
+        stream.publish(1, {'ctr': 0.01})
+        stream.publish(2, {'ctr': 0.02})
+        seq = stream.publish(1, {'ctr': 0.03})
+        current, events = stream.since(1, [1])
+        assert current == seq
+        assert [e['data']['ctr'] for e in events] == [0.03]
+
+    def test_new_client_gets_latest_snapshot(self):
+        stream = UpdateStream()
+        stream.publish(1, {'ctr': 0.01})
+        stream.publish(1, {'ctr': 0.02})
+        stream.publish(1, {'type': 'cpc_high'}, kind='alert')
+        _, events = stream.since(0, [1])
+        assert [e['data'] for e in events] == [{'ctr': 0.02}]
+
+    def test_foreign_or_future_cursor_gets_latest_snapshot(self):
+        stream, other = UpdateStream(), UpdateStream()
+        stream.publish(1, {'ctr': 0.01})
+        seq = stream.publish(1, {'ctr': 0.02})
+        assert stream.parse_cursor(stream.cursor(seq)) == seq
+        for cursor in (other.cursor(seq), str(seq), 'garbage', None):
+            assert stream.parse_cursor(cursor) == 0
+        # A restarted process can be behind a cursor's sequence
+        _, events = stream.since(seq + 100, [1])
+        assert [e['data'] for e in events] == [{'ctr': 0.02}]
+
+    def test_wait_times_out_without_new_data(self):
+        stream = UpdateStream()
+        seq = stream.publish(1, {'ctr': 0.01})
+        assert stream.wait(seq, [1], timeout=0.05) == (seq, [])
+
+    def test_wait_wakes_on_publish(self):
+        stream = UpdateStream()
+        timer = threading.Timer(0.05, stream.publish, args=(1, {'ctr': 0.05}))
+        timer.start()
+        _, events = stream.wait(0, [1], timeout=5)
+        timer.join()
+        assert events[0]['data'] == {'ctr': 0.05}
+
+    def test_wait_ignores_other_campaigns(self):
+        stream = UpdateStream()
+        seq = stream.publish(1, {'ctr': 0.01})
+        timers = [threading.Timer(0.02, stream.publish, args=(2, {'ctr': 0.02})),
+                  threading.Timer(0.05, stream.publish, args=(1, {'type': 'cpc_high'}), kwargs={'kind': 'alert'})]
+        for timer in timers:
+            timer.start()
+        _, events = stream.wait(seq, [1], timeout=5)
+        for timer in timers:
+            timer.join()
+        assert [e['event'] for e in events] == ['alert']
+
+
+def _eventually(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def monitor():
+    """A fast-ticking monitor on its own loop thread that keeps alerts out of the shared test database"""
+    monitor = RealTimeMonitor(metrics_source=SimulatedMetricsSource(seed=1), tick_interval=0.01, idle_ttl=0.1)
+    monitor._persist_alert_events = lambda events: None
+    yield monitor
+    for campaign_id in list(monitor.active_campaigns):
+        monitor.forget(campaign_id)
+    assert _eventually(lambda: not monitor.active_campaigns)
+
+
+class TestMonitorLifecycle:
+
+    def test_idle_campaigns_are_stopped(self, monitor):
+        monitor.ensure_monitoring([1])
+        assert _eventually(lambda: 1 in monitor.active_campaigns)
+        assert _eventually(lambda: 1 not in monitor.active_campaigns)
+        assert 1 not in monitor._requested_at
+
+    def test_forget_stops_monitoring(self, monitor):
+        monitor.idle_ttl = 60
+        monitor.ensure_monitoring([1, 2])
+        assert _eventually(lambda: monitor.active_campaigns == {1, 2})
+        monitor.forget(1)
+        assert _eventually(lambda: monitor.active_campaigns == {2})
+
+    def test_deleting_a_campaign_stops_monitoring(self, client, auth_headers, campaign_id):
+        get_monitor().active_campaigns.add(campaign_id)
+        res = client.delete(f'/api/v1/campaigns/{campaign_id}', headers=auth_headers)
+        assert res.status_code == 200
+        assert campaign_id not in get_monitor().active_campaigns
+
+
+class TestRealtimeEndpoints:
+
+    def test_poll_requires_campaigns(self, client, auth_headers):
+        res = client.get('/api/v1/realtime/poll', headers=auth_headers)
+        assert res.status_code == 400
+
+    def test_poll_unknown_campaign(self, client, auth_headers):
+        res = client.get('/api/v1/realtime/poll?campaigns=99999', headers=auth_headers)
+        assert res.status_code == 404
+
+    def test_poll_returns_newer_events_only(self, client, auth_headers, campaign_id):
+        get_monitor().updates.publish(campaign_id, {'current_ctr': 0.02})
+        res = client.get(f'/api/v1/realtime/poll?campaigns={campaign_id}&timeout=0',
+                         headers=auth_headers)
+        assert res.status_code == 200
+        data = res.get_json()
+        assert data['events'][-1]['data'] == {'current_ctr': 0.02}
+
+        res = client.get(
+            f"/api/v1/realtime/poll?campaigns={campaign_id}&since={data['sequence']}&timeout=0",
+            headers=auth_headers)
+        assert res.status_code == 204
+
+    def test_poll_waits_without_a_db_session(self, client, auth_headers, campaign_id, monkeypatch):
+        from src.core.database import db
+        updates = get_monitor().updates
+        held = []
+
+        def wait(sequence, campaign_ids, timeout):
+            held.append(db.Session.registry.has())
+            return sequence, []
+        monkeypatch.setattr(updates, 'wait', wait)
+        db.close_session()  # so the request owns its session
+        res = client.get(f'/api/v1/realtime/poll?campaigns={campaign_id}&timeout=0', headers=auth_headers)
+        assert res.status_code == 204
+        assert held == [False]
+
+    def test_poll_rejects_other_users_campaign(self, client, campaign_id):
+        other = client.post('/api/v1/auth/register', json={
+            'username': 'rt_other', 'email': 'rt_other@test.com', 'password': 'OtherPass123!'
+        }).get_json()['tokens']['access_token']
+        res = client.get(f'/api/v1/realtime/poll?campaigns={campaign_id}&timeout=0',
+                         headers={'Authorization': f'Bearer {other}'})
+        assert res.status_code == 403
+
+    def test_stream_emits_sse_events(self, client, auth_headers, campaign_id):
+        updates = get_monitor().updates
+        seq = updates.publish(campaign_id, {'current_ctr': 0.04})
+        res = client.get(f'/api/v1/realtime/stream?campaigns={campaign_id}',
+                         headers={**auth_headers, 'Last-Event-ID': updates.cursor(seq - 1)})
+        assert res.status_code == 200
+        assert res.mimetype == 'text/event-stream'
+        chunks = iter(res.response)
+        assert next(chunks).startswith(b'retry:')
+        event = next(chunks).decode()
+        res.close()
+        assert f'id: {updates.cursor(seq)}' in event
+        assert 'event: update' in event
+        assert '"current_ctr": 0.04' in event
+
+    def test_streams_per_process_are_capped(self, app, client, auth_headers, campaign_id):
+        url = f'/api/v1/realtime/stream?campaigns={campaign_id}'
+        app.config['REALTIME_MAX_STREAMS'] = 1
+        first = client.get(url, headers=auth_headers)
+        assert first.status_code == 200
+        busy = client.get(url, headers=auth_headers)
+        assert busy.status_code == 503
+        assert busy.headers['Retry-After']
+        first.close()
+        again = client.get(url, headers=auth_headers)
+        assert again.status_code == 200
+        again.close()
+
+    def test_sparkline_reads_in_memory_window(self, client, auth_headers, campaign_id):
+        now = time.time()
+        for i in range(10):
+            get_monitor().store.append(campaign_id, {'ctr': 0.01 * (i + 1)}, timestamp=now - 10 + i)
+        res = client.get(f'/api/v1/realtime/campaigns/{campaign_id}/sparkline?metric=ctr&seconds=60&points=6',
+                         headers=auth_headers)
+        get_monitor().store.drop(campaign_id)
+        assert res.status_code == 200
+        data = res.get_json()['sparkline']
+        assert len(data['points']) == 6
+        assert data['points'][:4] == [None] * 4
+        assert data['summary']['count'] == 10
+        assert data['summary']['last'] == pytest.approx(0.1)
+
+    def test_sparkline_rejects_unknown_metric(self, client, auth_headers, campaign_id):
+        res = client.get(f'/api/v1/realtime/campaigns/{campaign_id}/sparkline?metric=roas',
+                         headers=auth_headers)
+        assert res.status_code == 400
@@ -0,0 +1,98 @@
+"""Unit tests for the standalone real-time gateway"""
+import asyncio
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from config.settings import Config
+from src.core.metrics_sources import SimulatedMetricsSource
+from src.core.realtime_gateway import RealtimeGateway, authenticate_token, shard_for
+
+
+def make_token(user_id, token_type='access', secret=Config.JWT_SECRET_KEY):
+    return jwt.encode({
+        'sub': user_id, 'type': token_type,
+        'exp': datetime.utcnow() + timedelta(minutes=5)
+    }, secret, algorithm='HS256')
+
+
+def owns_odd_campaigns(user_id, campaign_ids):
+    return {c for c in campaign_ids if c % 2}
+
+
+def run_with_client(gateway, scenario):
+    async def runner():
+        async with TestClient(TestServer(gateway.create_app())) as client:
+            return await scenario(client)
+    return asyncio.run(runner())
+
+
+@pytest.fixture
+def gateway():
+    return RealtimeGateway(
+        Config,
+        metrics_source=SimulatedMetricsSource(seed=7),
+        ownership_checker=owns_odd_campaigns,
+    )
+
+
+class TestGatewayHelpers:
+
+    def test_shard_for_spreads_campaigns(self):
+        assert [shard_for(c, 3) for c in range(6)] == [0, 1, 2, 0, 1, 2]
+        assert shard_for(42, 1) == 0
+
+    def test_authenticate_token(self):
+        assert authenticate_token(make_token(5), Config.JWT_SECRET_KEY) == 5
+
+    def test_refresh_token_rejected(self):
+        with pytest.raises(jwt.InvalidTokenError):
+            authenticate_token(make_token(5, 'refresh'), Config.JWT_SECRET_KEY)
+
+    def test_bad_signature_rejected(self):
+        with pytest.raises(jwt.InvalidTokenError):
+            authenticate_token(make_token(5, secret='other'), Config.JWT_SECRET_KEY)
+
+
+class TestGatewayServer:
+
+    def test_ws_requires_token(self, gateway):
+        async def scenario(client):
+            res = await client.get('/ws')
+            return res.status
+        assert run_with_client(gateway, scenario) == 401
+
+    def test_subscribed_client_receives_updates(self, gateway):
+        async def scenario(client):
+            ws = await client.ws_connect(f'/ws?token={make_token(1)}&campaigns=1,2')
+            messages = [await ws.receive_json(timeout=2), await ws.receive_json(timeout=2)]
+            await gateway.monitor.tick()
+            messages.append(await ws.receive_json(timeout=2))
+            health = await (await client.get('/health')).json()
+            await ws.close()
+            return messages, health
+
+        messages, health = run_with_client(gateway, scenario)
+        assert messages[0] == {'type': 'error', 'error': 'Unauthorized', 'campaign_ids': [2]}
+        assert messages[1] == {'type': 'subscribed', 'campaign_ids': [1]}
+        assert messages[2]['type'] == 'update'
+        assert messages[2]['campaign_id'] == 1
+        assert health['clients'] == 1
+        assert health['monitored_campaigns'] == 1
+
+    def test_shard_monitors_only_campaigns_it_owns(self):
+        gateway = RealtimeGateway(
+            Config, shard_index=1, shard_count=2,
+            metrics_source=SimulatedMetricsSource(seed=7),
+            ownership_checker=lambda user_id, campaign_ids: set(campaign_ids),
+        )
+
+        async def scenario(client):
+            ws = await client.ws_connect(f'/ws?token={make_token(1)}&campaigns=1,2,3')
+            await ws.receive_json(timeout=2)
+            await ws.close()
+            return set(gateway.monitor.active_campaigns)
+
+        assert run_with_client(gateway, scenario) == {1, 3}
@@ -0,0 +1,113 @@
+"""Unit tests for batched scoring in AIOptimizer recommendations"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.ml.optimizer import AIOptimizer, RecommendationContext
+
+
+class CountingModel:
+    """Stands in for the trained regressor and counts predict calls"""
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+
+    def predict(self, X):
+        self.calls += 1
+        self.rows += len(X)
+        return np.clip(0.5 + 0.1 * X[:, 0], 0, 1)
+
+
+def campaign(**overrides):
+    data = {
+        'id': 1, 'ctr': 0.025, 'cpc': 1.2, 'cpa': 20.0, 'roas': 2.5, 'conversion_rate': 0.04,
+        'spent_budget': 400.0, 'total_budget': 1000.0, 'impressions': 50000, 'clicks': 1250,
+        'conversions': 50, 'start_date': datetime.utcnow() - timedelta(days=20),
+    }
+    data.update(overrides)
+    return data
+
+
+def history(rows=30):
+    return [{'ctr': 0.02 + 0.0001 * i, 'cpc': 1.0, 'cpa': 15.0, 'roas': 2.0, 'performance_score': 0.6}
+            for i in range(rows)]
+
+
+PLATFORMS = {
+    'google_ads': {'allocated_budget': 500, 'ctr': 0.035, 'roas': 4.5, 'performance_score': 0.8},
+    'facebook': {'allocated_budget': 300, 'ctr': 0.01, 'roas': 0.8, 'performance_score': 0.4},
+    'tiktok': {'allocated_budget': 200, 'ctr': 0.02, 'roas': 2.2, 'performance_score': 0.6},
+}
+
+
+@pytest.fixture
+def model_optimizer():
+    optimizer = AIOptimizer()
+    optimizer.performance_model = CountingModel()
+    optimizer.scaler = StandardScaler().fit(np.random.default_rng(0).normal(size=(50, 10)))
+    return optimizer
+
+
+class TestBatchedScoring:
+
+    def test_matches_single_predictions(self):
+        optimizer = AIOptimizer()
+        rows = [campaign()] + history(5) + list(PLATFORMS.values())
+        expected = [optimizer.predict_performance(row) for row in rows]
+        np.testing.assert_allclose(optimizer.predict_performance_batch(rows), expected)
+
+    def test_unusable_rows_get_neutral_score(self):
+        scores = AIOptimizer().predict_performance_batch([
+            campaign(), campaign(ctr=None), campaign(total_budget=0), campaign(start_date=None)
+        ])
+        assert scores[0] != 0.5
+        assert scores[1:].tolist() == [0.5, 0.5, 0.5]
+
+    def test_get_recommendations_makes_one_model_call(self, model_optimizer):
+        model_optimizer.get_recommendations(campaign(), PLATFORMS, history())
+        model = model_optimizer.performance_model
+        assert model.calls == 1
+        assert model.rows == 1 + len(PLATFORMS)   # history rows keep their stored scores
+
+    def test_only_unscored_history_rows_are_predicted(self, model_optimizer):
+        rows = history(4)
+        rows[1]['performance_score'] = None
+        context = RecommendationContext(model_optimizer, campaign(), {}, rows)
+        scores = context.history_scores()
+        assert model_optimizer.performance_model.rows == 2
+        assert scores[[0, 2, 3]].tolist() == [0.6, 0.6, 0.6]
+        assert scores[1] == pytest.approx(context.scores[2])
+
+    def test_context_memoizes_scores(self, model_optimizer):
+        context = RecommendationContext(model_optimizer, campaign(), PLATFORMS, history(10))
+        first = context.campaign_score
+        assert context.history_scores(last=7).shape == (7,)
+        assert set(context.platform_scores) == set(PLATFORMS)
+        assert context.campaign_score == first
+        assert model_optimizer.performance_model.calls == 1
+
+    def test_allocation_scores_all_requests_together(self, model_optimizer):
+        requests = [(1000.0 * (i + 1), PLATFORMS) for i in range(20)]
+        allocations = model_optimizer.optimize_budget_allocations(requests)
+        assert model_optimizer.performance_model.calls == 1
+        assert sum(allocations[4].values()) == pytest.approx(5000.0)
+
+
+class TestRecommendations:
+
+    def test_pause_uses_history_scores(self):
+        optimizer = AIOptimizer()
+        weak = campaign(ctr=0.001, roas=0.5, conversion_rate=0.001)
+        recommendations = optimizer.get_recommendations(weak, PLATFORMS, history())
+        assert [r.action for r in recommendations] == ['pause']
+
+    def test_reallocation_uses_context_platform_scores(self):
+        optimizer = AIOptimizer()
+        recommendations = optimizer.get_recommendations(campaign(), PLATFORMS, history(3))
+        reallocation = next(r for r in recommendations if r.action == 'reallocate')
+        expected = optimizer.optimize_budget_allocation(1000.0, PLATFORMS)
+        assert reallocation.platform_allocations == pytest.approx(expected)
+        assert reallocation.platform_allocations['google_ads'] > reallocation.platform_allocations['facebook']
@@ -0,0 +1,95 @@
+"""Unit tests for the offline policy simulator"""
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from src.ml.optimizer import AIOptimizer, rule_based_scores
+from src.ml.simulator import (
+    STRATEGIES, FleetConfig, OracleStrategy, PolicySimulator, Strategy, generate_fleet, main
+)
+
+
+@pytest.fixture(scope='module')
+def simulator():
+    return PolicySimulator(FleetConfig(campaigns=400, days=30, seed=3))
+
+
+class TestFleet:
+
+    def test_every_campaign_runs_somewhere(self):
+        fleet = generate_fleet(FleetConfig(campaigns=1000, seed=1))
+        assert fleet.active.any(axis=1).all()
+        assert (fleet.reference[~fleet.active] == 0).all()
+        np.testing.assert_allclose(fleet.reference.sum(axis=1), fleet.budget / 90)
+
+
+class TestPolicySimulator:
+
+    def test_static_spends_the_budget(self, simulator):
+        result = simulator.run(Strategy(), track_memory=False)
+        assert result.spend == pytest.approx(simulator.fleet.budget.sum())
+        assert result.paused_fraction == 0.0
+
+    def test_runs_are_reproducible(self, simulator):
+        first = simulator.run(Strategy(), track_memory=False)
+        second = simulator.run(Strategy(), track_memory=False)
+        assert first.revenue == second.revenue
+
+    def test_every_strategy_completes(self, simulator):
+        results = simulator.compare([cls() for cls in STRATEGIES.values()])
+        by_name = {r.strategy: r for r in results}
+        assert set(by_name) == set(STRATEGIES)
+        assert by_name['oracle'].revenue_vs_oracle == 1.0
+        assert by_name['oracle'].spend_vs_oracle == 1.0
+        assert by_name['oracle'].revenue > by_name['static'].revenue
+        for result in results:
+            assert result.campaigns_per_second > 0
+            assert result.peak_memory_mb > 0
+            if result.strategy != 'rules':
+                assert result.spend == pytest.approx(simulator.fleet.budget.sum())
+
+    def test_rules_keep_the_fleet_budget(self, simulator):
+        result = simulator.run(STRATEGIES['rules'](), track_memory=False)
+        assert result.budget_growth <= 1.0 + 1e-9
+        assert result.spend <= simulator.fleet.budget.sum() * (1 + 1e-9)
+
+    def test_oracle_split_respects_active_platforms(self, simulator):
+        from src.ml.simulator import SimulationState
+        state = SimulationState(simulator.fleet)
+        OracleStrategy().decide(state, np.random.default_rng(0))
+        assert (state.shares[~simulator.fleet.active] == 0).all()
+        np.testing.assert_allclose(state.shares.sum(axis=1), 1.0)
+
+
+class TestRuleScores:
+
+    def test_matches_scalar_rules(self):
+        optimizer = AIOptimizer()
+        grid = np.array(list(itertools.product(
+            [0, 0.004, 0.005, 0.01, 0.015, 0.02, 0.03, 0.04],
+            [0, 0.5, 1.0, 2.0, 2.5, 3.0, 4.0, 5.0],
+            [0, 0.005, 0.01, 0.03, 0.04, 0.05, 0.06],
+            [0, 0.3, 0.5, 0.8, 0.9, 0.95, 0.99],
+        )))
+        expected = [
+            optimizer._rule_based_performance({
+                'ctr': ctr, 'roas': roas, 'conversion_rate': rate, 'spent_budget': used, 'total_budget': 1
+            })
+            for ctr, roas, rate, used in grid
+        ]
+        np.testing.assert_allclose(rule_based_scores(*grid.T), expected, atol=1e-12)
+
+
+class TestCommandLine:
+
+    def test_json_output(self, capsys):
+        main(['--campaigns', '200', '--days', '14', '--strategies', 'static,oracle', '--json'])
+        results = json.loads(capsys.readouterr().out)
+        assert [r['strategy'] for r in results] == ['static', 'oracle']
+        assert results[0]['campaigns'] == 200
+
+    def test_rejects_unknown_strategy(self):
+        with pytest.raises(SystemExit):
+            main(['--strategies', 'magic'])
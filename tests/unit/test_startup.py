@@ -0,0 +1,63 @@
+"""Cold-start budget of the web process, measured with python -X importtime"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Seconds for importing app plus create_app() in a fresh interpreter
+STARTUP_BUDGET = float(os.getenv('STARTUP_BUDGET_SECONDS', 1.5))
+
+# Only training, forecasting and model loading need these
+DEFERRED_MODULES = ('sklearn', 'scipy', 'joblib', 'pandas')
+
+APP_SCRIPT = """
+import time
+from config.settings import TestingConfig
+from app import create_app
+started = time.perf_counter()
+create_app(TestingConfig)
+print(time.perf_counter() - started)
+"""
+
+
+def cold_start(script=APP_SCRIPT):
+    """
+    Run ``script`` in a new interpreter
+
+    Returns:
+        Tuple of (seconds to import app, last line the script printed, set of imported top-level packages)
+    """
+    env = {**os.environ, 'DATABASE_URL': 'sqlite:///:memory:', 'PYTHONDONTWRITEBYTECODE': '1'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    imported, app_import = set(), None
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        imported.add(name.split('.')[0])
+        if name == 'app':
+            app_import = int(cumulative) / 1e6
+    output = result.stdout.strip().splitlines()
+    return app_import, output[-1] if output else None, imported
+
+
+class TestStartup:
+
+    def test_create_app_cold_start(self):
+        app_import, create, imported = cold_start()
+        create = float(create)
+
+        assert not imported & set(DEFERRED_MODULES), \
+            f"create_app imported {sorted(imported & set(DEFERRED_MODULES))}; import them where they are used"
+        assert app_import + create < STARTUP_BUDGET, \
+            f"cold start took {app_import:.2f}s import + {create:.2f}s create_app (budget {STARTUP_BUDGET}s)"
+
+    def test_celery_beat_skips_the_web_and_ml_stack(self):
+        _, _, imported = cold_start("import src.tasks.celery_app")
+        assert not imported & {'flask', 'numpy', *DEFERRED_MODULES}
@@ -0,0 +1,125 @@
+"""Unit tests for the chunked, warm-startable training pipeline"""
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from src.ml.optimizer import AIOptimizer
+from src.ml.training import (
+    LATEST_FILE, PerformanceModelTrainer, TrainingConfig, history_chunks, load_latest_artifact
+)
+
+
+@pytest.fixture
+def session(app):
+    """The shared test database, with no metrics history left over from other tests"""
+    from src.core.database import get_db_session
+    from src.models.campaign import MetricsHistory
+    session = get_db_session()
+    session.query(MetricsHistory).delete()
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def campaign(app):
+    from src.core.campaign_manager import CampaignManager
+    return CampaignManager().create_campaign(
+        user_id=1, name='Training', total_budget=2000.0, platforms=['google_ads'],
+        start_date=datetime(2026, 1, 1)
+    )
+
+
+def add_history(session, campaign, rows, seed=0):
+    from src.models.campaign import MetricsHistory
+    rng = np.random.default_rng(seed)
+    for i in range(rows):
+        roas = rng.uniform(0, 5)
+        clicks = int(rng.integers(1, 500))
+        session.add(MetricsHistory(
+            campaign_id=campaign.id, recorded_at=datetime(2026, 1, 1) + timedelta(hours=7 * i),
+            impressions=clicks * 40, clicks=clicks, conversions=int(clicks * rng.uniform(0, 0.1)),
+            spent=float(rng.uniform(0, 2000)), ctr=0.025, cpc=float(rng.uniform(0.5, 3)),
+            cpa=float(rng.uniform(5, 50)), roas=roas, performance_score=min(1.0, roas / 5)
+        ))
+    session.commit()
+
+
+def trainer(tmp_path, **overrides):
+    config = TrainingConfig(chunk_size=40, n_estimators=8, n_jobs=1, holdout_every=10, **overrides)
+    return PerformanceModelTrainer(f"{tmp_path}/", config)
+
+
+class TestHistoryChunks:
+
+    def test_features_match_prediction_features(self, session, campaign):
+        add_history(session, campaign, 5)
+        ids, X, y = next(history_chunks(session, chunk_size=100))
+        row = campaign.metrics_history[3]
+        expected = AIOptimizer()._extract_features({
+            'ctr': row.ctr, 'cpc': row.cpc, 'cpa': row.cpa, 'roas': row.roas,
+            'conversion_rate': row.conversions / row.clicks, 'spent_budget': row.spent,
+            'total_budget': campaign.total_budget, 'impressions': row.impressions, 'clicks': row.clicks,
+            'conversions': row.conversions, 'start_date': campaign.start_date
+        }, now=row.recorded_at)
+        np.testing.assert_allclose(X[ids.tolist().index(row.id)], expected)
+        assert y[ids.tolist().index(row.id)] == pytest.approx(row.performance_score)
+
+    def test_pages_by_id_and_skips_incomplete_rows(self, session, campaign):
+        add_history(session, campaign, 25)
+        campaign.metrics_history[0].ctr = None
+        session.commit()
+        chunks = list(history_chunks(session, chunk_size=10))
+        assert [len(ids) for ids, _, _ in chunks] == [9, 10, 5]
+        assert np.all(np.diff(np.concatenate([ids for ids, _, _ in chunks])) > 0)
+
+
+class TestPerformanceModelTrainer:
+
+    def test_full_retrain_publishes_versioned_artifact(self, session, campaign, tmp_path):
+        add_history(session, campaign, 200)
+        metadata = trainer(tmp_path).train(session)
+
+        assert metadata['trained'] and not metadata['warm_start']
+        assert metadata['n_estimators'] == 10             # 5 chunks x ceil(8 / 5) trees
+        assert metadata['rows'] + metadata['holdout_rows'] == 200
+        assert metadata['metrics']['mae'] is not None
+        assert {'scaler_seconds', 'fit_seconds', 'total_seconds'} <= set(metadata['timings'])
+        with open(os.path.join(tmp_path, 'performance', LATEST_FILE)) as f:
+            assert f.read() == metadata['version']
+
+        _, X, _ = next(history_chunks(session, chunk_size=1000))
+        model, scaler, _ = load_latest_artifact(f"{tmp_path}/")
+        np.testing.assert_allclose(scaler.mean_, StandardScaler().fit(X).mean_)
+        assert model.n_jobs == 1 and not model.warm_start
+
+    def test_warm_start_adds_trees_for_new_rows_only(self, session, campaign, tmp_path):
+        add_history(session, campaign, 80)
+        first = trainer(tmp_path).train(session)
+        assert trainer(tmp_path).train(session, warm_start=True)['trained'] is False
+
+        add_history(session, campaign, 40, seed=1)
+        second = trainer(tmp_path, max_estimators=9).train(session, warm_start=True)
+        assert second['warm_start'] and second['parent_version'] == first['version']
+        assert second['watermark'] > first['watermark']
+        assert second['rows'] + second['holdout_rows'] == 40
+        assert second['total_rows'] == first['rows'] + second['rows']
+        assert second['n_estimators'] == 9                  # oldest trees dropped past the cap
+
+    def test_optimizer_loads_latest_artifact(self, session, campaign, tmp_path):
+        add_history(session, campaign, 60)
+        metadata = trainer(tmp_path).train(session)
+        optimizer = AIOptimizer(model_path=f"{tmp_path}/")
+        optimizer.load_models()
+        assert optimizer.model_metadata['version'] == metadata['version']
+        assert 0.0 <= optimizer.predict_performance({
+            'ctr': 0.03, 'cpc': 1.0, 'cpa': 10.0, 'roas': 4.0, 'conversion_rate': 0.05,
+            'spent_budget': 500, 'total_budget': 2000, 'impressions': 4000, 'clicks': 100,
+            'conversions': 5, 'start_date': datetime.utcnow() - timedelta(days=5)
+        }) <= 1.0
+
+    def test_empty_history_is_an_error(self, session, campaign, tmp_path):
+        with pytest.raises(ValueError):
+            trainer(tmp_path).train(session)
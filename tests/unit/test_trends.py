@@ -0,0 +1,85 @@
+"""Unit tests for batched and running score-trend regression"""
+import numpy as np
+import pytest
+
+from src.ml.optimizer import AIOptimizer
+from src.ml.trends import RunningTrend, least_squares_slopes
+
+
+class TestLeastSquaresSlopes:
+
+    def test_matches_polyfit_per_row(self):
+        values = np.random.default_rng(0).uniform(0, 1, (50, 7))
+        slopes, counts = least_squares_slopes(values)
+        expected = [np.polyfit(range(7), row, 1)[0] for row in values]
+        np.testing.assert_allclose(slopes, expected, atol=1e-12)
+        assert counts.tolist() == [7] * 50
+
+    def test_missing_points_are_skipped(self):
+        values = np.array([
+            [0.9, np.nan, 0.7, 0.6, np.nan],
+            [0.5, np.nan, np.nan, np.nan, np.nan],
+            [np.nan] * 5,
+        ])
+        slopes, counts = least_squares_slopes(values)
+        assert slopes[0] == pytest.approx(np.polyfit(range(3), [0.9, 0.7, 0.6], 1)[0])
+        assert slopes[1:].tolist() == [0.0, 0.0]
+        assert counts.tolist() == [3, 1, 0]
+
+
+class TestRunningTrend:
+
+    def test_sliding_window_equals_batch_fit(self):
+        scores = np.random.default_rng(1).uniform(0, 1, 40)
+        trend = RunningTrend()
+        for i, score in enumerate(scores):
+            trend.push(score)
+            window = scores[max(0, i - 6):i + 1]
+            expected = np.polyfit(range(len(window)), window, 1)[0] if len(window) > 1 else 0.0
+            assert trend.slope == pytest.approx(expected, abs=1e-9)
+        assert trend.count == 7
+
+    def test_round_trip_and_ignores_missing_scores(self):
+        trend = RunningTrend.from_scores([0.5, None, 0.4, 0.3])
+        restored = RunningTrend.from_dict(trend.to_dict())
+        assert restored == trend
+        assert restored.count == 3 and restored.slope == pytest.approx(-0.1)
+
+
+class TestDecliningTrend:
+
+    def test_supplied_trend_state_is_used(self):
+        campaign = {'ctr': 0.03, 'cpc': 1.0, 'cpa': 10.0, 'roas': 4.0, 'conversion_rate': 0.05,
+                    'spent_budget': 100, 'total_budget': 1000, 'conversions': 10, 'target_cpa': 20}
+        history = [{'performance_score': 0.8}] * 10
+        optimizer = AIOptimizer()
+        assert not optimizer.should_pause_campaign(campaign, history)[0]
+        campaign['score_trend'] = {'slope': -0.08, 'points': 7}
+        should_pause, reason = optimizer.should_pause_campaign(campaign, history)
+        assert should_pause and 'trend' in reason
+
+
+class TestScoreTrendState:
+
+    def test_backfill_then_incremental_updates(self, app):
+        from datetime import datetime
+        from src.core.campaign_manager import CampaignManager
+
+        manager = CampaignManager()
+        campaign = manager.create_campaign(user_id=1, name='Trend', total_budget=1000,
+                                           platforms=['facebook'], start_date=datetime.utcnow())
+        for ctr in (0.05, 0.04, 0.03):
+            manager.update_campaign_metrics(campaign.id, metrics={'ctr': ctr, 'roas': 2.0})
+        scores = [h.performance_score
+                  for h in sorted(campaign.metrics_history, key=lambda h: h.recorded_at)]
+
+        trend = manager.score_trends([campaign.id])[campaign.id]
+        assert campaign.score_trend is not None
+        assert trend['points'] == 3
+        assert trend['slope'] == pytest.approx(np.polyfit(range(3), scores, 1)[0])
+
+        manager.update_campaign_metrics(campaign.id, metrics={'ctr': 0.02})
+        state = RunningTrend.from_dict(campaign.score_trend.state)
+        assert state.count == 4
+        assert state.recent[-1] == pytest.approx(campaign.performance_score)
+        assert manager.score_trends([campaign.id])[campaign.id]['slope'] == pytest.approx(state.slope)